@@ -17,6 +17,7 @@ from app.auth import AuthenticatedUser
 from app.auth.dashboard_access import CAP_APP_USERS_MANAGE
 from app.core.middleware import get_current_request_id
 from app.db import get_sqlite_manager
+from app.services.config_events import TOPIC_ENTITLEMENTS, publish_config_change
 from app.services.supabase_admin import SupabaseAdminClient
 from app.services.supabase_auth_admin import SupabaseAuthAdminClient
 
@@ -590,6 +591,7 @@ async def upsert_app_user_entitlements(
         "last_updated": now_ms,
     }
     row = await supabase.upsert_one(table="user_entitlements", values=values, on_conflict="user_id")
+    await publish_config_change(request.app, TOPIC_ENTITLEMENTS)
     audit_ok = await _write_audit_log(
         request,
         admin_user=admin_user,
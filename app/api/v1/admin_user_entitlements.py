@@ -13,6 +13,7 @@ from app.api.v1.dashboard_deps import require_dashboard_capability_user
 from app.auth import AuthenticatedUser
 from app.auth.dashboard_access import CAP_APP_USERS_MANAGE
 from app.db import get_sqlite_manager
+from app.services.config_events import TOPIC_ENTITLEMENTS, publish_config_change
 from app.services.supabase_admin import SupabaseAdminClient
 
 from .llm_common import create_response
@@ -159,6 +160,7 @@ async def upsert_user_entitlements(
 
     if not isinstance(row, dict):
         return create_response(code=502, msg="Supabase upsert failed", data=None)
+    await publish_config_change(request.app, TOPIC_ENTITLEMENTS)
 
     return create_response(
         data=UserEntitlementsSnapshot(
@@ -305,6 +307,7 @@ async def upsert_user_entitlements_tier_preset(
             flags_json,
         ),
     )
+    await publish_config_change(request.app, TOPIC_ENTITLEMENTS)
 
     presets = await _list_effective_tier_presets(request)
     row = next((item for item in presets if _normalize_tier(item.get("tier")) == tier), None) or {
@@ -329,6 +332,7 @@ async def delete_user_entitlements_tier_preset(
 
     db = get_sqlite_manager(request.app)
     await db.execute("DELETE FROM user_entitlement_tier_presets WHERE tier = ?", (normalized,))
+    await publish_config_change(request.app, TOPIC_ENTITLEMENTS)
     return create_response(data={"tier": normalized}, msg="deleted")
 
 
@@ -15,16 +15,15 @@ from pydantic import BaseModel, ConfigDict, Field
 
 from app.auth import AuthenticatedUser, get_current_user
 from app.core.middleware import get_current_request_id, reset_current_request_id, set_current_request_id
-from app.db.sqlite_manager import get_sqlite_manager
 from app.services.ai_service import AIMessageInput, AIService, MessageEvent
+from app.services.daily_quota import get_daily_quota_counter
 from app.services.entitlement_service import EntitlementService
 from app.services.exercise_library_service import ExerciseLibraryService
+from app.services.llm_app_settings import get_llm_app_settings
 from app.services.web_search_service import WebSearchError, WebSearchService
 
 from .messages import (
     _FREE_TIER_DAILY_MODEL_LIMITS,
-    _get_llm_app_default_result_mode,
-    _get_llm_app_prompt_mode,
     _normalize_quota_model_key,
     stream_message_events,
 )
@@ -75,27 +74,6 @@ def _build_injected_context_xml(
     return out
 
 
-async def _get_llm_app_setting(request: Request, key: str) -> Any:
-    db = get_sqlite_manager(request.app)
-    row = await db.fetchone("SELECT value_json FROM llm_app_settings WHERE key = ? LIMIT 1", (str(key),))
-    raw = row.get("value_json") if isinstance(row, dict) else None
-    if raw is None:
-        return None
-    try:
-        return json.loads(raw) if isinstance(raw, str) else raw
-    except Exception:
-        return raw
-
-
-def _as_bool(value: Any) -> bool:
-    if isinstance(value, bool):
-        return value
-    if isinstance(value, (int, float)):
-        return bool(value)
-    text = str(value or "").strip().lower()
-    return text in {"1", "true", "yes", "y", "on"}
-
-
 def _web_search_response_to_dict(obj) -> dict[str, Any]:
     return {
         "provider": obj.provider,
@@ -240,8 +218,7 @@ async def create_agent_run(
 
         if not is_pro:
             today = time.strftime("%Y-%m-%d", time.gmtime())
-            db = get_sqlite_manager(request.app)
-            allowed, count_after = await db.increment_daily_model_usage_if_below_limit(
+            allowed, count_after = await get_daily_quota_counter(request.app).try_consume(
                 current_user.uid,
                 quota_model_key,
                 today,
@@ -274,9 +251,10 @@ async def create_agent_run(
         or (payload.metadata or {}).get("resultMode")
         or None
     )
+    app_settings = await get_llm_app_settings(request.app)
     if not requested_result_mode:
-        requested_result_mode = await _get_llm_app_default_result_mode(request)
-    prompt_mode = await _get_llm_app_prompt_mode(request)
+        requested_result_mode = app_settings.default_result_mode
+    prompt_mode = app_settings.prompt_mode
     enforced_skip_prompt = prompt_mode == "passthrough"
 
     # Agent 请求体：顶层字段为 SSOT；metadata 仅补充上下文/对账。
@@ -396,12 +374,13 @@ async def create_agent_run(
                 )
 
         # 2) Web 搜索（Exa；默认关闭）
-        web_search_enabled = _as_bool(await _get_llm_app_setting(request, "web_search_enabled"))
+        app_settings = await get_llm_app_settings(request.app)
+        web_search_enabled = app_settings.web_search_enabled
         if payload.enable_web_search is False:
             web_search_enabled = False
 
         if web_search_enabled:
-            api_key = str(await _get_llm_app_setting(request, "web_search_exa_api_key") or "").strip()
+            api_key = app_settings.web_search_exa_api_key
             api_key_source = "db" if api_key else "none"
             if not api_key:
                 api_key = str(os.getenv("EXA_API_KEY") or "").strip()
@@ -2,7 +2,6 @@
 
 from __future__ import annotations
 
-import asyncio
 import json
 from datetime import datetime, timedelta, timezone
 from typing import Any, Dict, Optional
@@ -10,14 +9,15 @@ from typing import Any, Dict, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect, status
 from pydantic import BaseModel, Field
 
-from app.auth import AuthenticatedUser, get_current_user
+from app.auth import AuthenticatedUser, ProviderError, get_current_user
 from app.auth.dashboard_access import is_dashboard_admin_user
 from app.db import SQLiteManager, get_sqlite_manager
 from app.auth.jwt_verifier import get_jwt_verifier
 from app.log import logger
+from app.services.config_events import TOPIC_DASHBOARD_CONFIG, publish_config_change
 from app.services.dashboard_broker import DashboardBroker
 from app.services.log_collector import LogCollector
-from app.services.llm_model_registry import LlmModelRegistry
+from app.services.llm_model_registry import LlmModelRegistry, ResolvedProviderRoute
 from app.services.metrics_collector import MetricsCollector
 from app.services.model_mapping_service import ModelMappingService, normalize_scope_type
 
@@ -79,7 +79,7 @@ async def dashboard_websocket(
         2. JWT 验证
         3. 检查用户类型（匿名用户禁止访问）
         4. 注册到连接池
-        5. 每 10 秒推送一次统计数据
+        5. 订阅共享统计快照（每 10 秒一次，所有连接共用一次聚合）
         6. 断线时清理连接
     """
     # 先接受连接（必须在任何操作之前）
@@ -112,21 +112,8 @@ async def dashboard_websocket(
     await broker.add_connection(user.uid, websocket)
 
     try:
-        while True:
-            # 获取统计数据
-            stats = await broker.get_dashboard_stats(time_window="24h")
-
-            # 推送数据
-            await websocket.send_json(
-                {
-                    "type": "stats_update",
-                    "data": stats,
-                    "timestamp": datetime.utcnow().isoformat(),
-                }
-            )
-
-            # 等待 10 秒
-            await asyncio.sleep(10)
+        # 统计快照由 broker 每个周期聚合一次并广播给所有连接（与连接数无关）
+        await broker.serve(websocket)
 
     except WebSocketDisconnect:
         logger.info("WebSocket connection closed uid=%s", user.uid)
@@ -370,6 +357,12 @@ async def get_mapped_models_stats(
             "avg_latency_ms": avg_latency_ms,
         }
 
+    # 批量解析：所有 key 共享一次加载的端点/映射/屏蔽列表
+    try:
+        routes = await registry.resolve_model_keys(keys)
+    except Exception as exc:
+        routes = {key: exc for key in keys}
+
     rows: list[dict[str, Any]] = []
     available = 0
     for key in keys:
@@ -388,8 +381,8 @@ async def get_mapped_models_stats(
             **_finalize_stats(key),
         }
 
-        try:
-            route = await registry.resolve_model_key(key)
+        route = routes.get(key) or ProviderError("resolved_model_missing")
+        if isinstance(route, ResolvedProviderRoute):
             row["availability"] = True
             row["availability_reason"] = "ok"
             row["provider"] = route.provider
@@ -398,9 +391,9 @@ async def get_mapped_models_stats(
             row["endpoint_id"] = route.endpoint_id
             row["endpoint_name"] = route.endpoint.get("name")
             available += 1
-        except Exception as exc:
+        else:
             row["availability"] = False
-            row["availability_reason"] = (str(exc) or type(exc).__name__)[:200]
+            row["availability_reason"] = (str(route) or type(route).__name__)[:200]
 
         rows.append(row)
 
@@ -811,6 +804,9 @@ async def update_dashboard_config(
         """,
         (json.dumps(payload, ensure_ascii=False),),
     )
+    # 整行覆盖 config_json（可能改变追踪开关）：本进程立即失效，其他 worker 经事件总线失效
+    db.invalidate_tracing_cache()
+    await publish_config_change(request.app, TOPIC_DASHBOARD_CONFIG)
 
     logger.info("Dashboard config updated by user_id=%s config=%s", current_user.uid, payload)
 
@@ -868,6 +864,7 @@ async def set_tracing_config(
 
     db = get_sqlite_manager(request.app)
     await db.set_tracing_enabled(payload.enabled)
+    await publish_config_change(request.app, TOPIC_DASHBOARD_CONFIG)
     return TracingConfigResponse(enabled=payload.enabled)
 
 
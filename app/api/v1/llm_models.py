@@ -2,7 +2,6 @@
 
 from __future__ import annotations
 
-import json
 import logging
 import os
 from typing import Any, Literal, Optional
@@ -14,10 +13,12 @@ from pydantic import BaseModel, ConfigDict, Field
 from app.auth import AuthenticatedUser, get_current_user
 from app.core.middleware import get_current_request_id
 from app.core.sse_guard import get_sse_guard
-from app.db.sqlite_manager import get_sqlite_manager
 
 from app.settings.config import get_settings
 from app.services.ai_service import DEFAULT_LLM_APP_RESULT_MODE, AIService
+from app.services.endpoint_circuit_breaker import get_endpoint_circuit_breaker
+from app.services.endpoint_health import get_endpoint_health_tracker
+from app.services.llm_app_settings import get_llm_app_settings, get_llm_app_settings_store
 from app.services.llm_model_registry import LlmModelRegistry
 
 from .llm_common import (
@@ -55,17 +56,20 @@ def _mask_secret(value: str) -> str:
     return f"{text[:4]}***{text[-4:]}"
 
 
-def _as_bool(value: Any) -> bool:
-    if isinstance(value, bool):
-        return value
-    if isinstance(value, (int, float)):
-        return bool(value)
-    text = str(value or "").strip().lower()
-    if text in {"1", "true", "yes", "y", "on"}:
-        return True
-    if text in {"0", "false", "no", "n", "off", ""}:
-        return False
-    return False
+def _attach_circuit_state(endpoint: dict[str, Any]) -> dict[str, Any]:
+    """为端点视图附加熔断状态与被动健康度（只读，不影响持久化字段）。"""
+
+    breaker = get_endpoint_circuit_breaker()
+    copy = dict(endpoint)
+    try:
+        endpoint_id = int(endpoint["id"])
+    except (KeyError, TypeError, ValueError):
+        copy["circuit"] = None
+        copy["passive_health"] = None
+        return copy
+    copy["circuit"] = breaker.describe(endpoint_id)
+    copy["passive_health"] = get_endpoint_health_tracker().describe(endpoint_id)
+    return copy
 
 
 class APIEndpointBase(BaseModel):
@@ -85,6 +89,21 @@ class APIEndpointBase(BaseModel):
     timeout: Optional[int] = Field(default=60, ge=1, le=600)
     is_active: Optional[bool] = True
     is_default: Optional[bool] = False
+    weight: Optional[int] = Field(
+        default=None,
+        ge=0,
+        le=1000,
+        description="负载均衡权重（同一模型多端点时生效；默认 100，0 表示仅在无其他可用端点时使用）",
+    )
+    prompt_cache_enabled: Optional[bool] = Field(
+        default=None,
+        description="anthropic.messages：是否自动为 system prompt / tools 插入 cache_control 断点（默认开启）",
+    )
+    max_concurrency: Optional[int] = Field(
+        default=None,
+        ge=0,
+        description="同时在途的上游请求上限（超出时按订阅等级排队；0 表示不限制，留空使用全局默认）",
+    )
     model_list: Optional[list[str]] = None
 
 
@@ -118,48 +137,20 @@ class BlockedModelsUpdateRequest(BaseModel):
     updates: list[BlockedModelUpdate] = Field(default_factory=list)
 
 async def _get_llm_app_config(request: Request) -> dict[str, Any]:
-    db = get_sqlite_manager(request.app)
-    rows = await db.fetchall("SELECT key, value_json FROM llm_app_settings ORDER BY key ASC", ())
+    snapshot = await get_llm_app_settings(request.app)
     merged: dict[str, Any] = dict(_DEFAULT_LLM_APP_CONFIG)
-    for row in rows:
-        key = str(row.get("key") or "").strip()
-        if not key:
-            continue
-        raw = row.get("value_json")
-        if raw is None:
-            continue
-        try:
-            value = json.loads(raw) if isinstance(raw, str) else raw
-        except Exception:
-            value = raw
-        merged[key] = value
+    merged.update(snapshot.values)
 
     # 兼容清理：移除历史遗留的灰度 key（不对外回显，避免泄露/误用）
     merged.pop("app_output_protocol_key", None)
 
-    mode = str(merged.get("default_result_mode") or "").strip()
-    if mode not in {"xml_plaintext", "raw_passthrough", "auto"}:
-        mode = "raw_passthrough"
-    merged["default_result_mode"] = mode
-
-    prompt_mode = str(merged.get("prompt_mode") or "").strip().lower()
-    if prompt_mode not in {"server", "passthrough"}:
-        prompt_mode = "server"
-    merged["prompt_mode"] = prompt_mode
-
-    output_protocol = str(merged.get("app_output_protocol") or "").strip().lower()
-    if output_protocol not in {"thinkingml_v45", "jsonseq_v1"}:
-        output_protocol = "thinkingml_v45"
-    merged["app_output_protocol"] = output_protocol
-
-    provider = str(merged.get("web_search_provider") or "exa").strip().lower() or "exa"
-    if provider != "exa":
-        provider = "exa"
-    merged["web_search_provider"] = provider
-    merged["web_search_enabled"] = _as_bool(merged.get("web_search_enabled"))
-
-    raw_key = merged.get("web_search_exa_api_key")
-    key = str(raw_key or "").strip()
+    merged["default_result_mode"] = snapshot.default_result_mode
+    merged["prompt_mode"] = snapshot.prompt_mode
+    merged["app_output_protocol"] = snapshot.app_output_protocol
+    merged["web_search_provider"] = snapshot.web_search_provider
+    merged["web_search_enabled"] = snapshot.web_search_enabled
+
+    key = snapshot.web_search_exa_api_key
     source = "db" if key else "none"
     if not key:
         key = str(os.getenv("EXA_API_KEY") or "").strip()
@@ -171,32 +162,8 @@ async def _get_llm_app_config(request: Request) -> dict[str, Any]:
 
 
 async def _set_llm_app_config(request: Request, values: dict[str, Any]) -> dict[str, Any]:
-    allowed_keys = {
-        "default_result_mode",
-        "prompt_mode",
-        "app_output_protocol",
-        "web_search_enabled",
-        "web_search_provider",
-        "web_search_exa_api_key",
-    }
-    db = get_sqlite_manager(request.app)
-    for key, value in values.items():
-        if key not in allowed_keys:
-            continue
-        try:
-            value_json = json.dumps(value, ensure_ascii=False)
-        except Exception:
-            value_json = json.dumps(str(value), ensure_ascii=False)
-        await db.execute(
-            """
-            INSERT INTO llm_app_settings(key, value_json, updated_at)
-            VALUES (?, ?, CURRENT_TIMESTAMP)
-            ON CONFLICT(key) DO UPDATE SET
-              value_json = excluded.value_json,
-              updated_at = CURRENT_TIMESTAMP
-            """,
-            (str(key), value_json),
-        )
+    # 写入 + 发布配置变更 + 刷新内存快照（消息热路径随即读到新值）
+    await get_llm_app_settings_store(request.app).update(values)
     return await _get_llm_app_config(request)
 
 
@@ -382,6 +349,9 @@ async def list_ai_models(
                     copy["endpoint_hint"] = {
                         "endpoint_id": route.endpoint_id,
                         "endpoint_name": route.endpoint.get("name"),
+                        "circuit_state": get_endpoint_circuit_breaker().state_of(route.endpoint_id)
+                        if route.endpoint_id is not None
+                        else None,
                     }
                 except Exception:
                     # 不阻塞列表：缺失字段按旧 schema 兼容
@@ -447,7 +417,7 @@ async def list_ai_models(
             )
 
     return create_response(
-        data=items,
+        data=[_attach_circuit_state(item) for item in items],
         total=total,
         page=page,
         page_size=page_size,
@@ -671,7 +641,7 @@ async def get_ai_model(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=create_response(code=404, msg="接口不存在"),
         )
-    return create_response(data=endpoint)
+    return create_response(data=_attach_circuit_state(endpoint))
 
 
 @router.post("/models/{endpoint_id}/sync")
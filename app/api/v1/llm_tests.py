@@ -2,7 +2,6 @@
 
 from __future__ import annotations
 
-import json
 import secrets
 import time
 from datetime import datetime, timezone
@@ -15,6 +14,7 @@ from pydantic import BaseModel, Field
 from app.auth import AuthenticatedUser, get_current_user
 from app.core.middleware import get_current_request_id
 from app.db import get_sqlite_manager
+from app.services.llm_app_settings import get_llm_app_settings
 from app.services.prompt_tools_assembly import assemble_system_prompt, extract_tools_schema
 
 from .llm_common import create_response, get_mapping_service, get_service, require_llm_admin
@@ -278,19 +278,7 @@ async def get_active_prompts_snapshot(
     if not normalized_protocol:
         # SSOT：默认跟随 llm_app_settings.app_output_protocol；缺失时回退 thinkingml_v45
         try:
-            db = get_sqlite_manager(request.app)
-            row = await db.fetchone(
-                "SELECT value_json FROM llm_app_settings WHERE key = ? LIMIT 1",
-                ("app_output_protocol",),
-            )
-            raw = row.get("value_json") if isinstance(row, dict) else None
-            value = ""
-            if raw is not None:
-                try:
-                    value = json.loads(raw) if isinstance(raw, str) else raw
-                except Exception:
-                    value = raw
-            normalized_protocol = str(value or "").strip().lower()
+            normalized_protocol = (await get_llm_app_settings(request.app)).app_output_protocol
         except Exception:
             normalized_protocol = ""
     if normalized_protocol not in {"thinkingml_v45", "jsonseq_v1"}:
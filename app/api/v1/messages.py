@@ -19,8 +19,10 @@ from app.auth.dashboard_access import is_dashboard_admin_user
 from app.core.middleware import get_current_request_id, reset_current_request_id, set_current_request_id
 from app.core.sse_guard import check_sse_concurrency, unregister_sse_connection
 from app.db.sqlite_manager import get_sqlite_manager
-from app.services.ai_service import DEFAULT_LLM_APP_RESULT_MODE, AIMessageInput, AIService, MessageEvent, MessageEventBroker
+from app.services.ai_service import AIMessageInput, AIService, MessageEvent, MessageEventBroker
+from app.services.daily_quota import get_daily_quota_counter
 from app.services.entitlement_service import EntitlementService
+from app.services.llm_app_settings import get_llm_app_settings
 from app.settings.config import get_settings
 
 router = APIRouter(tags=["messages"])
@@ -36,76 +38,6 @@ _FREE_TIER_DAILY_MODEL_LIMITS: dict[str, int | None] = {
     "gemini": 20,
 }
 
-async def _get_llm_app_default_result_mode(request: Request) -> str:
-    """App 默认 SSE 输出模式（SSOT：App 不传 result_mode 时按 llm_app_settings 持久化配置）。"""
-
-    db = get_sqlite_manager(request.app)
-    row = await db.fetchone(
-        "SELECT value_json FROM llm_app_settings WHERE key = ? LIMIT 1",
-        ("default_result_mode",),
-    )
-
-    mode = ""
-    raw = row.get("value_json") if isinstance(row, dict) else None
-    if raw is not None:
-        try:
-            value = json.loads(raw) if isinstance(raw, str) else raw
-        except Exception:
-            value = raw
-        mode = str(value or "").strip()
-
-    if mode not in {"xml_plaintext", "raw_passthrough", "auto"}:
-        mode = DEFAULT_LLM_APP_RESULT_MODE
-
-    return mode
-
-
-async def _get_llm_app_prompt_mode(request: Request) -> str:
-    """App 默认 Prompt 组装模式（SSOT：以 llm_app_settings.prompt_mode 为准）。"""
-
-    db = get_sqlite_manager(request.app)
-    row = await db.fetchone(
-        "SELECT value_json FROM llm_app_settings WHERE key = ? LIMIT 1",
-        ("prompt_mode",),
-    )
-
-    mode = ""
-    raw = row.get("value_json") if isinstance(row, dict) else None
-    if raw is not None:
-        try:
-            value = json.loads(raw) if isinstance(raw, str) else raw
-        except Exception:
-            value = raw
-        mode = str(value or "").strip().lower()
-
-    if mode not in {"server", "passthrough"}:
-        mode = "server"
-    return mode
-
-
-async def _get_llm_app_output_protocol(request: Request) -> str:
-    """App 默认对外输出协议（SSOT：以 llm_app_settings.app_output_protocol 为准）。"""
-
-    db = get_sqlite_manager(request.app)
-    row = await db.fetchone(
-        "SELECT value_json FROM llm_app_settings WHERE key = ? LIMIT 1",
-        ("app_output_protocol",),
-    )
-
-    mode = ""
-    raw = row.get("value_json") if isinstance(row, dict) else None
-    if raw is not None:
-        try:
-            value = json.loads(raw) if isinstance(raw, str) else raw
-        except Exception:
-            value = raw
-        mode = str(value or "").strip().lower()
-
-    if mode not in {"thinkingml_v45", "jsonseq_v1"}:
-        mode = "thinkingml_v45"
-    return mode
-
-
 def _normalize_quota_model_key(model_name: str) -> str:
     raw = str(model_name or "").strip().lower()
     if ":" in raw:
@@ -402,8 +334,7 @@ async def create_message(
 
         if not is_pro:
             today = datetime.now(timezone.utc).date().isoformat()
-            db = get_sqlite_manager(request.app)
-            allowed, count_after = await db.increment_daily_model_usage_if_below_limit(
+            allowed, count_after = await get_daily_quota_counter(request.app).try_consume(
                 current_user.uid,
                 quota_model_key,
                 today,
@@ -437,11 +368,13 @@ async def create_message(
         or (payload.metadata or {}).get("resultMode")
         or None
     )
+    # SSOT：llm_app_settings 内存快照（写入/配置版本变化后才重新加载）
+    app_settings = await get_llm_app_settings(request.app)
     if not requested_result_mode:
-        requested_result_mode = await _get_llm_app_default_result_mode(request)
-    prompt_mode = await _get_llm_app_prompt_mode(request)
+        requested_result_mode = app_settings.default_result_mode
+    prompt_mode = app_settings.prompt_mode
     enforced_skip_prompt = prompt_mode == "passthrough"
-    output_protocol = await _get_llm_app_output_protocol(request)
+    output_protocol = app_settings.app_output_protocol
     # SSOT：/messages 不允许使用 agent prompts（仅 /agent/runs 可用）
     sanitized_metadata = dict(payload.metadata or {})
     raw_scope = str(sanitized_metadata.get("prompt_scope") or "").strip().lower()
@@ -611,6 +544,25 @@ async def create_message(
     return MessageCreateResponse(message_id=message_id, conversation_id=conversation_id)
 
 
+def _observe_sse_first_event(meta: Any, first_event_at: Optional[float]) -> None:
+    """客户端视角的首帧延迟：创建消息 → 首个非 status/heartbeat 事件写出。"""
+
+    created_perf = getattr(meta, "created_perf", None)
+    if first_event_at is None or not isinstance(created_perf, float):
+        return
+    labels = getattr(meta, "upstream_labels", None) or {}
+    try:
+        from app.core.metrics import ai_sse_first_event_seconds
+
+        ai_sse_first_event_seconds.labels(
+            endpoint_id=str(labels.get("endpoint_id") or "unknown"),
+            model=str(labels.get("model") or "unknown"),
+            dialect=str(labels.get("dialect") or "unknown"),
+        ).observe(max(0.0, first_event_at - created_perf))
+    except Exception:  # pragma: no cover
+        pass
+
+
 @router.get("/messages/{message_id}/events")
 async def stream_message_events(
     message_id: str,
@@ -712,6 +664,7 @@ async def stream_message_events(
             "last_delta_ts_ms": None,
         }
         terminal_sent = False
+        first_event_at: Optional[float] = None
 
         def _append_frame(event: str, data: dict[str, Any], *, approx_chars: int = 0) -> None:
             nonlocal dropped_frames, stored_chars
@@ -890,6 +843,8 @@ async def stream_message_events(
                     out_data.pop("reply", None)
                     out_data["reply_snapshot_included"] = False
 
+                if first_event_at is None and item.event not in {"status", "heartbeat"}:
+                    first_event_at = time.perf_counter()
                 yield f"event: {item.event}\ndata: {json.dumps(out_data, ensure_ascii=False, separators=(',', ':'))}\n\n"
                 if item.event in {"completed", "error"}:
                     terminal_sent = True
@@ -926,6 +881,7 @@ async def stream_message_events(
                     pass
 
             await unregister_sse_connection(connection_id)
+            _observe_sse_first_event(meta, first_event_at)
 
             try:
                 db = get_sqlite_manager(request.app)
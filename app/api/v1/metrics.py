@@ -20,6 +20,33 @@ async def metrics():
     - jwks_cache_hits_total: JWKS缓存命中总数
     - active_connections: 活跃连接数
     - rate_limit_blocks_total: 限流阻止总数
+    - rate_limit_decisions_total: 限流决策总数（allow/deny、原因、用户类型）
+    - rate_limiter_tracked_keys: 限流器跟踪的 key 数量
+    - rate_limiter_cleanup_duration_seconds: 限流器/SSE 守卫清理耗时
+    - sse_active_connections: SSE 活跃连接数（按用户类型）
+    - sse_guard_rejections_total: SSE 守卫拒绝总数
+    - ai_endpoint_circuit_state: 上游端点熔断状态（0=closed, 1=half_open, 2=open）
+    - ai_endpoint_circuit_transitions_total: 上游端点熔断状态切换次数
+    - ai_endpoint_probe_cycle_duration_seconds: 端点巡检单轮耗时
+    - ai_endpoint_probe_cycles_total: 端点巡检轮次（completed/skipped）
+    - ai_endpoint_passive_observations_total: 真实流量的被动健康观测（按端点与结果类别）
+    - ai_endpoint_health_checks_total: 巡检中端点健康判定来源（probed/passive）
+    - ai_response_cache_requests_total: 响应缓存查询结果（hit/coalesced/miss/bypass）
+    - ai_response_cache_saved_tokens_total: 响应缓存与在途合并节省的 token 数
+    - ai_prompt_cache_tokens_total: Anthropic prompt caching 上游报告的缓存读/写 token 数
+    - ai_endpoint_queue_depth: 端点并发排队中的请求数
+    - ai_endpoint_queue_wait_seconds: 端点并发排队等待时长（按 pro/free）
+    - ai_endpoint_queue_timeouts_total: 端点并发排队超时次数
+    - ai_upstream_connect_seconds: 发起上游请求到收到响应头的耗时
+    - ai_upstream_ttft_seconds: 发起上游请求到 adapter 收到首个增量的耗时
+    - ai_sse_first_event_seconds: 创建消息到客户端 SSE 收到首个内容帧的耗时
+    - ai_upstream_chunk_gap_seconds: 上游相邻增量的间隔
+    - ai_upstream_output_tokens_per_second: 上游输出 token 速率
+    - ai_model_allowlist_version: 模型白名单索引版本
+    - ai_model_allowlist_rebuild_seconds: 模型白名单索引重建耗时
+    - entitlement_cache_requests_total: 权益缓存查询结果（hit/stale/miss）
+    - entitlement_load_seconds: 权益加载耗时
+    - entitlement_cache_entries: 权益缓存条目数
     """
     metrics_data = generate_latest()
     return Response(content=metrics_data, media_type=CONTENT_TYPE_LATEST)
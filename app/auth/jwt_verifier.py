@@ -4,6 +4,7 @@ import json
 import logging
 import time
 from dataclasses import dataclass
+from datetime import datetime, timezone
 from functools import lru_cache
 from typing import Any, Dict, List, Optional
 
@@ -57,7 +58,7 @@ class JWTError:
 
 
 class JWKSCache:
-    """简单的 JWKS 缓存，支持 15 分钟 TTL。"""
+    """简单的 JWKS 缓存，支持 15 分钟 TTL；记录最近一次拉取结果供 Dashboard 连通性展示。"""
 
     def __init__(
         self,
@@ -72,6 +73,9 @@ class JWKSCache:
         self._timeout_seconds = timeout_seconds
         self._keys: List[Dict[str, Any]] = []
         self._expires_at: float = 0.0
+        self._last_attempt_at: Optional[float] = None  # time.monotonic()
+        self._last_success_at: Optional[float] = None  # time.time()
+        self._last_error: Optional[str] = None
         self._init_static()
 
     def _init_static(self) -> None:
@@ -100,26 +104,74 @@ class JWKSCache:
         if not self._jwks_url:
             raise RuntimeError("JWKS source not configured")
 
-        now = time.monotonic()
-        if self._keys and now < self._expires_at:
+        if self._keys and time.monotonic() < self._expires_at:
             return self._keys
+        return self._fetch()
+
+    def refresh(self) -> bool:
+        """强制从 JWKS URL 拉取一次（失败时保留已缓存的密钥）；返回是否成功，不抛异常。"""
+
+        if not self._jwks_url or self._expires_at == float("inf"):
+            return bool(self._keys)
+        try:
+            self._fetch()
+        except Exception:
+            return False
+        return True
 
+    def _fetch(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        self._last_attempt_at = now
         try:
             with httpx.Client(timeout=self._timeout_seconds) as client:
                 response = client.get(self._jwks_url)
                 response.raise_for_status()
                 payload = response.json()
         except httpx.HTTPError as exc:
+            self._last_error = (str(exc) or type(exc).__name__)[:200]
             raise RuntimeError(f"Failed to fetch JWKS: {exc}") from exc
+        except Exception as exc:
+            self._last_error = (str(exc) or type(exc).__name__)[:200]
+            raise
 
         keys = payload.get("keys") if isinstance(payload, dict) else None
-        if not keys:
+        if not keys or not isinstance(keys, list):
+            self._last_error = "jwks_invalid_payload"
             raise RuntimeError("JWKS response missing keys")
 
         self._keys = list(keys)
         self._expires_at = now + self._ttl_seconds
+        self._last_success_at = time.time()
+        self._last_error = None
         return self._keys
 
+    @property
+    def jwks_url(self) -> Optional[str]:
+        return self._jwks_url
+
+    @property
+    def last_attempt_at(self) -> Optional[float]:
+        """最近一次远程拉取的时间（time.monotonic()）；从未拉取时为 None。"""
+
+        return self._last_attempt_at
+
+    def status(self) -> Dict[str, Any]:
+        """缓存状态快照（不触发网络请求）。"""
+
+        static = self._expires_at == float("inf")
+        return {
+            "source": "static" if static else ("jwks_url" if self._jwks_url else None),
+            "key_count": len(self._keys),
+            # 最近一次拉取成功（静态密钥视为始终可用）
+            "ok": bool(self._keys) if static else (self._last_success_at is not None and self._last_error is None),
+            "last_success_at": (
+                datetime.fromtimestamp(self._last_success_at, tz=timezone.utc).isoformat()
+                if self._last_success_at is not None
+                else None
+            ),
+            "last_error": self._last_error,
+        }
+
     def get_key(self, kid: Optional[str]) -> Dict[str, Any]:
         keys = self.get_keys()
         if kid:
@@ -146,13 +198,21 @@ class JWTVerifier:
             timeout_seconds=settings.http_timeout_seconds,
         )
 
-    def verify_token(self, token: str) -> AuthenticatedUser:
+    def _sync_settings(self) -> None:
         # 测试/热更新场景下 Settings 可能被 cache_clear 重新加载：这里按需刷新，避免签名密钥不一致导致 401。
         latest_settings = get_settings()
         if latest_settings is not self._settings:
             self._settings = latest_settings
             self._cache = self._build_cache(latest_settings)
 
+    @property
+    def jwks_cache(self) -> JWKSCache:
+        self._sync_settings()
+        return self._cache
+
+    def verify_token(self, token: str) -> AuthenticatedUser:
+        self._sync_settings()
+
         request_id = get_current_request_id()
 
         if not token:
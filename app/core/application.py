@@ -20,8 +20,11 @@ from app.db import SQLiteManager
 from app.repositories.user_repo import UserRepository
 from app.services.ai_config_service import AIConfigService
 from app.services.ai_service import AIService, MessageEventBroker
+from app.services.config_events import TOPIC_DASHBOARD_CONFIG, TOPIC_ENTITLEMENTS, ConfigEventBus
+from app.services.daily_quota import DailyQuotaCounter
 from app.services.dashboard_broker import DashboardBroker
 from app.services.log_collector import LogCollector
+from app.services.llm_app_settings import LlmAppSettingsStore
 from app.services.llm_model_registry import LlmModelRegistry
 from app.services.metrics_collector import MetricsCollector
 from app.services.model_mapping_service import ModelMappingService
@@ -80,7 +83,15 @@ async def lifespan(app: FastAPI):
         except Exception:
             # 兜底：迁移失败不阻断启动
             pass
-    app.state.ai_config_service = AIConfigService(sqlite_manager, settings, storage_dir)
+    # 配置变更事件总线：服务/路由写配置时发布，缓存据此失效；多 worker 经 SQLite config_versions 同步版本号
+    config_event_bus = ConfigEventBus(
+        sqlite_manager,
+        poll_interval_seconds=float(getattr(settings, "config_event_poll_interval_seconds", 1.0)),
+    )
+    app.state.config_event_bus = config_event_bus
+    config_event_bus.subscribe(TOPIC_DASHBOARD_CONFIG, lambda _change: sqlite_manager.invalidate_tracing_cache())
+    app.state.llm_app_settings_store = LlmAppSettingsStore(sqlite_manager, event_bus=config_event_bus)
+    app.state.ai_config_service = AIConfigService(sqlite_manager, settings, storage_dir, event_bus=config_event_bus)
     # 本地最小闭环：若没有任何 active endpoint，则用环境变量注入一个默认端点，避免 E2E/SSE 直接报 no_active_ai_endpoint。
     try:
         await app.state.ai_config_service.ensure_env_default_endpoint()
@@ -103,6 +114,7 @@ async def lifespan(app: FastAPI):
         sqlite_manager,
         storage_dir,
         auto_seed_enabled=bool(getattr(settings, "allow_test_ai_endpoints", False)),
+        blocked_check_interval_seconds=float(getattr(settings, "ai_blocked_models_check_interval_seconds", 2.0)),
     )
     # 启动期兜底：仅测试环境自动生成最小 global 映射（生产环境禁止“删不掉/回弹”）
     try:
@@ -128,17 +140,20 @@ async def lifespan(app: FastAPI):
         model_mapping_service=app.state.model_mapping_service,
         llm_model_registry=app.state.llm_model_registry,
     )
+    # 兼容：升级前的 token 用量不在小时级汇总表中，汇总表为空时回填一次
+    await app.state.metrics_collector.backfill_token_usage_hourly()
     app.state.dashboard_broker = DashboardBroker(app.state.metrics_collector)
     app.state.sync_service = SyncService(sqlite_manager)
+    # 按日模型配额：内存计数 + 写前预占（热路径不再每条消息进入 SQLite 全局锁）
+    app.state.daily_quota_counter = DailyQuotaCounter(
+        sqlite_manager,
+        chunk_size=int(getattr(settings, "ai_daily_quota_reservation_chunk", 5)),
+        flush_interval_seconds=float(getattr(settings, "ai_daily_quota_flush_interval_seconds", 30.0)),
+    )
+    app.state.daily_quota_counter.start()
 
     # AI 服务层（注入 SQLiteManager 用于统计记录）
     app.state.message_broker = MessageEventBroker()
-    app.state.ai_service = AIService(
-        db_manager=sqlite_manager,
-        ai_config_service=app.state.ai_config_service,
-        model_mapping_service=app.state.model_mapping_service,
-        llm_model_registry=app.state.llm_model_registry,
-    )
     app.state.web_search_service = WebSearchService(
         timeout_seconds=float(getattr(settings, "http_timeout_seconds", 10.0) or 10.0),
         cache_ttl_seconds=300,
@@ -155,6 +170,8 @@ async def lifespan(app: FastAPI):
             app.state.supabase_auth_admin = SupabaseAuthAdminClient(settings)
             app.state.user_repository = UserRepository(app.state.supabase_admin, bundle_ttl_seconds=60)
             app.state.entitlement_service = EntitlementService(app.state.user_repository, ttl_seconds=60)
+            config_event_bus.subscribe(TOPIC_ENTITLEMENTS, app.state.user_repository.on_config_change)
+            config_event_bus.subscribe(TOPIC_ENTITLEMENTS, app.state.entitlement_service.on_config_change)
         except Exception:
             # 缺少配置或初始化失败不阻断启动；具体端点按需返回可诊断错误体。
             app.state.supabase_admin = None
@@ -162,18 +179,36 @@ async def lifespan(app: FastAPI):
             app.state.user_repository = None
             app.state.entitlement_service = None
 
+    # AIService 需要 entitlement_service（上游并发排队按订阅等级优先），因此在 Supabase 初始化之后创建。
+    app.state.ai_service = AIService(
+        db_manager=sqlite_manager,
+        ai_config_service=app.state.ai_config_service,
+        model_mapping_service=app.state.model_mapping_service,
+        llm_model_registry=app.state.llm_model_registry,
+        entitlement_service=app.state.entitlement_service,
+    )
+
     # Supabase 保活服务（防止免费层 7 天无活动后暂停）
     app.state.supabase_keepalive = SupabaseKeepaliveService(settings)
     await app.state.supabase_keepalive.start()
+    await config_event_bus.start()
 
     try:
         yield
     finally:
         # 清理资源
+        await config_event_bus.stop()
+        # 归还未用的配额预占（须在关闭 SQLite 之前）
+        await app.state.daily_quota_counter.stop()
+
         monitor = getattr(app.state, "endpoint_monitor", None)
         if monitor is not None:
             await monitor.stop()
 
+        supabase_admin = getattr(app.state, "supabase_admin", None)
+        if isinstance(supabase_admin, SupabaseAdminClient):
+            await supabase_admin.aclose()
+
         keepalive = getattr(app.state, "supabase_keepalive", None)
         if keepalive is not None:
             await keepalive.stop()
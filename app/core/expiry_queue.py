@@ -0,0 +1,72 @@
+"""基于最小堆的过期队列（惰性删除），用于增量清理限流/并发跟踪条目。"""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+from typing import Dict, Generic, Hashable, List, Optional, Tuple, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+
+# 堆中失效条目超过有效条目的倍数时触发一次重建，避免重排/注销导致堆无限增长。
+_COMPACT_FACTOR = 2
+_COMPACT_MIN_SIZE = 1024
+
+
+class ExpiryQueue(Generic[K]):
+    """按截止时间排序的键队列。
+
+    - schedule/discard 为 O(log n)/O(1)，被覆盖或注销的旧堆条目惰性丢弃；
+    - pop_due 只弹出截止时间已到的键，每次清理的开销与“到期条目数”成正比，而不是与总键数成正比。
+    """
+
+    def __init__(self) -> None:
+        self._heap: List[Tuple[float, int, K]] = []
+        self._deadlines: Dict[K, float] = {}
+        self._seq = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._deadlines
+
+    def deadline_of(self, key: K) -> Optional[float]:
+        return self._deadlines.get(key)
+
+    def schedule(self, key: K, deadline: float) -> None:
+        """登记（或改期）键的截止时间。"""
+        if self._deadlines.get(key) == deadline:
+            return
+        self._deadlines[key] = deadline
+        heapq.heappush(self._heap, (deadline, next(self._seq), key))
+        self._maybe_compact()
+
+    def discard(self, key: K) -> None:
+        """移除键（堆中旧条目在弹出时惰性丢弃）。"""
+        self._deadlines.pop(key, None)
+
+    def pop_due(self, now: float, limit: Optional[int] = None) -> List[K]:
+        """弹出截止时间 <= now 的键（最多 limit 个）。"""
+        due: List[K] = []
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            if limit is not None and len(due) >= limit:
+                break
+            deadline, _, key = heapq.heappop(heap)
+            if self._deadlines.get(key) != deadline:
+                continue  # 已改期或已注销
+            del self._deadlines[key]
+            due.append(key)
+        return due
+
+    def clear(self) -> None:
+        self._heap.clear()
+        self._deadlines.clear()
+
+    def _maybe_compact(self) -> None:
+        size = len(self._heap)
+        if size < _COMPACT_MIN_SIZE or size <= _COMPACT_FACTOR * max(1, len(self._deadlines)):
+            return
+        self._heap = [(deadline, next(self._seq), key) for key, deadline in self._deadlines.items()]
+        heapq.heapify(self._heap)
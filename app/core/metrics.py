@@ -12,8 +12,6 @@ from typing import Dict, Optional
 from prometheus_client import Counter, Gauge, Histogram
 
 from app.core.middleware import get_current_request_id
-from app.core.rate_limiter import get_rate_limiter
-from app.core.sse_guard import get_sse_guard
 
 logger = logging.getLogger(__name__)
 
@@ -62,6 +60,185 @@ ai_conversation_latency_seconds = Histogram(
     buckets=(0.1, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0),
 )
 
+# 10. 限流决策总数（allow/deny × 原因 × 用户类型），用于区分真实负载与限额配置问题
+rate_limit_decisions_total = Counter(
+    "rate_limit_decisions_total",
+    "Total number of rate limiter decisions",
+    ["result", "reason", "user_type"],  # result: allow/deny; reason: ok/ip_qps/ip_daily/user_qps/user_daily/cooldown
+)
+
+# 11. 限流器当前跟踪的 key 数量（按类型：user/ip/cooldown）
+rate_limiter_tracked_keys = Gauge(
+    "rate_limiter_tracked_keys", "Number of keys currently tracked by the rate limiter", ["limiter"]
+)
+
+# 12. 限流器 / SSE 守卫清理耗时
+rate_limiter_cleanup_duration_seconds = Histogram(
+    "rate_limiter_cleanup_duration_seconds",
+    "Duration of incremental expiry cleanup ticks in seconds",
+    ["component"],  # rate_limiter, sse_guard
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5),
+)
+
+# 13. SSE 活跃连接数（按用户类型）
+sse_active_connections = Gauge("sse_active_connections", "Number of active SSE connections", ["user_type"])
+
+# 14. SSE 守卫拒绝总数（按原因和用户类型）
+sse_guard_rejections_total = Counter(
+    "sse_guard_rejections_total",
+    "Total number of SSE connections rejected by the concurrency guard",
+    ["reason", "user_type"],  # user_limit_exceeded, conversation_limit_exceeded
+)
+
+# 15. 上游端点熔断状态（0=closed, 1=half_open, 2=open）
+ai_endpoint_circuit_state = Gauge(
+    "ai_endpoint_circuit_state", "Circuit breaker state per upstream endpoint (0=closed,1=half_open,2=open)", ["endpoint_id"]
+)
+
+# 16. 上游端点熔断状态切换总数（按目标状态）
+ai_endpoint_circuit_transitions_total = Counter(
+    "ai_endpoint_circuit_transitions_total",
+    "Total number of circuit breaker state transitions per upstream endpoint",
+    ["endpoint_id", "state"],
+)
+
+# 17. 端点巡检单轮耗时（全部端点并发探测完成）
+ai_endpoint_probe_cycle_duration_seconds = Histogram(
+    "ai_endpoint_probe_cycle_duration_seconds",
+    "Duration of a full endpoint health probe cycle in seconds",
+    buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0),
+)
+
+# 18. 端点巡检轮次总数（completed / skipped：上一轮未结束而跳过）
+ai_endpoint_probe_cycles_total = Counter(
+    "ai_endpoint_probe_cycles_total", "Total number of endpoint health probe cycles", ["result"]
+)
+
+# 19. 真实流量的被动健康观测（outcome: success / timeout / connect_error / http_5xx / http_4xx / provider_error）
+ai_endpoint_passive_observations_total = Counter(
+    "ai_endpoint_passive_observations_total",
+    "Total number of live upstream calls observed for passive endpoint health",
+    ["endpoint_id", "outcome"],
+)
+
+# 20. 周期巡检中每个端点的健康判定来源（probed=主动探针，passive=采用真实流量观测）
+ai_endpoint_health_checks_total = Counter(
+    "ai_endpoint_health_checks_total", "Total number of per-endpoint health checks by source", ["mode"]
+)
+
+# 21. 响应缓存查询结果（hit / coalesced / miss / bypass：非确定性请求不参与缓存）
+ai_response_cache_requests_total = Counter(
+    "ai_response_cache_requests_total", "Total number of AI response cache lookups", ["result"]
+)
+
+# 22. 响应缓存/在途合并节省的上游 token 数
+ai_response_cache_saved_tokens_total = Counter(
+    "ai_response_cache_saved_tokens_total", "Total number of upstream tokens saved by the AI response cache"
+)
+
+# 23. Anthropic prompt caching 上游报告的缓存 token（read=cache_read_input_tokens，write=cache_creation_input_tokens）
+ai_prompt_cache_tokens_total = Counter(
+    "ai_prompt_cache_tokens_total", "Total number of prompt cache tokens reported by upstream", ["endpoint_id", "kind"]
+)
+
+# 24. 端点并发排队中的请求数
+ai_endpoint_queue_depth = Gauge(
+    "ai_endpoint_queue_depth", "Number of upstream requests waiting for an endpoint concurrency slot", ["endpoint_id"]
+)
+
+# 25. 端点并发排队等待时长（按订阅等级）
+ai_endpoint_queue_wait_seconds = Histogram(
+    "ai_endpoint_queue_wait_seconds",
+    "Time spent waiting for an endpoint concurrency slot",
+    ["endpoint_id", "tier"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+
+# 26. 端点并发排队超时次数
+ai_endpoint_queue_timeouts_total = Counter(
+    "ai_endpoint_queue_timeouts_total",
+    "Total number of upstream requests that timed out in the endpoint queue",
+    ["endpoint_id"],
+)
+
+# 27-31. 上游/客户端分段延迟（区分慢在本服务还是慢在供应商；标签：endpoint_id/model/dialect）
+_UPSTREAM_LATENCY_LABELS = ["endpoint_id", "model", "dialect"]
+_UPSTREAM_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0)
+
+# 27. 发起上游请求 → 收到响应头
+ai_upstream_connect_seconds = Histogram(
+    "ai_upstream_connect_seconds",
+    "Time from upstream dispatch to response headers",
+    _UPSTREAM_LATENCY_LABELS,
+    buckets=_UPSTREAM_LATENCY_BUCKETS,
+)
+
+# 28. 发起上游请求 → adapter 收到首个增量（TTFT）
+ai_upstream_ttft_seconds = Histogram(
+    "ai_upstream_ttft_seconds",
+    "Time from upstream dispatch to the first streamed delta at the adapter",
+    _UPSTREAM_LATENCY_LABELS,
+    buckets=_UPSTREAM_LATENCY_BUCKETS,
+)
+
+# 29. 创建消息 → 客户端 SSE 收到首个内容帧
+ai_sse_first_event_seconds = Histogram(
+    "ai_sse_first_event_seconds",
+    "Time from message creation to the first content SSE event written to the client",
+    _UPSTREAM_LATENCY_LABELS,
+    buckets=_UPSTREAM_LATENCY_BUCKETS,
+)
+
+# 30. 上游相邻增量之间的间隔
+ai_upstream_chunk_gap_seconds = Histogram(
+    "ai_upstream_chunk_gap_seconds",
+    "Gap between consecutive streamed deltas from upstream",
+    _UPSTREAM_LATENCY_LABELS,
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+# 31. 输出速率（completion tokens / 首包到结束的生成时长）
+ai_upstream_output_tokens_per_second = Histogram(
+    "ai_upstream_output_tokens_per_second",
+    "Upstream output tokens per second after the first delta",
+    _UPSTREAM_LATENCY_LABELS,
+    buckets=(5, 10, 20, 40, 60, 80, 120, 200, 400),
+)
+
+# 32. 模型白名单索引版本（每次重建 +1）
+ai_model_allowlist_version = Gauge(
+    "ai_model_allowlist_version",
+    "Version of the precomputed model allowlist index (incremented on every rebuild)",
+)
+
+# 33. 模型白名单索引重建耗时
+ai_model_allowlist_rebuild_seconds = Histogram(
+    "ai_model_allowlist_rebuild_seconds",
+    "Time spent rebuilding the model allowlist index",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+# 34. 权益缓存查询结果（hit=新鲜命中 / stale=过期返回旧值并后台刷新 / miss=需同步加载）
+entitlement_cache_requests_total = Counter(
+    "entitlement_cache_requests_total",
+    "Entitlement cache lookups by result",
+    ["result"],
+)
+
+# 35. 权益从 Supabase 加载耗时（result: ok/error）
+entitlement_load_seconds = Histogram(
+    "entitlement_load_seconds",
+    "Time spent loading a user's entitlements from the repository",
+    ["result"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+
+# 36. 权益缓存条目数（LRU 有界）
+entitlement_cache_entries = Gauge(
+    "entitlement_cache_entries",
+    "Number of users currently held in the entitlement cache",
+)
+
 
 @dataclass
 class RateLimitMetrics:
@@ -149,8 +326,7 @@ class MetricsCollector:
     async def log_metrics(self):
         """输出指标日志。"""
         try:
-            # 收集限流器指标
-            _ = get_rate_limiter()
+            from app.core.sse_guard import get_sse_guard
 
             # 收集SSE守卫指标
             sse_guard = get_sse_guard()
@@ -267,6 +443,8 @@ class MetricsCollector:
 
     async def get_current_metrics(self) -> Dict:
         """获取当前指标快照。"""
+        from app.core.sse_guard import get_sse_guard
+
         sse_guard = get_sse_guard()
         sse_stats = await sse_guard.get_stats()
 
@@ -16,11 +16,34 @@ from starlette.types import ASGIApp
 
 from app.auth import get_authenticated_user_optional
 from app.core.exceptions import create_error_response
+from app.core.expiry_queue import ExpiryQueue
+from app.core.metrics import (
+    rate_limit_blocks_total,
+    rate_limit_decisions_total,
+    rate_limiter_cleanup_duration_seconds,
+    rate_limiter_tracked_keys,
+)
 from app.core.middleware import get_current_request_id
 from app.settings.config import get_settings
 
 logger = logging.getLogger(__name__)
 
+# 条目闲置超过该时长即回收
+_ENTRY_IDLE_TTL_SECONDS = 3600
+# 增量清理：每个 tick 只处理已到期的条目，且单次处理量有上限，避免事件循环出现长停顿
+_CLEANUP_INTERVAL_SECONDS = 5
+_CLEANUP_BATCH_LIMIT = 5000
+
+# check_rate_limit 返回的 reason -> Prometheus 标签
+_DECISION_REASON_LABELS = {
+    "OK": "ok",
+    "IP in cooldown period": "cooldown",
+    "IP QPS limit exceeded": "ip_qps",
+    "IP daily limit exceeded": "ip_daily",
+    "User QPS limit exceeded": "user_qps",
+    "User daily limit exceeded": "user_daily",
+}
+
 
 @dataclass
 class TokenBucket:
@@ -119,6 +142,11 @@ class RateLimiter:
         # 冷静期跟踪 (ip -> tracker)
         self.cooldown_trackers: Dict[str, CooldownTracker] = defaultdict(CooldownTracker)
 
+        # 过期队列：按“最早可能过期时间”登记，清理时只弹出到期条目并按实际活跃时间改期
+        self._user_expiry: ExpiryQueue[str] = ExpiryQueue()
+        self._ip_expiry: ExpiryQueue[str] = ExpiryQueue()
+        self._cooldown_expiry: ExpiryQueue[str] = ExpiryQueue()
+
         # 清理任务
         self._cleanup_task: Optional[asyncio.Task] = None
         self._start_cleanup_task()
@@ -128,36 +156,67 @@ class RateLimiter:
 
         async def cleanup():
             while True:
-                await asyncio.sleep(300)  # 5分钟清理一次
+                await asyncio.sleep(_CLEANUP_INTERVAL_SECONDS)
+                started = time.perf_counter()
                 self._cleanup_old_entries()
+                rate_limiter_cleanup_duration_seconds.labels(component="rate_limiter").observe(
+                    time.perf_counter() - started
+                )
+                for limiter, count in self.tracked_entry_counts().items():
+                    rate_limiter_tracked_keys.labels(limiter=limiter).set(count)
 
         self._cleanup_task = asyncio.create_task(cleanup())
 
-    def _cleanup_old_entries(self):
-        """清理过期的限流条目。"""
-        now = time.time()
-        cutoff = now - 3600  # 1小时前的条目
+    def _cleanup_old_entries(self, now: Optional[float] = None, limit: Optional[int] = _CLEANUP_BATCH_LIMIT) -> int:
+        """增量清理过期的限流条目，返回本次回收的条目数。"""
+        now = time.time() if now is None else now
+        cutoff = now - _ENTRY_IDLE_TTL_SECONDS
+        removed = 0
 
         # 清理用户桶
-        expired_users = [user_id for user_id, bucket in self.user_qps_buckets.items() if bucket.last_refill < cutoff]
-        for user_id in expired_users:
+        for user_id in self._user_expiry.pop_due(now, limit):
+            bucket = self.user_qps_buckets.get(user_id)
+            if bucket is not None and bucket.last_refill >= cutoff:
+                self._user_expiry.schedule(user_id, bucket.last_refill + _ENTRY_IDLE_TTL_SECONDS)
+                continue
             self.user_qps_buckets.pop(user_id, None)
             self.user_daily_windows.pop(user_id, None)
+            removed += 1
 
         # 清理IP桶
-        expired_ips = [ip for ip, bucket in self.ip_qps_buckets.items() if bucket.last_refill < cutoff]
-        for ip in expired_ips:
+        for ip in self._ip_expiry.pop_due(now, limit):
+            bucket = self.ip_qps_buckets.get(ip)
+            if bucket is not None and bucket.last_refill >= cutoff:
+                self._ip_expiry.schedule(ip, bucket.last_refill + _ENTRY_IDLE_TTL_SECONDS)
+                continue
             self.ip_qps_buckets.pop(ip, None)
             self.ip_daily_windows.pop(ip, None)
+            removed += 1
 
         # 清理冷静期跟踪器
-        expired_cooldowns = [
-            ip
-            for ip, tracker in self.cooldown_trackers.items()
-            if tracker.last_failure < cutoff and not tracker.is_in_cooldown()
-        ]
-        for ip in expired_cooldowns:
+        for ip in self._cooldown_expiry.pop_due(now, limit):
+            tracker = self.cooldown_trackers.get(ip)
+            if tracker is None:
+                continue
+            if tracker.last_failure >= cutoff or tracker.cooldown_until > now:
+                self._cooldown_expiry.schedule(ip, self._cooldown_deadline(tracker))
+                continue
             self.cooldown_trackers.pop(ip, None)
+            removed += 1
+
+        return removed
+
+    @staticmethod
+    def _cooldown_deadline(tracker: CooldownTracker) -> float:
+        return max(tracker.last_failure + _ENTRY_IDLE_TTL_SECONDS, tracker.cooldown_until)
+
+    def tracked_entry_counts(self) -> Dict[str, int]:
+        """当前跟踪的条目数（按类型）。"""
+        return {
+            "user": len(self.user_qps_buckets),
+            "ip": len(self.ip_qps_buckets),
+            "cooldown": len(self.cooldown_trackers),
+        }
 
     def _get_user_qps_bucket(self, user_id: str, is_anonymous: bool = False) -> TokenBucket:
         """获取用户QPS令牌桶。"""
@@ -165,9 +224,12 @@ class RateLimiter:
             qps_limit = (
                 self.settings.rate_limit_anonymous_qps if is_anonymous else self.settings.rate_limit_per_user_qps
             )
+            now = time.time()
             self.user_qps_buckets[user_id] = TokenBucket(
-                capacity=qps_limit, tokens=qps_limit, last_refill=time.time(), refill_rate=qps_limit
+                capacity=qps_limit, tokens=qps_limit, last_refill=now, refill_rate=qps_limit
             )
+            if user_id not in self._user_expiry:
+                self._user_expiry.schedule(user_id, now + _ENTRY_IDLE_TTL_SECONDS)
         return self.user_qps_buckets[user_id]
 
     def _get_user_daily_window(self, user_id: str, is_anonymous: bool = False) -> SlidingWindow:
@@ -183,9 +245,12 @@ class RateLimiter:
         """获取IP QPS令牌桶。"""
         if ip not in self.ip_qps_buckets:
             qps_limit = self.settings.rate_limit_anonymous_qps if is_anonymous else self.settings.rate_limit_per_ip_qps
+            now = time.time()
             self.ip_qps_buckets[ip] = TokenBucket(
-                capacity=qps_limit, tokens=qps_limit, last_refill=time.time(), refill_rate=qps_limit
+                capacity=qps_limit, tokens=qps_limit, last_refill=now, refill_rate=qps_limit
             )
+            if ip not in self._ip_expiry:
+                self._ip_expiry.schedule(ip, now + _ENTRY_IDLE_TTL_SECONDS)
         return self.ip_qps_buckets[ip]
 
     def _get_ip_daily_window(self, ip: str) -> SlidingWindow:
@@ -198,6 +263,20 @@ class RateLimiter:
 
     def check_rate_limit(
         self, user_id: Optional[str], client_ip: str, user_agent: str, user_type: str = "permanent"
+    ) -> Tuple[bool, str, Optional[int]]:
+        """检查限流状态，并按 allow/deny × 原因 导出 Prometheus 计数。"""
+        allowed, reason, retry_after = self._evaluate_rate_limit(user_id, client_ip, user_agent, user_type)
+        reason_label = _DECISION_REASON_LABELS.get(reason, "other")
+        user_type_label = "anonymous" if user_type == "anonymous" else "permanent"
+        rate_limit_decisions_total.labels(
+            result="allow" if allowed else "deny", reason=reason_label, user_type=user_type_label
+        ).inc()
+        if not allowed:
+            rate_limit_blocks_total.labels(reason=reason_label, user_type=user_type_label).inc()
+        return allowed, reason, retry_after
+
+    def _evaluate_rate_limit(
+        self, user_id: Optional[str], client_ip: str, user_agent: str, user_type: str = "permanent"
     ) -> Tuple[bool, str, Optional[int]]:
         """
         检查限流状态。
@@ -211,9 +290,9 @@ class RateLimiter:
         Returns:
             (allowed, reason, retry_after_seconds)
         """
-        # 检查冷静期
-        cooldown_tracker = self.cooldown_trackers[client_ip]
-        if cooldown_tracker.is_in_cooldown():
+        # 检查冷静期（只读，不为每个 IP 创建空跟踪器）
+        cooldown_tracker = self.cooldown_trackers.get(client_ip)
+        if cooldown_tracker is not None and cooldown_tracker.is_in_cooldown():
             retry_after = int(cooldown_tracker.cooldown_until - time.time())
             logger.warning(
                 "请求被冷静期阻止 ip=%s retry_after=%d request_id=%s",
@@ -268,6 +347,8 @@ class RateLimiter:
         cooldown_tracker.record_failure(
             self.settings.rate_limit_cooldown_seconds, self.settings.rate_limit_failure_threshold
         )
+        if client_ip not in self._cooldown_expiry:
+            self._cooldown_expiry.schedule(client_ip, self._cooldown_deadline(cooldown_tracker))
 
     def record_success(self, client_ip: str) -> None:
         """记录成功请求，重置失败计数。"""
@@ -14,6 +14,8 @@ from starlette.responses import JSONResponse
 
 from app.auth import AuthenticatedUser
 from app.core.exceptions import create_error_response
+from app.core.expiry_queue import ExpiryQueue
+from app.core.metrics import rate_limiter_cleanup_duration_seconds, sse_active_connections, sse_guard_rejections_total
 from app.core.middleware import get_current_request_id
 from app.settings.config import get_settings
 
@@ -30,6 +32,7 @@ class ConnectionInfo:
     start_time: float
     client_ip: str
     user_agent: str
+    user_type: str = "permanent"
 
 
 class SSEConcurrencyGuard:
@@ -41,6 +44,8 @@ class SSEConcurrencyGuard:
         self.active_connections: Dict[str, ConnectionInfo] = {}  # connection_id -> info
         self.user_connections: Dict[str, Set[str]] = defaultdict(set)  # user_id -> connection_ids
         self.conversation_connections: Dict[str, Set[str]] = defaultdict(set)  # conversation_id -> connection_ids
+        # 按 start_time 排序的连接队列：过期清理只弹出超龄连接，无需遍历全部活跃连接
+        self._age_queue: ExpiryQueue[str] = ExpiryQueue()
 
         # 统计信息
         self.total_connections_created = 0
@@ -67,6 +72,7 @@ class SSEConcurrencyGuard:
         """
         async with self._lock:
             user_id = user.uid
+            user_type_label = "anonymous" if user.user_type == "anonymous" else "permanent"
 
             # 检查用户并发限制（根据用户类型设置不同限制）
             user_connection_count = len(self.user_connections.get(user_id, set()))
@@ -80,6 +86,7 @@ class SSEConcurrencyGuard:
             if user_connection_count >= max_concurrent:
                 self.total_connections_rejected += 1
                 self.rejection_reasons["user_limit_exceeded"] += 1
+                sse_guard_rejections_total.labels(reason="user_limit_exceeded", user_type=user_type_label).inc()
 
                 logger.warning(
                     "SSE用户并发限制 user_id=%s user_type=%s current=%d max=%d request_id=%s",
@@ -97,6 +104,9 @@ class SSEConcurrencyGuard:
                 if conv_connection_count >= self.settings.sse_max_concurrent_per_conversation:
                     self.total_connections_rejected += 1
                     self.rejection_reasons["conversation_limit_exceeded"] += 1
+                    sse_guard_rejections_total.labels(
+                        reason="conversation_limit_exceeded", user_type=user_type_label
+                    ).inc()
 
                     logger.warning(
                         "SSE对话并发限制 conversation_id=%s current=%d max=%d request_id=%s",
@@ -119,14 +129,17 @@ class SSEConcurrencyGuard:
                 start_time=time.time(),
                 client_ip=client_ip,
                 user_agent=user_agent,
+                user_type=user_type_label,
             )
 
             self.active_connections[connection_id] = connection_info
+            self._age_queue.schedule(connection_id, connection_info.start_time)
             self.user_connections[user_id].add(connection_id)
             if conversation_id:
                 self.conversation_connections[conversation_id].add(connection_id)
 
             self.total_connections_created += 1
+            sse_active_connections.labels(user_type=user_type_label).inc()
 
             logger.info(
                 "SSE连接已注册 connection_id=%s user_id=%s conversation_id=%s message_id=%s request_id=%s",
@@ -143,8 +156,10 @@ class SSEConcurrencyGuard:
         """注销SSE连接。"""
         async with self._lock:
             connection_info = self.active_connections.pop(connection_id, None)
+            self._age_queue.discard(connection_id)
             if not connection_info:
                 return
+            sse_active_connections.labels(user_type=connection_info.user_type).dec()
 
             # 从用户连接集合中移除
             user_connections = self.user_connections.get(connection_info.user_id)
@@ -215,16 +230,18 @@ class SSEConcurrencyGuard:
     async def cleanup_stale_connections(self, max_age_seconds: int = 3600) -> int:
         """清理过期连接。"""
         # 注意：unregister_connection 自身会加锁；这里先在锁内取快照，再逐个注销，避免锁重入死锁。
+        started = time.perf_counter()
         async with self._lock:
-            now = time.time()
+            cutoff = time.time() - max_age_seconds
             stale_connections = [
                 connection_id
-                for connection_id, info in self.active_connections.items()
-                if now - info.start_time > max_age_seconds
+                for connection_id in self._age_queue.pop_due(cutoff)
+                if connection_id in self.active_connections
             ]
 
         for connection_id in stale_connections:
             await self.unregister_connection(connection_id)
+        rate_limiter_cleanup_duration_seconds.labels(component="sse_guard").observe(time.perf_counter() - started)
 
         if stale_connections:
             logger.info(
@@ -29,6 +29,9 @@ PRAGMA foreign_keys = ON;
         timeout INTEGER DEFAULT 60,
         is_active INTEGER DEFAULT 1,
     is_default INTEGER DEFAULT 0,
+    weight INTEGER DEFAULT 100,
+    prompt_cache_enabled INTEGER DEFAULT 1,
+    max_concurrency INTEGER,
     model_list TEXT,
     status TEXT DEFAULT 'unknown',
     latency_ms REAL,
@@ -120,6 +123,10 @@ CREATE TABLE IF NOT EXISTS ai_request_stats (
     total_latency_ms REAL DEFAULT 0,
     success_count INTEGER DEFAULT 0,
     error_count INTEGER DEFAULT 0,
+    prompt_tokens INTEGER DEFAULT 0,
+    completion_tokens INTEGER DEFAULT 0,
+    cached_tokens INTEGER DEFAULT 0,
+    total_tokens INTEGER DEFAULT 0,
     created_at TEXT DEFAULT CURRENT_TIMESTAMP,
     updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
     UNIQUE(user_id, endpoint_id, model, request_date),
@@ -129,6 +136,19 @@ CREATE TABLE IF NOT EXISTS ai_request_stats (
 CREATE INDEX IF NOT EXISTS idx_ai_request_date ON ai_request_stats(request_date);
 CREATE INDEX IF NOT EXISTS idx_ai_request_endpoint ON ai_request_stats(endpoint_id);
 
+-- Token 用量小时级汇总（按 小时 × 模型 × 端点 增量累加；Dashboard 只读此表，行数与流量无关）
+CREATE TABLE IF NOT EXISTS ai_token_usage_hourly (
+    usage_hour TEXT NOT NULL,                 -- 本地时间 YYYY-MM-DDTHH
+    model TEXT NOT NULL,
+    endpoint_id INTEGER NOT NULL DEFAULT 0,   -- 0 表示未知端点（避免 NULL 破坏主键唯一性）
+    prompt_tokens INTEGER DEFAULT 0,
+    completion_tokens INTEGER DEFAULT 0,
+    cached_tokens INTEGER DEFAULT 0,
+    total_tokens INTEGER DEFAULT 0,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY(usage_hour, model, endpoint_id)
+);
+
 CREATE TABLE IF NOT EXISTS ai_model_daily_usage (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     user_id TEXT NOT NULL,
@@ -183,6 +203,10 @@ CREATE TABLE IF NOT EXISTS conversation_logs (
     latency_ms REAL,
     status TEXT NOT NULL,
     error_message TEXT,
+    prompt_tokens INTEGER DEFAULT 0,
+    completion_tokens INTEGER DEFAULT 0,
+    cached_tokens INTEGER DEFAULT 0,
+    total_tokens INTEGER DEFAULT 0,
     created_at TEXT DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -310,6 +334,13 @@ CREATE TABLE IF NOT EXISTS llm_model_mappings (
 
 CREATE INDEX IF NOT EXISTS idx_llm_model_mappings_scope ON llm_model_mappings(scope_type, scope_key);
 CREATE INDEX IF NOT EXISTS idx_llm_model_mappings_updated_at ON llm_model_mappings(updated_at DESC);
+
+-- 配置变更版本号（按主题单调递增；多 worker 共享同一 SQLite 时据此感知其他进程的配置写入）
+CREATE TABLE IF NOT EXISTS config_versions (
+    topic TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
 """
 
 
@@ -320,6 +351,8 @@ class SQLiteManager:
         self._db_path = Path(db_path)
         self._conn: Optional[aiosqlite.Connection] = None
         self._lock = asyncio.Lock()
+        # 请求追踪开关缓存：本实例写入时同步更新；其他 worker 的写入经配置事件总线调用 invalidate_tracing_cache()
+        self._tracing_enabled: Optional[bool] = None
 
     @property
     def is_initialized(self) -> bool:
@@ -354,6 +387,9 @@ class SQLiteManager:
                     "last_synced_at": "ALTER TABLE ai_endpoints ADD COLUMN last_synced_at TEXT",
                     "resolved_endpoints": "ALTER TABLE ai_endpoints ADD COLUMN resolved_endpoints TEXT",
                     "supabase_id": "ALTER TABLE ai_endpoints ADD COLUMN supabase_id INTEGER",
+                    "weight": "ALTER TABLE ai_endpoints ADD COLUMN weight INTEGER DEFAULT 100",
+                    "prompt_cache_enabled": "ALTER TABLE ai_endpoints ADD COLUMN prompt_cache_enabled INTEGER DEFAULT 1",
+                    "max_concurrency": "ALTER TABLE ai_endpoints ADD COLUMN max_concurrency INTEGER",
                 },
             )
             await self._ensure_columns(
@@ -405,6 +441,19 @@ class SQLiteManager:
                     "kind": "ALTER TABLE conversation_logs ADD COLUMN kind TEXT",
                     "request_detail_json": "ALTER TABLE conversation_logs ADD COLUMN request_detail_json TEXT",
                     "response_detail_json": "ALTER TABLE conversation_logs ADD COLUMN response_detail_json TEXT",
+                    "prompt_tokens": "ALTER TABLE conversation_logs ADD COLUMN prompt_tokens INTEGER DEFAULT 0",
+                    "completion_tokens": "ALTER TABLE conversation_logs ADD COLUMN completion_tokens INTEGER DEFAULT 0",
+                    "cached_tokens": "ALTER TABLE conversation_logs ADD COLUMN cached_tokens INTEGER DEFAULT 0",
+                    "total_tokens": "ALTER TABLE conversation_logs ADD COLUMN total_tokens INTEGER DEFAULT 0",
+                },
+            )
+            await self._ensure_columns(
+                "ai_request_stats",
+                {
+                    "prompt_tokens": "ALTER TABLE ai_request_stats ADD COLUMN prompt_tokens INTEGER DEFAULT 0",
+                    "completion_tokens": "ALTER TABLE ai_request_stats ADD COLUMN completion_tokens INTEGER DEFAULT 0",
+                    "cached_tokens": "ALTER TABLE ai_request_stats ADD COLUMN cached_tokens INTEGER DEFAULT 0",
+                    "total_tokens": "ALTER TABLE ai_request_stats ADD COLUMN total_tokens INTEGER DEFAULT 0",
                 },
             )
             await self._conn.commit()
@@ -507,71 +556,87 @@ class SQLiteManager:
             await cursor.close()
         return [dict(row) for row in rows]
 
-    async def increment_daily_model_usage_if_below_limit(
+    async def reserve_daily_model_usage(
         self,
         user_id: str,
         model_key: str,
         usage_date: str,
         *,
+        chunk: int,
         limit: int,
-    ) -> tuple[bool, int]:
-        """按日对指定 model_key 计数并做上限门控（原子操作）。
+    ) -> tuple[int, int]:
+        """预占日配额：原子地把计数推进 min(chunk, limit - count) 个单位（写前预留，供内存计数层消费）。
+
+        使用 BEGIN IMMEDIATE 串行化多进程的“读-改-写”，保证各 worker 预占之和不超过 limit。
 
         Returns:
-            (allowed, count_after)
+            (granted, count_after)
         """
 
         if self._conn is None:
             raise RuntimeError("SQLiteManager has not been initialised.")
 
+        safe_chunk = max(int(chunk), 1)
         safe_limit = int(limit)
-        if safe_limit <= 0:
-            row = await self.fetchone(
-                """
-                SELECT count
-                FROM ai_model_daily_usage
-                WHERE user_id = ? AND model_key = ? AND usage_date = ?
-                """,
-                (user_id, model_key, usage_date),
-            )
-            count_after = int((row or {}).get("count") or 0)
-            return False, count_after
-
         async with self._lock:
-            await self._conn.execute(
-                """
-                INSERT INTO ai_model_daily_usage (user_id, model_key, usage_date, count)
-                VALUES (?, ?, ?, 1)
-                ON CONFLICT(user_id, model_key, usage_date)
-                DO UPDATE SET
-                    count = count + 1,
-                    updated_at = CURRENT_TIMESTAMP
-                WHERE count < ?
-                """,
-                (user_id, model_key, usage_date, safe_limit),
-            )
+            if self._conn.in_transaction:
+                await self._conn.commit()
+            await self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = await self._conn.execute(
+                    """
+                    SELECT count
+                    FROM ai_model_daily_usage
+                    WHERE user_id = ? AND model_key = ? AND usage_date = ?
+                    """,
+                    (user_id, model_key, usage_date),
+                )
+                row = await cursor.fetchone()
+                await cursor.close()
+                current = int(row["count"] or 0) if row else 0
+                granted = max(0, min(safe_chunk, safe_limit - current))
+                if granted > 0:
+                    await self._conn.execute(
+                        """
+                        INSERT INTO ai_model_daily_usage (user_id, model_key, usage_date, count)
+                        VALUES (?, ?, ?, ?)
+                        ON CONFLICT(user_id, model_key, usage_date)
+                        DO UPDATE SET
+                            count = count + excluded.count,
+                            updated_at = CURRENT_TIMESTAMP
+                        """,
+                        (user_id, model_key, usage_date, granted),
+                    )
+                await self._conn.commit()
+            except Exception:
+                await self._conn.rollback()
+                raise
+        return granted, current + granted
 
-            cursor = await self._conn.execute("SELECT changes() as changed")
-            changed_row = await cursor.fetchone()
-            await cursor.close()
-            changed = int(changed_row["changed"] or 0) if changed_row else 0
+    async def release_daily_model_usage(self, releases: Iterable[tuple[str, str, str, int]]) -> None:
+        """批量归还未消费的日配额预占（user_id, model_key, usage_date, unused），单次事务提交。"""
 
-            cursor = await self._conn.execute(
+        if self._conn is None:
+            raise RuntimeError("SQLiteManager has not been initialised.")
+
+        params = [
+            (int(unused), user_id, model_key, usage_date)
+            for user_id, model_key, usage_date, unused in releases
+            if int(unused) > 0
+        ]
+        if not params:
+            return
+        async with self._lock:
+            await self._conn.executemany(
                 """
-                SELECT count
-                FROM ai_model_daily_usage
+                UPDATE ai_model_daily_usage
+                SET count = MAX(count - ?, 0), updated_at = CURRENT_TIMESTAMP
                 WHERE user_id = ? AND model_key = ? AND usage_date = ?
                 """,
-                (user_id, model_key, usage_date),
+                params,
             )
-            row = await cursor.fetchone()
-            await cursor.close()
-            count_after = int(row["count"] or 0) if row else 0
-
             await self._conn.commit()
 
-        return changed > 0, count_after
-
     async def log_conversation(
         self,
         user_id: str,
@@ -583,6 +648,7 @@ class SQLiteManager:
         latency_ms: float,
         status: str,
         error_message: Optional[str],
+        token_usage: Optional[dict[str, int]] = None,
     ) -> None:
         """记录 AI 对话日志（循环缓冲区，最多保留 100 条）。
 
@@ -596,17 +662,20 @@ class SQLiteManager:
             latency_ms: 延迟（毫秒）
             status: 状态（success/error）
             error_message: 错误信息
+            token_usage: 上游 usage 归一后的 token 数（prompt/completion/cached/total）
         """
         if self._conn is None:
             raise RuntimeError("SQLiteManager has not been initialised.")
 
+        usage = token_usage or {}
         async with self._lock:
             # 插入新记录
             await self._conn.execute(
                 """
                 INSERT INTO conversation_logs
-                (user_id, message_id, request_id, kind, request_payload, response_payload, model_used, latency_ms, status, error_message)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                (user_id, message_id, request_id, kind, request_payload, response_payload, model_used, latency_ms, status,
+                 error_message, prompt_tokens, completion_tokens, cached_tokens, total_tokens)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 """,
                 (
                     user_id,
@@ -619,6 +688,10 @@ class SQLiteManager:
                     latency_ms,
                     status,
                     error_message,
+                    int(usage.get("prompt_tokens") or 0),
+                    int(usage.get("completion_tokens") or 0),
+                    int(usage.get("cached_tokens") or 0),
+                    int(usage.get("total_tokens") or 0),
                 ),
             )
 
@@ -858,19 +931,28 @@ class SQLiteManager:
 
     async def get_tracing_enabled(self) -> bool:
         """获取请求追踪开关状态（默认关闭）。"""
+        cached = self._tracing_enabled
+        if cached is not None:
+            return cached
         async with self._lock:
             cursor = await self._conn.execute(
                 "SELECT config_json FROM dashboard_config WHERE id = 1"
             )
             row = await cursor.fetchone()
-            if row is None:
-                return False
+            enabled = False
+            if row is not None:
+                try:
+                    config = json.loads(row["config_json"])
+                    enabled = bool(config.get("request_tracing_enabled", False))
+                except (json.JSONDecodeError, KeyError):
+                    enabled = False
+            self._tracing_enabled = enabled
+            return enabled
 
-            try:
-                config = json.loads(row["config_json"])
-                return bool(config.get("request_tracing_enabled", False))
-            except (json.JSONDecodeError, KeyError):
-                return False
+    def invalidate_tracing_cache(self) -> None:
+        """丢弃追踪开关缓存（其他进程修改 dashboard_config 后调用）。"""
+
+        self._tracing_enabled = None
 
     async def set_tracing_enabled(self, enabled: bool) -> None:
         """设置请求追踪开关。"""
@@ -897,6 +979,31 @@ class SQLiteManager:
                     (json.dumps(config),)
                 )
             await self._conn.commit()
+            self._tracing_enabled = bool(enabled)
+
+    async def bump_config_version(self, topic: str) -> int:
+        """原子递增某配置主题的共享版本号并返回新值。"""
+        if self._conn is None:
+            raise RuntimeError("SQLiteManager has not been initialised.")
+
+        async with self._lock:
+            cursor = await self._conn.execute(
+                """
+                INSERT INTO config_versions(topic, version, updated_at) VALUES (?, 1, CURRENT_TIMESTAMP)
+                ON CONFLICT(topic) DO UPDATE SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+                RETURNING version
+                """,
+                (topic,),
+            )
+            row = await cursor.fetchone()
+            await cursor.close()
+            await self._conn.commit()
+        return int(row["version"]) if row else 0
+
+    async def get_config_versions(self) -> dict[str, int]:
+        """读取全部配置主题的共享版本号。"""
+        rows = await self.fetchall("SELECT topic, version FROM config_versions")
+        return {str(row["topic"]): int(row["version"] or 0) for row in rows}
 
     async def save_detailed_conversation_log(
         self,
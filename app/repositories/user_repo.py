@@ -4,8 +4,10 @@ from __future__ import annotations
 
 import asyncio
 import time
+from collections import OrderedDict
 from typing import Any, Optional, TypedDict
 
+from app.services.config_events import ConfigChange
 from app.services.supabase_admin import SupabaseAdminClient
 
 
@@ -16,10 +18,20 @@ class UserBundle(TypedDict):
 
 
 class UserRepository:
-    def __init__(self, supabase: SupabaseAdminClient, *, bundle_ttl_seconds: int = 60) -> None:
+    def __init__(
+        self,
+        supabase: SupabaseAdminClient,
+        *,
+        bundle_ttl_seconds: int = 60,
+        max_cached_bundles: int = 10_000,
+    ) -> None:
         self._supabase = supabase
         self._bundle_ttl_seconds = max(int(bundle_ttl_seconds), 1)
-        self._bundle_cache: dict[str, tuple[float, UserBundle]] = {}
+        self._max_cached_bundles = max(int(max_cached_bundles), 1)
+        # user_id -> (expires_at, bundle)；按最近访问排序，超出上限淘汰最久未用
+        self._bundle_cache: OrderedDict[str, tuple[float, UserBundle]] = OrderedDict()
+        # 同一用户的并发冷加载合并为一次
+        self._bundle_inflight: dict[str, asyncio.Task[UserBundle]] = {}
 
     async def get_profile(self, user_id: str) -> Optional[dict[str, Any]]:
         return await self._supabase.fetch_one_by_user_id(table="user_profiles", user_id=user_id)
@@ -30,21 +42,56 @@ class UserRepository:
     async def get_entitlements(self, user_id: str) -> Optional[dict[str, Any]]:
         return await self._supabase.fetch_one_by_user_id(table="user_entitlements", user_id=user_id)
 
+    def invalidate_user_bundle(self, user_id: Optional[str] = None) -> None:
+        """丢弃 bundle 缓存（user_id 为空时清空全部）。"""
+
+        if user_id is None:
+            self._bundle_cache.clear()
+            self._bundle_inflight.clear()
+        else:
+            self._bundle_cache.pop(user_id, None)
+            self._bundle_inflight.pop(user_id, None)
+
+    def on_config_change(self, change: ConfigChange) -> None:
+        """配置事件总线回调：管理端修改权益后（含其他 worker）清空 bundle 缓存，/me 不再返回旧权益。"""
+
+        self.invalidate_user_bundle()
+
     async def get_user_bundle(self, user_id: str) -> UserBundle:
-        """Return profile/settings/entitlements with TTL cache (SSOT: Supabase)."""
-        now = time.monotonic()
+        """Return profile/settings/entitlements with TTL cache (SSOT: Supabase).
+
+        三张表经共享连接池并发读取（冷加载耗时约等于单次往返）；同一用户的并发请求只触发一次加载。
+        """
         cached = self._bundle_cache.get(user_id)
         if cached is not None:
             expires_at, value = cached
-            if now < expires_at:
+            if time.monotonic() < expires_at:
+                self._bundle_cache.move_to_end(user_id)
                 return value
 
+        task = self._bundle_inflight.get(user_id)
+        if task is None:
+            task = asyncio.create_task(self._load_user_bundle(user_id))
+            self._bundle_inflight[user_id] = task
+            task.add_done_callback(lambda done: self._forget_inflight(user_id, done))
+        # shield：单个调用方取消不影响其他等待者
+        return await asyncio.shield(task)
+
+    def _forget_inflight(self, user_id: str, task: asyncio.Task[UserBundle]) -> None:
+        if self._bundle_inflight.get(user_id) is task:
+            self._bundle_inflight.pop(user_id, None)
+
+    async def _load_user_bundle(self, user_id: str) -> UserBundle:
         profile, settings, entitlements = await asyncio.gather(
             self.get_profile(user_id),
             self.get_settings(user_id),
             self.get_entitlements(user_id),
         )
         bundle: UserBundle = {"profile": profile, "settings": settings, "entitlements": entitlements}
-        self._bundle_cache[user_id] = (now + float(self._bundle_ttl_seconds), bundle)
+        if self._bundle_inflight.get(user_id) is asyncio.current_task():
+            # 加载期间被 invalidate 的结果不写回缓存
+            self._bundle_cache[user_id] = (time.monotonic() + float(self._bundle_ttl_seconds), bundle)
+            self._bundle_cache.move_to_end(user_id)
+            while len(self._bundle_cache) > self._max_cached_bundles:
+                self._bundle_cache.popitem(last=False)
         return bundle
-
@@ -6,10 +6,11 @@ import asyncio
 import json
 import logging
 import re
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
 from pathlib import Path
 from time import perf_counter
-from typing import Any, Optional
+from typing import Any, AsyncIterator, Optional
 from urllib.parse import urlsplit
 
 import httpx
@@ -17,12 +18,21 @@ import httpx
 from app.db import SQLiteManager
 from app.settings.config import Settings
 from app.services.ai_url import build_resolved_endpoints, normalize_ai_base_url
+from app.services.config_events import TOPIC_ENDPOINTS, TOPIC_PROMPTS, ConfigEventBus
+from app.services.endpoint_balancer import DEFAULT_ENDPOINT_WEIGHT
+from app.services.endpoint_health import get_endpoint_health_tracker
 from app.services.upstream_auth import is_retryable_auth_error, iter_auth_headers
 from app.services.prompt_tools_assembly import assemble_system_prompt, extract_tools_schema, gate_active_tools_schema
 
 logger = logging.getLogger(__name__)
 
 _SUPPORTED_PROVIDER_PROTOCOLS: tuple[str, ...] = ("openai", "claude")
+# 探针/同步只写这些列：不影响路由，更新时不发布 TOPIC_ENDPOINTS（避免每轮巡检都让路由缓存失效）
+_ENDPOINT_PROBE_FIELDS = frozenset(
+    {"latency_ms", "last_checked_at", "last_error", "sync_status", "last_synced_at", "supabase_id"}
+)
+# 按值比较的路由字段：值未变化时同样不发布
+_ENDPOINT_COMPARED_FIELDS = frozenset({"is_active", "api_key", "model_list", "status"})
 
 DISALLOWED_TEST_ENDPOINT_PREFIXES = ("test-", "test_")
 
@@ -176,6 +186,26 @@ def _safe_json_loads(value: Optional[str]) -> Any:
         return None
 
 
+def _normalize_weight(value: Any) -> int:
+    if value is None or isinstance(value, bool):
+        return DEFAULT_ENDPOINT_WEIGHT
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        return DEFAULT_ENDPOINT_WEIGHT
+
+
+def _normalize_max_concurrency(value: Any) -> Optional[int]:
+    """None 表示沿用全局默认并发上限；0 表示不限制。"""
+
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        return None
+
+
 def _is_disallowed_test_endpoint_name(name: str | None) -> bool:
     text = (name or "").strip().lower()
     if not text:
@@ -183,16 +213,92 @@ def _is_disallowed_test_endpoint_name(name: str | None) -> bool:
     return text.startswith(DISALLOWED_TEST_ENDPOINT_PREFIXES)
 
 
+@asynccontextmanager
+async def _borrow_probe_client(
+    client: Optional[httpx.AsyncClient],
+    timeout: float,
+) -> AsyncIterator[httpx.AsyncClient]:
+    """批量巡检复用共享 client；单端点刷新时临时创建并在结束后关闭。"""
+
+    if client is not None:
+        yield client
+        return
+    async with httpx.AsyncClient(timeout=timeout) as own_client:
+        yield own_client
+
+
+def _probe_is_stale(last_checked_at: Any, max_age_seconds: float) -> bool:
+    """上次主动探针是否已超过 max_age_seconds（从未探测/无法解析视为过期）。"""
+
+    if not last_checked_at:
+        return True
+    try:
+        checked = datetime.fromisoformat(str(last_checked_at).replace("Z", "+00:00"))
+    except ValueError:
+        return True
+    if checked.tzinfo is None:
+        checked = checked.replace(tzinfo=timezone.utc)
+    return (datetime.now(timezone.utc) - checked).total_seconds() > max_age_seconds
+
+
+def _observe_active_probe(mode: str) -> None:
+    try:
+        from app.core.metrics import ai_endpoint_health_checks_total
+
+        ai_endpoint_health_checks_total.labels(mode=mode).inc()
+    except Exception:  # pragma: no cover
+        pass
+
+
+def _observe_probe_cycle(duration_seconds: Optional[float], *, skipped: bool) -> None:
+    try:
+        from app.core.metrics import ai_endpoint_probe_cycle_duration_seconds, ai_endpoint_probe_cycles_total
+
+        ai_endpoint_probe_cycles_total.labels(result="skipped" if skipped else "completed").inc()
+        if duration_seconds is not None:
+            ai_endpoint_probe_cycle_duration_seconds.observe(duration_seconds)
+    except Exception:  # pragma: no cover
+        pass
+
+
 class AIConfigService:
     """封装 AI 端点与 Prompt 的本地持久化、状态检测及 Supabase 同步逻辑。"""
 
-    def __init__(self, db: SQLiteManager, settings: Settings, storage_dir: Path | None = None) -> None:
+    def __init__(
+        self,
+        db: SQLiteManager,
+        settings: Settings,
+        storage_dir: Path | None = None,
+        *,
+        event_bus: ConfigEventBus | None = None,
+    ) -> None:
         self._db = db
         self._settings = settings
         self._storage_dir = (storage_dir or Path("storage") / "ai_runtime").resolve()
         self._storage_dir.mkdir(parents=True, exist_ok=True)
         self._backup_dir = self._storage_dir / "backups"
         self._backup_dir.mkdir(parents=True, exist_ok=True)
+        # 端点巡检互斥：上一轮未结束时跳过新一轮，避免探针周期重叠。
+        self._refresh_all_lock = asyncio.Lock()
+        # 端点/Prompt 每次写入后发布到配置事件总线；派生索引（如模型白名单、prompt 映射索引）据版本号判断是否需要重建。
+        # 未注入总线时使用私有的进程内总线（单测/脚本）。
+        self._events = event_bus if event_bus is not None else ConfigEventBus()
+
+    @property
+    def event_bus(self) -> ConfigEventBus:
+        return self._events
+
+    @property
+    def revision(self) -> int:
+        """端点/Prompt 配置的修订号（单调递增；多 worker 时含其他进程的写入）。"""
+
+        return self._events.topic_version(TOPIC_ENDPOINTS) + self._events.topic_version(TOPIC_PROMPTS)
+
+    @property
+    def prompt_revision(self) -> int:
+        """Prompt 的修订号（仅 Prompt 写入时递增）。"""
+
+        return self._events.topic_version(TOPIC_PROMPTS)
 
     # --------------------------------------------------------------------- #
     # Endpoint 基础方法
@@ -313,6 +419,9 @@ class AIConfigService:
             "timeout": row.get("timeout", self._settings.http_timeout_seconds),
             "is_active": bool(row.get("is_active")),
             "is_default": bool(row.get("is_default")),
+            "weight": row.get("weight") if row.get("weight") is not None else DEFAULT_ENDPOINT_WEIGHT,
+            "prompt_cache_enabled": row.get("prompt_cache_enabled") is None or bool(row.get("prompt_cache_enabled")),
+            "max_concurrency": row.get("max_concurrency"),
             "model_list": model_list,
             "status": row.get("status") or "unknown",
             "latency_ms": row.get("latency_ms"),
@@ -389,11 +498,11 @@ class AIConfigService:
             """
             INSERT INTO ai_endpoints (
                 name, base_url, provider_protocol, model, description, api_key, timeout,
-                is_active, is_default, model_list, status,
+                is_active, is_default, weight, prompt_cache_enabled, max_concurrency, model_list, status,
                 latency_ms, last_checked_at, last_error,
                 sync_status, last_synced_at, resolved_endpoints,
                 created_at, updated_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """,
             [
                 payload["name"],
@@ -405,6 +514,9 @@ class AIConfigService:
                 payload.get("timeout") or int(self._settings.http_timeout_seconds),
                 1 if payload.get("is_active", True) else 0,
                 1 if payload.get("is_default") else 0,
+                _normalize_weight(payload.get("weight")),
+                0 if payload.get("prompt_cache_enabled") is False else 1,
+                _normalize_max_concurrency(payload.get("max_concurrency")),
                 _safe_json_dumps(payload.get("model_list") or []),
                 payload.get("status") or "unknown",
                 payload.get("latency_ms"),
@@ -417,7 +529,9 @@ class AIConfigService:
                 now,
             ],
         )
+        # 先读回再发布：发布会写 config_versions，改变 last_insert_rowid()
         row = await self._db.fetchone("SELECT * FROM ai_endpoints WHERE id = last_insert_rowid()")
+        await self._events.publish(TOPIC_ENDPOINTS)
         if row is None:
             raise RuntimeError("Failed to load endpoint after insert")
         endpoint = self._format_endpoint_row(row)
@@ -770,6 +884,12 @@ class AIConfigService:
                     [endpoint_id],
                 )
             add("is_default", 1 if payload["is_default"] else 0)
+        if "weight" in payload:
+            add("weight", _normalize_weight(payload["weight"]))
+        if "prompt_cache_enabled" in payload:
+            add("prompt_cache_enabled", 0 if payload["prompt_cache_enabled"] is False else 1)
+        if "max_concurrency" in payload:
+            add("max_concurrency", _normalize_max_concurrency(payload["max_concurrency"]))
         if "model_list" in payload:
             add("model_list", _safe_json_dumps(payload["model_list"]))
         if "status" in payload:
@@ -790,14 +910,40 @@ class AIConfigService:
         if not updates:
             return existing
 
+        routing_changed = await self._endpoint_routing_changed(endpoint_id, existing, payload, updates)
         add("updated_at", _utc_now())
         params.append(endpoint_id)
         await self._db.execute(f"UPDATE ai_endpoints SET {', '.join(updates)} WHERE id = ?", params)
+        if routing_changed:
+            await self._events.publish(TOPIC_ENDPOINTS)
         return await self.get_endpoint(endpoint_id)
 
+    async def _endpoint_routing_changed(
+        self,
+        endpoint_id: int,
+        existing: dict[str, Any],
+        payload: dict[str, Any],
+        updates: list[str],
+    ) -> bool:
+        """判断本次更新是否影响路由：探针字段忽略；启用/密钥/模型列表按值比较；状态仅在进出 offline 时算变化。"""
+
+        fields = {item.split(" = ", 1)[0] for item in updates}
+        if fields - _ENDPOINT_PROBE_FIELDS - _ENDPOINT_COMPARED_FIELDS:
+            return True
+        if "is_active" in fields and bool(payload["is_active"]) != existing["is_active"]:
+            return True
+        if "model_list" in fields and list(payload["model_list"] or []) != existing["model_list"]:
+            return True
+        if "status" in fields and (payload["status"] == "offline") != (existing["status"] == "offline"):
+            return True
+        if "api_key" in fields and (payload["api_key"] or None) != (await self._get_api_key(endpoint_id) or None):
+            return True
+        return False
+
     async def delete_endpoint(self, endpoint_id: int, *, sync_remote: bool = True) -> None:
         endpoint = await self.get_endpoint(endpoint_id)
         await self._db.execute("DELETE FROM ai_endpoints WHERE id = ?", [endpoint_id])
+        await self._events.publish(TOPIC_ENDPOINTS)
 
         if sync_remote and endpoint.get("supabase_id") and self._supabase_available():
             headers = self._supabase_headers()
@@ -812,7 +958,14 @@ class AIConfigService:
             except httpx.HTTPError as exc:  # pragma: no cover
                 logger.warning("删除 Supabase 端点失败 endpoint_id=%s error=%s", endpoint_id, exc)
 
-    async def refresh_endpoint_status(self, endpoint_id: int) -> dict[str, Any]:
+    async def refresh_endpoint_status(
+        self,
+        endpoint_id: int,
+        *,
+        client: Optional[httpx.AsyncClient] = None,
+    ) -> dict[str, Any]:
+        """探测单个端点的连通性与模型列表并落盘；client 非空时复用调用方的连接池（批量巡检）。"""
+
         endpoint = await self.get_endpoint(endpoint_id)
         api_key = await self._get_api_key(endpoint_id)
         base_headers = {"Content-Type": "application/json"}
@@ -846,10 +999,10 @@ class AIConfigService:
 
         try:
             response: httpx.Response | None = None
-            async with httpx.AsyncClient(timeout=timeout) as client:
+            async with _borrow_probe_client(client, timeout) as probe_client:
                 # 特例：VoyageAI 为 embeddings 供应商（chat/models 不适用）
                 if is_voyage:
-                    response = await client.options(embeddings_url, headers=base_headers)
+                    response = await probe_client.options(embeddings_url, headers=base_headers, timeout=timeout)
                     latency_ms = (perf_counter() - start) * 1000
                     if response.status_code == 404:
                         status_value = "offline"
@@ -874,7 +1027,7 @@ class AIConfigService:
                     model_ids = [item for item in merged if item and not (item in seen or seen.add(item))]
                 # 特例：Perplexity 不提供 /models 列表，用 chat 端点探针 + 文档内置模型列表作为可选项
                 elif is_perplexity:
-                    response = await client.options(chat_url, headers=base_headers)
+                    response = await probe_client.options(chat_url, headers=base_headers, timeout=timeout)
                     latency_ms = (perf_counter() - start) * 1000
                     if response.status_code == 404:
                         status_value = "offline"
@@ -890,7 +1043,7 @@ class AIConfigService:
 
                     fetched: list[str] = []
                     try:
-                        models_resp = await client.get(models_url, headers=base_headers)
+                        models_resp = await probe_client.get(models_url, headers=base_headers, timeout=timeout)
                         if models_resp.status_code == 200:
                             payload = models_resp.json()
                             items: list[Any]
@@ -934,10 +1087,10 @@ class AIConfigService:
 
                     async def _probe_route(url: str) -> int:
                         probe_headers = dict(base_headers)
-                        probe_resp = await client.options(url, headers=probe_headers)
+                        probe_resp = await probe_client.options(url, headers=probe_headers, timeout=timeout)
                         if probe_resp.status_code == 404:
                             # 兼容：部分上游仅实现 POST（GET/HEAD 返回 404），用空 JSON 做“路由存在性”探测。
-                            probe_resp = await client.post(url, headers=probe_headers, json={})
+                            probe_resp = await probe_client.post(url, headers=probe_headers, json={}, timeout=timeout)
                         return int(probe_resp.status_code)
 
                     # 协议兜底：
@@ -969,13 +1122,13 @@ class AIConfigService:
                         if api_key:
                             headers["x-api-key"] = api_key
                             headers["anthropic-version"] = "2023-06-01"
-                        response = await client.get(claude_models_url, headers=headers)
+                        response = await probe_client.get(claude_models_url, headers=headers, timeout=timeout)
                         latency_ms = (perf_counter() - start) * 1000
                     elif status_value != "offline":
                         for index, auth_headers in enumerate(auth_candidates):
                             headers = dict(base_headers)
                             headers.update(auth_headers)
-                            response = await client.get(openai_models_url, headers=headers)
+                            response = await probe_client.get(openai_models_url, headers=headers, timeout=timeout)
                             latency_ms = (perf_counter() - start) * 1000
 
                             if response.status_code != 401 or index >= len(auth_candidates) - 1:
@@ -1058,15 +1211,97 @@ class AIConfigService:
         )
         return await self.get_endpoint(endpoint_id)
 
-    async def refresh_all_status(self) -> list[dict[str, Any]]:
-        rows = await self._db.fetchall("SELECT id FROM ai_endpoints ORDER BY id ASC")
-        results: list[dict[str, Any]] = []
-        for row in rows:
-            try:
-                results.append(await self.refresh_endpoint_status(row["id"]))
-            except Exception:  # pragma: no cover
-                logger.exception("检测端点状态失败 endpoint_id=%s", row["id"])
-        return results
+    async def refresh_all_status(self, *, passive_first: bool = False) -> list[dict[str, Any]]:
+        """并发巡检全部端点（信号量限并发 + 单端点截止时间 + 共享连接池）。
+
+        上一轮巡检仍在进行时直接跳过本轮（返回空列表），避免慢端点导致周期叠加。
+        passive_first=True（后台周期巡检）时，近期有真实成功流量且无可疑错误的端点直接采用被动健康度，
+        只对空闲/可疑端点发主动探针。
+        """
+
+        if self._refresh_all_lock.locked():
+            logger.warning("上一轮端点巡检尚未结束，跳过本轮")
+            _observe_probe_cycle(None, skipped=True)
+            return []
+
+        async with self._refresh_all_lock:
+            start = perf_counter()
+            rows = await self._db.fetchall(
+                "SELECT id, status, last_error, last_checked_at FROM ai_endpoints ORDER BY id ASC"
+            )
+            concurrency = max(1, int(getattr(self._settings, "ai_endpoint_probe_concurrency", 8)))
+            deadline = float(
+                getattr(self._settings, "ai_endpoint_probe_deadline_seconds", None)
+                or self._settings.http_timeout_seconds
+            )
+            semaphore = asyncio.Semaphore(concurrency)
+            tracker = get_endpoint_health_tracker()
+            use_passive = passive_first and bool(getattr(self._settings, "ai_passive_health_enabled", False))
+            idle_seconds = float(getattr(self._settings, "ai_passive_health_idle_seconds", 120.0))
+            max_probe_age = float(getattr(self._settings, "ai_passive_health_max_probe_age_seconds", 1800.0))
+            limits = httpx.Limits(max_connections=concurrency * 2, max_keepalive_connections=concurrency)
+
+            async with httpx.AsyncClient(timeout=self._settings.http_timeout_seconds, limits=limits) as client:
+
+                async def _probe(row: dict[str, Any]) -> Optional[dict[str, Any]]:
+                    endpoint_id = int(row["id"])
+                    if (
+                        use_passive
+                        and tracker.get(endpoint_id) is not None
+                        and not tracker.needs_active_probe(endpoint_id, idle_seconds=idle_seconds)
+                        and not _probe_is_stale(row.get("last_checked_at"), max_probe_age)
+                    ):
+                        _observe_active_probe("passive")
+                        return await self._apply_passive_health(row)
+                    _observe_active_probe("probed")
+                    async with semaphore:
+                        try:
+                            return await asyncio.wait_for(
+                                self.refresh_endpoint_status(endpoint_id, client=client),
+                                timeout=deadline,
+                            )
+                        except asyncio.TimeoutError:
+                            return await self._mark_probe_deadline_exceeded(endpoint_id, deadline)
+                        except Exception:  # pragma: no cover
+                            logger.exception("检测端点状态失败 endpoint_id=%s", endpoint_id)
+                            return None
+
+                outcomes = await asyncio.gather(*(_probe(row) for row in rows))
+
+            _observe_probe_cycle(perf_counter() - start, skipped=False)
+            return [item for item in outcomes if item is not None]
+
+    async def _apply_passive_health(self, row: dict[str, Any]) -> Optional[dict[str, Any]]:
+        """近期真实流量成功：只刷新在线状态（不访问上游）。
+
+        model_list / latency_ms / last_checked_at 仍只由主动探针写入（last_checked_at 用于判断探针是否过期）；
+        状态未变化时不写库。
+        """
+
+        endpoint_id = int(row["id"])
+        try:
+            if str(row.get("status") or "") != "online" or row.get("last_error"):
+                await self.update_endpoint(endpoint_id, {"status": "online", "last_error": None})
+            return await self.get_endpoint(endpoint_id)
+        except Exception:  # pragma: no cover
+            logger.exception("写入端点被动健康度失败 endpoint_id=%s", endpoint_id)
+            return None
+
+    async def _mark_probe_deadline_exceeded(self, endpoint_id: int, deadline: float) -> Optional[dict[str, Any]]:
+        try:
+            await self.update_endpoint(
+                endpoint_id,
+                {
+                    "status": "offline",
+                    "latency_ms": deadline * 1000,
+                    "last_checked_at": _utc_now(),
+                    "last_error": f"probe_deadline_exceeded: {deadline:g}s",
+                },
+            )
+            return await self.get_endpoint(endpoint_id)
+        except Exception:  # pragma: no cover
+            logger.exception("记录端点巡检超时失败 endpoint_id=%s", endpoint_id)
+            return None
 
     # --------------------------------------------------------------------- #
     # Supabase 同步
@@ -1370,6 +1605,7 @@ class AIConfigService:
         if not data:
             if delete_missing:
                 await self._db.execute("DELETE FROM ai_endpoints WHERE supabase_id IS NOT NULL")
+                await self._events.publish(TOPIC_ENDPOINTS)
             return []
 
         merged: list[dict[str, Any]] = []
@@ -1458,6 +1694,7 @@ class AIConfigService:
             else:
                 await self._db.execute("DELETE FROM ai_endpoints WHERE supabase_id IS NOT NULL")
 
+        await self._events.publish(TOPIC_ENDPOINTS)
         return merged
 
     async def supabase_status(self) -> dict[str, Any]:
@@ -1585,7 +1822,9 @@ class AIConfigService:
                 now,
             ],
         )
+        # 先读回再发布：发布会写 config_versions，改变 last_insert_rowid()
         row = await self._db.fetchone("SELECT * FROM ai_prompts WHERE id = last_insert_rowid()")
+        await self._events.publish(TOPIC_PROMPTS)
         if row is None:
             raise RuntimeError("Failed to load prompt after insert")
         prompt = self._format_prompt_row(row)
@@ -1651,11 +1890,13 @@ class AIConfigService:
         add("updated_at", _utc_now())
         params.append(prompt_id)
         await self._db.execute(f"UPDATE ai_prompts SET {', '.join(updates)} WHERE id = ?", params)
+        await self._events.publish(TOPIC_PROMPTS)
         return await self.get_prompt(prompt_id)
 
     async def delete_prompt(self, prompt_id: int, *, sync_remote: bool = True) -> None:
         prompt = await self.get_prompt(prompt_id)
         await self._db.execute("DELETE FROM ai_prompts WHERE id = ?", [prompt_id])
+        await self._events.publish(TOPIC_PROMPTS)
 
         if sync_remote and prompt.get("supabase_id") and self._supabase_available():
             headers = self._supabase_headers()
@@ -1686,6 +1927,7 @@ class AIConfigService:
             "UPDATE ai_prompts SET is_active = 1, updated_at = ? WHERE id = ?",
             [_utc_now(), prompt_id],
         )
+        await self._events.publish(TOPIC_PROMPTS)
         return await self.get_prompt(prompt_id)
 
     async def get_prompt_by_supabase_id(self, supabase_id: int) -> dict[str, Any]:
@@ -1820,6 +2062,7 @@ class AIConfigService:
                 ],
             )
             merged.append(await self.get_prompt_by_supabase_id(supabase_id))
+        await self._events.publish(TOPIC_PROMPTS)
         return merged
 
     async def record_prompt_test(
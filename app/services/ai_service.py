@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 import asyncio
+import functools
 import json
 import logging
 import re
@@ -25,9 +26,30 @@ from app.services.ai_endpoint_rules import looks_like_test_endpoint
 from app.services.ai_config_service import AIConfigService
 from app.services.ai_model_rules import looks_like_embedding_model
 from app.services.ai_url import build_resolved_endpoints, normalize_ai_base_url
-from app.services.llm_model_registry import LlmModelRegistry
+from app.services.endpoint_balancer import EndpointBalancer, get_endpoint_balancer
+from app.services.endpoint_concurrency import PRIORITY_FREE, PRIORITY_PRO, get_endpoint_concurrency_limiter
+from app.services.endpoint_circuit_breaker import (
+    EndpointCircuitBreaker,
+    classify_upstream_failure,
+    get_endpoint_circuit_breaker,
+)
+from app.services.entitlement_service import EntitlementService
+from app.services.llm_model_registry import (
+    LlmModelRegistry,
+    ResolvedProviderRoute,
+    filter_circuit_open_endpoints,
+    pick_endpoint_for_model,
+)
 from app.services.prompt_tools_assembly import assemble_system_prompt, extract_tools_schema, gate_active_tools_schema
 from app.services.providers import get_provider_adapter
+from app.services.providers.timing import UpstreamTiming, track_upstream_timing
+from app.services.response_cache import (
+    InflightResponse,
+    build_response_cache_key,
+    get_response_cache,
+    is_deterministic_payload,
+    observe_response_cache,
+)
 from app.services.upstream_auth import is_retryable_auth_error, iter_auth_headers, should_send_x_api_key
 from app.services.model_mapping_service import ModelMappingService, normalize_mapping_id
 from app.settings.config import get_settings
@@ -333,6 +355,12 @@ class MessageChannelMeta:
     terminal_event: Optional[MessageEvent] = None
     delta_seq: int = 0
     raw_seq: int = 0
+    # 上游路由轨迹（单路/TTFT 超时切换/对冲），写入请求追踪的 response_detail。
+    upstream_routing: Optional[dict[str, Any]] = None
+    # 胜出上游的指标标签（endpoint_id/model/dialect），供 SSE 订阅侧的客户端首包直方图使用。
+    upstream_labels: Optional[dict[str, str]] = None
+    # 消息创建时刻（perf_counter），用于计算客户端首个 SSE 内容帧的耗时。
+    created_perf: float = field(default_factory=perf_counter)
     # auto：缓存少量 raw 帧，等待判定；一旦判定则清空或 flush。
     auto_pending_raw_events: list[MessageEvent] = field(default_factory=list)
     auto_pending_raw_chars: int = 0
@@ -1388,6 +1416,221 @@ class MessageEventBroker:
             await queue.put(None)
 
 
+def _split_token_usage(metadata: Optional[dict[str, Any]]) -> tuple[Optional[dict[str, Any]], Optional[dict[str, int]]]:
+    """adapter 把归一后的 usage 放在 metadata["usage"]；拆出后用于落库，不随 completed 事件下发。"""
+
+    if not isinstance(metadata, dict) or "usage" not in metadata:
+        return metadata, None
+    rest = {key: value for key, value in metadata.items() if key != "usage"}
+    usage = metadata.get("usage")
+    return rest or None, usage if isinstance(usage, dict) else None
+
+
+def upstream_latency_labels(endpoint_id: Any, model: Any, dialect: Any) -> dict[str, str]:
+    """上游延迟类直方图的统一标签。"""
+
+    return {
+        "endpoint_id": str(endpoint_id) if endpoint_id is not None else "unknown",
+        "model": str(model or "").strip() or "unknown",
+        "dialect": str(dialect or "").strip() or "unknown",
+    }
+
+
+def _observe_upstream_latency(
+    labels: dict[str, str],
+    timing: UpstreamTiming,
+    *,
+    first_delta_at: Optional[float],
+    metadata: Optional[dict[str, Any]],
+    succeeded: bool,
+) -> None:
+    """一次上游尝试结束后记录：建连（响应头）耗时、adapter 首包（TTFT）、输出 token 速率。"""
+
+    try:
+        from app.core.metrics import (
+            ai_upstream_connect_seconds,
+            ai_upstream_output_tokens_per_second,
+            ai_upstream_ttft_seconds,
+        )
+
+        if timing.connected_at is not None:
+            ai_upstream_connect_seconds.labels(**labels).observe(max(0.0, timing.connected_at - timing.started_at))
+        if not succeeded or first_delta_at is None:
+            return
+        ai_upstream_ttft_seconds.labels(**labels).observe(max(0.0, first_delta_at - timing.started_at))
+        _, usage = _split_token_usage(metadata)
+        completion_tokens = int((usage or {}).get("completion_tokens") or 0)
+        generation_seconds = perf_counter() - first_delta_at
+        if completion_tokens > 0 and generation_seconds > 0:
+            ai_upstream_output_tokens_per_second.labels(**labels).observe(completion_tokens / generation_seconds)
+    except Exception:  # pragma: no cover
+        pass
+
+
+def _without_token_usage(result: tuple[Any, ...]) -> tuple[Any, ...]:
+    """缓存回放/在途合并的结果未消耗上游 token，去掉 usage 避免重复计量。"""
+
+    metadata, _ = _split_token_usage(result[6])
+    return (*result[:6], metadata, *result[7:])
+
+
+def _result_total_tokens(result: tuple[Any, ...]) -> int:
+    """上游结果 metadata["usage"] 中归一后的 total_tokens（缺失为 0），用于统计缓存节省的 token。"""
+
+    _, usage = _split_token_usage(result[6])
+    return int((usage or {}).get("total_tokens") or 0)
+
+
+def _observe_chunk_gap(labels: dict[str, str], gap_seconds: float) -> None:
+    try:
+        from app.core.metrics import ai_upstream_chunk_gap_seconds
+
+        ai_upstream_chunk_gap_seconds.labels(**labels).observe(max(0.0, gap_seconds))
+    except Exception:  # pragma: no cover
+        pass
+
+
+class _UpstreamRace:
+    """多路上游尝试的胜者仲裁：首个产出增量（或无增量完成）的尝试获胜。"""
+
+    __slots__ = ("winner", "claimed")
+
+    def __init__(self) -> None:
+        self.winner: Optional[_UpstreamAttempt] = None
+        self.claimed = asyncio.Event()
+
+
+class _UpstreamAttempt:
+    """单次上游尝试的事件闸门（对 dispatch 伪装为 broker）。
+
+    - 单路（race=None）：事件直通 broker，仅记录首个增量时刻；
+    - 多路：首个增量到达前缓存事件，抢到胜者后 flush 并转为直通；落败者的事件全部丢弃，
+      保证客户端只看到一条上游的输出。
+    """
+
+    def __init__(
+        self,
+        route: ResolvedProviderRoute,
+        *,
+        index: int,
+        broker: MessageEventBroker,
+        race: Optional[_UpstreamRace] = None,
+    ) -> None:
+        self.route = route
+        self.index = index
+        self.started_at = perf_counter()
+        self.first_delta_at: Optional[float] = None
+        self.last_delta_at: Optional[float] = None
+        self._gap_event: Optional[str] = None  # 用于度量 chunk 间隔的事件类型
+        self.labels: Optional[dict[str, str]] = None
+        self.outcome = "pending"
+        self.error: Optional[str] = None
+        self._broker = broker
+        self._race = race
+        self._buffer: list[tuple[str, MessageEvent]] = []
+
+    def get_meta(self, message_id: str) -> Optional[MessageChannelMeta]:
+        return self._broker.get_meta(message_id)
+
+    async def publish(self, message_id: str, event: MessageEvent) -> None:
+        if event.event in {"content_delta", "upstream_raw"}:
+            now = perf_counter()
+            if self.first_delta_at is None:
+                self.first_delta_at = now
+            self._observe_gap(event.event, now)
+        race = self._race
+        if race is None or race.winner is self:
+            await self._broker.publish(message_id, event)
+            return
+        if race.winner is not None:
+            return
+        self._buffer.append((message_id, event))
+        if self.first_delta_at is not None:
+            await self.claim()
+
+    def _observe_gap(self, event_name: str, now: float) -> None:
+        # emit_raw 时同一帧会背靠背发布 upstream_raw + content_delta：间隔只按一种事件度量，
+        # 有 content_delta 时以其为准，仅在从未出现增量时回退到 upstream_raw，避免约一半样本接近 0。
+        if event_name == "content_delta" and self._gap_event != "content_delta":
+            self._gap_event = "content_delta"
+            self.last_delta_at = None
+        elif self._gap_event is None:
+            self._gap_event = event_name
+        if event_name != self._gap_event:
+            return
+        if self.labels is not None and self.last_delta_at is not None:
+            _observe_chunk_gap(self.labels, now - self.last_delta_at)
+        self.last_delta_at = now
+
+    async def claim(self) -> bool:
+        """抢占胜者；成功时按原顺序 flush 已缓存事件。"""
+
+        race = self._race
+        if race is None:
+            return True
+        if race.winner is None:
+            race.winner = self
+            race.claimed.set()
+            buffered, self._buffer = self._buffer, []
+            for message_id, event in buffered:
+                await self._broker.publish(message_id, event)
+        return race.winner is self
+
+    def to_trace(self) -> dict[str, Any]:
+        ttft_ms = (self.first_delta_at - self.started_at) * 1000 if self.first_delta_at is not None else None
+        return {
+            "endpoint_id": self.route.endpoint_id,
+            "model": self.route.resolved_model,
+            "outcome": self.outcome,
+            "ttft_ms": round(ttft_ms, 2) if ttft_ms is not None else None,
+            "error": self.error,
+        }
+
+
+class _ResponseRecorder:
+    """leader 请求的事件录制器：事件照常发布，同时把发布前快照交给在途合并/缓存（status 事件除外）。"""
+
+    def __init__(self, broker: MessageEventBroker, inflight: InflightResponse) -> None:
+        self._broker = broker
+        self._inflight = inflight
+
+    def get_meta(self, message_id: str) -> Optional[MessageChannelMeta]:
+        return self._broker.get_meta(message_id)
+
+    async def publish(self, message_id: str, event: MessageEvent) -> None:
+        if event.event != "status":
+            snapshot = {key: value for key, value in event.data.items() if key not in ("message_id", "request_id")}
+            await self._inflight.append(event.event, snapshot)
+        await self._broker.publish(message_id, event)
+
+
+class _UpstreamAttemptLost(Exception):
+    """尝试在无增量的情况下完成，但胜者已被其他尝试抢占。"""
+
+
+@dataclass(frozen=True, slots=True)
+class ModelAllowIndex:
+    """is_model_allowed 的预计算索引：只读快照，配置修订号变化时整体替换。"""
+
+    revision: tuple[int, int]
+    version: int
+    app_scopes: frozenset[str]
+    shared_mapping_ids: frozenset[str]
+    user_mapping_ids: dict[str, frozenset[str]]
+    rebuild_seconds: float
+    built_at: float
+
+    def allows(self, name: str, *, user_id: str | None = None) -> bool:
+        if ":" not in name:
+            return name in self.app_scopes
+        # 兼容：legacy mapping_id（如 global:global / tenant:xxx）
+        user_ids = self.user_mapping_ids.get(user_id or "", frozenset())
+        for candidate in (name, normalize_mapping_id(name)):
+            if candidate in self.shared_mapping_ids or candidate in user_ids:
+                return True
+        return False
+
+
 class AIService:
     """封装 AI 模型调用与聊天记录持久化。"""
 
@@ -1399,6 +1642,7 @@ class AIService:
         ai_config_service: Optional[AIConfigService] = None,
         model_mapping_service: Optional[ModelMappingService] = None,
         llm_model_registry: Optional[LlmModelRegistry] = None,
+        entitlement_service: Optional[EntitlementService] = None,
     ) -> None:
         self._settings = get_settings()
         self._provider = provider or get_auth_provider()
@@ -1406,6 +1650,9 @@ class AIService:
         self._ai_config_service = ai_config_service
         self._model_mapping_service = model_mapping_service
         self._llm_model_registry = llm_model_registry
+        self._entitlement_service = entitlement_service  # 用于上游排队优先级（pro 优先）
+        self._model_allow_index: Optional[ModelAllowIndex] = None
+        self._model_allow_lock = asyncio.Lock()
 
     async def list_model_whitelist(
         self,
@@ -1413,12 +1660,14 @@ class AIService:
         user_id: str | None = None,
         include_inactive: bool = False,
         include_debug_fields: bool = False,
+        all_user_scopes: bool = False,
     ) -> list[dict[str, Any]]:
         """返回“客户端可发送的 model 白名单”。
 
         约束：
         - name 是客户端可发送的 model（SSOT）
         - 列表中的每个 name 必须可路由到可用的 provider+endpoint（否则过滤掉）
+        - all_user_scopes=True 时包含所有用户的 user 级映射（用于构建全量白名单索引）
         """
 
         if self._model_mapping_service is None or self._ai_config_service is None:
@@ -1467,7 +1716,7 @@ class AIService:
                     # prompt 级映射需要 prompt_id 参与解析，不作为“通用白名单 model”
                     continue
                 if scope_type == "user":
-                    if not user_id or scope_key != user_id:
+                    if not all_user_scopes and (not user_id or scope_key != user_id):
                         continue
                 elif scope_type == "global":
                     # 允许存在多个 global 映射（如 global:xai / global:gpt），客户端用 id 作为稳定 key
@@ -1547,9 +1796,11 @@ class AIService:
             return collected
 
         items = _collect_items(mappings)
+        # 全量索引模式下 user 映射不代表“当前用户可用”，是否需要修复只看共享映射
+        shared_items = [item for item in items if item.get("scope_type") != "user"] if all_user_scopes else items
 
         # 端到端兜底：当白名单为空但存在可用端点时，自动修复 global:global（避免配置漂移导致 App 无法选择模型）。
-        if bool(getattr(self._settings, "allow_test_ai_endpoints", False)) and not items and candidates:
+        if bool(getattr(self._settings, "allow_test_ai_endpoints", False)) and not shared_items and candidates:
             default_endpoint = next((item for item in candidates if item.get("is_default")), candidates[0])
             seed_candidates: list[str] = []
             preferred = str(default_endpoint.get("model") or "").strip()
@@ -1724,18 +1975,78 @@ class AIService:
             return False
 
         # 兼容：既允许 legacy mapping_id（如 global:global），也允许 App 业务 key（如 xai）
-        if ":" in name:
-            normalized = normalize_mapping_id(name)
-            acceptable = {name, normalized}
-            whitelist = await self.list_model_whitelist(
-                user_id=user_id,
-                include_inactive=False,
-                include_debug_fields=False,
+        index = await self.get_model_allow_index()
+        return index.allows(name, user_id=user_id)
+
+    def _config_revision(self) -> tuple[int, int]:
+        return (
+            int(getattr(self._ai_config_service, "revision", 0) or 0),
+            int(getattr(self._model_mapping_service, "revision", 0) or 0),
+        )
+
+    async def get_model_allow_index(self) -> ModelAllowIndex:
+        """返回当前白名单索引；仅当端点/Prompt/映射/屏蔽列表修订号变化时重建（并发调用只重建一次）。"""
+
+        index = self._model_allow_index
+        if index is not None and index.revision == self._config_revision():
+            return index
+        async with self._model_allow_lock:
+            index = self._model_allow_index
+            # 先取修订号再重建：重建期间（含测试环境 auto-seed）发生的写入会在下次调用时再触发一次重建
+            revision = self._config_revision()
+            if index is not None and index.revision == revision:
+                return index
+
+            started = perf_counter()
+            whitelist = await self.list_model_whitelist(all_user_scopes=True)
+            app_scopes = await self.list_app_model_scopes(include_inactive=False, include_debug_fields=False)
+
+            shared: set[str] = set()
+            per_user: dict[str, set[str]] = {}
+            for item in whitelist:
+                name = str(item.get("name") or "")
+                if not name:
+                    continue
+                if item.get("scope_type") == "user":
+                    per_user.setdefault(str(item.get("scope_key") or ""), set()).add(name)
+                else:
+                    shared.add(name)
+
+            elapsed = perf_counter() - started
+            index = ModelAllowIndex(
+                revision=revision,
+                version=(index.version + 1) if index is not None else 1,
+                app_scopes=frozenset(str(item.get("name") or "") for item in app_scopes if item.get("name")),
+                shared_mapping_ids=frozenset(shared),
+                user_mapping_ids={uid: frozenset(names) for uid, names in per_user.items()},
+                rebuild_seconds=elapsed,
+                built_at=time.time(),
             )
-            return any(item.get("name") in acceptable for item in whitelist)
+            self._model_allow_index = index
+            try:
+                from app.core.metrics import ai_model_allowlist_rebuild_seconds, ai_model_allowlist_version
 
-        app_scopes = await self.list_app_model_scopes(include_inactive=False, include_debug_fields=False)
-        return any(item.get("name") == name for item in app_scopes)
+                ai_model_allowlist_version.set(index.version)
+                ai_model_allowlist_rebuild_seconds.observe(elapsed)
+            except Exception:  # pragma: no cover
+                pass
+            return index
+
+    def describe_model_allow_index(self) -> dict[str, Any]:
+        """白名单索引状态（版本/重建耗时/规模），供运维排查。"""
+
+        index = self._model_allow_index
+        if index is None:
+            return {"version": 0, "built": False}
+        return {
+            "version": index.version,
+            "built": True,
+            "revision": list(index.revision),
+            "rebuild_ms": round(index.rebuild_seconds * 1000, 3),
+            "built_at": index.built_at,
+            "app_scopes": len(index.app_scopes),
+            "mapping_ids": len(index.shared_mapping_ids) + sum(len(v) for v in index.user_mapping_ids.values()),
+        }
 
     @staticmethod
     def new_message_id() -> str:
@@ -1832,6 +2143,7 @@ class AIService:
         upstream_request_id: Optional[str] = None
         provider_used: Optional[str] = None
         provider_metadata: Optional[dict[str, Any]] = None
+        token_usage: Optional[dict[str, int]] = None
         error_message: Optional[str] = None
 
         try:
@@ -1880,6 +2192,7 @@ class AIService:
                     provider_used,
                     provider_metadata,
                 ) = result
+            provider_metadata, token_usage = _split_token_usage(provider_metadata)
             if provider_used is None and self._ai_config_service is None:
                 provider_used = "openai"
 
@@ -2019,7 +2332,9 @@ class AIService:
         finally:
             latency_ms = (perf_counter() - start_time) * 1000
             stats_model = requested_model_key_for_stats or model_used
-            await self._record_ai_request(user.uid, endpoint_id_used, stats_model, latency_ms, success)
+            await self._record_ai_request(
+                user.uid, endpoint_id_used, stats_model, latency_ms, success, token_usage=token_usage
+            )
 
             # Prometheus：会话延迟与成功率（按 model/user_type/status 维度）
             try:
@@ -2051,6 +2366,7 @@ class AIService:
                         latency_ms=latency_ms,
                         status="success" if success else "error",
                         error_message=error_message,
+                        token_usage=token_usage,
                     )
                 except Exception as exc:  # pragma: no cover
                     logger.warning("写入对话日志失败 message_id=%s request_id=%s error=%s", message_id, request_id, exc)
@@ -2085,6 +2401,8 @@ class AIService:
                         "latency_ms": latency_ms,
                         "success": success,
                         "provider_metadata": provider_metadata,
+                        "token_usage": token_usage,
+                        "upstream_routing": getattr(broker.get_meta(message_id), "upstream_routing", None),
                         "upstream": {
                             "request_payload": request_payload,
                             "response_payload": response_payload,
@@ -2187,6 +2505,8 @@ class AIService:
             preferred_endpoint_id = _parse_optional_int(
                 (message.metadata or {}).get("endpoint_id") or (message.metadata or {}).get("endpointId")
             )
+        # 路由会把 openai_req["model"] 改写为真实 vendor model；备选路由需按原始 model key 解析。
+        requested_model_key = str(openai_req.get("model") or "").strip()
 
         if self._llm_model_registry is None:
             selected_endpoint, selected_model, provider_name = await self._select_endpoint_and_model(
@@ -2236,7 +2556,424 @@ class AIService:
                 ensure_ascii=False,
             )
 
+        primary_route = ResolvedProviderRoute(
+            endpoint=selected_endpoint,
+            endpoint_id=endpoint_id,
+            api_key=api_key,
+            provider=provider_name,
+            dialect=dialect,
+            resolved_model=str(selected_model or ""),
+        )
+        call_upstream = functools.partial(
+            self._call_upstream_routes,
+            primary_route,
+            message_id=message_id,
+            message=message,
+            request_id=request_id,
+            payload_mode=payload_mode,
+            dialect_override=dialect_override,
+            openai_req=openai_req,
+            emit_raw=emit_raw,
+            preferred_endpoint_id=preferred_endpoint_id,
+            requested_model_key=requested_model_key,
+            user=user,
+        )
+        cache_key = self._response_cache_key(
+            user=user,
+            message=message,
+            payload_mode=payload_mode,
+            openai_req=openai_req,
+            effective_dialect=effective_dialect,
+            resolved_model=primary_route.resolved_model,
+            emit_raw=emit_raw,
+        )
+        if cache_key is None:
+            upstream = await call_upstream(broker=broker)
+        else:
+            upstream = await self._call_upstream_with_response_cache(
+                cache_key,
+                primary_route,
+                broker=broker,
+                message_id=message_id,
+                request_id=request_id,
+                effective_dialect=effective_dialect,
+                call_upstream=call_upstream,
+            )
+        reply_text, model_used, response_payload, upstream_request_id, endpoint_used, provider_used, provider_metadata = upstream
+        return (
+            reply_text,
+            model_used,
+            request_payload,
+            response_payload,
+            upstream_request_id,
+            endpoint_used,
+            provider_used,
+            provider_metadata,
+        )
+
+    async def _call_upstream_routes(
+        self,
+        primary_route: ResolvedProviderRoute,
+        *,
+        broker: MessageEventBroker,
+        message_id: str,
+        message: AIMessageInput,
+        request_id: Optional[str],
+        payload_mode: bool,
+        dialect_override: str,
+        openai_req: dict[str, Any],
+        emit_raw: bool,
+        preferred_endpoint_id: Optional[int],
+        requested_model_key: str,
+        user: Optional[AuthenticatedUser] = None,
+    ) -> tuple[str, str, Optional[str], Optional[str], Optional[int], str, Optional[dict[str, Any]]]:
+        """沿主路由（及可选的切换/对冲备选）调用上游。
+
+        返回 (reply_text, resolved_model, response_payload, upstream_request_id, endpoint_id, provider, metadata)。
+        """
+
+        routes = [primary_route]
+        routing_mode = self._upstream_routing_mode(preferred_endpoint_id)
+        if routing_mode != "single" and self._llm_model_registry is not None:
+            try:
+                routes.extend(
+                    await self._llm_model_registry.resolve_fallback_routes(
+                        requested_model_key,
+                        primary_route,
+                        limit=max(0, int(self._settings.ai_upstream_max_attempts) - 1),
+                        # payload 模式且未显式指定 dialect 时，请求体与主路由协议绑定，备选只能同协议。
+                        dialect=primary_route.dialect if payload_mode and not dialect_override else None,
+                    )
+                )
+            except Exception as exc:  # pragma: no cover - 备选解析失败不影响主路由
+                logger.warning("解析备选上游失败 message_id=%s error=%s", message_id, exc)
+        if len(routes) == 1:
+            routing_mode = "single"
+
+        async def _run(attempt: _UpstreamAttempt) -> tuple[str, Optional[str], Optional[str], Optional[dict[str, Any]]]:
+            return await self._run_upstream_attempt(
+                attempt,
+                message_id=message_id,
+                message=message,
+                request_id=request_id,
+                payload_mode=payload_mode,
+                dialect_override=dialect_override,
+                openai_req=openai_req,
+                emit_raw=emit_raw,
+                user=user,
+            )
+
+        if routing_mode == "single":
+            winner = _UpstreamAttempt(primary_route, index=0, broker=broker)
+            attempts = [winner]
+            try:
+                reply_text, response_payload, upstream_request_id, provider_metadata = await _run(winner)
+                winner.outcome = "won"
+            finally:
+                self._store_upstream_routing(broker, message_id, routing_mode, attempts)
+        else:
+            winner, attempts, result = await self._race_upstream_attempts(
+                routes,
+                mode=routing_mode,
+                broker=broker,
+                message_id=message_id,
+                run=_run,
+            )
+            reply_text, response_payload, upstream_request_id, provider_metadata = result
+
+        winner_dialect = dialect_override or winner.route.dialect
+        return (
+            reply_text,
+            winner.route.resolved_model,
+            response_payload,
+            upstream_request_id,
+            winner.route.endpoint_id,
+            "gemini" if winner_dialect == "gemini.generate_content" else winner.route.provider,
+            provider_metadata,
+        )
+
+    def _response_cache_key(
+        self,
+        *,
+        user: AuthenticatedUser,
+        message: AIMessageInput,
+        payload_mode: bool,
+        openai_req: dict[str, Any],
+        effective_dialect: str,
+        resolved_model: str,
+        emit_raw: bool,
+    ) -> Optional[str]:
+        """可缓存时返回最终上游请求体的规范化哈希；未开启或请求非确定性时返回 None。"""
+
+        if not getattr(self._settings, "ai_response_cache_enabled", False):
+            return None
+        if payload_mode:
+            body = dict(message.payload or {})
+            body["model"] = resolved_model
+        else:
+            body = dict(openai_req)
+        body.pop("stream", None)
+        if getattr(self._settings, "ai_response_cache_deterministic_only", True) and not is_deterministic_payload(body):
+            observe_response_cache("bypass")
+            return None
+        return build_response_cache_key(
+            {
+                # 按用户隔离：缓存只用于同一用户的重试/重复提交，避免跨用户复用对话内容。
+                "user": user.uid,
+                "dialect": effective_dialect,
+                "model": resolved_model,
+                "emit_raw": emit_raw,
+                "body": body,
+            }
+        )
+
+    async def _call_upstream_with_response_cache(
+        self,
+        cache_key: str,
+        primary_route: ResolvedProviderRoute,
+        *,
+        broker: MessageEventBroker,
+        message_id: str,
+        request_id: Optional[str],
+        effective_dialect: str,
+        call_upstream: Callable[..., Awaitable[tuple[Any, ...]]],
+    ) -> tuple[Any, ...]:
+        """命中缓存直接回放；相同请求在途时订阅其事件流；否则作为 leader 调用上游并写入缓存。"""
+
+        cache = get_response_cache()
+        cached = cache.get(cache_key)
+        if cached is not None:
+            observe_response_cache("hit", saved_tokens=cached.saved_tokens)
+            await self._publish_cached_routed(broker, message_id, request_id, cached.result, source="cache_hit")
+            for event_name, data in cached.events:
+                await broker.publish(message_id, MessageEvent(event=event_name, data=dict(data)))
+            self._store_response_cache_routing(
+                broker, message_id, "cache_hit", upstream_latency_labels(cached.result[4], cached.result[1], effective_dialect)
+            )
+            return _without_token_usage(cached.result)
+
+        inflight, is_leader = cache.join(cache_key)
+        if not is_leader:
+            replayed = 0
+            async for event_name, data in inflight.follow():
+                if replayed == 0:
+                    await self._publish_cached_routed(broker, message_id, request_id, None, source="coalesced", route=primary_route)
+                replayed += 1
+                await broker.publish(message_id, MessageEvent(event=event_name, data=dict(data)))
+            if inflight.result is not None:
+                if replayed == 0:
+                    await self._publish_cached_routed(broker, message_id, request_id, inflight.result, source="coalesced")
+                observe_response_cache("coalesced", saved_tokens=inflight.saved_tokens)
+                self._store_response_cache_routing(
+                    broker,
+                    message_id,
+                    "coalesced",
+                    upstream_latency_labels(inflight.result[4], inflight.result[1], effective_dialect),
+                )
+                return _without_token_usage(inflight.result)
+            if replayed:
+                # leader 已输出部分内容后失败：不能再自行重试，否则客户端会收到重复内容。
+                raise ProviderError("coalesced_upstream_failed")
+            observe_response_cache("miss")
+            return await call_upstream(broker=broker)
+
+        observe_response_cache("miss")
+        recorder = _ResponseRecorder(broker, inflight)
+        try:
+            result = await call_upstream(broker=recorder)
+        except BaseException:
+            await cache.abort(cache_key, inflight)
+            raise
+        if result[0]:
+            await cache.complete(cache_key, inflight, result, saved_tokens=_result_total_tokens(result))
+        else:
+            # raw_only 等无正文结果不缓存
+            await cache.abort(cache_key, inflight)
+        return result
+
+    async def _publish_cached_routed(
+        self,
+        broker: MessageEventBroker,
+        message_id: str,
+        request_id: Optional[str],
+        result: Optional[tuple[Any, ...]],
+        *,
+        source: str,
+        route: Optional[ResolvedProviderRoute] = None,
+    ) -> None:
+        if result is not None:
+            resolved_model, endpoint_id, provider = result[1], result[4], result[5]
+        else:
+            resolved_model = route.resolved_model if route is not None else None
+            endpoint_id = route.endpoint_id if route is not None else None
+            provider = route.provider if route is not None else None
         await broker.publish(
+            message_id,
+            MessageEvent(
+                event="status",
+                data={
+                    "state": "routed",
+                    "message_id": message_id,
+                    "request_id": request_id,
+                    "provider": provider,
+                    "resolved_model": resolved_model,
+                    "endpoint_id": endpoint_id,
+                    "upstream_request_id": None,
+                    "response_cache": source,
+                },
+            ),
+        )
+
+    @staticmethod
+    def _store_response_cache_routing(
+        broker: MessageEventBroker, message_id: str, mode: str, labels: dict[str, str]
+    ) -> None:
+        meta = broker.get_meta(message_id)
+        if meta is not None:
+            meta.upstream_routing = {"mode": mode, "attempts": []}
+            meta.upstream_labels = labels
+
+    def _upstream_routing_mode(self, preferred_endpoint_id: Optional[int]) -> str:
+        """single | failover | hedged；显式指定端点（管理员调试）时不切换。"""
+
+        if preferred_endpoint_id is not None:
+            return "single"
+        if getattr(self._settings, "ai_upstream_hedge_enabled", False):
+            return "hedged"
+        if getattr(self._settings, "ai_upstream_failover_enabled", False):
+            return "failover"
+        return "single"
+
+    @staticmethod
+    def _store_upstream_routing(
+        broker: MessageEventBroker,
+        message_id: str,
+        mode: str,
+        attempts: list[_UpstreamAttempt],
+    ) -> None:
+        meta = broker.get_meta(message_id)
+        if meta is None:
+            return
+        meta.upstream_routing = {"mode": mode, "attempts": [attempt.to_trace() for attempt in attempts]}
+        winner = next((attempt for attempt in attempts if attempt.outcome == "won"), None)
+        if winner is not None:
+            meta.upstream_labels = winner.labels
+
+    async def _race_upstream_attempts(
+        self,
+        routes: list[ResolvedProviderRoute],
+        *,
+        mode: str,
+        broker: MessageEventBroker,
+        message_id: str,
+        run: Callable[[_UpstreamAttempt], Awaitable[tuple[str, Optional[str], Optional[str], Optional[dict[str, Any]]]]],
+    ) -> tuple[_UpstreamAttempt, list[_UpstreamAttempt], tuple[str, Optional[str], Optional[str], Optional[dict[str, Any]]]]:
+        """按 failover/hedged 策略调度多条上游尝试，返回 (胜者, 全部尝试, 胜者结果)。
+
+        - failover：当前尝试超过 TTFT 阈值仍无增量时取消它并切到下一候选；
+        - hedged：超过对冲延迟（默认 0，即立即）后并发启动下一候选，先出增量者获胜；
+        - 两种模式下，首包前报错都会立即切到下一候选；胜者确定后其余尝试被取消，
+          胜者后续的错误（已向客户端输出部分内容）不再切换。
+        """
+
+        race = _UpstreamRace()
+        if mode == "hedged":
+            launch_delay = max(0.0, float(self._settings.ai_upstream_hedge_delay_seconds))
+        else:
+            launch_delay = max(0.0, float(self._settings.ai_upstream_failover_ttft_seconds))
+        attempts: list[_UpstreamAttempt] = []
+        tasks: dict[asyncio.Task, _UpstreamAttempt] = {}
+        last_error: Optional[BaseException] = None
+
+        async def _run_and_claim(attempt: _UpstreamAttempt):
+            result = await run(attempt)
+            if not await attempt.claim():
+                raise _UpstreamAttemptLost()
+            return result
+
+        def _launch() -> None:
+            attempt = _UpstreamAttempt(routes[len(attempts)], index=len(attempts), broker=broker, race=race)
+            attempts.append(attempt)
+            tasks[asyncio.create_task(_run_and_claim(attempt))] = attempt
+
+        async def _cancel(pending: dict[asyncio.Task, _UpstreamAttempt], outcome: str) -> None:
+            for task, attempt in pending.items():
+                if attempt.outcome == "pending":
+                    attempt.outcome = outcome
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        claimed_waiter = asyncio.create_task(race.claimed.wait())
+        _launch()
+        try:
+            while race.winner is None:
+                if not tasks:
+                    if len(attempts) >= len(routes):
+                        raise last_error or ProviderError("upstream_all_attempts_failed")
+                    _launch()
+                    continue
+                done, _ = await asyncio.wait(
+                    {*tasks, claimed_waiter},
+                    timeout=launch_delay if len(attempts) < len(routes) else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if race.winner is not None:
+                    break
+                if not done:
+                    if mode == "failover":
+                        # 超过 TTFT 阈值仍无增量：放弃当前尝试
+                        await _cancel(tasks, "ttft_timeout")
+                        tasks.clear()
+                    _launch()
+                    continue
+                for task in done:
+                    if task is claimed_waiter:
+                        continue
+                    attempt = tasks.pop(task)
+                    exc = task.exception()
+                    attempt.outcome = "error"
+                    attempt.error = (str(exc) or type(exc).__name__)[:200]
+                    last_error = exc
+
+            winner = race.winner
+            winner_task = next(task for task, attempt in tasks.items() if attempt is winner)
+            await _cancel({task: attempt for task, attempt in tasks.items() if attempt is not winner}, "cancelled")
+            tasks = {winner_task: winner}
+            try:
+                result = await winner_task
+            except BaseException as exc:
+                winner.outcome = "error"
+                winner.error = (str(exc) or type(exc).__name__)[:200]
+                raise
+            winner.outcome = "won"
+            return winner, attempts, result
+        finally:
+            claimed_waiter.cancel()
+            await _cancel(tasks, "cancelled")
+            self._store_upstream_routing(broker, message_id, mode, attempts)
+
+    async def _run_upstream_attempt(
+        self,
+        attempt: _UpstreamAttempt,
+        *,
+        message_id: str,
+        message: AIMessageInput,
+        request_id: Optional[str],
+        payload_mode: bool,
+        dialect_override: str,
+        openai_req: dict[str, Any],
+        emit_raw: bool,
+        user: Optional[AuthenticatedUser] = None,
+    ) -> tuple[str, Optional[str], Optional[str], Optional[dict[str, Any]]]:
+        """沿单条路由调用上游（并发排队 → 熔断放行 → 负载均衡登记 → dispatch → 结果回写）。"""
+
+        route = attempt.route
+        endpoint_id = route.endpoint_id
+        effective_dialect = dialect_override or route.dialect
+        provider_name = "gemini" if effective_dialect == "gemini.generate_content" else route.provider
+
+        await attempt.publish(
             message_id,
             MessageEvent(
                 event="status",
@@ -2245,14 +2982,159 @@ class AIService:
                     "message_id": message_id,
                     "request_id": request_id,
                     "provider": provider_name,
-                    "resolved_model": selected_model,
+                    "resolved_model": route.resolved_model,
                     "endpoint_id": endpoint_id,
                     "upstream_request_id": None,
                 },
             ),
         )
 
-        provider_metadata: Optional[dict[str, Any]] = None
+        limiter = get_endpoint_concurrency_limiter()
+        limit = limiter.limit_for(route.endpoint) if endpoint_id is not None else 0
+        priority = await self._upstream_priority(user) if limit > 0 else PRIORITY_FREE
+        async with limiter.slot(endpoint_id or 0, limit=limit, priority=priority):
+            return await self._run_upstream_attempt_admitted(
+                attempt,
+                message_id=message_id,
+                message=message,
+                payload_mode=payload_mode,
+                dialect_override=dialect_override,
+                openai_req=openai_req,
+                emit_raw=emit_raw,
+            )
+
+    async def _upstream_priority(self, user: Optional[AuthenticatedUser]) -> int:
+        """上游排队优先级：pro 订阅用户优先；匿名/解析失败按 free 处理。"""
+
+        if user is None or user.is_anonymous or self._entitlement_service is None:
+            return PRIORITY_FREE
+        try:
+            entitlement = await self._entitlement_service.resolve(user.uid)
+        except Exception:
+            return PRIORITY_FREE
+        return PRIORITY_PRO if entitlement.is_pro else PRIORITY_FREE
+
+    async def _run_upstream_attempt_admitted(
+        self,
+        attempt: _UpstreamAttempt,
+        *,
+        message_id: str,
+        message: AIMessageInput,
+        payload_mode: bool,
+        dialect_override: str,
+        openai_req: dict[str, Any],
+        emit_raw: bool,
+    ) -> tuple[str, Optional[str], Optional[str], Optional[dict[str, Any]]]:
+        """已获得并发名额：熔断放行 → 负载均衡登记 → dispatch → 结果回写。"""
+
+        route = attempt.route
+        endpoint_id = route.endpoint_id
+        effective_dialect = dialect_override or route.dialect
+        breaker = (
+            get_endpoint_circuit_breaker()
+            if endpoint_id is not None and getattr(self._settings, "ai_circuit_breaker_enabled", False)
+            else None
+        )
+        if breaker is not None and not breaker.acquire(endpoint_id):
+            # 熔断打开：直接失败，避免请求白等 http_timeout_seconds。
+            raise ProviderError("endpoint_circuit_open")
+        balancer = get_endpoint_balancer() if endpoint_id is not None else None
+        balance_model = str(route.resolved_model or "").strip()
+        if balancer is not None:
+            balancer.begin(endpoint_id, balance_model)
+        attempt_req = openai_req if openai_req.get("model") == route.resolved_model else dict(openai_req, model=route.resolved_model)
+        attempt.labels = upstream_latency_labels(endpoint_id, route.resolved_model, effective_dialect)
+        dispatch_error: Optional[BaseException] = None
+        result: Optional[tuple[str, Optional[str], Optional[str], Optional[dict[str, Any]]]] = None
+        # TTFT/建连从获得并发名额开始计（排队等待不计入端点延迟）。
+        with track_upstream_timing() as timing:
+            try:
+                result = await self._dispatch_provider_call(
+                    message_id=message_id,
+                    message=message,
+                    broker=attempt,
+                    payload_mode=payload_mode,
+                    dialect=route.dialect,
+                    effective_dialect=effective_dialect,
+                    selected_endpoint=route.endpoint,
+                    selected_model=route.resolved_model,
+                    api_key=route.api_key,
+                    openai_req=attempt_req,
+                    emit_raw=emit_raw,
+                )
+                return result
+            except BaseException as exc:
+                dispatch_error = exc
+                raise
+            finally:
+                if endpoint_id is not None:
+                    self._record_dispatch_outcome(
+                        endpoint_id,
+                        balance_model,
+                        started=timing.started_at,
+                        first_delta_at=attempt.first_delta_at,
+                        error=dispatch_error,
+                        balancer=balancer,
+                        breaker=breaker,
+                    )
+                _observe_upstream_latency(
+                    attempt.labels,
+                    timing,
+                    first_delta_at=attempt.first_delta_at,
+                    metadata=result[3] if result is not None else None,
+                    succeeded=result is not None,
+                )
+
+    def _record_dispatch_outcome(
+        self,
+        endpoint_id: int,
+        model: str,
+        *,
+        started: float,
+        first_delta_at: Optional[float],
+        error: Optional[BaseException],
+        balancer: Optional[EndpointBalancer],
+        breaker: Optional[EndpointCircuitBreaker],
+    ) -> None:
+        """把一次上游调用的结果回写到负载均衡（TTFT/错误率）与熔断器。"""
+
+        if breaker is not None:
+            failure_reason = classify_upstream_failure(error) if error is not None else None
+            if error is None:
+                breaker.record_success(endpoint_id)
+            elif failure_reason is not None:
+                breaker.record_failure(endpoint_id, failure_reason)
+            else:
+                # 4xx/内容错误/取消：说明端点本身可达，不计入熔断
+                breaker.release(endpoint_id)
+
+        if balancer is not None:
+            # TTFT：以首个 content_delta/upstream_raw 到达为准；无增量输出时退化为整体耗时。
+            # 被取消（对冲落败/TTFT 超时）的尝试按已等待时长记为 TTFT 下界，而不是计入错误率。
+            cancelled = isinstance(error, asyncio.CancelledError)
+            ttft_ms: Optional[float] = None
+            if error is None or cancelled:
+                if first_delta_at is None or first_delta_at < started:
+                    first_delta_at = perf_counter()
+                ttft_ms = (first_delta_at - started) * 1000
+            balancer.finish(endpoint_id, model, success=error is None or cancelled, ttft_ms=ttft_ms)
+
+    async def _dispatch_provider_call(
+        self,
+        *,
+        message_id: str,
+        message: AIMessageInput,
+        broker: MessageEventBroker,
+        payload_mode: bool,
+        dialect: str,
+        effective_dialect: str,
+        selected_endpoint: dict[str, Any],
+        selected_model: Optional[str],
+        api_key: str,
+        openai_req: dict[str, Any],
+        emit_raw: bool,
+    ) -> tuple[str, Optional[str], Optional[str], Optional[dict[str, Any]]]:
+        """按 dialect 调用上游并流式发布事件，返回 (reply_text, response_payload, upstream_request_id, metadata)。"""
 
         if payload_mode:
             provider_payload = dict(message.payload or {})
@@ -2276,7 +3158,7 @@ class AIService:
                         )
                     await broker.publish(message_id, MessageEvent(event=event, data=data))
 
-                reply_text, response_payload, upstream_request_id, provider_metadata = await adapter.stream(
+                return await adapter.stream(
                     endpoint=selected_endpoint,
                     api_key=api_key,
                     payload=provider_payload,
@@ -2285,7 +3167,7 @@ class AIService:
                     emit_raw=emit_raw,
                 )
             elif effective_dialect == "openai.responses":
-                reply_text, response_payload, upstream_request_id, provider_metadata = await self._call_openai_responses_streaming(
+                return await self._call_openai_responses_streaming(
                     selected_endpoint,
                     api_key,
                     provider_payload,
@@ -2294,7 +3176,7 @@ class AIService:
                     emit_raw=emit_raw,
                 )
             elif effective_dialect == "gemini.generate_content":
-                reply_text, response_payload, upstream_request_id, provider_metadata = await self._call_gemini_generate_content_streaming(
+                return await self._call_gemini_generate_content_streaming(
                     selected_endpoint,
                     api_key,
                     provider_payload,
@@ -2304,7 +3186,7 @@ class AIService:
                     emit_raw=emit_raw,
                 )
             else:
-                reply_text, response_payload, upstream_request_id, provider_metadata = await self._call_openai_chat_completions_streaming(
+                return await self._call_openai_chat_completions_streaming(
                     selected_endpoint,
                     api_key,
                     provider_payload,
@@ -2314,7 +3196,7 @@ class AIService:
                 )
         else:
             if dialect == "anthropic.messages":
-                reply_text, response_payload, upstream_request_id, provider_metadata = await self._call_anthropic_messages_streaming(
+                return await self._call_anthropic_messages_streaming(
                     selected_endpoint,
                     api_key,
                     openai_req,
@@ -2323,7 +3205,7 @@ class AIService:
                     emit_raw=emit_raw,
                 )
             elif dialect == "openai.responses":
-                reply_text, response_payload, upstream_request_id, provider_metadata = await self._call_openai_responses_streaming(
+                return await self._call_openai_responses_streaming(
                     selected_endpoint,
                     api_key,
                     openai_req,
@@ -2332,7 +3214,7 @@ class AIService:
                     emit_raw=emit_raw,
                 )
             elif dialect == "gemini.generate_content":
-                reply_text, response_payload, upstream_request_id, provider_metadata = await self._call_gemini_generate_content_streaming(
+                return await self._call_gemini_generate_content_streaming(
                     selected_endpoint,
                     api_key,
                     openai_req,
@@ -2342,7 +3224,7 @@ class AIService:
                     emit_raw=emit_raw,
                 )
             else:
-                reply_text, response_payload, upstream_request_id, provider_metadata = await self._call_openai_chat_completions_streaming(
+                return await self._call_openai_chat_completions_streaming(
                     selected_endpoint,
                     api_key,
                     openai_req,
@@ -2351,17 +3233,6 @@ class AIService:
                     emit_raw=emit_raw,
                 )
 
-        return (
-            reply_text,
-            selected_model,
-            request_payload,
-            response_payload,
-            upstream_request_id,
-            endpoint_id,
-            provider_name,
-            provider_metadata,
-        )
-
     async def _call_openai_completion_settings(self, message: AIMessageInput) -> str:
         text = (message.text or "").strip()
         if not text:
@@ -2632,6 +3503,8 @@ class AIService:
         endpoints, _ = await self._ai_config_service.list_endpoints(only_active=True, page=1, page_size=200)
         candidates = [item for item in endpoints if item.get("is_active") and item.get("has_api_key")]
         candidates = [item for item in candidates if str(item.get("status") or "").strip().lower() != "offline"]
+        if preferred_endpoint_id is None:
+            candidates = filter_circuit_open_endpoints(candidates, self._settings)
         if not getattr(self._settings, "allow_test_ai_endpoints", False):
             non_test = [item for item in candidates if not looks_like_test_endpoint(item)]
             if non_test:
@@ -2729,7 +3602,7 @@ class AIService:
             selected_endpoint = preferred
 
         if isinstance(resolved_model, str) and resolved_model.strip():
-            by_list = next((item for item in candidates if _endpoint_supports_model(item, resolved_model)), None)
+            by_list = pick_endpoint_for_model(candidates, resolved_model, self._settings)
             # 仅在未显式指定 endpoint 时，才按 model_list 进行“自动切换端点”。
             if preferred_endpoint_id is None:
                 if isinstance(soft_preferred_endpoint_id, int) and _endpoint_supports_model(selected_endpoint, resolved_model):
@@ -3195,26 +4068,36 @@ class AIService:
         model: Optional[str],
         latency_ms: float,
         success: bool,
+        *,
+        token_usage: Optional[dict[str, int]] = None,
     ) -> None:
-        """记录 AI 请求统计到 ai_request_stats 表。"""
+        """记录 AI 请求统计到 ai_request_stats 表（含上游 usage 的 token 累计），并累加小时级 token 汇总。"""
 
         if not self._db:
             return
+        usage = token_usage or {}
+        tokens = [int(usage.get(key) or 0) for key in ("prompt_tokens", "completion_tokens", "cached_tokens", "total_tokens")]
         try:
-            today = datetime.now().date().isoformat()
+            now = datetime.now()
+            today = now.date().isoformat()
             await self._db.execute(
                 """
                 INSERT INTO ai_request_stats (
                     user_id, endpoint_id, model, request_date,
-                    count, total_latency_ms, success_count, error_count
+                    count, total_latency_ms, success_count, error_count,
+                    prompt_tokens, completion_tokens, cached_tokens, total_tokens
                 )
-                VALUES (?, ?, ?, ?, 1, ?, ?, ?)
+                VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?, ?, ?, ?)
                 ON CONFLICT(user_id, endpoint_id, model, request_date)
                 DO UPDATE SET
                     count = count + 1,
                     total_latency_ms = total_latency_ms + ?,
                     success_count = success_count + ?,
                     error_count = error_count + ?,
+                    prompt_tokens = prompt_tokens + ?,
+                    completion_tokens = completion_tokens + ?,
+                    cached_tokens = cached_tokens + ?,
+                    total_tokens = total_tokens + ?,
                     updated_at = CURRENT_TIMESTAMP
             """,
                 [
@@ -3225,11 +4108,32 @@ class AIService:
                     latency_ms,
                     1 if success else 0,
                     0 if success else 1,
+                    *tokens,
                     latency_ms,
                     1 if success else 0,
                     0 if success else 1,
+                    *tokens,
                 ],
             )
+            if any(tokens):
+                # 小时级汇总：Dashboard token 统计只读此表，不再随用户数/请求量增长
+                await self._db.execute(
+                    """
+                    INSERT INTO ai_token_usage_hourly (
+                        usage_hour, model, endpoint_id,
+                        prompt_tokens, completion_tokens, cached_tokens, total_tokens
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(usage_hour, model, endpoint_id)
+                    DO UPDATE SET
+                        prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+                        completion_tokens = completion_tokens + excluded.completion_tokens,
+                        cached_tokens = cached_tokens + excluded.cached_tokens,
+                        total_tokens = total_tokens + excluded.total_tokens,
+                        updated_at = CURRENT_TIMESTAMP
+                """,
+                    [now.strftime("%Y-%m-%dT%H"), model or "unknown", int(endpoint_id or 0), *tokens],
+                )
         except Exception as exc:
             logger.warning("Failed to record AI request stats request_id=%s error=%s", get_current_request_id(), exc)
 
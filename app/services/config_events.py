@@ -0,0 +1,207 @@
+"""配置变更事件总线（进程内订阅 + SQLite 共享版本号，用于协调各级缓存失效）。
+
+- 每个配置主题（端点/Prompt/映射/屏蔽列表/LLM App 设置/Dashboard 配置/权益）维护单调递增的版本号；
+- 写入方 `publish(topic)`：同一 SQLite 上原子递增 config_versions 并立即通知本进程订阅者；
+- 多 worker：后台轮询 config_versions，发现其他进程推进的版本时通知本进程订阅者（remote=True）；
+- 仅本进程可见的变更 `publish_local(topic)` 计入独立的本地计数，不占用共享版本号空间；
+- 读取方可直接比较 `topic_version()`（共享 + 本地计数）/ `version` 判断缓存是否过期，也可 `subscribe()` 主动失效。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from typing import Any
+
+from fastapi import FastAPI
+
+from app.db.sqlite_manager import SQLiteManager
+
+logger = logging.getLogger(__name__)
+
+TOPIC_ENDPOINTS = "endpoints"
+TOPIC_PROMPTS = "prompts"
+TOPIC_MAPPINGS = "mappings"
+TOPIC_BLOCKED_MODELS = "blocked_models"
+TOPIC_LLM_APP_SETTINGS = "llm_app_settings"
+TOPIC_DASHBOARD_CONFIG = "dashboard_config"  # 含请求追踪开关
+TOPIC_ENTITLEMENTS = "entitlements"
+
+CONFIG_TOPICS: tuple[str, ...] = (
+    TOPIC_ENDPOINTS,
+    TOPIC_PROMPTS,
+    TOPIC_MAPPINGS,
+    TOPIC_BLOCKED_MODELS,
+    TOPIC_LLM_APP_SETTINGS,
+    TOPIC_DASHBOARD_CONFIG,
+    TOPIC_ENTITLEMENTS,
+)
+
+
+@dataclass(frozen=True, slots=True)
+class ConfigChange:
+    """一次配置变更通知。"""
+
+    topic: str
+    version: int
+    remote: bool = False
+
+
+ConfigListener = Callable[[ConfigChange], Any]
+
+
+class ConfigEventBus:
+    """配置变更事件总线。
+
+    未绑定 SQLite（或 SQLite 不可用）时退化为纯进程内版本号，行为与单 worker 一致。
+    """
+
+    def __init__(self, db: SQLiteManager | None = None, *, poll_interval_seconds: float = 1.0) -> None:
+        self._db = db
+        self._poll_interval = max(0.05, float(poll_interval_seconds))
+        self._shared_versions: dict[str, int] = {}
+        self._local_versions: dict[str, int] = {}
+        self._listeners: dict[str | None, list[ConfigListener]] = {}
+        self._poll_task: asyncio.Task[None] | None = None
+        self._stop_event = asyncio.Event()
+
+    def attach(self, db: SQLiteManager | None, *, poll_interval_seconds: float | None = None) -> None:
+        """绑定（或替换）共享版本号所在的 SQLite。"""
+
+        self._db = db
+        if poll_interval_seconds is not None:
+            self._poll_interval = max(0.05, float(poll_interval_seconds))
+
+    @property
+    def version(self) -> int:
+        """全局配置版本号（各主题版本号之和，单调递增）。"""
+
+        return sum(self._shared_versions.values()) + sum(self._local_versions.values())
+
+    def topic_version(self, topic: str) -> int:
+        """主题版本号：共享计数 + 本进程本地计数（两者各自单调，和亦单调）。"""
+
+        return self._shared_versions.get(topic, 0) + self._local_versions.get(topic, 0)
+
+    def snapshot(self) -> dict[str, int]:
+        return {topic: self.topic_version(topic) for topic in CONFIG_TOPICS}
+
+    def subscribe(self, topic: str | None, listener: ConfigListener) -> Callable[[], None]:
+        """订阅某主题（topic=None 订阅全部）；返回取消订阅函数。监听器须为轻量同步函数。"""
+
+        listeners = self._listeners.setdefault(topic, [])
+        listeners.append(listener)
+
+        def _unsubscribe() -> None:
+            try:
+                listeners.remove(listener)
+            except ValueError:
+                pass
+
+        return _unsubscribe
+
+    def _shared_db(self) -> SQLiteManager | None:
+        db = self._db
+        if db is None or not getattr(db, "is_initialized", False):
+            return None
+        return db
+
+    def _notify(self, topic: str, *, remote: bool) -> int:
+        version = self.topic_version(topic)
+        change = ConfigChange(topic=topic, version=version, remote=remote)
+        for listener in (*self._listeners.get(topic, ()), *self._listeners.get(None, ())):
+            try:
+                listener(change)
+            except Exception:  # pragma: no cover
+                logger.exception("config_event_listener_failed topic=%s", topic)
+        return version
+
+    def _advance(self, topic: str, shared_version: int, *, remote: bool) -> bool:
+        if shared_version <= self._shared_versions.get(topic, 0):
+            return False
+        self._shared_versions[topic] = shared_version
+        self._notify(topic, remote=remote)
+        return True
+
+    def publish_local(self, topic: str) -> int:
+        """仅推进本进程本地计数（用于各 worker 会各自检测到的变更，如外部修改了屏蔽列表文件）。"""
+
+        self._local_versions[topic] = self._local_versions.get(topic, 0) + 1
+        return self._notify(topic, remote=False)
+
+    async def publish(self, topic: str) -> int:
+        """发布配置变更：递增共享版本号（SQLite 不可用时仅本地计数）并通知订阅者，返回新的主题版本号。"""
+
+        db = self._shared_db()
+        if db is not None:
+            try:
+                shared_version = await db.bump_config_version(topic)
+            except Exception as exc:  # pragma: no cover
+                logger.warning("config_version_bump_failed topic=%s error=%s", topic, exc)
+            else:
+                self._advance(topic, shared_version, remote=False)
+                return self.topic_version(topic)
+        return self.publish_local(topic)
+
+    async def refresh(self) -> list[str]:
+        """读取共享版本号，通知其他进程推进过的主题；返回发生变化的主题列表。"""
+
+        db = self._shared_db()
+        if db is None:
+            return []
+        try:
+            shared = await db.get_config_versions()
+        except Exception as exc:  # pragma: no cover
+            logger.warning("config_version_refresh_failed error=%s", exc)
+            return []
+        return [topic for topic, version in shared.items() if self._advance(topic, version, remote=True)]
+
+    async def _poll_loop(self) -> None:
+        while not self._stop_event.is_set():
+            await self.refresh()
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=self._poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self) -> None:
+        """同步一次共享版本号并启动后台轮询。"""
+
+        if self._poll_task is not None and not self._poll_task.done():
+            return
+        await self.refresh()
+        self._stop_event = asyncio.Event()
+        self._poll_task = asyncio.create_task(self._poll_loop())
+
+    async def stop(self) -> None:
+        task = self._poll_task
+        self._poll_task = None
+        if task is None:
+            return
+        self._stop_event.set()
+        try:
+            await task
+        except Exception:  # pragma: no cover
+            pass
+
+
+def get_config_event_bus(app: FastAPI) -> ConfigEventBus | None:
+    """从 FastAPI app.state 取出配置事件总线（未初始化时返回 None）。"""
+
+    bus = getattr(app.state, "config_event_bus", None)
+    return bus if isinstance(bus, ConfigEventBus) else None
+
+
+async def publish_config_change(app: FastAPI, topics: str | Iterable[str]) -> None:
+    """路由层写入配置后调用：best-effort 发布（总线缺失/失败不影响写入结果）。"""
+
+    bus = get_config_event_bus(app)
+    if bus is None:
+        return
+    for topic in (topics,) if isinstance(topics, str) else tuple(topics):
+        try:
+            await bus.publish(topic)
+        except Exception:  # pragma: no cover
+            pass
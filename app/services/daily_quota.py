@@ -0,0 +1,183 @@
+"""按日模型配额的内存计数层（写前预占 + 批量归还）。
+
+- 计数键：(user_id, model_key, usage_date)；首次访问时惰性地向 SQLite 预占一段额度（reservation chunk）；
+- 预占额度内的请求只在内存中扣减，不再进入 SQLite 全局锁；用尽后再预占下一段；
+- SQLite 中的 count 始终 >= 实际已用量（写前预占），进程崩溃只会少给用户至多 chunk-1 次，绝不会超额；
+- 后台周期性把空闲/跨日键的未用预占批量归还（单事务），停机时全部归还，使持久化计数回到精确值；
+- 多 worker 共享 SQLite 时，预占在 BEGIN IMMEDIATE 内完成，各 worker 预占之和不超过上限。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+
+from fastapi import FastAPI
+
+from app.db.sqlite_manager import SQLiteManager, get_sqlite_manager
+
+logger = logging.getLogger(__name__)
+
+QuotaKey = tuple[str, str, str]
+
+
+@dataclass(slots=True)
+class _QuotaEntry:
+    durable: int = 0  # 最近一次预占/读取后 SQLite 中的计数（含本进程未用预占）
+    available: int = 0  # 本进程已预占、尚未消费的单位数
+    touched_at: float = 0.0
+    exhausted_at: float | None = None  # 最近一次预占失败（已达上限）的时间
+    evicted: bool = False
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+    @property
+    def used(self) -> int:
+        return max(0, self.durable - self.available)
+
+
+class DailyQuotaCounter:
+    """日配额计数（见模块说明）。"""
+
+    def __init__(
+        self,
+        db: SQLiteManager,
+        *,
+        chunk_size: int = 5,
+        flush_interval_seconds: float = 30.0,
+    ) -> None:
+        self._db = db
+        self._chunk_size = max(1, int(chunk_size))
+        self._flush_interval = max(0.05, float(flush_interval_seconds))
+        self._entries: dict[QuotaKey, _QuotaEntry] = {}
+        self._flush_task: asyncio.Task[None] | None = None
+        self._stop_event = asyncio.Event()
+
+    def _consume_locally(self, entry: _QuotaEntry, limit: int) -> tuple[bool, int] | None:
+        if entry.evicted:
+            return None
+        if entry.used >= limit:
+            return False, entry.used
+        if entry.available > 0:
+            entry.available -= 1
+            entry.touched_at = time.monotonic()
+            return True, entry.used
+        return None
+
+    async def try_consume(self, user_id: str, model_key: str, usage_date: str, *, limit: int) -> tuple[bool, int]:
+        """消费一次日配额：已用量未达 limit 时计数 +1 并放行，否则拒绝且不计数（limit<=0 一律拒绝）。
+
+        Returns:
+            (allowed, count_after)：count_after 为本次之后的已用量（不含本进程尚未消费的预占）
+        """
+
+        safe_limit = int(limit)
+        key = (str(user_id), str(model_key), str(usage_date))
+        while True:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _QuotaEntry(touched_at=time.monotonic())
+
+            # 快路径：事件循环内同步扣减，无 await 即原子
+            result = self._consume_locally(entry, safe_limit)
+            if result is not None:
+                return result
+
+            async with entry.lock:
+                if entry.evicted:
+                    continue
+                result = self._consume_locally(entry, safe_limit)
+                if result is not None:
+                    return result
+
+                now = time.monotonic()
+                if safe_limit <= 0 or (
+                    entry.exhausted_at is not None and now - entry.exhausted_at < self._flush_interval
+                ):
+                    # 已达上限：在一个 flush 周期内直接拒绝（其他 worker 归还预占后，下个周期重新尝试）
+                    return False, entry.used
+
+                granted, count_after = await self._db.reserve_daily_model_usage(
+                    *key, chunk=min(self._chunk_size, safe_limit), limit=safe_limit
+                )
+                entry.durable = count_after + entry.available
+                entry.available += granted
+                entry.touched_at = now
+                if entry.available <= 0:
+                    entry.exhausted_at = now
+                    return False, entry.used
+                entry.exhausted_at = None
+                entry.available -= 1
+                return True, entry.used
+
+    def describe(self, user_id: str, model_key: str, usage_date: str) -> dict[str, int] | None:
+        entry = self._entries.get((str(user_id), str(model_key), str(usage_date)))
+        if entry is None:
+            return None
+        return {"used": entry.used, "reserved": entry.available, "durable": entry.durable}
+
+    async def flush(self, *, all_keys: bool = False) -> int:
+        """归还空闲（超过一个 flush 周期未访问）或全部键的未用预占，并从内存移除；返回归还的单位数。"""
+
+        now = time.monotonic()
+        releases: list[tuple[str, str, str, int]] = []
+        for key, entry in list(self._entries.items()):
+            if not all_keys and now - entry.touched_at < self._flush_interval:
+                continue
+            async with entry.lock:
+                if not all_keys and now - entry.touched_at < self._flush_interval:
+                    continue
+                # 先同步置零并摘除，之后的请求会建立新条目重新预占
+                unused = entry.available
+                entry.available = 0
+                entry.evicted = True
+                self._entries.pop(key, None)
+            if unused > 0:
+                releases.append((*key, unused))
+        if releases:
+            try:
+                await self._db.release_daily_model_usage(releases)
+            except Exception as exc:  # pragma: no cover
+                # 归还失败只会让持久化计数偏高（保守），不影响正确性
+                logger.warning("daily_quota_release_failed keys=%s error=%s", len(releases), exc)
+                return 0
+        return sum(item[3] for item in releases)
+
+    async def _flush_loop(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=self._flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+
+    def start(self) -> None:
+        if self._flush_task is not None and not self._flush_task.done():
+            return
+        self._stop_event = asyncio.Event()
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """停止后台任务并归还全部未用预占（优雅停机后持久化计数精确）。"""
+
+        task = self._flush_task
+        self._flush_task = None
+        if task is not None:
+            self._stop_event.set()
+            try:
+                await task
+            except Exception:  # pragma: no cover
+                pass
+        await self.flush(all_keys=True)
+
+
+def get_daily_quota_counter(app: FastAPI) -> DailyQuotaCounter:
+    """从 app.state 取出日配额计数层（未初始化时按当前 SQLiteManager 懒创建）。"""
+
+    counter = getattr(app.state, "daily_quota_counter", None)
+    if isinstance(counter, DailyQuotaCounter):
+        return counter
+    counter = DailyQuotaCounter(get_sqlite_manager(app))
+    app.state.daily_quota_counter = counter
+    return counter
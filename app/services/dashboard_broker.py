@@ -2,8 +2,11 @@
 
 from __future__ import annotations
 
+import asyncio
+import json
 import logging
-from typing import Any, Dict
+from datetime import datetime
+from typing import Any, Dict, Optional
 
 from fastapi import WebSocket
 
@@ -13,16 +16,26 @@ logger = logging.getLogger(__name__)
 
 
 class DashboardBroker:
-    """管理 Dashboard WebSocket 连接和数据聚合。"""
+    """管理 Dashboard WebSocket 连接和数据聚合。
 
-    def __init__(self, metrics_collector: MetricsCollector) -> None:
+    推送模型：单个后台生产者每个周期聚合一次统计并序列化一次，广播给所有订阅的连接；
+    仅在有订阅者时运行，最后一个订阅者离开后停止。
+    """
+
+    def __init__(self, metrics_collector: MetricsCollector, *, push_interval_seconds: float = 10.0) -> None:
         """初始化 DashboardBroker。
 
         Args:
             metrics_collector: 统计数据聚合服务
+            push_interval_seconds: WebSocket 推送间隔（秒）
         """
         self.collector = metrics_collector
         self.connections: Dict[str, WebSocket] = {}  # {user_id: WebSocket}
+        self.push_interval_seconds = max(0.01, float(push_interval_seconds))
+        # 每个订阅者一个“只保留最新一条”的队列：慢连接只会跳过旧快照，不会拖慢生产者或其他连接
+        self._subscribers: set[asyncio.Queue[str]] = set()
+        self._producer: Optional[asyncio.Task[None]] = None
+        self._latest_payload: Optional[str] = None
         logger.info("DashboardBroker initialized")
 
     async def add_connection(self, user_id: str, websocket: WebSocket) -> None:
@@ -63,3 +76,62 @@ class DashboardBroker:
             聚合后的统计数据
         """
         return await self.collector.aggregate_stats(time_window)
+
+    # ------------------------------------------------------------------ #
+    # 快照广播
+    # ------------------------------------------------------------------ #
+    def subscribe(self) -> asyncio.Queue[str]:
+        """订阅统计快照（已序列化的 stats_update 文本帧）；首个订阅者启动后台生产者。"""
+
+        queue: asyncio.Queue[str] = asyncio.Queue(maxsize=1)
+        self._subscribers.add(queue)
+        if self._producer is None or self._producer.done():
+            self._producer = asyncio.create_task(self._produce())
+        elif self._latest_payload is not None:
+            # 生产者已在运行：新连接立即收到最近一次快照，无需等待下个周期
+            queue.put_nowait(self._latest_payload)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue[str]) -> None:
+        """取消订阅；最后一个订阅者离开时停止生产者。"""
+
+        self._subscribers.discard(queue)
+        if not self._subscribers and self._producer is not None:
+            self._producer.cancel()
+            self._producer = None
+            self._latest_payload = None
+
+    async def serve(self, websocket: WebSocket) -> None:
+        """把共享快照持续推送给单个连接，直到发送失败（断开）为止。"""
+
+        queue = self.subscribe()
+        try:
+            while True:
+                payload = await queue.get()
+                await websocket.send_text(payload)
+        finally:
+            self.unsubscribe(queue)
+
+    def _broadcast(self, payload: str) -> None:
+        self._latest_payload = payload
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(payload)
+
+    async def _produce(self) -> None:
+        while self._subscribers:
+            try:
+                stats = await self.get_dashboard_stats(time_window="24h")
+                # 与 WebSocket.send_json 相同的编码方式，只序列化一次
+                payload = json.dumps(
+                    {"type": "stats_update", "data": stats, "timestamp": datetime.utcnow().isoformat()},
+                    separators=(",", ":"),
+                    ensure_ascii=False,
+                )
+                self._broadcast(payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.exception("Dashboard snapshot producer failed: %s", exc)
+            await asyncio.sleep(self.push_interval_seconds)
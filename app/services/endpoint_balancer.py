@@ -0,0 +1,176 @@
+"""同模型多端点的延迟感知负载均衡（EWMA TTFT + 错误率，加权 Power-of-Two-Choices）。"""
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+
+DEFAULT_ENDPOINT_WEIGHT = 100
+
+# 错误率对得分的放大系数：错误率 50% 时得分放大到 (1 + 0.5 * 4) = 3 倍。
+_ERROR_PENALTY = 4.0
+# 尚无样本的 (endpoint, model) 使用的 TTFT 先验（毫秒）；取 0 表示优先探索新端点。
+_COLD_TTFT_MS = 0.0
+
+
+@dataclass(slots=True)
+class EndpointModelStats:
+    """单个 (endpoint_id, model) 的实时观测值。"""
+
+    ewma_ttft_ms: Optional[float] = None
+    ewma_error_rate: float = 0.0
+    inflight: int = 0
+    samples: int = 0
+    failures: int = 0
+    last_updated_at: float = 0.0
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "ewma_ttft_ms": round(self.ewma_ttft_ms, 2) if self.ewma_ttft_ms is not None else None,
+            "ewma_error_rate": round(self.ewma_error_rate, 4),
+            "inflight": self.inflight,
+            "samples": self.samples,
+            "failures": self.failures,
+            "last_updated_at": self.last_updated_at or None,
+        }
+
+
+def endpoint_weight(endpoint: dict[str, Any]) -> int:
+    """读取端点权重（缺省/非法值回落到默认权重；0 表示仅在别无选择时使用）。"""
+
+    raw = endpoint.get("weight")
+    if raw is None or isinstance(raw, bool):
+        return DEFAULT_ENDPOINT_WEIGHT
+    try:
+        value = int(raw)
+    except (TypeError, ValueError):
+        return DEFAULT_ENDPOINT_WEIGHT
+    return max(0, value)
+
+
+class EndpointBalancer:
+    """基于真实流量观测的端点选择器。
+
+    - 每个 (endpoint_id, model) 维护 EWMA TTFT、EWMA 错误率与在途请求数；
+    - choose 按端点权重有放回抽取两个候选，取得分更低者（得分 = TTFT × (在途+1) × 错误惩罚）；
+      得分相同则随机取其一，因此观测值相近时流量按权重分配，慢端点也仍会被抽中以持续获得样本。
+    """
+
+    def __init__(self, *, alpha: float = 0.3, rng: Optional[random.Random] = None) -> None:
+        self._alpha = min(1.0, max(0.01, float(alpha)))
+        self._rng = rng or random.Random()
+        self._stats: dict[tuple[int, str], EndpointModelStats] = {}
+        self._lock = threading.Lock()
+
+    def _get_stats(self, endpoint_id: int, model: str) -> EndpointModelStats:
+        key = (endpoint_id, model)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = EndpointModelStats()
+            self._stats[key] = stats
+        return stats
+
+    def score(self, endpoint: dict[str, Any], model: str) -> float:
+        endpoint_id = _parse_endpoint_id(endpoint)
+        if endpoint_id is None:
+            return float("inf")
+        stats = self._stats.get((endpoint_id, model))
+        if stats is None:
+            return _COLD_TTFT_MS
+        ttft = stats.ewma_ttft_ms if stats.ewma_ttft_ms is not None else _COLD_TTFT_MS
+        # +1ms：避免 TTFT 极小时在途数/错误率失去区分度。
+        return (ttft + 1.0) * (stats.inflight + 1) * (1.0 + _ERROR_PENALTY * stats.ewma_error_rate)
+
+    def choose(self, endpoints: list[dict[str, Any]], model: str) -> Optional[dict[str, Any]]:
+        """在支持同一模型的端点中选出一个；单候选直接返回，空列表返回 None。"""
+
+        if not endpoints:
+            return None
+        weighted = [item for item in endpoints if endpoint_weight(item) > 0]
+        if not weighted:
+            return endpoints[0]
+        if len(weighted) == 1:
+            return weighted[0]
+
+        with self._lock:
+            weights = [endpoint_weight(item) for item in weighted]
+            first, second = self._rng.choices(weighted, weights=weights, k=2)
+            if first is second:
+                return first
+            first_score = self.score(first, model)
+            second_score = self.score(second, model)
+            if first_score == second_score:
+                return first if self._rng.random() < 0.5 else second
+            return first if first_score < second_score else second
+
+    def begin(self, endpoint_id: int, model: str) -> None:
+        """登记一次在途请求（与 finish 成对调用）。"""
+
+        with self._lock:
+            self._get_stats(endpoint_id, model).inflight += 1
+
+    def finish(
+        self,
+        endpoint_id: int,
+        model: str,
+        *,
+        success: bool,
+        ttft_ms: Optional[float] = None,
+    ) -> None:
+        """回写一次请求结果：成功时更新 TTFT，失败仅计入错误率。"""
+
+        with self._lock:
+            stats = self._get_stats(endpoint_id, model)
+            stats.inflight = max(0, stats.inflight - 1)
+            stats.samples += 1
+            stats.last_updated_at = time.time()
+            alpha = self._alpha
+            stats.ewma_error_rate = alpha * (0.0 if success else 1.0) + (1 - alpha) * stats.ewma_error_rate
+            if not success:
+                stats.failures += 1
+                return
+            if ttft_ms is not None and ttft_ms >= 0:
+                if stats.ewma_ttft_ms is None:
+                    stats.ewma_ttft_ms = float(ttft_ms)
+                else:
+                    stats.ewma_ttft_ms = alpha * float(ttft_ms) + (1 - alpha) * stats.ewma_ttft_ms
+
+    def get_stats(self, endpoint_id: int, model: str) -> Optional[EndpointModelStats]:
+        return self._stats.get((endpoint_id, model))
+
+    def snapshot(self) -> list[dict[str, Any]]:
+        with self._lock:
+            items = sorted(self._stats.items())
+            return [{"endpoint_id": endpoint_id, "model": model, **stats.to_dict()} for (endpoint_id, model), stats in items]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+
+def _parse_endpoint_id(endpoint: dict[str, Any]) -> Optional[int]:
+    raw = endpoint.get("id")
+    if isinstance(raw, bool):
+        return None
+    try:
+        return int(raw)
+    except (TypeError, ValueError):
+        return None
+
+
+_endpoint_balancer: Optional[EndpointBalancer] = None
+
+
+def get_endpoint_balancer() -> EndpointBalancer:
+    """获取全局端点负载均衡器实例（观测值在进程内共享）。"""
+
+    global _endpoint_balancer
+    if _endpoint_balancer is None:
+        from app.settings.config import get_settings
+
+        settings = get_settings()
+        _endpoint_balancer = EndpointBalancer(alpha=settings.ai_endpoint_balancing_ewma_alpha)
+    return _endpoint_balancer
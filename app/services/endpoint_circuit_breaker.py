@@ -0,0 +1,224 @@
+"""上游端点熔断器（按 endpoint 维度，由真实请求结果驱动）。"""
+
+from __future__ import annotations
+
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+import httpx
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+# Prometheus gauge 取值：便于在 Grafana 中按阈值着色
+_STATE_GAUGE_VALUES = {CIRCUIT_CLOSED: 0, CIRCUIT_HALF_OPEN: 1, CIRCUIT_OPEN: 2}
+
+_UPSTREAM_HTTP_STATUS_RE = re.compile(r"^upstream_http_(\d{3})")
+
+
+def upstream_http_status(exc: BaseException) -> Optional[int]:
+    """提取上游 HTTP 状态码；非 HTTP 状态类错误返回 None。
+
+    adapter 可能把 httpx 异常包装为 ProviderError("upstream_http_<status>:...")，因此同时检查 __cause__ 与消息前缀。
+    """
+
+    for candidate in (exc, exc.__cause__):
+        if isinstance(candidate, httpx.HTTPStatusError):
+            return candidate.response.status_code if candidate.response is not None else 0
+    match = _UPSTREAM_HTTP_STATUS_RE.match(str(exc))
+    return int(match.group(1)) if match else None
+
+
+def classify_upstream_failure(exc: BaseException) -> Optional[str]:
+    """判定异常是否计入熔断（仅超时/连接失败/5xx）；返回失败类别，其他异常返回 None。"""
+
+    for candidate in (exc, exc.__cause__):
+        if candidate is None or isinstance(candidate, httpx.HTTPStatusError):
+            continue
+        if isinstance(candidate, httpx.TimeoutException):
+            return "timeout"
+        if isinstance(candidate, httpx.TransportError):
+            return "connect_error"
+    status_code = upstream_http_status(exc)
+    return "http_5xx" if status_code is not None and status_code >= 500 else None
+
+
+@dataclass(slots=True)
+class EndpointCircuit:
+    """单个端点的熔断状态。"""
+
+    state: str = CIRCUIT_CLOSED
+    consecutive_failures: int = 0
+    opened_at: float = 0.0
+    half_open_inflight: int = 0
+    last_failure_reason: Optional[str] = None
+    last_failure_at: Optional[float] = None
+    total_opens: int = 0
+
+    def to_dict(self, *, open_seconds: float) -> dict[str, Any]:
+        retry_at = self.opened_at + open_seconds if self.state == CIRCUIT_OPEN else None
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "opened_at": self.opened_at or None,
+            "retry_at": retry_at,
+            "last_failure_reason": self.last_failure_reason,
+            "last_failure_at": self.last_failure_at,
+            "total_opens": self.total_opens,
+        }
+
+
+class EndpointCircuitBreaker:
+    """closed → (连续 N 次超时/5xx) → open → (冷却 open_seconds) → half_open → (试探成功) → closed。
+
+    - half_open 期间最多放行 half_open_max_trials 个并发试探请求，试探失败立即回到 open；
+    - is_available 只读判定（用于候选过滤，不占用试探名额），acquire 才真正放行。
+    """
+
+    def __init__(
+        self,
+        *,
+        failure_threshold: int = 5,
+        open_seconds: float = 30.0,
+        half_open_max_trials: int = 1,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._failure_threshold = max(1, int(failure_threshold))
+        self._open_seconds = max(0.0, float(open_seconds))
+        self._half_open_max_trials = max(1, int(half_open_max_trials))
+        self._clock = clock
+        self._circuits: dict[int, EndpointCircuit] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def open_seconds(self) -> float:
+        return self._open_seconds
+
+    def _get(self, endpoint_id: int) -> EndpointCircuit:
+        circuit = self._circuits.get(endpoint_id)
+        if circuit is None:
+            circuit = EndpointCircuit()
+            self._circuits[endpoint_id] = circuit
+        return circuit
+
+    def _transition(self, endpoint_id: int, circuit: EndpointCircuit, state: str) -> None:
+        if circuit.state == state:
+            return
+        circuit.state = state
+        if state == CIRCUIT_OPEN:
+            circuit.opened_at = self._clock()
+            circuit.total_opens += 1
+            circuit.half_open_inflight = 0
+        elif state == CIRCUIT_CLOSED:
+            circuit.opened_at = 0.0
+            circuit.half_open_inflight = 0
+        try:
+            from app.core.metrics import ai_endpoint_circuit_state, ai_endpoint_circuit_transitions_total
+
+            label = str(endpoint_id)
+            ai_endpoint_circuit_state.labels(endpoint_id=label).set(_STATE_GAUGE_VALUES[state])
+            ai_endpoint_circuit_transitions_total.labels(endpoint_id=label, state=state).inc()
+        except Exception:  # pragma: no cover
+            pass
+
+    def _cooled_down(self, circuit: EndpointCircuit) -> bool:
+        return self._clock() - circuit.opened_at >= self._open_seconds
+
+    def state_of(self, endpoint_id: int) -> str:
+        with self._lock:
+            circuit = self._circuits.get(endpoint_id)
+            if circuit is None:
+                return CIRCUIT_CLOSED
+            if circuit.state == CIRCUIT_OPEN and self._cooled_down(circuit):
+                return CIRCUIT_HALF_OPEN
+            return circuit.state
+
+    def is_available(self, endpoint_id: int) -> bool:
+        """只读判定端点当前是否可以接收请求（不占用 half_open 试探名额）。"""
+
+        with self._lock:
+            circuit = self._circuits.get(endpoint_id)
+            if circuit is None or circuit.state == CIRCUIT_CLOSED:
+                return True
+            if circuit.state == CIRCUIT_OPEN:
+                return self._cooled_down(circuit)
+            return circuit.half_open_inflight < self._half_open_max_trials
+
+    def acquire(self, endpoint_id: int) -> bool:
+        """请求发出前调用：closed 直接放行；open 冷却结束后转 half_open 并占用一个试探名额。"""
+
+        with self._lock:
+            circuit = self._get(endpoint_id)
+            if circuit.state == CIRCUIT_CLOSED:
+                return True
+            if circuit.state == CIRCUIT_OPEN:
+                if not self._cooled_down(circuit):
+                    return False
+                self._transition(endpoint_id, circuit, CIRCUIT_HALF_OPEN)
+            if circuit.half_open_inflight >= self._half_open_max_trials:
+                return False
+            circuit.half_open_inflight += 1
+            return True
+
+    def record_success(self, endpoint_id: int) -> None:
+        with self._lock:
+            circuit = self._get(endpoint_id)
+            circuit.consecutive_failures = 0
+            if circuit.state != CIRCUIT_CLOSED:
+                self._transition(endpoint_id, circuit, CIRCUIT_CLOSED)
+
+    def record_failure(self, endpoint_id: int, reason: str) -> None:
+        with self._lock:
+            circuit = self._get(endpoint_id)
+            circuit.consecutive_failures += 1
+            circuit.last_failure_reason = reason
+            circuit.last_failure_at = self._clock()
+            if circuit.state == CIRCUIT_HALF_OPEN:
+                self._transition(endpoint_id, circuit, CIRCUIT_OPEN)
+            elif circuit.state == CIRCUIT_CLOSED and circuit.consecutive_failures >= self._failure_threshold:
+                self._transition(endpoint_id, circuit, CIRCUIT_OPEN)
+
+    def release(self, endpoint_id: int) -> None:
+        """请求以“非熔断类”结果结束（如 4xx/内容错误）时归还 half_open 名额，不改变状态。"""
+
+        with self._lock:
+            circuit = self._circuits.get(endpoint_id)
+            if circuit is not None and circuit.state == CIRCUIT_HALF_OPEN and circuit.half_open_inflight > 0:
+                circuit.half_open_inflight -= 1
+
+    def describe(self, endpoint_id: Optional[int]) -> dict[str, Any]:
+        if endpoint_id is None:
+            return EndpointCircuit().to_dict(open_seconds=self._open_seconds)
+        with self._lock:
+            circuit = self._circuits.get(endpoint_id) or EndpointCircuit()
+            data = circuit.to_dict(open_seconds=self._open_seconds)
+            if circuit.state == CIRCUIT_OPEN and self._cooled_down(circuit):
+                data["state"] = CIRCUIT_HALF_OPEN
+            return data
+
+    def reset(self) -> None:
+        with self._lock:
+            self._circuits.clear()
+
+
+_endpoint_circuit_breaker: Optional[EndpointCircuitBreaker] = None
+
+
+def get_endpoint_circuit_breaker() -> EndpointCircuitBreaker:
+    """获取全局端点熔断器实例。"""
+
+    global _endpoint_circuit_breaker
+    if _endpoint_circuit_breaker is None:
+        from app.settings.config import get_settings
+
+        settings = get_settings()
+        _endpoint_circuit_breaker = EndpointCircuitBreaker(
+            failure_threshold=settings.ai_circuit_breaker_failure_threshold,
+            open_seconds=settings.ai_circuit_breaker_open_seconds,
+            half_open_max_trials=settings.ai_circuit_breaker_half_open_max_trials,
+        )
+    return _endpoint_circuit_breaker
@@ -0,0 +1,172 @@
+"""上游端点并发上限 + 优先级排队（突发流量时排队降级，而不是整体触发供应商 429）。"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+from app.auth import ProviderError
+
+# 数值越小越先出队：pro 订阅用户优先于 free/匿名用户。
+PRIORITY_PRO = 0
+PRIORITY_FREE = 1
+
+_PRIORITY_TIERS = {PRIORITY_PRO: "pro", PRIORITY_FREE: "free"}
+
+
+@dataclass(slots=True)
+class _EndpointSlots:
+    """单个端点的占用数与等待队列（heap 元素：(priority, seq, future)）。"""
+
+    active: int = 0
+    waiters: list[tuple[int, int, asyncio.Future[None]]] = field(default_factory=list)
+
+    def pending(self) -> int:
+        return sum(1 for _, _, future in self.waiters if not future.done())
+
+
+class EndpointConcurrencyLimiter:
+    """按 endpoint 限制同时在途的上游请求数。
+
+    - 有空位且无人排队时直接放行；否则按 (priority, 入队顺序) 排队；
+    - 释放时把名额直接移交给队首等待者（不经过“先释放再抢”），保证优先级顺序；
+    - 等待超过 max_queue_wait_seconds 抛出 ProviderError("endpoint_queue_timeout")，
+      由上层的切换/对冲逻辑转向其他端点或返回错误。
+    """
+
+    def __init__(
+        self,
+        *,
+        max_concurrency: int = 0,
+        max_queue_wait_seconds: float = 10.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._default_limit = max(0, int(max_concurrency))
+        self._max_queue_wait_seconds = max(0.0, float(max_queue_wait_seconds))
+        self._clock = clock
+        self._slots: dict[int, _EndpointSlots] = {}
+        self._seq = itertools.count()
+
+    def limit_for(self, endpoint: Optional[dict[str, Any]] = None) -> int:
+        """端点级 max_concurrency 优先，缺省回落到全局默认值；0 表示不限制。"""
+
+        raw = endpoint.get("max_concurrency") if isinstance(endpoint, dict) else None
+        if isinstance(raw, int) and not isinstance(raw, bool) and raw >= 0:
+            return raw
+        return self._default_limit
+
+    @asynccontextmanager
+    async def slot(self, endpoint_id: int, *, limit: int, priority: int = PRIORITY_FREE) -> AsyncIterator[float]:
+        """占用一个并发名额，yield 排队等待秒数；limit<=0 时不做限制。"""
+
+        if limit <= 0:
+            yield 0.0
+            return
+        waited = await self._acquire(endpoint_id, limit=limit, priority=priority)
+        try:
+            yield waited
+        finally:
+            self._release(endpoint_id, limit=limit)
+
+    async def _acquire(self, endpoint_id: int, *, limit: int, priority: int) -> float:
+        slots = self._slots.setdefault(endpoint_id, _EndpointSlots())
+        if slots.active < limit and not slots.pending():
+            slots.active += 1
+            return 0.0
+
+        started = self._clock()
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        heapq.heappush(slots.waiters, (priority, next(self._seq), future))
+        _observe_queue_depth(endpoint_id, slots.pending())
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=self._max_queue_wait_seconds)
+        except BaseException as exc:
+            if future.done() and not future.cancelled():
+                # 超时/取消与名额移交同时发生：名额已归属本请求，需要归还。
+                self._release(endpoint_id, limit=limit)
+            else:
+                future.cancel()
+            _observe_queue_depth(endpoint_id, slots.pending())
+            waited = self._clock() - started
+            _observe_queue_wait(endpoint_id, priority, waited)
+            if isinstance(exc, asyncio.TimeoutError):
+                _observe_queue_timeout(endpoint_id)
+                raise ProviderError("endpoint_queue_timeout") from exc
+            raise
+        waited = self._clock() - started
+        _observe_queue_wait(endpoint_id, priority, waited)
+        return waited
+
+    def _release(self, endpoint_id: int, *, limit: int) -> None:
+        slots = self._slots.get(endpoint_id)
+        if slots is None:
+            return
+        while slots.waiters and slots.active <= limit:
+            _, _, future = heapq.heappop(slots.waiters)
+            if future.done():
+                continue
+            future.set_result(None)
+            _observe_queue_depth(endpoint_id, slots.pending())
+            return
+        slots.active = max(0, slots.active - 1)
+
+    def describe(self, endpoint_id: Optional[int]) -> dict[str, int]:
+        slots = self._slots.get(endpoint_id) if endpoint_id is not None else None
+        if slots is None:
+            return {"active": 0, "queued": 0}
+        return {"active": slots.active, "queued": slots.pending()}
+
+    def reset(self) -> None:
+        self._slots.clear()
+
+
+def _observe_queue_depth(endpoint_id: int, depth: int) -> None:
+    try:
+        from app.core.metrics import ai_endpoint_queue_depth
+
+        ai_endpoint_queue_depth.labels(endpoint_id=str(endpoint_id)).set(depth)
+    except Exception:  # pragma: no cover
+        pass
+
+
+def _observe_queue_wait(endpoint_id: int, priority: int, waited: float) -> None:
+    try:
+        from app.core.metrics import ai_endpoint_queue_wait_seconds
+
+        tier = _PRIORITY_TIERS.get(priority, str(priority))
+        ai_endpoint_queue_wait_seconds.labels(endpoint_id=str(endpoint_id), tier=tier).observe(max(0.0, waited))
+    except Exception:  # pragma: no cover
+        pass
+
+
+def _observe_queue_timeout(endpoint_id: int) -> None:
+    try:
+        from app.core.metrics import ai_endpoint_queue_timeouts_total
+
+        ai_endpoint_queue_timeouts_total.labels(endpoint_id=str(endpoint_id)).inc()
+    except Exception:  # pragma: no cover
+        pass
+
+
+_endpoint_concurrency_limiter: Optional[EndpointConcurrencyLimiter] = None
+
+
+def get_endpoint_concurrency_limiter() -> EndpointConcurrencyLimiter:
+    """获取全局端点并发限制器实例。"""
+
+    global _endpoint_concurrency_limiter
+    if _endpoint_concurrency_limiter is None:
+        from app.settings.config import get_settings
+
+        settings = get_settings()
+        _endpoint_concurrency_limiter = EndpointConcurrencyLimiter(
+            max_concurrency=settings.ai_endpoint_max_concurrency,
+            max_queue_wait_seconds=settings.ai_endpoint_queue_max_wait_seconds,
+        )
+    return _endpoint_concurrency_limiter
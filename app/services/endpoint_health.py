@@ -0,0 +1,141 @@
+"""上游端点被动健康度（由真实流量驱动，减少主动探针）。"""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from app.services.endpoint_circuit_breaker import classify_upstream_failure, upstream_http_status
+
+# 这些错误类别说明端点本身可能异常（而不是请求参数/鉴权问题），需要主动探针确认。
+SUSPECT_ERROR_CLASSES = frozenset({"timeout", "connect_error", "http_5xx"})
+
+
+def classify_passive_error(exc: BaseException) -> str:
+    """将上游异常归类为 timeout / connect_error / http_5xx / http_4xx / provider_error。"""
+
+    reason = classify_upstream_failure(exc)
+    if reason is not None:
+        return reason
+    return "http_4xx" if upstream_http_status(exc) is not None else "provider_error"
+
+
+@dataclass(slots=True)
+class EndpointPassiveHealth:
+    """单个端点的被动观测值。"""
+
+    ewma_latency_ms: Optional[float] = None
+    last_success_at: Optional[float] = None
+    last_failure_at: Optional[float] = None
+    last_error_class: Optional[str] = None
+    last_outcome_ok: bool = True
+    consecutive_failures: int = 0
+    successes: int = 0
+    failures: int = 0
+
+    @property
+    def last_seen_at(self) -> Optional[float]:
+        seen = [value for value in (self.last_success_at, self.last_failure_at) if value is not None]
+        return max(seen) if seen else None
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "ewma_latency_ms": round(self.ewma_latency_ms, 2) if self.ewma_latency_ms is not None else None,
+            "last_success_at": self.last_success_at,
+            "last_failure_at": self.last_failure_at,
+            "last_error_class": self.last_error_class,
+            "consecutive_failures": self.consecutive_failures,
+            "successes": self.successes,
+            "failures": self.failures,
+        }
+
+
+class EndpointHealthTracker:
+    """按 endpoint 聚合真实请求的成功/延迟/错误类别。
+
+    - adapter 每次上游调用结束后 record；
+    - needs_active_probe：近期无流量（idle）或最近一次结果为可疑错误（suspect）时才需要主动探针。
+    """
+
+    def __init__(self, *, alpha: float = 0.3, clock: Callable[[], float] = time.time) -> None:
+        self._alpha = min(1.0, max(0.01, float(alpha)))
+        self._clock = clock
+        self._health: dict[int, EndpointPassiveHealth] = {}
+        self._lock = threading.Lock()
+
+    def record_success(self, endpoint_id: int, *, latency_ms: Optional[float]) -> None:
+        with self._lock:
+            health = self._health.setdefault(endpoint_id, EndpointPassiveHealth())
+            health.last_success_at = self._clock()
+            health.last_outcome_ok = True
+            health.consecutive_failures = 0
+            health.successes += 1
+            if latency_ms is not None and latency_ms >= 0:
+                if health.ewma_latency_ms is None:
+                    health.ewma_latency_ms = float(latency_ms)
+                else:
+                    health.ewma_latency_ms = self._alpha * float(latency_ms) + (1 - self._alpha) * health.ewma_latency_ms
+        _observe(endpoint_id, "success")
+
+    def record_failure(self, endpoint_id: int, error_class: str) -> None:
+        with self._lock:
+            health = self._health.setdefault(endpoint_id, EndpointPassiveHealth())
+            health.last_failure_at = self._clock()
+            health.last_error_class = error_class
+            health.last_outcome_ok = False
+            health.consecutive_failures += 1
+            health.failures += 1
+        _observe(endpoint_id, error_class)
+
+    def get(self, endpoint_id: int) -> Optional[EndpointPassiveHealth]:
+        return self._health.get(endpoint_id)
+
+    def is_suspect(self, endpoint_id: int) -> bool:
+        health = self._health.get(endpoint_id)
+        return (
+            health is not None
+            and not health.last_outcome_ok
+            and health.last_error_class in SUSPECT_ERROR_CLASSES
+        )
+
+    def needs_active_probe(self, endpoint_id: int, *, idle_seconds: float) -> bool:
+        health = self._health.get(endpoint_id)
+        if health is None or health.last_success_at is None:
+            return True
+        if self.is_suspect(endpoint_id):
+            return True
+        return self._clock() - health.last_success_at > idle_seconds
+
+    def describe(self, endpoint_id: Optional[int]) -> Optional[dict[str, Any]]:
+        if endpoint_id is None:
+            return None
+        with self._lock:
+            health = self._health.get(endpoint_id)
+            return health.to_dict() if health is not None else None
+
+    def reset(self) -> None:
+        with self._lock:
+            self._health.clear()
+
+
+def _observe(endpoint_id: int, outcome: str) -> None:
+    try:
+        from app.core.metrics import ai_endpoint_passive_observations_total
+
+        ai_endpoint_passive_observations_total.labels(endpoint_id=str(endpoint_id), outcome=outcome).inc()
+    except Exception:  # pragma: no cover
+        pass
+
+
+_endpoint_health_tracker: Optional[EndpointHealthTracker] = None
+
+
+def get_endpoint_health_tracker() -> EndpointHealthTracker:
+    """获取全局端点被动健康度实例。"""
+
+    global _endpoint_health_tracker
+    if _endpoint_health_tracker is None:
+        _endpoint_health_tracker = EndpointHealthTracker()
+    return _endpoint_health_tracker
@@ -2,11 +2,14 @@
 
 from __future__ import annotations
 
+import asyncio
 import time
+from collections import OrderedDict
 from dataclasses import dataclass
 from typing import Any, Optional
 
 from app.repositories.user_repo import UserRepository
+from app.services.config_events import ConfigChange
 
 
 @dataclass(frozen=True)
@@ -26,25 +29,96 @@ class ResolvedEntitlement:
 
 
 class EntitlementService:
-    def __init__(self, user_repository: UserRepository, *, ttl_seconds: int = 60) -> None:
+    """权益解析（有界 LRU 缓存）。
+
+    - TTL 内命中直接返回；过期但未超过 stale 窗口时返回旧值并在后台刷新（stale-while-revalidate）；
+    - 同一用户的并发加载合并为一次（single-flight）；
+    - 刷新失败时保留旧值，不把已知用户降级为 free。
+    """
+
+    def __init__(
+        self,
+        user_repository: UserRepository,
+        *,
+        ttl_seconds: int = 60,
+        stale_ttl_seconds: int = 600,
+        max_entries: int = 10_000,
+    ) -> None:
         self._repo = user_repository
         self._ttl_seconds = max(int(ttl_seconds), 1)
-        self._cache: dict[str, tuple[float, ResolvedEntitlement]] = {}
+        # 过期后仍可作为旧值返回的额外时长（超过后按未命中同步加载）
+        self._stale_ttl_seconds = max(int(stale_ttl_seconds), 0)
+        self._max_entries = max(int(max_entries), 1)
+        # user_id -> (fresh_until, entitlement)；按最近访问排序
+        self._cache: OrderedDict[str, tuple[float, ResolvedEntitlement]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Task[ResolvedEntitlement]] = {}
+        # invalidate() 递增；加载完成时代际不一致则丢弃结果，避免覆盖失效后的新数据
+        self._generation = 0
+
+    def invalidate(self, user_id: Optional[str] = None) -> None:
+        """丢弃缓存（user_id 为空时清空全部）。"""
+
+        self._generation += 1
+        if user_id is None:
+            self._cache.clear()
+            self._inflight.clear()
+        else:
+            self._cache.pop(user_id, None)
+            self._inflight.pop(user_id, None)
+        _set_cache_entries(len(self._cache))
+
+    def on_config_change(self, change: ConfigChange) -> None:
+        """配置事件总线回调：管理端修改权益/等级预设后（含其他 worker）清空缓存。"""
+
+        self.invalidate()
 
     async def resolve(self, user_id: str) -> ResolvedEntitlement:
         now = time.monotonic()
         cached = self._cache.get(user_id)
         if cached is not None:
-            expires_at, value = cached
-            if now < expires_at:
+            fresh_until, value = cached
+            if now < fresh_until:
+                self._cache.move_to_end(user_id)
+                _record_lookup("hit")
+                return value
+            if now < fresh_until + self._stale_ttl_seconds:
+                self._cache.move_to_end(user_id)
+                _record_lookup("stale")
+                self._ensure_load(user_id)
                 return value
 
+        _record_lookup("miss")
+        # shield：单个调用方被取消时不影响其他等待同一加载的请求
+        return await asyncio.shield(self._ensure_load(user_id))
+
+    def _ensure_load(self, user_id: str) -> asyncio.Task[ResolvedEntitlement]:
+        task = self._inflight.get(user_id)
+        if task is None:
+            task = asyncio.create_task(self._load(user_id, self._generation))
+            self._inflight[user_id] = task
+            task.add_done_callback(lambda done: self._forget_inflight(user_id, done))
+        return task
+
+    def _forget_inflight(self, user_id: str, task: asyncio.Task[ResolvedEntitlement]) -> None:
+        if self._inflight.get(user_id) is task:
+            self._inflight.pop(user_id, None)
+
+    async def _load(self, user_id: str, generation: int) -> ResolvedEntitlement:
+        started = time.perf_counter()
         resolved_at_ms = int(time.time() * 1000)
         row = None
+        failed = False
         try:
             row = await self._repo.get_entitlements(user_id)
         except Exception:
             row = None
+            failed = True
+        _observe_load(time.perf_counter() - started, failed=failed)
+
+        previous = self._cache.get(user_id)
+        if failed and previous is not None:
+            # 刷新失败：沿用旧值（下次访问再尝试刷新）
+            return previous[1]
 
         tier = "free"
         expires_at_ms: Optional[int] = None
@@ -67,6 +141,37 @@ class EntitlementService:
             flags=flags,
             resolved_at_ms=resolved_at_ms,
         )
-        self._cache[user_id] = (now + float(self._ttl_seconds), entitlement)
+        if generation == self._generation:
+            self._cache[user_id] = (time.monotonic() + float(self._ttl_seconds), entitlement)
+            self._cache.move_to_end(user_id)
+            while len(self._cache) > self._max_entries:
+                self._cache.popitem(last=False)
+            _set_cache_entries(len(self._cache))
         return entitlement
 
+
+def _record_lookup(result: str) -> None:
+    try:
+        from app.core.metrics import entitlement_cache_requests_total
+
+        entitlement_cache_requests_total.labels(result=result).inc()
+    except Exception:  # pragma: no cover
+        pass
+
+
+def _observe_load(seconds: float, *, failed: bool) -> None:
+    try:
+        from app.core.metrics import entitlement_load_seconds
+
+        entitlement_load_seconds.labels(result="error" if failed else "ok").observe(max(0.0, seconds))
+    except Exception:  # pragma: no cover
+        pass
+
+
+def _set_cache_entries(count: int) -> None:
+    try:
+        from app.core.metrics import entitlement_cache_entries
+
+        entitlement_cache_entries.set(count)
+    except Exception:  # pragma: no cover
+        pass
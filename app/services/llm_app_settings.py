@@ -0,0 +1,161 @@
+"""LLM App 输出策略配置（llm_app_settings）的内存快照。
+
+消息/Agent 热路径只读内存快照：一次查询加载全部 key，写入（或配置事件总线版本变化）后重新加载。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Mapping
+
+from fastapi import FastAPI
+
+from app.db.sqlite_manager import SQLiteManager, get_sqlite_manager
+from app.services.ai_service import DEFAULT_LLM_APP_RESULT_MODE
+from app.services.config_events import TOPIC_LLM_APP_SETTINGS, ConfigEventBus, get_config_event_bus
+
+RESULT_MODES = frozenset({"xml_plaintext", "raw_passthrough", "auto"})
+PROMPT_MODES = frozenset({"server", "passthrough"})
+OUTPUT_PROTOCOLS = frozenset({"thinkingml_v45", "jsonseq_v1"})
+
+# Dashboard 可写入的 key（其余 key 忽略）
+WRITABLE_KEYS = frozenset(
+    {
+        "default_result_mode",
+        "prompt_mode",
+        "app_output_protocol",
+        "web_search_enabled",
+        "web_search_provider",
+        "web_search_exa_api_key",
+    }
+)
+
+
+def _as_bool(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return bool(value)
+    text = str(value or "").strip().lower()
+    return text in {"1", "true", "yes", "y", "on"}
+
+
+def _decode(raw: Any) -> Any:
+    try:
+        return json.loads(raw) if isinstance(raw, str) else raw
+    except Exception:
+        return raw
+
+
+@dataclass(frozen=True, slots=True)
+class LlmAppSettings:
+    """llm_app_settings 的规范化快照（非法/缺失值已回退默认）。"""
+
+    default_result_mode: str = DEFAULT_LLM_APP_RESULT_MODE
+    prompt_mode: str = "server"
+    app_output_protocol: str = "thinkingml_v45"
+    web_search_enabled: bool = False
+    web_search_provider: str = "exa"
+    web_search_exa_api_key: str = ""
+    # 原始 key → 已解码 value（含未规范化的历史 key，供 Dashboard 回显）
+    values: Mapping[str, Any] = field(default_factory=lambda: MappingProxyType({}))
+
+    @classmethod
+    def from_values(cls, values: Mapping[str, Any]) -> "LlmAppSettings":
+        result_mode = str(values.get("default_result_mode") or "").strip()
+        prompt_mode = str(values.get("prompt_mode") or "").strip().lower()
+        output_protocol = str(values.get("app_output_protocol") or "").strip().lower()
+        return cls(
+            default_result_mode=result_mode if result_mode in RESULT_MODES else DEFAULT_LLM_APP_RESULT_MODE,
+            prompt_mode=prompt_mode if prompt_mode in PROMPT_MODES else "server",
+            app_output_protocol=output_protocol if output_protocol in OUTPUT_PROTOCOLS else "thinkingml_v45",
+            web_search_enabled=_as_bool(values.get("web_search_enabled")),
+            # 目前仅支持 exa
+            web_search_provider="exa",
+            web_search_exa_api_key=str(values.get("web_search_exa_api_key") or "").strip(),
+            values=MappingProxyType(dict(values)),
+        )
+
+
+class LlmAppSettingsStore:
+    """llm_app_settings 快照缓存：一次查询加载；本进程写入后立即刷新，其他 worker 写入经配置事件总线版本号失效。"""
+
+    def __init__(self, db: SQLiteManager, *, event_bus: ConfigEventBus | None = None) -> None:
+        self._db = db
+        self._events = event_bus
+        self._snapshot: LlmAppSettings | None = None
+        self._loaded_version: int | None = None
+        self._lock = asyncio.Lock()
+
+    def _current_version(self) -> int | None:
+        return self._events.topic_version(TOPIC_LLM_APP_SETTINGS) if self._events is not None else None
+
+    def _is_fresh(self) -> bool:
+        return self._snapshot is not None and self._loaded_version == self._current_version()
+
+    def invalidate(self) -> None:
+        """丢弃快照（绕过 update() 直接改表后调用）。"""
+
+        self._snapshot = None
+
+    async def get(self) -> LlmAppSettings:
+        snapshot = self._snapshot
+        if snapshot is not None and self._is_fresh():
+            return snapshot
+        async with self._lock:
+            if self._snapshot is not None and self._is_fresh():
+                return self._snapshot
+            version = self._current_version()
+            rows = await self._db.fetchall("SELECT key, value_json FROM llm_app_settings", ())
+            values: dict[str, Any] = {}
+            for row in rows:
+                key = str(row.get("key") or "").strip()
+                raw = row.get("value_json")
+                if key and raw is not None:
+                    values[key] = _decode(raw)
+            self._snapshot = LlmAppSettings.from_values(values)
+            self._loaded_version = version
+            return self._snapshot
+
+    async def update(self, values: Mapping[str, Any]) -> LlmAppSettings:
+        """写入允许的 key 并发布变更；返回刷新后的快照。"""
+
+        for key, value in values.items():
+            if key not in WRITABLE_KEYS:
+                continue
+            try:
+                value_json = json.dumps(value, ensure_ascii=False)
+            except Exception:
+                value_json = json.dumps(str(value), ensure_ascii=False)
+            await self._db.execute(
+                """
+                INSERT INTO llm_app_settings(key, value_json, updated_at)
+                VALUES (?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(key) DO UPDATE SET
+                  value_json = excluded.value_json,
+                  updated_at = CURRENT_TIMESTAMP
+                """,
+                (str(key), value_json),
+            )
+        self.invalidate()
+        if self._events is not None:
+            await self._events.publish(TOPIC_LLM_APP_SETTINGS)
+        return await self.get()
+
+
+def get_llm_app_settings_store(app: FastAPI) -> LlmAppSettingsStore:
+    """从 app.state 取出快照缓存（未初始化时按当前 SQLiteManager/事件总线懒创建）。"""
+
+    store = getattr(app.state, "llm_app_settings_store", None)
+    if isinstance(store, LlmAppSettingsStore):
+        return store
+    store = LlmAppSettingsStore(get_sqlite_manager(app), event_bus=get_config_event_bus(app))
+    app.state.llm_app_settings_store = store
+    return store
+
+
+async def get_llm_app_settings(app: FastAPI) -> LlmAppSettings:
+    return await get_llm_app_settings_store(app).get()
@@ -2,13 +2,15 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Any, Literal, Optional
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Literal, Optional
 
 from app.auth import ProviderError
 from app.services.ai_config_service import AIConfigService
 from app.services.ai_endpoint_rules import looks_like_test_endpoint
 from app.services.ai_model_rules import looks_like_embedding_model
+from app.services.endpoint_balancer import get_endpoint_balancer
+from app.services.endpoint_circuit_breaker import get_endpoint_circuit_breaker
 from app.services.model_mapping_service import ModelMappingService
 from app.settings.config import Settings
 
@@ -21,6 +23,16 @@ LlmDialect = Literal[
 ]
 
 
+@dataclass(slots=True)
+class _RoutingSnapshot:
+    """一次加载的路由输入（可路由端点 + 映射 + 屏蔽列表），供批量解析复用。"""
+
+    candidates: list[dict[str, Any]]
+    mappings: list[dict[str, Any]]
+    blocked: set[str]
+    api_keys: dict[int, Optional[str]] = field(default_factory=dict)
+
+
 @dataclass(slots=True)
 class ResolvedProviderRoute:
     endpoint: dict[str, Any]
@@ -59,13 +71,67 @@ class LlmModelRegistry:
         openai_req: dict[str, Any],
         *,
         preferred_endpoint_id: Optional[int] = None,
+    ) -> ResolvedProviderRoute:
+        return await self._resolve_request(openai_req, preferred_endpoint_id=preferred_endpoint_id)
+
+    async def resolve_model_key(
+        self,
+        model_key: str,
+        *,
+        preferred_endpoint_id: Optional[int] = None,
+    ) -> ResolvedProviderRoute:
+        openai_req: dict[str, Any] = {"model": str(model_key or "").strip()}
+        return await self.resolve_openai_request(openai_req, preferred_endpoint_id=preferred_endpoint_id)
+
+    async def resolve_model_keys(self, model_keys: Iterable[str]) -> dict[str, ResolvedProviderRoute | Exception]:
+        """批量解析 model key：端点/映射/屏蔽列表只加载一次，所有 key 在同一快照上单趟解析。
+
+        单个 key 的结果与 resolve_model_key 一致；解析失败的 key 对应其异常（通常是 ProviderError），
+        任一 key（如脏映射）抛出的异常都不会中断其余 key。
+        """
+
+        keys = [key for key in dict.fromkeys(str(item or "").strip() for item in model_keys) if key]
+        if not keys:
+            return {}
+        snapshot = await self._load_routing_snapshot()
+        results: dict[str, ResolvedProviderRoute | Exception] = {}
+        for key in keys:
+            try:
+                results[key] = await self._resolve_request({"model": key}, snapshot=snapshot)
+            except Exception as exc:
+                results[key] = exc
+        return results
+
+    async def _load_routing_snapshot(self) -> _RoutingSnapshot:
+        candidates = await self._list_candidate_endpoints()
+        try:
+            mappings = await self._model_mapping_service.list_mappings()
+        except Exception:
+            mappings = []
+        blocked = set(await self._model_mapping_service.list_blocked_models())
+        return _RoutingSnapshot(candidates=candidates, mappings=mappings, blocked=blocked)
+
+    async def _resolve_request(
+        self,
+        openai_req: dict[str, Any],
+        *,
+        preferred_endpoint_id: Optional[int] = None,
+        snapshot: Optional[_RoutingSnapshot] = None,
     ) -> ResolvedProviderRoute:
         endpoint, resolved_model, provider_name = await self._select_endpoint_and_model(
             openai_req,
             preferred_endpoint_id=preferred_endpoint_id,
+            snapshot=snapshot,
         )
         endpoint_id = parse_optional_int(endpoint.get("id"))
-        api_key = await self._get_endpoint_api_key(endpoint_id)
+        if snapshot is None:
+            api_key = await self._get_endpoint_api_key(endpoint_id)
+        elif endpoint_id in snapshot.api_keys:
+            api_key = snapshot.api_keys[endpoint_id]
+        else:
+            api_key = await self._get_endpoint_api_key(endpoint_id)
+            if endpoint_id is not None:
+                snapshot.api_keys[endpoint_id] = api_key
         if not api_key:
             raise ProviderError("endpoint_api_key_missing")
         resolved_model = str(resolved_model or "").strip()
@@ -80,15 +146,6 @@ class LlmModelRegistry:
             resolved_model=resolved_model,
         )
 
-    async def resolve_model_key(
-        self,
-        model_key: str,
-        *,
-        preferred_endpoint_id: Optional[int] = None,
-    ) -> ResolvedProviderRoute:
-        openai_req: dict[str, Any] = {"model": str(model_key or "").strip()}
-        return await self.resolve_openai_request(openai_req, preferred_endpoint_id=preferred_endpoint_id)
-
     def _infer_dialect(self, endpoint: dict[str, Any]) -> LlmDialect:
         protocol = str(endpoint.get("provider_protocol") or "").strip().lower()
         if protocol == "claude":
@@ -112,19 +169,108 @@ class LlmModelRegistry:
         except Exception:
             return None
 
-    async def _select_endpoint_and_model(
+    async def resolve_fallback_routes(
         self,
-        openai_req: dict[str, Any],
+        model_key: str,
+        primary: ResolvedProviderRoute,
         *,
-        preferred_endpoint_id: Optional[int] = None,
-    ) -> tuple[dict[str, Any], Optional[str], str]:
+        limit: int,
+        dialect: Optional[LlmDialect] = None,
+    ) -> list[ResolvedProviderRoute]:
+        """主路由之外的备选路由（用于 TTFT 超时/首包前失败的切换与对冲）。
+
+        顺序：同一 resolved_model 的其他端点优先，其次是 model_key 命中映射中的其他可路由候选；
+        dialect 非空时只保留同 dialect 的端点（payload 模式的请求体无法跨协议复用）。
+        """
+
+        if limit <= 0:
+            return []
+        candidates = await self._list_candidate_endpoints()
+        if not candidates:
+            return []
+
+        models = [primary.resolved_model]
+        for name in await self._mapping_candidate_models(model_key, candidates):
+            if name not in models:
+                models.append(name)
+
+        routes: list[ResolvedProviderRoute] = []
+        for model in models:
+            for endpoint in candidates:
+                if not endpoint_supports_model(endpoint, model):
+                    continue
+                endpoint_id = parse_optional_int(endpoint.get("id"))
+                if endpoint_id is None or (endpoint_id == primary.endpoint_id and model == primary.resolved_model):
+                    continue
+                endpoint_dialect = self._infer_dialect(endpoint)
+                if dialect is not None and endpoint_dialect != dialect:
+                    continue
+                api_key = await self._get_endpoint_api_key(endpoint_id)
+                if not api_key:
+                    continue
+                routes.append(
+                    ResolvedProviderRoute(
+                        endpoint=endpoint,
+                        endpoint_id=endpoint_id,
+                        api_key=api_key,
+                        provider=self._infer_provider(endpoint),
+                        dialect=endpoint_dialect,
+                        resolved_model=model,
+                    )
+                )
+                if len(routes) >= limit:
+                    return routes
+        return routes
+
+    async def _list_candidate_endpoints(self, *, preferred_endpoint_id: Optional[int] = None) -> list[dict[str, Any]]:
         endpoints, _ = await self._ai_config_service.list_endpoints(only_active=True, page=1, page_size=200)
         candidates = [item for item in endpoints if item.get("is_active") and item.get("has_api_key")]
         candidates = [item for item in candidates if str(item.get("status") or "").strip().lower() != "offline"]
+        if preferred_endpoint_id is None:
+            candidates = filter_circuit_open_endpoints(candidates, self._settings)
         if not getattr(self._settings, "allow_test_ai_endpoints", False):
             non_test = [item for item in candidates if not looks_like_test_endpoint(item)]
             if non_test:
                 candidates = non_test
+        return candidates
+
+    async def _mapping_candidate_models(self, model_key: str, candidates: list[dict[str, Any]]) -> list[str]:
+        key = str(model_key or "").strip()
+        if not key:
+            return []
+        try:
+            mappings = await self._model_mapping_service.list_mappings()
+        except Exception:
+            return []
+        blocked = set(await self._model_mapping_service.list_blocked_models())
+
+        models: list[str] = []
+        for mapping in mappings:
+            if not isinstance(mapping, dict) or not bool(mapping.get("is_active", True)):
+                continue
+            if ":" in key:
+                matched = str(mapping.get("id") or "").strip() == key
+            else:
+                matched = str(mapping.get("scope_key") or "").strip() == key and str(
+                    mapping.get("scope_type") or ""
+                ).strip() in ("mapping", "global")
+            if not matched:
+                continue
+            _, routable, _ = pick_routable_candidates_from_mapping(mapping, endpoints=candidates, blocked=blocked)
+            models.extend(routable)
+        return list(dict.fromkeys(models))
+
+    async def _select_endpoint_and_model(
+        self,
+        openai_req: dict[str, Any],
+        *,
+        preferred_endpoint_id: Optional[int] = None,
+        snapshot: Optional[_RoutingSnapshot] = None,
+    ) -> tuple[dict[str, Any], Optional[str], str]:
+        if snapshot is not None:
+            candidates = snapshot.candidates
+        else:
+            candidates = await self._list_candidate_endpoints(preferred_endpoint_id=preferred_endpoint_id)
         if not candidates:
             raise ProviderError("no_active_ai_endpoint")
 
@@ -149,11 +295,14 @@ class LlmModelRegistry:
                     resolved_model = None
             else:
                 # App 业务 key（如 xai）：按“可路由候选”解析为真实 vendor model
-                try:
-                    mappings = await self._model_mapping_service.list_mappings()
-                except Exception:
-                    mappings = []
-                blocked = set(await self._model_mapping_service.list_blocked_models())
+                if snapshot is not None:
+                    mappings, blocked = snapshot.mappings, snapshot.blocked
+                else:
+                    try:
+                        mappings = await self._model_mapping_service.list_mappings()
+                    except Exception:
+                        mappings = []
+                    blocked = set(await self._model_mapping_service.list_blocked_models())
 
                 scope_priority = ("mapping", "global")
                 candidates_mappings = [
@@ -219,7 +368,7 @@ class LlmModelRegistry:
             selected_endpoint = preferred
 
         if isinstance(resolved_model, str) and resolved_model.strip():
-            by_list = next((item for item in candidates if endpoint_supports_model(item, resolved_model)), None)
+            by_list = pick_endpoint_for_model(candidates, resolved_model, self._settings)
             if preferred_endpoint_id is None:
                 if isinstance(soft_preferred_endpoint_id, int) and endpoint_supports_model(selected_endpoint, resolved_model):
                     pass
@@ -306,6 +455,15 @@ def endpoint_supports_model(endpoint: dict[str, Any], model: str) -> bool:
     return False
 
 
+def pick_endpoint_for_model(candidates: list[dict[str, Any]], model: str, settings: Any) -> Optional[dict[str, Any]]:
+    """在支持该模型的候选中选端点：开启均衡且候选多于一个时交给 EndpointBalancer，否则取第一个。"""
+
+    supporting = [item for item in candidates if endpoint_supports_model(item, model)]
+    if len(supporting) <= 1 or not getattr(settings, "ai_endpoint_balancing_enabled", False):
+        return supporting[0] if supporting else None
+    return get_endpoint_balancer().choose(supporting, model.strip())
+
+
 def pick_routable_candidates_from_mapping(
     mapping: dict[str, Any],
     *,
@@ -340,6 +498,20 @@ def pick_routable_candidates_from_mapping(
     return picked_default, routable, blocked_candidates
 
 
+def filter_circuit_open_endpoints(candidates: list[dict[str, Any]], settings: Any) -> list[dict[str, Any]]:
+    """摘除熔断中的端点；若全部熔断则保持原列表（由 dispatch 快速失败，而不是误报无可用端点）。"""
+
+    if not getattr(settings, "ai_circuit_breaker_enabled", False):
+        return candidates
+    breaker = get_endpoint_circuit_breaker()
+    available = [
+        item
+        for item in candidates
+        if (endpoint_id := parse_optional_int(item.get("id"))) is None or breaker.is_available(endpoint_id)
+    ]
+    return available or candidates
+
+
 def parse_optional_int(value: Any) -> Optional[int]:
     if value in (None, ""):
         return None
@@ -2,18 +2,20 @@
 
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
-from datetime import datetime, timedelta
+import time
+from datetime import datetime, timedelta, timezone
 from typing import Any, Dict, Optional
 
-import httpx
-
+from app.auth.jwt_verifier import JWKSCache, get_jwt_verifier
 from app.core.metrics import auth_requests_total
 from app.db.sqlite_manager import SQLiteManager
 from app.services.monitor_service import EndpointMonitor
 from app.services.model_mapping_service import ModelMappingService, normalize_scope_type
-from app.services.llm_model_registry import LlmModelRegistry
+from app.services.llm_model_registry import LlmModelRegistry, ResolvedProviderRoute
+from app.services.providers.usage import TOKEN_USAGE_FIELDS, normalize_usage
 from app.settings.config import get_settings
 
 logger = logging.getLogger(__name__)
@@ -33,6 +35,7 @@ class MetricsCollector:
         self._monitor = endpoint_monitor
         self._mapping_service = model_mapping_service
         self._registry = llm_model_registry
+        self._jwks_probe_task: Optional[asyncio.Task[bool]] = None
 
     async def aggregate_stats(self, time_window: str = "24h") -> Dict[str, Any]:
         """聚合所有统计数据。
@@ -179,13 +182,12 @@ class MetricsCollector:
         if total <= 0:
             return {"total": 0, "available": 0, "unavailable": 0, "availability_rate": 0.0}
 
-        available = 0
-        for key in sorted(keys):
-            try:
-                await self._registry.resolve_model_key(key)
-                available += 1
-            except Exception:
-                continue
+        # 批量解析：端点/映射/屏蔽列表只加载一次（逐个 resolve_model_key 会让每个 key 重新读取）
+        try:
+            resolved = await self._registry.resolve_model_keys(sorted(keys))
+        except Exception:
+            resolved = {}
+        available = sum(1 for route in resolved.values() if isinstance(route, ResolvedProviderRoute))
 
         unavailable = max(total - available, 0)
         availability_rate = round((available / total) * 100.0, 2) if total > 0 else 0.0
@@ -300,67 +302,108 @@ class MetricsCollector:
         }
 
     async def _get_token_usage(self, time_window: str) -> int:
-        """统计 Token 使用量（从 conversation_logs.response_payload 解析 usage）。
+        """统计 Token 使用量（ai_token_usage_hourly 小时级汇总，来自上游 usage 块）。
 
-        - OpenAI：usage.total_tokens
-        - Claude：usage.input_tokens + usage.output_tokens（如存在）
+        按小时粒度截取窗口（包含起始时刻所在的整点小时）；扫描行数只与 小时数 × 模型 × 端点 相关。
         """
         start_time = self._calculate_start_time(time_window)
-        rows = await self._db.fetchall(
+        result = await self._db.fetchone(
             """
-            SELECT response_payload
-            FROM conversation_logs
-            WHERE status = 'success' AND date(created_at) >= ?
+            SELECT SUM(total_tokens) as total_tokens
+            FROM ai_token_usage_hourly
+            WHERE usage_hour >= ?
         """,
-            [start_time.date().isoformat()],
+            [start_time.strftime("%Y-%m-%dT%H")],
         )
+        return int(result["total_tokens"] or 0) if result else 0
 
-        total_tokens = 0
-        for row in rows:
-            raw = row.get("response_payload")
-            if not raw or not isinstance(raw, str):
-                continue
-            try:
-                payload = json.loads(raw)
-            except Exception:
-                continue
-            if not isinstance(payload, dict):
-                continue
-
-            usage = payload.get("usage")
-            if not isinstance(usage, dict):
-                continue
+    async def backfill_token_usage_hourly(self) -> None:
+        """汇总表为空时一次性回填 ai_token_usage_hourly（应用启动调用，保证升级前后 token 统计连续）。
 
-            if isinstance(usage.get("total_tokens"), int):
-                total_tokens += int(usage["total_tokens"])
-                continue
+        - ai_request_stats：按天累计的 token 列，回填到当天 00 时
+        - conversation_logs：token 列为 0 的成功记录（token 列上线前写入）按旧口径解析 response_payload.usage，
+          回填到 created_at 所在的本地小时；已有 token 列的记录已计入 ai_request_stats，不重复回填
+        """
 
-            input_tokens = usage.get("input_tokens")
-            output_tokens = usage.get("output_tokens")
-            if isinstance(input_tokens, int) or isinstance(output_tokens, int):
-                total_tokens += int(input_tokens or 0) + int(output_tokens or 0)
+        try:
+            if await self._db.fetchone("SELECT 1 AS hit FROM ai_token_usage_hourly LIMIT 1"):
+                return
+            await self._db.execute(
+                """
+                INSERT INTO ai_token_usage_hourly (
+                    usage_hour, model, endpoint_id,
+                    prompt_tokens, completion_tokens, cached_tokens, total_tokens
+                )
+                SELECT
+                    request_date || 'T00', COALESCE(model, 'unknown'), COALESCE(endpoint_id, 0),
+                    SUM(prompt_tokens), SUM(completion_tokens), SUM(cached_tokens), SUM(total_tokens)
+                FROM ai_request_stats
+                WHERE total_tokens > 0
+                GROUP BY 1, 2, 3
+            """
+            )
 
-        return int(total_tokens)
+            rows = await self._db.fetchall(
+                """
+                SELECT created_at, model_used, response_payload
+                FROM conversation_logs
+                WHERE status = 'success' AND COALESCE(total_tokens, 0) = 0 AND response_payload IS NOT NULL
+            """
+            )
+            hourly: dict[tuple[str, str], list[int]] = {}
+            for row in rows:
+                try:
+                    payload = json.loads(row["response_payload"])
+                    # created_at 为 SQLite CURRENT_TIMESTAMP（UTC），汇总表按本地小时
+                    created = datetime.strptime(str(row["created_at"])[:19], "%Y-%m-%d %H:%M:%S")
+                except (TypeError, ValueError):
+                    continue
+                usage = normalize_usage(payload.get("usage")) if isinstance(payload, dict) else None
+                if not usage or not usage["total_tokens"]:
+                    continue
+                usage_hour = created.replace(tzinfo=timezone.utc).astimezone().strftime("%Y-%m-%dT%H")
+                totals = hourly.setdefault((usage_hour, row.get("model_used") or "unknown"), [0, 0, 0, 0])
+                for index, field in enumerate(TOKEN_USAGE_FIELDS):
+                    totals[index] += usage[field]
+
+            for (usage_hour, model), totals in hourly.items():
+                await self._db.execute(
+                    """
+                    INSERT INTO ai_token_usage_hourly (
+                        usage_hour, model, endpoint_id,
+                        prompt_tokens, completion_tokens, cached_tokens, total_tokens
+                    )
+                    VALUES (?, ?, 0, ?, ?, ?, ?)
+                    ON CONFLICT(usage_hour, model, endpoint_id)
+                    DO UPDATE SET
+                        prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+                        completion_tokens = completion_tokens + excluded.completion_tokens,
+                        cached_tokens = cached_tokens + excluded.cached_tokens,
+                        total_tokens = total_tokens + excluded.total_tokens
+                """,
+                    [usage_hour, model, *totals],
+                )
+        except Exception as exc:
+            logger.warning("回填 token 小时级汇总失败 error=%s", exc)
 
     async def _get_jwt_availability(self) -> Dict[str, Any]:
-        """查询 JWT 连通性（SSOT：JWKS 可用性 + 可选验证统计）。"""
+        """查询 JWT 连通性（SSOT：JWKS 缓存状态 + 可选验证统计）。
+
+        不在调用路径上出网：读取 JWKSCache 最近一次拉取的结果；距上次拉取超过
+        jwks_probe_interval_seconds 时在后台刷新一次（结果在下一次查询中体现）。
+        """
 
         settings = get_settings()
-        jwks_url = str(settings.supabase_jwks_url) if settings.supabase_jwks_url else ""
+        cache = get_jwt_verifier().jwks_cache
+        jwks_url = cache.jwks_url or ""
+        state = cache.status()
 
         probe_ok = False
         probe_error: str | None = None
         if jwks_url:
-            try:
-                async with httpx.AsyncClient(timeout=settings.http_timeout_seconds) as client:
-                    resp = await client.get(jwks_url)
-                    resp.raise_for_status()
-                    data = resp.json()
-                probe_ok = isinstance(data, dict) and isinstance(data.get("keys"), list) and len(data.get("keys") or []) > 0
-                if not probe_ok:
-                    probe_error = "jwks_invalid_payload"
-            except Exception as exc:
-                probe_error = str(exc)[:200]
+            self._schedule_jwks_probe(cache, float(getattr(settings, "jwks_probe_interval_seconds", 300.0)))
+            probe_ok = bool(state["ok"])
+            probe_error = None if probe_ok else (state["last_error"] or "jwks_probe_pending")
         else:
             probe_error = "jwks_url_missing"
 
@@ -392,6 +435,8 @@ class MetricsCollector:
                 "jwks_url": jwks_url or None,
                 "ok": probe_ok,
                 "error": probe_error,
+                "key_count": state["key_count"],
+                "last_success_at": state["last_success_at"],
             },
             # 兼容：保留 JWT 验证统计（用于趋势/排障）
             "verification": {
@@ -401,6 +446,17 @@ class MetricsCollector:
             },
         }
 
+    def _schedule_jwks_probe(self, cache: JWKSCache, interval_seconds: float) -> None:
+        """后台刷新 JWKS：同一时刻最多一个探针，距上次拉取（含 JWT 验证触发的拉取）不足一个间隔时跳过。"""
+
+        task = self._jwks_probe_task
+        if task is not None and not task.done():
+            return
+        last_attempt_at = cache.last_attempt_at
+        if last_attempt_at is not None and time.monotonic() - last_attempt_at < max(1.0, interval_seconds):
+            return
+        self._jwks_probe_task = asyncio.create_task(asyncio.to_thread(cache.refresh))
+
     def _calculate_start_time(self, time_window: str) -> datetime:
         """计算时间窗口的起始时间。
 
@@ -4,6 +4,7 @@ from __future__ import annotations
 
 import asyncio
 import json
+import time
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
@@ -12,6 +13,7 @@ from typing import Any
 from app.db import SQLiteManager
 from app.services.ai_config_service import AIConfigService
 from app.services.ai_model_rules import looks_like_embedding_model
+from app.services.config_events import TOPIC_BLOCKED_MODELS, TOPIC_MAPPINGS, ConfigChange, ConfigEventBus
 
 MAPPING_KEY = "__model_mapping"
 BLOCKED_MODELS_KEY = "__blocked_models"
@@ -44,6 +46,14 @@ def _normalize_mapping_id(mapping_id: str) -> str:
     return _mapping_id(scope_type, scope_key)
 
 
+def _legacy_mapping_ids(mapping_id: str) -> list[str]:
+    """mapping_id 及其历史别名（mapping:* -> tenant:*），用于按主键查询旧数据。"""
+
+    scope_type, _, scope_key = mapping_id.partition(":")
+    aliases = [alias for alias, target in _SCOPE_TYPE_ALIASES.items() if target == scope_type]
+    return [mapping_id, *(_mapping_id(alias, scope_key) for alias in aliases)]
+
+
 def normalize_scope_type(scope_type: str | None) -> str:
     """对外暴露的 scope_type 归一化（SSOT：tenant -> mapping）。"""
 
@@ -76,11 +86,11 @@ class ModelMapping:
             "scope_key": self.scope_key,
             "name": self.name,
             "default_model": self.default_model,
-            "candidates": self.candidates,
+            "candidates": list(self.candidates),
             "is_active": self.is_active,
             "updated_at": self.updated_at,
             "source": self.source,
-            "metadata": self.metadata,
+            "metadata": dict(self.metadata),
         }
 
 
@@ -97,6 +107,8 @@ class ModelMappingService:
         storage_dir: Path,
         *,
         auto_seed_enabled: bool = False,
+        blocked_check_interval_seconds: float = 2.0,
+        event_bus: ConfigEventBus | None = None,
     ) -> None:
         self._ai_service = ai_service
         self._db = db
@@ -108,18 +120,58 @@ class ModelMappingService:
         self._lock = asyncio.Lock()
         self._auto_seed_enabled = bool(auto_seed_enabled)
         self._sqlite_import_done = False
+        # 映射/屏蔽列表每次写入后发布到配置事件总线（prompt 映射写在 ai_prompts，由 AIConfigService.revision 覆盖）。
+        # 未注入时复用 AIConfigService 的总线，两者版本号同源。
+        if event_bus is None:
+            event_bus = getattr(ai_service, "event_bus", None)
+        self._events = event_bus if isinstance(event_bus, ConfigEventBus) else ConfigEventBus()
+        # 屏蔽列表常驻内存：写入时直接更新；文件 mtime 至多每 interval 秒检查一次（外部修改时重新加载）
+        self._blocked_cache: tuple[str, ...] | None = None
+        self._blocked_mtime_ns: int | None = None
+        self._blocked_checked_at = 0.0
+        self._blocked_check_interval = max(0.0, float(blocked_check_interval_seconds))
+        # prompt 内嵌映射索引（见 _get_prompt_index）
+        self._prompt_index: dict[str, tuple[ModelMapping, dict[str, Any]]] | None = None
+        self._prompt_index_revision: int | None = None
+        self._prompt_index_lock = asyncio.Lock()
+        # 其他 worker 写入屏蔽列表后，跳过本地 mtime 节流立即重新检查
+        self._events.subscribe(TOPIC_BLOCKED_MODELS, self._on_blocked_models_changed)
+
+    @property
+    def revision(self) -> int:
+        """映射与屏蔽列表的修订号（单调递增；多 worker 时含其他进程的写入）。"""
+
+        return self._events.topic_version(TOPIC_MAPPINGS) + self._events.topic_version(TOPIC_BLOCKED_MODELS)
+
+    def _on_blocked_models_changed(self, change: ConfigChange) -> None:
+        if change.remote:
+            self._blocked_checked_at = 0.0
 
     async def list_blocked_models(self) -> list[str]:
+        now = time.monotonic()
+        cached = self._blocked_cache
+        if cached is not None and now - self._blocked_checked_at < self._blocked_check_interval:
+            return list(cached)
+        self._blocked_checked_at = now
+        mtime_ns = self._blocked_file_mtime_ns()
+        if cached is not None and mtime_ns == self._blocked_mtime_ns:
+            return list(cached)
+
         payload = await self._read_blocked()
         blocked = payload.get("blocked") if isinstance(payload, dict) else None
-        if not isinstance(blocked, list):
-            return []
         items: list[str] = []
-        for value in blocked:
-            text = str(value or "").strip()
-            if text:
-                items.append(text)
-        return sorted(set(items))
+        if isinstance(blocked, list):
+            for value in blocked:
+                text = str(value or "").strip()
+                if text:
+                    items.append(text)
+        loaded = tuple(sorted(set(items)))
+        if cached is not None and loaded != cached:
+            # 文件被外部修改：派生索引（模型白名单）需要重建（每个 worker 各自检测，仅推进本进程版本号）
+            self._events.publish_local(TOPIC_BLOCKED_MODELS)
+        self._blocked_cache = loaded
+        self._blocked_mtime_ns = mtime_ns
+        return list(loaded)
 
     async def upsert_blocked_models(self, updates: list[dict[str, Any]]) -> list[str]:
         normalized: list[tuple[str, bool]] = []
@@ -157,6 +209,10 @@ class ModelMappingService:
                 json.dumps(new_payload, ensure_ascii=False, indent=2),
                 "utf-8",
             )
+            self._blocked_cache = tuple(new_payload["blocked"])
+            self._blocked_mtime_ns = self._blocked_file_mtime_ns()
+            self._blocked_checked_at = time.monotonic()
+            await self._events.publish(TOPIC_BLOCKED_MODELS)
             return list(new_payload["blocked"])
 
     async def list_mappings(
@@ -164,8 +220,11 @@ class ModelMappingService:
         *,
         scope_type: str | None = None,
         scope_key: str | None = None,
+        mapping_ids: list[str] | None = None,
     ) -> list[dict[str, Any]]:
         await self._ensure_sqlite_imported()
+        if mapping_ids:
+            return await self._list_mappings_by_ids([_normalize_mapping_id(item) for item in mapping_ids])
         normalized_scope_type = _normalize_scope_type(scope_type) if scope_type else None
         prompt_mappings = (
             await self._collect_prompt_mappings()
@@ -180,6 +239,23 @@ class ModelMappingService:
             combined = [item for item in combined if item.scope_key == scope_key]
         return [item.to_dict() for item in combined]
 
+    async def _list_mappings_by_ids(self, mapping_ids: list[str]) -> list[dict[str, Any]]:
+        prompt_keys = [item.split(":", 1)[1] for item in mapping_ids if item.startswith("prompt:")]
+        # 历史数据可能仍以 tenant:* 为主键存储：按别名一并查询（读出后 id 统一归一化为 mapping:*）
+        sqlite_ids = [
+            alias
+            for item in mapping_ids
+            if ":" in item and not item.startswith("prompt:")
+            for alias in _legacy_mapping_ids(item)
+        ]
+        items: list[ModelMapping] = []
+        if prompt_keys:
+            index = await self._get_prompt_index()
+            items.extend(index[key][0] for key in prompt_keys if key in index)
+        if sqlite_ids:
+            items.extend(await self._collect_sqlite_mappings(ids=sqlite_ids))
+        return [item.to_dict() for item in items]
+
     async def upsert_mapping(self, payload: dict[str, Any]) -> dict[str, Any]:
         await self._ensure_sqlite_imported()
         scope_type = _normalize_scope_type(payload["scope_type"])
@@ -357,13 +433,18 @@ class ModelMappingService:
         if not key:
             return {"resolved_model": None, "hit": False}
 
+        normalized_key = _normalize_mapping_id(key) if ":" in key else key
+        if ":" in normalized_key:
+            candidate_ids = [normalized_key]
+        else:
+            candidate_ids = [_mapping_id("mapping", normalized_key), _mapping_id("global", normalized_key)]
         try:
-            mappings = await self.list_mappings()
+            # 按 id 定位候选映射（prompt 走内存索引，其余按主键查询），避免全量扫描
+            mappings = await self.list_mappings(mapping_ids=candidate_ids)
         except Exception:
             return {"resolved_model": key, "hit": False}
 
         mapping: dict[str, Any] | None = None
-        normalized_key = _normalize_mapping_id(key) if ":" in key else key
         if ":" in normalized_key:
             mapping = next((m for m in mappings if m.get("id") == normalized_key and m.get("is_active", True)), None)
         else:
@@ -563,6 +644,7 @@ class ModelMappingService:
                 )
             else:
                 await self._db.execute("DELETE FROM llm_model_mappings")
+            await self._events.publish(TOPIC_MAPPINGS)
             after_row = await self._db.fetchone("SELECT COUNT(1) AS cnt FROM llm_model_mappings")
             after_count = int(after_row.get("cnt") or 0) if after_row else 0
             deleted_count = max(0, before_count - after_count)
@@ -804,6 +886,12 @@ class ModelMappingService:
                     pass
                 self._sqlite_import_done = True
 
+    def _blocked_file_mtime_ns(self) -> int | None:
+        try:
+            return self._blocked_file_path.stat().st_mtime_ns
+        except OSError:
+            return None
+
     async def _read_blocked(self) -> dict[str, Any]:
         async with self._lock:
             return await self._read_blocked_unlocked()
@@ -818,8 +906,33 @@ class ModelMappingService:
         except Exception:
             return {"updated_at": None, "blocked": []}
 
-    async def _collect_prompt_mappings(self) -> list[ModelMapping]:
-        items: list[ModelMapping] = []
+    def _current_prompt_revision(self) -> int | None:
+        revision = getattr(self._ai_service, "prompt_revision", None)
+        return revision if isinstance(revision, int) else None
+
+    async def _get_prompt_index(self) -> dict[str, tuple[ModelMapping, dict[str, Any]]]:
+        """prompt 内嵌映射索引 {prompt_id: (ModelMapping, 原始映射块)}；仅在 Prompt 写入后重建。
+
+        AIConfigService 不提供 prompt_revision 时（如测试替身）每次重新扫描。
+        """
+
+        revision = self._current_prompt_revision()
+        if revision is None:
+            return await self._scan_prompt_mappings()
+        index = self._prompt_index
+        if index is not None and self._prompt_index_revision == revision:
+            return index
+        async with self._prompt_index_lock:
+            revision = self._current_prompt_revision()
+            if self._prompt_index is not None and self._prompt_index_revision == revision:
+                return self._prompt_index
+            index = await self._scan_prompt_mappings()
+            self._prompt_index = index
+            self._prompt_index_revision = revision
+            return index
+
+    async def _scan_prompt_mappings(self) -> dict[str, tuple[ModelMapping, dict[str, Any]]]:
+        items: dict[str, tuple[ModelMapping, dict[str, Any]]] = {}
         page = 1
         page_size = 100
         while True:
@@ -836,7 +949,7 @@ class ModelMappingService:
                         if isinstance(entry, dict) and MAPPING_KEY in entry:
                             mapping_data = entry[MAPPING_KEY]
                             break
-                if not mapping_data:
+                if not mapping_data or not isinstance(mapping_data, dict):
                     continue
                 mapping = ModelMapping(
                     id=_mapping_id("prompt", str(prompt["id"])),
@@ -853,16 +966,22 @@ class ModelMappingService:
                         "category": prompt.get("category"),
                     },
                 )
-                items.append(mapping)
+                items[mapping.scope_key] = (mapping, mapping_data)
             # 使用 total + 分页参数作为终止条件，避免上游分页/映射缺失导致死循环
             if total and page * page_size >= total:
                 break
             page += 1
         return items
 
+    async def _collect_prompt_mappings(self) -> list[ModelMapping]:
+        return [mapping for mapping, _ in (await self._get_prompt_index()).values()]
+
     async def _read_prompt_mapping(self, prompt_id: int | None) -> dict[str, Any] | None:
         if prompt_id is None:
             return None
+        if self._current_prompt_revision() is not None:
+            entry = (await self._get_prompt_index()).get(str(int(prompt_id)))
+            return dict(entry[1]) if entry is not None else None
         try:
             prompt = await self._ai_service.get_prompt(int(prompt_id))
         except Exception:
@@ -882,10 +1001,14 @@ class ModelMappingService:
         *,
         scope_type: str | None = None,
         scope_key: str | None = None,
+        ids: list[str] | None = None,
     ) -> list[ModelMapping]:
         query = "SELECT * FROM llm_model_mappings"
         params: list[Any] = []
         clauses: list[str] = []
+        if ids:
+            clauses.append(f"id IN ({','.join('?' * len(ids))})")
+            params.extend(ids)
         if scope_type:
             clauses.append("scope_type = ?")
             params.append(scope_type)
@@ -1001,6 +1124,7 @@ class ModelMappingService:
                 json.dumps(meta, ensure_ascii=False),
             ),
         )
+        await self._events.publish(TOPIC_MAPPINGS)
 
     async def _delete_sqlite_mapping(self, scope_type: str, scope_key: str) -> bool:
         normalized_scope_type = _normalize_scope_type(scope_type)
@@ -1010,6 +1134,7 @@ class ModelMappingService:
         if not existing:
             return False
         await self._db.execute("DELETE FROM llm_model_mappings WHERE id = ?", (mapping_id,))
+        await self._events.publish(TOPIC_MAPPINGS)
         return True
 
     async def _get_sqlite_mapping(self, scope_type: str, scope_key: str) -> dict[str, Any] | None:
@@ -17,7 +17,8 @@ class EndpointMonitor:
 
     The monitor:
     - accepts a polling interval between 10 and 600 seconds
-    - delegates to ``AIConfigService.refresh_all_status`` every cycle
+    - delegates to ``AIConfigService.refresh_all_status`` every cycle; scheduled cycles
+      reuse passive health from live traffic and only probe idle or suspect endpoints
     - records the ISO timestamp of the last run and the last error message
     """
 
@@ -74,7 +75,7 @@ class EndpointMonitor:
     async def _run_loop(self) -> None:
         try:
             while not self._stop_event.is_set():
-                await self._run_once()
+                await self._run_once(passive_first=True)
                 try:
                     await asyncio.wait_for(self._stop_event.wait(), timeout=self._interval)
                 except asyncio.TimeoutError:
@@ -83,9 +84,9 @@ class EndpointMonitor:
             logger.debug("Endpoint monitor loop cancelled")
             raise
 
-    async def _run_once(self) -> None:
+    async def _run_once(self, *, passive_first: bool = False) -> None:
         try:
-            await self._service.refresh_all_status()
+            await self._service.refresh_all_status(passive_first=passive_first)
             self._last_run_iso = datetime.now(timezone.utc).replace(microsecond=0).isoformat()
             self._last_error = None
             logger.debug("Endpoint monitor refreshed endpoints")
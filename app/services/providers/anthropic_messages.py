@@ -14,7 +14,10 @@ from app.auth import ProviderError
 from app.core.middleware import REQUEST_ID_HEADER_NAME, get_current_request_id
 from app.services.ai_url import normalize_ai_base_url
 
+from .passive_health import track_passive_health
 from .sse import iter_sse_frames
+from .timing import mark_upstream_connected
+from .usage import attach_usage
 
 PublishFn = Callable[[str, dict[str, Any]], Awaitable[None]]
 
@@ -23,6 +26,85 @@ logger = logging.getLogger(__name__)
 _TRACE_UPSTREAM_RAW_MAX_FRAMES = 20
 _TRACE_UPSTREAM_RAW_MAX_CHARS = 8000
 
+_EPHEMERAL_CACHE_CONTROL = {"type": "ephemeral"}
+
+
+def _has_cache_control(value: Any) -> bool:
+    if isinstance(value, dict):
+        return "cache_control" in value or any(_has_cache_control(item) for item in value.values())
+    if isinstance(value, list):
+        return any(_has_cache_control(item) for item in value)
+    return False
+
+
+def apply_prompt_cache_breakpoints(body: dict[str, Any], *, min_chars: int = 0) -> dict[str, Any]:
+    """为稳定前缀（tools → system）自动插入 cache_control 断点，返回新 body（不修改入参）。
+
+    - 请求中已有任意 cache_control（客户端自行管理缓存）时原样返回；
+    - tools：标记最后一个 tool（缓存整个 tools 定义）；
+    - system：字符串转为单个 text block 并标记；block 列表则标记最后一个 text block；
+    - system/tools 序列化长度低于 min_chars 时跳过（上游对过短前缀不缓存，标记无意义）。
+    """
+
+    if any(_has_cache_control(body.get(key)) for key in ("system", "tools", "messages")):
+        return body
+
+    out = dict(body)
+    tools = body.get("tools")
+    if isinstance(tools, list) and tools and isinstance(tools[-1], dict):
+        if len(json.dumps(tools, ensure_ascii=False)) >= min_chars:
+            out["tools"] = [*tools[:-1], {**tools[-1], "cache_control": dict(_EPHEMERAL_CACHE_CONTROL)}]
+
+    system = body.get("system")
+    if isinstance(system, str) and system.strip() and len(system) >= min_chars:
+        out["system"] = [{"type": "text", "text": system, "cache_control": dict(_EPHEMERAL_CACHE_CONTROL)}]
+    elif isinstance(system, list) and system:
+        text_indexes = [
+            index for index, block in enumerate(system) if isinstance(block, dict) and block.get("type") == "text"
+        ]
+        total_chars = sum(len(str(system[index].get("text") or "")) for index in text_indexes)
+        if text_indexes and total_chars >= min_chars:
+            blocks = list(system)
+            last = text_indexes[-1]
+            blocks[last] = {**blocks[last], "cache_control": dict(_EPHEMERAL_CACHE_CONTROL)}
+            out["system"] = blocks
+    return out
+
+
+def _prompt_cache_enabled(endpoint: dict[str, Any]) -> tuple[bool, int]:
+    from app.settings.config import get_settings
+
+    settings = get_settings()
+    enabled = bool(getattr(settings, "ai_anthropic_prompt_cache_enabled", True)) and endpoint.get(
+        "prompt_cache_enabled", True
+    ) is not False
+    return enabled, int(getattr(settings, "ai_anthropic_prompt_cache_min_chars", 0) or 0)
+
+
+def _merge_usage(usage: Optional[dict[str, Any]], candidate: Any) -> Optional[dict[str, Any]]:
+    """message_start 带 input/cache token，message_delta 带累计 output token；按 key 合并。"""
+
+    if not isinstance(candidate, dict):
+        return usage
+    merged = dict(usage or {})
+    merged.update({key: value for key, value in candidate.items() if value is not None})
+    return merged
+
+
+def _observe_prompt_cache_usage(endpoint: dict[str, Any], usage: Optional[dict[str, Any]]) -> None:
+    if not usage:
+        return
+    try:
+        from app.core.metrics import ai_prompt_cache_tokens_total
+
+        endpoint_id = str(endpoint.get("id") or "unknown")
+        for kind, key in (("read", "cache_read_input_tokens"), ("write", "cache_creation_input_tokens")):
+            value = usage.get(key)
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0:
+                ai_prompt_cache_tokens_total.labels(endpoint_id=endpoint_id, kind=kind).inc(value)
+    except Exception:  # pragma: no cover
+        pass
+
 
 class AnthropicMessagesAdapter:
     dialect = "anthropic.messages"
@@ -68,8 +150,12 @@ class AnthropicMessagesAdapter:
         rid = request_id or get_current_request_id()
         if rid:
             headers[REQUEST_ID_HEADER_NAME] = rid
+        enabled, min_chars = _prompt_cache_enabled(endpoint)
+        if enabled:
+            payload = apply_prompt_cache_breakpoints(payload, min_chars=min_chars)
         return url, headers, payload
 
+    @track_passive_health
     async def stream(
         self,
         *,
@@ -96,6 +182,7 @@ class AnthropicMessagesAdapter:
                     raw = await response.aread()
                     detail = self._format_upstream_error(raw)
                     raise ProviderError(f"upstream_http_{response.status_code}:{detail}") from exc
+                mark_upstream_connected()
                 upstream_request_id = response.headers.get("request-id") or response.headers.get("x-request-id")
                 content_type = str(response.headers.get("content-type") or "").lower()
 
@@ -164,7 +251,9 @@ class AnthropicMessagesAdapter:
                         raise ProviderError("upstream_empty_content")
                     reply_text = text.strip()
                     await publish("content_delta", {"delta": reply_text})
-                    return reply_text, json.dumps(data, ensure_ascii=False), upstream_request_id, None
+                    _observe_prompt_cache_usage(endpoint, data.get("usage") if isinstance(data.get("usage"), dict) else None)
+                    metadata = attach_usage(None, data.get("usage"))
+                    return reply_text, json.dumps(data, ensure_ascii=False), upstream_request_id, metadata
 
                 async for event_name, raw_text in iter_sse_frames(response):
                     if emit_raw and raw_text:
@@ -185,16 +274,17 @@ class AnthropicMessagesAdapter:
                                 )
                     if raw_text == "[DONE]":
                         break
-                    if not raw_text:
+                    if not raw_text or event_name == "ping":
+                        # ping 为保活帧，不含内容/usage，无需 JSON 解析
                         continue
                     try:
                         obj = json.loads(raw_text)
                     except Exception:
                         continue
 
-                    candidate_usage = obj.get("usage") if isinstance(obj, dict) else None
-                    if isinstance(candidate_usage, dict):
-                        usage = dict(candidate_usage)
+                    if isinstance(obj, dict):
+                        message = obj.get("message") if isinstance(obj.get("message"), dict) else {}
+                        usage = _merge_usage(_merge_usage(usage, message.get("usage")), obj.get("usage"))
 
                     if event_name == "error" or (isinstance(obj, dict) and obj.get("type") == "error"):
                         raise ProviderError("upstream_error")
@@ -210,13 +300,14 @@ class AnthropicMessagesAdapter:
                     if event_name == "message_stop":
                         break
 
+        _observe_prompt_cache_usage(endpoint, usage)
         reply_text = "".join(reply_parts).strip()
         if not reply_text:
             if emit_raw:
                 payload_out: dict[str, Any] = {"stream": True, "chunks": len(reply_parts), "raw_only": True}
                 if usage:
                     payload_out["usage"] = usage
-                return "", json.dumps(payload_out, ensure_ascii=False), upstream_request_id, None
+                return "", json.dumps(payload_out, ensure_ascii=False), upstream_request_id, attach_usage(None, usage)
             raise ProviderError("upstream_empty_content")
         payload_out: dict[str, Any] = {"stream": True, "chunks": len(reply_parts)}
         if usage:
@@ -225,7 +316,7 @@ class AnthropicMessagesAdapter:
             reply_text,
             json.dumps(payload_out, ensure_ascii=False),
             upstream_request_id,
-            None,
+            attach_usage(None, usage),
         )
 
 
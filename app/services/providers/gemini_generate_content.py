@@ -14,7 +14,10 @@ from app.auth import ProviderError
 from app.core.middleware import get_current_request_id
 from app.services.ai_url import normalize_ai_base_url
 
+from .passive_health import track_passive_health
 from .sse import iter_sse_frames
+from .timing import mark_upstream_connected
+from .usage import attach_usage
 
 PublishFn = Callable[[str, dict[str, Any]], Awaitable[None]]
 
@@ -48,6 +51,7 @@ class GeminiGenerateContentAdapter:
             headers["X-Request-Id"] = rid
         return url, headers, payload
 
+    @track_passive_health
     async def stream(
         self,
         *,
@@ -61,12 +65,14 @@ class GeminiGenerateContentAdapter:
     ) -> tuple[str, str, Optional[str], Optional[dict[str, Any]]]:
         url, headers, body = self.build_request(endpoint, model=model, api_key=api_key, payload=payload)
         reply_parts: list[str] = []
+        usage: Optional[dict[str, Any]] = None
         raw_frames = 0
         raw_chars = 0
 
         async with httpx.AsyncClient(timeout=timeout) as client:
             async with client.stream("POST", url, json=body, headers=headers) as response:
                 response.raise_for_status()
+                mark_upstream_connected()
 
                 content_type = str(response.headers.get("content-type") or "").lower()
                 if "text/event-stream" not in content_type:
@@ -123,7 +129,8 @@ class GeminiGenerateContentAdapter:
                             return "", json.dumps(payload_out, ensure_ascii=False), None, None
                         raise ProviderError("upstream_empty_content")
                     await publish("content_delta", {"delta": text})
-                    return text, json.dumps(data, ensure_ascii=False), None, None
+                    metadata = attach_usage(None, data.get("usageMetadata") if isinstance(data, dict) else None)
+                    return text, json.dumps(data, ensure_ascii=False), None, metadata
 
                 async for event_name, raw_text in iter_sse_frames(response):
                     if emit_raw and raw_text:
@@ -151,17 +158,26 @@ class GeminiGenerateContentAdapter:
                     except Exception:
                         continue
 
+                    # usageMetadata 在每个 chunk 中为累计值，保留最后一次即可。
+                    candidate_usage = obj.get("usageMetadata") if isinstance(obj, dict) else None
+                    if isinstance(candidate_usage, dict):
+                        usage = dict(candidate_usage)
+
                     text = _extract_text_from_chunk(obj)
                     if text:
                         reply_parts.append(text)
                         await publish("content_delta", {"delta": text})
 
         reply_text = "".join(reply_parts).strip()
+        payload_out: dict[str, Any] = {"stream": True, "chunks": len(reply_parts)}
+        if usage:
+            payload_out["usageMetadata"] = usage
         if not reply_text:
             if emit_raw:
-                return "", json.dumps({"stream": True, "chunks": len(reply_parts), "raw_only": True}, ensure_ascii=False), None, None
+                payload_out["raw_only"] = True
+                return "", json.dumps(payload_out, ensure_ascii=False), None, attach_usage(None, usage)
             raise ProviderError("upstream_empty_content")
-        return reply_text, json.dumps({"stream": True, "chunks": len(reply_parts)}, ensure_ascii=False), None, None
+        return reply_text, json.dumps(payload_out, ensure_ascii=False), None, attach_usage(None, usage)
 
 
 def _extract_text_from_chunk(obj: Any) -> str:
@@ -7,6 +7,7 @@ import logging
 import time
 from collections.abc import Awaitable, Callable
 from typing import Any, Optional
+from urllib.parse import urlparse
 
 import httpx
 
@@ -15,7 +16,10 @@ from app.core.middleware import REQUEST_ID_HEADER_NAME, get_current_request_id
 from app.services.ai_url import build_resolved_endpoints, normalize_ai_base_url
 from app.services.upstream_auth import is_retryable_auth_error, iter_auth_headers
 
+from .passive_health import track_passive_health
 from .sse import iter_sse_frames
+from .timing import mark_upstream_connected
+from .usage import attach_usage
 
 PublishFn = Callable[[str, dict[str, Any]], Awaitable[None]]
 
@@ -23,6 +27,17 @@ logger = logging.getLogger(__name__)
 
 _TRACE_UPSTREAM_RAW_MAX_FRAMES = 20
 _TRACE_UPSTREAM_RAW_MAX_CHARS = 8000
+# 官方 OpenAI 一定支持 stream_options；其余兼容厂商可能对未知字段直接返回 400，需显式开启
+_STREAM_USAGE_NATIVE_HOSTS = frozenset({"api.openai.com"})
+
+
+def _stream_include_usage_enabled(url: str) -> bool:
+    from app.settings.config import get_settings
+
+    if bool(getattr(get_settings(), "ai_openai_stream_include_usage", False)):
+        return True
+    host = (urlparse(url).hostname or "").lower()
+    return host in _STREAM_USAGE_NATIVE_HOSTS
 
 
 class OpenAIChatCompletionsAdapter:
@@ -66,9 +81,13 @@ class OpenAIChatCompletionsAdapter:
         # payload 模式：允许在白名单范围内全量透传；SSOT：服务端强制 stream=true
         payload = {str(k): v for k, v in (openai_req or {}).items() if v is not None}
         payload["stream"] = True
+        # 流末尾的 usage chunk（prompt/completion/cached tokens）；调用方显式传入 stream_options 时保持原样。
+        if "stream_options" not in payload and _stream_include_usage_enabled(str(chat_url)):
+            payload["stream_options"] = {"include_usage": True}
 
         return str(chat_url), headers, payload
 
+    @track_passive_health
     async def stream(
         self,
         *,
@@ -112,6 +131,7 @@ class OpenAIChatCompletionsAdapter:
                             continue
 
                     response.raise_for_status()
+                    mark_upstream_connected()
                     upstream_request_id = response.headers.get("x-request-id") or response.headers.get("request-id")
                     content_type = str(response.headers.get("content-type") or "").lower()
 
@@ -170,7 +190,8 @@ class OpenAIChatCompletionsAdapter:
 
                         reply_text = str(content).strip()
                         await publish("content_delta", {"delta": reply_text})
-                        return reply_text, json.dumps(data, ensure_ascii=False), upstream_request_id, None
+                        metadata = attach_usage(None, data.get("usage"))
+                        return reply_text, json.dumps(data, ensure_ascii=False), upstream_request_id, metadata
 
                     async for event_name, raw_text in iter_sse_frames(response):
                         if emit_raw and raw_text:
@@ -245,7 +266,7 @@ class OpenAIChatCompletionsAdapter:
                             reply_text,
                             json.dumps(payload_out, ensure_ascii=False),
                             upstream_request_id,
-                            metadata,
+                            attach_usage(metadata, usage),
                         )
 
                     names = list(dict.fromkeys([x for x in tool_call_names if x]))
@@ -256,6 +277,7 @@ class OpenAIChatCompletionsAdapter:
                         payload_out: dict[str, Any] = {"stream": True, "chunks": len(reply_parts), "raw_only": True}
                         if usage:
                             payload_out["usage"] = usage
+                        metadata = attach_usage(metadata, usage)
                         return "", json.dumps(payload_out, ensure_ascii=False), upstream_request_id, metadata
 
                     if names:
@@ -15,7 +15,10 @@ from app.core.middleware import REQUEST_ID_HEADER_NAME, get_current_request_id
 from app.services.ai_url import normalize_ai_base_url
 from app.services.upstream_auth import is_retryable_auth_error, iter_auth_headers
 
+from .passive_health import track_passive_health
 from .sse import iter_sse_frames
+from .timing import mark_upstream_connected
+from .usage import attach_usage
 
 PublishFn = Callable[[str, dict[str, Any]], Awaitable[None]]
 
@@ -47,6 +50,7 @@ class OpenAIResponsesAdapter:
         body.setdefault("stream", True)
         return url, headers, body
 
+    @track_passive_health
     async def stream(
         self,
         *,
@@ -82,6 +86,7 @@ class OpenAIResponsesAdapter:
                         if is_retryable_auth_error(response.status_code, retry_payload):
                             continue
                     response.raise_for_status()
+                    mark_upstream_connected()
 
                     upstream_request_id = response.headers.get("x-request-id") or response.headers.get("request-id")
                     content_type = str(response.headers.get("content-type") or "").lower()
@@ -139,7 +144,8 @@ class OpenAIResponsesAdapter:
                                 return "", json.dumps(payload_out, ensure_ascii=False), upstream_request_id, None
                             raise ProviderError("upstream_empty_content")
                         await publish("content_delta", {"delta": text})
-                        return text, json.dumps(data, ensure_ascii=False), upstream_request_id, None
+                        metadata = attach_usage(None, data.get("usage") if isinstance(data, dict) else None)
+                        return text, json.dumps(data, ensure_ascii=False), upstream_request_id, metadata
 
                     async for event_name, raw_text in iter_sse_frames(response):
                         if emit_raw and raw_text:
@@ -168,6 +174,9 @@ class OpenAIResponsesAdapter:
                             continue
 
                         candidate_usage = obj.get("usage") if isinstance(obj, dict) else None
+                        if candidate_usage is None and isinstance(obj, dict) and isinstance(obj.get("response"), dict):
+                            # response.completed：usage 位于 response 对象内
+                            candidate_usage = obj["response"].get("usage")
                         if isinstance(candidate_usage, dict):
                             usage = dict(candidate_usage)
 
@@ -196,7 +205,8 @@ class OpenAIResponsesAdapter:
                             payload_out: dict[str, Any] = {"stream": True, "chunks": len(reply_parts), "raw_only": True}
                             if usage:
                                 payload_out["usage"] = usage
-                            return "", json.dumps(payload_out, ensure_ascii=False), upstream_request_id, None
+                            metadata = attach_usage(None, usage)
+                            return "", json.dumps(payload_out, ensure_ascii=False), upstream_request_id, metadata
                         raise ProviderError("upstream_empty_content")
                     payload_out: dict[str, Any] = {"stream": True, "chunks": len(reply_parts)}
                     if usage:
@@ -205,7 +215,7 @@ class OpenAIResponsesAdapter:
                         reply_text,
                         json.dumps(payload_out, ensure_ascii=False),
                         upstream_request_id,
-                        None,
+                        attach_usage(None, usage),
                     )
 
         raise ProviderError("upstream_no_response")
@@ -0,0 +1,59 @@
+"""Adapter 侧的被动健康度采集（真实请求的成功/首包延迟/错误类别）。"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+from collections.abc import Awaitable, Callable
+from time import perf_counter
+from typing import Any, Optional, TypeVar
+
+from app.services.endpoint_health import classify_passive_error, get_endpoint_health_tracker
+
+_StreamFn = TypeVar("_StreamFn", bound=Callable[..., Awaitable[Any]])
+
+
+def track_passive_health(stream: _StreamFn) -> _StreamFn:
+    """装饰 adapter.stream：按 endpoint 记录本次上游调用结果。
+
+    延迟取首个增量（content_delta/upstream_raw）到达时间，无增量时取整体耗时；
+    取消（客户端断开/对冲落败）不代表端点健康状况，不做记录。
+    """
+
+    @functools.wraps(stream)
+    async def wrapper(self: Any, *, endpoint: dict[str, Any], publish: Callable[..., Awaitable[None]], **kwargs: Any):
+        endpoint_id = _parse_endpoint_id(endpoint)
+        if endpoint_id is None:
+            return await stream(self, endpoint=endpoint, publish=publish, **kwargs)
+
+        started = perf_counter()
+        first_delta_at: Optional[float] = None
+
+        async def _publish(event: str, data: dict[str, Any]) -> None:
+            nonlocal first_delta_at
+            if first_delta_at is None and event in ("content_delta", "upstream_raw"):
+                first_delta_at = perf_counter()
+            await publish(event, data)
+
+        tracker = get_endpoint_health_tracker()
+        try:
+            result = await stream(self, endpoint=endpoint, publish=_publish, **kwargs)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            tracker.record_failure(endpoint_id, classify_passive_error(exc))
+            raise
+        tracker.record_success(endpoint_id, latency_ms=((first_delta_at or perf_counter()) - started) * 1000)
+        return result
+
+    return wrapper  # type: ignore[return-value]
+
+
+def _parse_endpoint_id(endpoint: dict[str, Any]) -> Optional[int]:
+    raw = endpoint.get("id") if isinstance(endpoint, dict) else None
+    if raw is None or isinstance(raw, bool):
+        return None
+    try:
+        return int(raw)
+    except (TypeError, ValueError):
+        return None
@@ -2,46 +2,86 @@
 
 from __future__ import annotations
 
-from collections.abc import AsyncIterator
+from collections.abc import AsyncIterable, AsyncIterator
 from typing import Optional
 
 import httpx
 
+_FRAME_SEP = b"\n\n"
 
-async def iter_sse_frames(response: httpx.Response) -> AsyncIterator[tuple[Optional[str], str]]:
-    """Iterate SSE frames (event_name, data_text)."""
 
-    current_event: Optional[str] = None
-    data_lines: list[str] = []
-
-    async def flush() -> AsyncIterator[tuple[Optional[str], str]]:
-        nonlocal current_event, data_lines
-        if not data_lines:
-            current_event = None
-            return
-        raw_text = "\n".join(data_lines).strip()
-        data_lines = []
-        event_name = (current_event or "").strip() or None
-        current_event = None
-        if raw_text:
-            yield event_name, raw_text
-
-    async for line in response.aiter_lines():
-        if line is None:
-            continue
-        if not line:
-            async for item in flush():
-                yield item
-            continue
-        if line.startswith(":"):
-            continue
-        if line.startswith("event:"):
-            current_event = line[len("event:") :].strip()
+def _parse_frame(frame: bytes) -> tuple[Optional[str], str]:
+    """解析单个 SSE 帧（不含分隔空行）；只解码 event 名与 data 负载，注释/未知字段不做任何解码。"""
+
+    event_name: Optional[str] = None
+    data_parts: list[bytes] = []
+    for line in frame.split(b"\n"):
+        if line.startswith(b"data:"):
+            data_parts.append(line[5:].strip())
+        elif line.startswith(b"event:"):
+            event_name = line[6:].strip().decode("utf-8", errors="replace") or None
+    if not data_parts:
+        return event_name, ""
+    return event_name, b"\n".join(data_parts).strip().decode("utf-8", errors="replace")
+
+
+async def iter_sse_byte_frames(chunks: AsyncIterable[bytes]) -> AsyncIterator[tuple[Optional[str], str]]:
+    """字节级 SSE 分帧：复用一个 bytearray 缓冲，用 rfind(b"\\n\\n") 找到本轮最后一个完整帧边界后整体切帧。
+
+    - 只对 data 负载做 UTF-8 解码（多字节字符跨 chunk 时，整帧到齐后才解码，不会被截断）；
+    - 不做 JSON 解析，由 adapter 按需处理；
+    - CRLF 行尾统一折叠为 LF 后再分帧。
+    """
+
+    buffer = bytearray()
+    scan_from = 0
+    event_names: dict[bytes, str] = {}
+    async for chunk in chunks:
+        if not chunk:
             continue
-        if line.startswith("data:"):
-            data_lines.append(line[len("data:") :].strip())
+        pending_cr = buffer.endswith(b"\r")
+        buffer += chunk
+        if pending_cr or b"\r" in chunk:
+            # 末尾孤立的 \r 可能与下个 chunk 的 \n 组成 CRLF，暂不折叠
+            tail = buffer[-1:] if buffer.endswith(b"\r") else b""
+            body = buffer[:-1] if tail else buffer
+            buffer = bytearray(body.replace(b"\r\n", b"\n").replace(b"\r", b"\n")) + tail
+            scan_from = 0
+
+        boundary = buffer.rfind(_FRAME_SEP, scan_from)
+        if boundary < 0:
+            # 下一轮只需从缓冲末尾附近继续查找分隔符
+            scan_from = max(0, len(buffer) - 1)
             continue
+        block = bytes(buffer[:boundary])
+        del buffer[: boundary + 2]
+        scan_from = max(0, len(buffer) - 1)
+        for frame in block.split(_FRAME_SEP):
+            # 快路径（内联）：`data: ...` 或 `event: x\ndata: ...` 两种单行 data 帧，覆盖主流上游的绝大多数帧
+            event_name = None
+            rest = frame
+            if frame.startswith(b"event:"):
+                head, _, rest = frame.partition(b"\n")
+                event_name = event_names.get(head)
+                if event_name is None:
+                    event_name = event_names[head] = head[6:].strip().decode("utf-8", errors="replace")
+            if rest.startswith(b"data:") and b"\n" not in rest:
+                data = rest[5:].strip().decode("utf-8", errors="replace")
+            elif frame:
+                event_name, data = _parse_frame(frame)
+            else:
+                continue
+            if data:
+                yield event_name or None, data
 
-    async for item in flush():
-        yield item
+    if buffer.strip():
+        event_name, data = _parse_frame(bytes(buffer.strip(b"\n")))
+        if data:
+            yield event_name, data
+
+
+def iter_sse_frames(response: httpx.Response) -> AsyncIterator[tuple[Optional[str], str]]:
+    """Iterate SSE frames (event_name, data_text)."""
 
+    # 直接返回底层生成器，避免每帧多一层 async generator 转发
+    return iter_sse_byte_frames(response.aiter_bytes())
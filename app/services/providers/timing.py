@@ -0,0 +1,41 @@
+"""单次上游调用的时间点采集（adapter 标记，AIService 汇总为直方图）。"""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Optional
+
+
+@dataclass(slots=True)
+class UpstreamTiming:
+    """perf_counter 时间点：started_at=发起请求，connected_at=收到上游响应头。"""
+
+    started_at: float = field(default_factory=perf_counter)
+    connected_at: Optional[float] = None
+
+
+_current_timing: ContextVar[Optional[UpstreamTiming]] = ContextVar("upstream_timing", default=None)
+
+
+@contextmanager
+def track_upstream_timing() -> Iterator[UpstreamTiming]:
+    """在当前上下文（单次上游尝试所在的 task）内启用时间点采集。"""
+
+    timing = UpstreamTiming()
+    token = _current_timing.set(timing)
+    try:
+        yield timing
+    finally:
+        _current_timing.reset(token)
+
+
+def mark_upstream_connected() -> None:
+    """adapter 在拿到上游响应头（状态码校验通过）后调用；未启用采集时为空操作。"""
+
+    timing = _current_timing.get()
+    if timing is not None and timing.connected_at is None:
+        timing.connected_at = perf_counter()
@@ -0,0 +1,69 @@
+"""把各 dialect 上游返回的 usage 块归一为统一的 token 计数。"""
+
+from __future__ import annotations
+
+from typing import Any, Optional
+
+TOKEN_USAGE_FIELDS = ("prompt_tokens", "completion_tokens", "cached_tokens", "total_tokens")
+
+
+def _int(value: Any) -> int:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return 0
+    return max(0, int(value))
+
+
+def normalize_usage(raw: Any) -> Optional[dict[str, int]]:
+    """返回 {prompt_tokens, completion_tokens, cached_tokens, total_tokens}；无可识别字段时返回 None。
+
+    - OpenAI Chat：prompt_tokens / completion_tokens / prompt_tokens_details.cached_tokens
+    - OpenAI Responses：input_tokens / output_tokens / input_tokens_details.cached_tokens
+    - Anthropic：input_tokens 不含缓存部分，prompt = input + cache_read + cache_creation，cached = cache_read
+    - Gemini：promptTokenCount / candidatesTokenCount / cachedContentTokenCount / totalTokenCount
+    """
+
+    if not isinstance(raw, dict) or not raw:
+        return None
+
+    if "promptTokenCount" in raw or "candidatesTokenCount" in raw or "totalTokenCount" in raw:
+        prompt = _int(raw.get("promptTokenCount"))
+        completion = _int(raw.get("candidatesTokenCount")) + _int(raw.get("thoughtsTokenCount"))
+        cached = _int(raw.get("cachedContentTokenCount"))
+        total = _int(raw.get("totalTokenCount"))
+    elif "prompt_tokens" in raw or "completion_tokens" in raw:
+        details = raw.get("prompt_tokens_details")
+        prompt = _int(raw.get("prompt_tokens"))
+        completion = _int(raw.get("completion_tokens"))
+        cached = _int(details.get("cached_tokens")) if isinstance(details, dict) else 0
+        total = _int(raw.get("total_tokens"))
+    elif "cache_read_input_tokens" in raw or "cache_creation_input_tokens" in raw:
+        cached = _int(raw.get("cache_read_input_tokens"))
+        prompt = _int(raw.get("input_tokens")) + cached + _int(raw.get("cache_creation_input_tokens"))
+        completion = _int(raw.get("output_tokens"))
+        total = 0
+    elif "input_tokens" in raw or "output_tokens" in raw:
+        details = raw.get("input_tokens_details")
+        prompt = _int(raw.get("input_tokens"))
+        completion = _int(raw.get("output_tokens"))
+        cached = _int(details.get("cached_tokens")) if isinstance(details, dict) else 0
+        total = _int(raw.get("total_tokens"))
+    else:
+        return None
+
+    return {
+        "prompt_tokens": prompt,
+        "completion_tokens": completion,
+        "cached_tokens": cached,
+        "total_tokens": total or prompt + completion,
+    }
+
+
+def attach_usage(metadata: Optional[dict[str, Any]], raw_usage: Any) -> Optional[dict[str, Any]]:
+    """把归一后的 usage 放入 adapter 返回的 metadata（metadata["usage"]）。"""
+
+    usage = normalize_usage(raw_usage)
+    if usage is None:
+        return metadata
+    out = dict(metadata or {})
+    out["usage"] = usage
+    return out
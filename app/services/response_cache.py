@@ -0,0 +1,181 @@
+"""精确匹配的上游响应缓存 + 在途请求合并（仅用于确定性请求，默认关闭）。"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+CacheEvent = tuple[str, dict[str, Any]]
+
+
+def build_response_cache_key(parts: dict[str, Any]) -> str:
+    """对最终上游请求体做规范化 JSON（排序 key、紧凑分隔符）后取 sha256。"""
+
+    canonical = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def is_deterministic_payload(body: dict[str, Any]) -> bool:
+    """temperature 显式为 0（OpenAI/Anthropic 顶层，或 Gemini generationConfig）才视为确定性请求。"""
+
+    temperature = body.get("temperature")
+    if temperature is None:
+        generation_config = body.get("generationConfig")
+        if isinstance(generation_config, dict):
+            temperature = generation_config.get("temperature")
+    if isinstance(temperature, bool) or not isinstance(temperature, (int, float)):
+        return False
+    return float(temperature) == 0.0
+
+
+@dataclass(slots=True)
+class CachedResponse:
+    """已完成的上游响应：事件序列（发布前快照）+ 调用结果。"""
+
+    events: list[CacheEvent]
+    result: tuple[Any, ...]
+    saved_tokens: int
+    expires_at: float
+
+
+@dataclass(slots=True)
+class InflightResponse:
+    """在途的首个请求（leader）；相同 key 的后续请求订阅其事件流而不是再调用上游。"""
+
+    events: list[CacheEvent] = field(default_factory=list)
+    result: Optional[tuple[Any, ...]] = None
+    saved_tokens: int = 0
+    failed: bool = False
+    done: bool = False
+    condition: asyncio.Condition = field(default_factory=asyncio.Condition)
+
+    async def append(self, event: str, data: dict[str, Any]) -> None:
+        async with self.condition:
+            self.events.append((event, data))
+            self.condition.notify_all()
+
+    async def finish(self, result: Optional[tuple[Any, ...]], *, saved_tokens: int = 0) -> None:
+        async with self.condition:
+            self.result = result
+            self.saved_tokens = saved_tokens
+            self.failed = result is None
+            self.done = True
+            self.condition.notify_all()
+
+    async def follow(self) -> AsyncIterator[CacheEvent]:
+        index = 0
+        while True:
+            async with self.condition:
+                await self.condition.wait_for(lambda: index < len(self.events) or self.done)
+                pending = self.events[index:]
+                finished = self.done
+            for item in pending:
+                yield item
+            index += len(pending)
+            if finished and index >= len(self.events):
+                return
+
+
+class ResponseCache:
+    """TTL + 条目数上限的 LRU；同一 key 同时只有一个在途请求访问上游。"""
+
+    def __init__(
+        self,
+        *,
+        ttl_seconds: float = 300.0,
+        max_entries: int = 256,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._ttl_seconds = max(0.0, float(ttl_seconds))
+        self._max_entries = max(1, int(max_entries))
+        self._clock = clock
+        self._entries: OrderedDict[str, CachedResponse] = OrderedDict()
+        self._inflight: dict[str, InflightResponse] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= self._clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def join(self, key: str) -> tuple[InflightResponse, bool]:
+        """返回 (在途请求, 是否 leader)；leader 负责调用上游并在结束时 complete/abort。"""
+
+        with self._lock:
+            inflight = self._inflight.get(key)
+            if inflight is not None:
+                return inflight, False
+            inflight = InflightResponse()
+            self._inflight[key] = inflight
+            return inflight, True
+
+    async def complete(self, key: str, inflight: InflightResponse, result: tuple[Any, ...], *, saved_tokens: int) -> None:
+        with self._lock:
+            if self._inflight.get(key) is inflight:
+                del self._inflight[key]
+            if self._ttl_seconds > 0:
+                self._entries[key] = CachedResponse(
+                    events=list(inflight.events),
+                    result=result,
+                    saved_tokens=saved_tokens,
+                    expires_at=self._clock() + self._ttl_seconds,
+                )
+                self._entries.move_to_end(key)
+                while len(self._entries) > self._max_entries:
+                    self._entries.popitem(last=False)
+        await inflight.finish(result, saved_tokens=saved_tokens)
+
+    async def abort(self, key: str, inflight: InflightResponse) -> None:
+        with self._lock:
+            if self._inflight.get(key) is inflight:
+                del self._inflight[key]
+        await inflight.finish(None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def observe_response_cache(result: str, *, saved_tokens: int = 0) -> None:
+    try:
+        from app.core.metrics import ai_response_cache_requests_total, ai_response_cache_saved_tokens_total
+
+        ai_response_cache_requests_total.labels(result=result).inc()
+        if saved_tokens > 0:
+            ai_response_cache_saved_tokens_total.inc(saved_tokens)
+    except Exception:  # pragma: no cover
+        pass
+
+
+_response_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> ResponseCache:
+    """获取全局响应缓存实例。"""
+
+    global _response_cache
+    if _response_cache is None:
+        from app.settings.config import get_settings
+
+        settings = get_settings()
+        _response_cache = ResponseCache(
+            ttl_seconds=settings.ai_response_cache_ttl_seconds,
+            max_entries=settings.ai_response_cache_max_entries,
+        )
+    return _response_cache
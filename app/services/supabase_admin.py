@@ -2,8 +2,10 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
-from typing import Any, Optional
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional
 
 import httpx
 
@@ -108,6 +110,30 @@ class SupabaseAdminClient:
                 hint="Set SUPABASE_SERVICE_ROLE_KEY",
         )
         self._timeout = settings.http_timeout_seconds
+        # 复用连接池（keep-alive）：同一用户的多表并发读取不再各自建连/握手
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @asynccontextmanager
+    async def _session(self) -> AsyncIterator[httpx.AsyncClient]:
+        loop = asyncio.get_running_loop()
+        client = self._client
+        if client is None or client.is_closed or self._client_loop is not loop:
+            # 连接池绑定事件循环：循环变化（测试/重启）时重建
+            client = httpx.AsyncClient(
+                timeout=self._timeout,
+                limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+            )
+            self._client = client
+            self._client_loop = loop
+        yield client
+
+    async def aclose(self) -> None:
+        client = self._client
+        self._client = None
+        self._client_loop = None
+        if client is not None and not client.is_closed:
+            await client.aclose()
 
     @staticmethod
     def _resolve_base_url(settings: Settings) -> str:
@@ -160,7 +186,7 @@ class SupabaseAdminClient:
         params = {"select": select, "user_id": f"eq.{user_id}", "limit": 1}
 
         try:
-            async with httpx.AsyncClient(timeout=self._timeout) as client:
+            async with self._session() as client:
                 response = await client.get(url, headers=self._headers(), params=params)
                 response.raise_for_status()
         except httpx.HTTPStatusError as exc:
@@ -237,7 +263,7 @@ class SupabaseAdminClient:
         headers = self._headers({"Prefer": "resolution=merge-duplicates,return=representation"})
 
         try:
-            async with httpx.AsyncClient(timeout=self._timeout) as client:
+            async with self._session() as client:
                 response = await client.post(url, headers=headers, params=params, json=values)
                 response.raise_for_status()
         except httpx.HTTPStatusError as exc:
@@ -293,7 +319,7 @@ class SupabaseAdminClient:
         headers = self._headers({"Prefer": "return=representation"})
 
         try:
-            async with httpx.AsyncClient(timeout=self._timeout) as client:
+            async with self._session() as client:
                 response = await client.patch(url, headers=headers, params=params, json=values)
                 response.raise_for_status()
         except httpx.HTTPStatusError as exc:
@@ -361,7 +387,7 @@ class SupabaseAdminClient:
         headers = self._headers({"Prefer": "count=exact"} if with_count else None)
 
         try:
-            async with httpx.AsyncClient(timeout=self._timeout) as client:
+            async with self._session() as client:
                 response = await client.get(url, headers=headers, params=params)
                 response.raise_for_status()
         except httpx.HTTPStatusError as exc:
@@ -54,6 +54,8 @@ class Settings(BaseSettings):
     endpoint_monitor_probe_enabled: bool = Field(default=True, alias="ENDPOINT_MONITOR_PROBE_ENABLED")
 
     jwks_cache_ttl_seconds: int = Field(default=900, alias="JWKS_CACHE_TTL_SECONDS")
+    # Dashboard JWT 连通性：读取 JWKS 缓存状态，后台探针最多每个间隔刷新一次（不随推送/请求频率出网）
+    jwks_probe_interval_seconds: float = Field(default=300.0, alias="JWKS_PROBE_INTERVAL_SECONDS")
     # 这里使用 List[str] 以便更宽松地接受占位符/非完整 URL，由 JWT 验证器在使用时再做规范化
     allowed_issuers: List[str] = Field(default_factory=list, alias="JWT_ALLOWED_ISSUERS")
     required_audience: Optional[str] = Field(default=None, alias="JWT_AUDIENCE")
@@ -116,6 +118,55 @@ class Settings(BaseSettings):
     # AI 端点选择策略
     allow_test_ai_endpoints: bool = Field(default=False, alias="ALLOW_TEST_AI_ENDPOINTS")
     ai_strict_model_routing: bool = Field(default=False, alias="AI_STRICT_MODEL_ROUTING")
+    # 同一模型存在多个可用端点时，按实时 TTFT/错误率 + 端点权重做负载均衡（默认关闭：沿用“首个可用端点”）
+    ai_endpoint_balancing_enabled: bool = Field(default=False, alias="AI_ENDPOINT_BALANCING_ENABLED")
+    ai_endpoint_balancing_ewma_alpha: float = Field(default=0.3, alias="AI_ENDPOINT_BALANCING_EWMA_ALPHA")
+    # 端点熔断：连续超时/5xx 达到阈值后摘除，冷却后以少量试探请求恢复（默认关闭）
+    ai_circuit_breaker_enabled: bool = Field(default=False, alias="AI_CIRCUIT_BREAKER_ENABLED")
+    ai_circuit_breaker_failure_threshold: int = Field(default=5, alias="AI_CIRCUIT_BREAKER_FAILURE_THRESHOLD")
+    ai_circuit_breaker_open_seconds: float = Field(default=30.0, alias="AI_CIRCUIT_BREAKER_OPEN_SECONDS")
+    ai_circuit_breaker_half_open_max_trials: int = Field(default=1, alias="AI_CIRCUIT_BREAKER_HALF_OPEN_MAX_TRIALS")
+    # 首包前切换：TTFT 超过阈值或首个增量前报错时，切到映射中的下一候选（端点/模型）；默认关闭
+    ai_upstream_failover_enabled: bool = Field(default=False, alias="AI_UPSTREAM_FAILOVER_ENABLED")
+    ai_upstream_failover_ttft_seconds: float = Field(default=10.0, alias="AI_UPSTREAM_FAILOVER_TTFT_SECONDS")
+    # 对冲请求：并发竞速两条上游，先出增量者获胜、另一条取消（会放大上游用量，默认关闭）
+    ai_upstream_hedge_enabled: bool = Field(default=False, alias="AI_UPSTREAM_HEDGE_ENABLED")
+    ai_upstream_hedge_delay_seconds: float = Field(default=0.0, alias="AI_UPSTREAM_HEDGE_DELAY_SECONDS")
+    # 单次请求最多尝试的上游路由数（含主路由）
+    ai_upstream_max_attempts: int = Field(default=2, alias="AI_UPSTREAM_MAX_ATTEMPTS")
+    # 端点巡检：并发探针数与单端点截止时间（秒）
+    ai_endpoint_probe_concurrency: int = Field(default=8, alias="AI_ENDPOINT_PROBE_CONCURRENCY")
+    ai_endpoint_probe_deadline_seconds: float = Field(default=15.0, alias="AI_ENDPOINT_PROBE_DEADLINE_SECONDS")
+    # 被动健康度：周期巡检时，近期（idle_seconds 内）有真实成功流量且无超时/5xx 的端点不再主动探测
+    ai_passive_health_enabled: bool = Field(default=True, alias="AI_PASSIVE_HEALTH_ENABLED")
+    ai_passive_health_idle_seconds: float = Field(default=120.0, alias="AI_PASSIVE_HEALTH_IDLE_SECONDS")
+    # 被动跳过的上限：距上次主动探针（last_checked_at）超过该时长仍强制探测一次，刷新 model_list 与探针延迟
+    ai_passive_health_max_probe_age_seconds: float = Field(
+        default=1800.0, alias="AI_PASSIVE_HEALTH_MAX_PROBE_AGE_SECONDS"
+    )
+    # 精确匹配响应缓存 + 在途请求合并（默认关闭；默认只缓存 temperature=0 的确定性请求）
+    ai_response_cache_enabled: bool = Field(default=False, alias="AI_RESPONSE_CACHE_ENABLED")
+    ai_response_cache_ttl_seconds: float = Field(default=300.0, alias="AI_RESPONSE_CACHE_TTL_SECONDS")
+    ai_response_cache_max_entries: int = Field(default=256, alias="AI_RESPONSE_CACHE_MAX_ENTRIES")
+    ai_response_cache_deterministic_only: bool = Field(default=True, alias="AI_RESPONSE_CACHE_DETERMINISTIC_ONLY")
+    # Anthropic prompt caching：自动为 system / tools 插入 cache_control 断点（端点级 prompt_cache_enabled 可单独关闭）
+    ai_anthropic_prompt_cache_enabled: bool = Field(default=True, alias="AI_ANTHROPIC_PROMPT_CACHE_ENABLED")
+    ai_anthropic_prompt_cache_min_chars: int = Field(default=2048, alias="AI_ANTHROPIC_PROMPT_CACHE_MIN_CHARS")
+    # OpenAI 流式请求附带 stream_options.include_usage（api.openai.com 始终附带；其余兼容厂商可能拒绝该字段，默认关闭）
+    ai_openai_stream_include_usage: bool = Field(default=False, alias="AI_OPENAI_STREAM_INCLUDE_USAGE")
+    # 端点并发上限（0=不限制；端点级 max_concurrency 优先）与排队最长等待（超时后走切换/返回错误）
+    ai_endpoint_max_concurrency: int = Field(default=0, alias="AI_ENDPOINT_MAX_CONCURRENCY")
+    ai_endpoint_queue_max_wait_seconds: float = Field(default=10.0, alias="AI_ENDPOINT_QUEUE_MAX_WAIT_SECONDS")
+    # 屏蔽模型列表常驻内存；blocked_models.json 的 mtime 至多每 N 秒检查一次（外部改文件时重新加载）
+    ai_blocked_models_check_interval_seconds: float = Field(
+        default=2.0, alias="AI_BLOCKED_MODELS_CHECK_INTERVAL_SECONDS"
+    )
+    # 配置事件总线：多 worker 共享 SQLite 时，轮询 config_versions 感知其他进程配置写入的间隔（秒）
+    config_event_poll_interval_seconds: float = Field(default=1.0, alias="CONFIG_EVENT_POLL_INTERVAL_SECONDS")
+    # 日配额内存计数：每次向 SQLite 写前预占的单位数（崩溃时至多少计 chunk-1 次可用额度，绝不超额）
+    ai_daily_quota_reservation_chunk: int = Field(default=5, alias="AI_DAILY_QUOTA_RESERVATION_CHUNK")
+    # 日配额内存计数：批量归还空闲/跨日预占的周期（秒）
+    ai_daily_quota_flush_interval_seconds: float = Field(default=30.0, alias="AI_DAILY_QUOTA_FLUSH_INTERVAL_SECONDS")
 
     model_config = SettingsConfigDict(
         env_file=".env",
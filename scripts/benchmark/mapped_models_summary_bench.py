@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Dashboard 映射模型可用性摘要基准（本地临时 SQLite，不出网）：
+
+对比“逐个解析”（旧实现：每个 key 调用 resolve_model_key，各自重新读取端点/映射/屏蔽列表）与
+“批量解析”（当前实现：LlmModelRegistry.resolve_model_keys 在一次加载的快照上单趟解析）
+在 N 个映射 key（默认 200）下完成一次摘要的耗时。
+
+用法：
+    python scripts/benchmark/mapped_models_summary_bench.py --keys 200 --endpoints 5 --rounds 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(REPO_ROOT))
+
+os.environ.setdefault("SUPABASE_PROVIDER_ENABLED", "false")
+
+from app.db.sqlite_manager import SQLiteManager  # noqa: E402
+from app.services.ai_config_service import AIConfigService  # noqa: E402
+from app.services.llm_model_registry import LlmModelRegistry, ResolvedProviderRoute  # noqa: E402
+from app.services.model_mapping_service import ModelMappingService  # noqa: E402
+from app.settings.config import get_settings  # noqa: E402
+
+
+async def _seed(config: AIConfigService, mapping: ModelMappingService, *, keys: int, endpoints: int) -> list[str]:
+    for e in range(endpoints):
+        await config.create_endpoint(
+            {
+                "name": f"bench-{e}",
+                "base_url": f"http://bench-{e}.upstream.local",
+                "api_key": "k",
+                "model_list": [f"model-{i}" for i in range(e, keys, endpoints)],
+            }
+        )
+    names: list[str] = []
+    for i in range(keys):
+        # 每 10 个 key 有一个指向不可路由的模型，覆盖“映射无可路由候选 → 回退端点默认模型”路径
+        model = f"model-{i}" if i % 10 else f"missing-{i}"
+        await mapping.upsert_mapping(
+            {"scope_type": "mapping", "scope_key": f"key-{i}", "default_model": model, "candidates": [model], "is_active": True}
+        )
+        names.append(f"key-{i}")
+    return names
+
+
+async def _sequential(registry: LlmModelRegistry, keys: list[str]) -> int:
+    available = 0
+    for key in keys:
+        try:
+            await registry.resolve_model_key(key)
+            available += 1
+        except Exception:
+            continue
+    return available
+
+
+async def _batch(registry: LlmModelRegistry, keys: list[str]) -> int:
+    resolved = await registry.resolve_model_keys(keys)
+    return sum(1 for route in resolved.values() if isinstance(route, ResolvedProviderRoute))
+
+
+async def _time(call, registry: LlmModelRegistry, keys: list[str], rounds: int) -> tuple[float, int]:
+    samples: list[float] = []
+    available = 0
+    for _ in range(rounds):
+        start = time.perf_counter()
+        available = await call(registry, keys)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), available
+
+
+async def _main(args: argparse.Namespace) -> int:
+    settings = get_settings()
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        db = SQLiteManager(tmp_path / "bench.sqlite3")
+        await db.init()
+        try:
+            config = AIConfigService(db, settings, storage_dir=tmp_path / "runtime")
+            mapping = ModelMappingService(config, db, tmp_path / "runtime")
+            registry = LlmModelRegistry(config, mapping, settings)
+            keys = await _seed(config, mapping, keys=args.keys, endpoints=args.endpoints)
+            await _batch(registry, keys)  # 预热映射/屏蔽列表缓存
+
+            seq_ms, seq_available = await _time(_sequential, registry, keys, args.rounds)
+            batch_ms, batch_available = await _time(_batch, registry, keys, args.rounds)
+            if seq_available != batch_available:
+                print(f"MISMATCH sequential={seq_available} batch={batch_available}")
+                return 1
+
+            print(f"keys={args.keys} endpoints={args.endpoints} available={batch_available} rounds={args.rounds}")
+            print(f"{'sequential ms':>14} {'batch ms':>9} {'speedup':>8}")
+            print(f"{seq_ms:>14.2f} {batch_ms:>9.2f} {seq_ms / max(batch_ms, 1e-6):>7.1f}x")
+        finally:
+            await db.close()
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Dashboard mapped-models summary resolution benchmark")
+    parser.add_argument("--keys", type=int, default=200)
+    parser.add_argument("--endpoints", type=int, default=5)
+    parser.add_argument("--rounds", type=int, default=10)
+    return asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+prompt 内嵌模型映射解析基准（本地临时 SQLite，不出网）：
+
+对比“全量扫描”（旧实现：每次解析都分页读取全部 ai_prompts 并解析 tools_json）与
+“索引查找”（当前实现：prompt 映射索引按 AIConfigService.prompt_revision 失效，其余映射按主键查询）
+在 N 个 prompt（其中约 1/10 带映射）下 resolve_model_key / resolve_for_message 的单次延迟。
+
+用法：
+    python scripts/benchmark/prompt_mapping_resolve_bench.py --prompts 1000 --rounds 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(REPO_ROOT))
+
+os.environ.setdefault("SUPABASE_PROVIDER_ENABLED", "false")
+
+from app.db.sqlite_manager import SQLiteManager  # noqa: E402
+from app.services.ai_config_service import AIConfigService  # noqa: E402
+from app.services.model_mapping_service import MAPPING_KEY, ModelMappingService  # noqa: E402
+from app.settings.config import get_settings  # noqa: E402
+
+
+class _UnversionedConfig:
+    """隐藏 prompt_revision 的代理：ModelMappingService 退化为每次全量扫描（旧实现行为）。"""
+
+    def __init__(self, inner: AIConfigService) -> None:
+        self._inner = inner
+
+    def __getattr__(self, name: str) -> Any:
+        if name == "prompt_revision":
+            raise AttributeError(name)
+        return getattr(self._inner, name)
+
+
+async def _seed(config: AIConfigService, prompts: int) -> list[int]:
+    mapped: list[int] = []
+    for i in range(prompts):
+        tools: dict[str, Any] = {"tools": [{"type": "function", "function": {"name": f"tool_{i}"}}]}
+        if i % 10 == 0:
+            tools[MAPPING_KEY] = {"default_model": f"model-{i}", "candidates": [f"model-{i}"], "is_active": True}
+        prompt = await config.create_prompt({"name": f"prompt-{i}", "content": "x" * 512, "tools_json": tools})
+        if i % 10 == 0:
+            mapped.append(int(prompt["id"]))
+    return mapped
+
+
+async def _time_calls(call, ids: list[int], rounds: int) -> float:
+    samples: list[float] = []
+    for index in range(rounds):
+        prompt_id = ids[index % len(ids)]
+        start = time.perf_counter()
+        await call(prompt_id)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+async def _main(args: argparse.Namespace) -> int:
+    settings = get_settings()
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        db = SQLiteManager(tmp_path / "bench.sqlite3")
+        await db.init()
+        try:
+            config = AIConfigService(db, settings, storage_dir=tmp_path / "runtime")
+            mapped = await _seed(config, args.prompts)
+            legacy = ModelMappingService(_UnversionedConfig(config), db, tmp_path / "legacy")
+            indexed = ModelMappingService(config, db, tmp_path / "indexed")
+            await indexed.list_mappings()  # 预热索引（首次构建成本与旧实现单次扫描相同）
+
+            print(f"prompts={args.prompts} mapped={len(mapped)} rounds={args.rounds}")
+            print(f"{'call':>22} {'scan ms':>9} {'index ms':>9} {'speedup':>8}")
+            for label, make_call in (
+                ("resolve_model_key", lambda svc: lambda pid: svc.resolve_model_key(f"prompt:{pid}")),
+                ("resolve_for_message", lambda svc: lambda pid: svc.resolve_for_message(user_id="u", prompt_id=pid)),
+            ):
+                scan_ms = await _time_calls(make_call(legacy), mapped, args.rounds)
+                index_ms = await _time_calls(make_call(indexed), mapped, args.rounds)
+                print(f"{label:>22} {scan_ms:>9.3f} {index_ms:>9.3f} {scan_ms / max(index_ms, 1e-6):>7.1f}x")
+        finally:
+            await db.close()
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Prompt-embedded model mapping resolution benchmark")
+    parser.add_argument("--prompts", type=int, default=1_000)
+    parser.add_argument("--rounds", type=int, default=50)
+    return asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
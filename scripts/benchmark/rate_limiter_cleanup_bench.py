@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+限流器/SSE 守卫清理停顿基准（纯内存，不出网）：
+
+对比“全量扫描”（旧实现：每 300s 遍历全部条目）与“过期队列增量清理”（当前实现：每 5s 只弹出到期条目）
+在不同 key 数量下单次清理 tick 的事件循环停顿时间。
+条目的最后活跃时间在一个 TTL 内均匀分布，因此每个 tick 到期的比例约为 interval / TTL。
+
+用法：
+    python scripts/benchmark/rate_limiter_cleanup_bench.py --keys 1000 10000 100000 500000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(REPO_ROOT))
+
+os.environ.setdefault("SUPABASE_PROVIDER_ENABLED", "false")
+
+from app.core.rate_limiter import (  # noqa: E402
+    _CLEANUP_INTERVAL_SECONDS,
+    _ENTRY_IDLE_TTL_SECONDS,
+    RateLimiter,
+    TokenBucket,
+)
+
+_LEGACY_CLEANUP_INTERVAL_SECONDS = 300
+
+
+def _legacy_full_scan(limiter: RateLimiter, now: float) -> int:
+    """旧实现：遍历全部桶与跟踪器（仅用于基准对比）。"""
+    cutoff = now - _ENTRY_IDLE_TTL_SECONDS
+    expired_users = [uid for uid, bucket in limiter.user_qps_buckets.items() if bucket.last_refill < cutoff]
+    for uid in expired_users:
+        limiter.user_qps_buckets.pop(uid, None)
+        limiter.user_daily_windows.pop(uid, None)
+    expired_ips = [ip for ip, bucket in limiter.ip_qps_buckets.items() if bucket.last_refill < cutoff]
+    for ip in expired_ips:
+        limiter.ip_qps_buckets.pop(ip, None)
+        limiter.ip_daily_windows.pop(ip, None)
+    return len(expired_users) + len(expired_ips)
+
+
+def _populate(limiter: RateLimiter, keys: int, due_ratio: float, base: float) -> None:
+    """写入 keys 个用户 + keys 个 IP，其中 due_ratio 比例在 base 时刻已闲置超过 TTL。"""
+    due_count = int(keys * due_ratio)
+    for i in range(keys):
+        # 到期的条目登记得更早；其余条目登记时间分散在最近一个 TTL 内
+        if i < due_count:
+            created = base - _ENTRY_IDLE_TTL_SECONDS - 1 - (i % 60)
+        else:
+            created = base - (i % (_ENTRY_IDLE_TTL_SECONDS - 1))
+        for key, buckets, queue in (
+            (f"user-{i}", limiter.user_qps_buckets, limiter._user_expiry),
+            (f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}", limiter.ip_qps_buckets, limiter._ip_expiry),
+        ):
+            buckets[key] = TokenBucket(capacity=10, tokens=10, last_refill=created, refill_rate=10)
+            queue.schedule(key, created + _ENTRY_IDLE_TTL_SECONDS)
+
+
+def _timed_tick(keys: int, due_ratio: float, cleanup) -> tuple[float, int]:
+    base = time.time()
+    limiter = RateLimiter()
+    limiter._cleanup_task.cancel()
+    _populate(limiter, keys, due_ratio, base)
+    start = time.perf_counter()
+    removed = cleanup(limiter, base)
+    return (time.perf_counter() - start) * 1000, removed
+
+
+def _measure(keys: int, rounds: int) -> dict:
+    legacy_ratio = _LEGACY_CLEANUP_INTERVAL_SECONDS / _ENTRY_IDLE_TTL_SECONDS
+    incremental_ratio = _CLEANUP_INTERVAL_SECONDS / _ENTRY_IDLE_TTL_SECONDS
+    legacy_ms: list[float] = []
+    incremental_ms: list[float] = []
+    for _ in range(rounds):
+        elapsed, legacy_removed = _timed_tick(keys, legacy_ratio, _legacy_full_scan)
+        legacy_ms.append(elapsed)
+        elapsed, incremental_removed = _timed_tick(
+            keys, incremental_ratio, lambda limiter, now: limiter._cleanup_old_entries(now=now, limit=None)
+        )
+        incremental_ms.append(elapsed)
+
+    return {
+        "keys": keys,
+        "legacy_due": legacy_removed,
+        "incremental_due": incremental_removed,
+        "legacy_ms": statistics.median(legacy_ms),
+        "incremental_ms": statistics.median(incremental_ms),
+    }
+
+
+async def _main(args: argparse.Namespace) -> int:
+    print(
+        f"{'keys/type':>10} {'full-scan due':>14} {'full-scan ms':>13} "
+        f"{'incr due':>9} {'incr ms':>9} {'pause ratio':>12}"
+    )
+    for keys in args.keys:
+        row = _measure(keys, args.rounds)
+        ratio = row["legacy_ms"] / max(row["incremental_ms"], 1e-6)
+        print(
+            f"{row['keys']:>10} {row['legacy_due']:>14} {row['legacy_ms']:>13.2f} "
+            f"{row['incremental_due']:>9} {row['incremental_ms']:>9.2f} {ratio:>11.1f}x"
+        )
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Rate limiter cleanup pause benchmark")
+    parser.add_argument("--keys", type=int, nargs="+", default=[1_000, 10_000, 100_000, 300_000])
+    parser.add_argument("--rounds", type=int, default=3)
+    return asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+上游 SSE 分帧基准（纯内存，不出网）：
+
+对比“按行解析”（旧实现：response.aiter_lines() 解码为 str 行后再拼 data 字段）与
+“字节级分帧”（当前实现：aiter_bytes() + bytearray 缓冲 + find(b"\\n\\n")，只解码 data 负载）。
+输入为按真实上游格式录制的 OpenAI Chat Completions / Anthropic Messages 流（含 usage、ping、CRLF 变体），
+以 TCP 常见的 1~4KB 不规则 chunk 切分后通过 httpx.Response 回放；仅计分帧耗时，不含 JSON 解析。
+
+用法：
+    python scripts/benchmark/sse_parser_bench.py --deltas 200 2000 --rounds 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from collections.abc import AsyncIterator
+from pathlib import Path
+from typing import Optional
+
+import httpx
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(REPO_ROOT))
+
+os.environ.setdefault("SUPABASE_PROVIDER_ENABLED", "false")
+
+from app.services.providers.sse import iter_sse_frames  # noqa: E402
+
+_TEXT = "深蹲时保持核心收紧，膝盖与脚尖方向一致。Keep the bar path vertical and brace before each rep. "
+
+
+async def _legacy_iter_sse_frames(response: httpx.Response) -> AsyncIterator[tuple[Optional[str], str]]:
+    """旧实现：按 str 行解析（仅用于基准对比）。"""
+    current_event: Optional[str] = None
+    data_lines: list[str] = []
+    async for line in response.aiter_lines():
+        if not line:
+            if data_lines:
+                raw_text = "\n".join(data_lines).strip()
+                if raw_text:
+                    yield (current_event or "").strip() or None, raw_text
+            data_lines = []
+            current_event = None
+            continue
+        if line.startswith(":"):
+            continue
+        if line.startswith("event:"):
+            current_event = line[len("event:") :].strip()
+            continue
+        if line.startswith("data:"):
+            data_lines.append(line[len("data:") :].strip())
+    if data_lines:
+        raw_text = "\n".join(data_lines).strip()
+        if raw_text:
+            yield (current_event or "").strip() or None, raw_text
+
+
+def _record_openai(deltas: int) -> bytes:
+    frames = []
+    for i in range(deltas):
+        chunk = {
+            "id": "chatcmpl-bench",
+            "object": "chat.completion.chunk",
+            "created": 1700000000,
+            "model": "gpt-4o-mini",
+            "choices": [{"index": 0, "delta": {"content": _TEXT[i % len(_TEXT) :][:8]}, "finish_reason": None}],
+        }
+        frames.append(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n")
+    usage = {"prompt_tokens": 512, "completion_tokens": deltas, "total_tokens": 512 + deltas}
+    frames.append(f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n")
+    frames.append("data: [DONE]\n\n")
+    return "".join(frames).encode("utf-8")
+
+
+def _record_anthropic(deltas: int) -> bytes:
+    frames = [
+        "event: message_start\n"
+        'data: {"type":"message_start","message":{"id":"msg_bench","usage":{"input_tokens":512,"output_tokens":1}}}\n\n',
+        'event: content_block_start\ndata: {"type":"content_block_start","index":0,'
+        '"content_block":{"type":"text","text":""}}\n\n',
+    ]
+    for i in range(deltas):
+        if i % 50 == 0:
+            frames.append('event: ping\ndata: {"type": "ping"}\n\n')
+        delta = {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": _TEXT[i % 40 :][:8]}}
+        frames.append(f"event: content_block_delta\ndata: {json.dumps(delta, ensure_ascii=False)}\n\n")
+    frames.append('event: content_block_stop\ndata: {"type":"content_block_stop","index":0}\n\n')
+    frames.append(
+        'event: message_delta\ndata: {"type":"message_delta","delta":{"stop_reason":"end_turn"},'
+        f'"usage":{{"output_tokens":{deltas}}}}}\n\n'
+    )
+    frames.append('event: message_stop\ndata: {"type":"message_stop"}\n\n')
+    return "".join(frames).encode("utf-8")
+
+
+def _split(raw: bytes, seed: int) -> list[bytes]:
+    rng = random.Random(seed)
+    chunks: list[bytes] = []
+    index = 0
+    while index < len(raw):
+        size = rng.randint(1024, 4096)
+        chunks.append(raw[index : index + size])
+        index += size
+    return chunks
+
+
+class _ReplayStream(httpx.AsyncByteStream):
+    def __init__(self, chunks: list[bytes]) -> None:
+        self._chunks = chunks
+
+    async def __aiter__(self):
+        for chunk in self._chunks:
+            yield chunk
+
+
+async def _timed(parser, chunks: list[bytes]) -> tuple[float, int]:
+    response = httpx.Response(200, headers={"content-type": "text/event-stream"}, stream=_ReplayStream(chunks))
+    frames = 0
+    start = time.perf_counter()
+    async for _ in parser(response):
+        frames += 1
+    return (time.perf_counter() - start) * 1000, frames
+
+
+async def _measure(name: str, raw: bytes, rounds: int) -> dict:
+    chunks = _split(raw, seed=len(raw))
+    legacy_ms: list[float] = []
+    byte_ms: list[float] = []
+    for _ in range(rounds):
+        elapsed, legacy_frames = await _timed(_legacy_iter_sse_frames, chunks)
+        legacy_ms.append(elapsed)
+        elapsed, byte_frames = await _timed(iter_sse_frames, chunks)
+        byte_ms.append(elapsed)
+    if legacy_frames != byte_frames:
+        raise SystemExit(f"{name}: frame count mismatch legacy={legacy_frames} bytes={byte_frames}")
+    return {
+        "name": name,
+        "kib": len(raw) / 1024,
+        "frames": byte_frames,
+        "legacy_ms": statistics.median(legacy_ms),
+        "byte_ms": statistics.median(byte_ms),
+    }
+
+
+async def _main(args: argparse.Namespace) -> int:
+    print(f"{'stream':>22} {'KiB':>8} {'frames':>7} {'lines ms':>9} {'bytes ms':>9} {'speedup':>8}")
+    for deltas in args.deltas:
+        for name, raw in (
+            (f"openai/{deltas}", _record_openai(deltas)),
+            (f"anthropic/{deltas}", _record_anthropic(deltas)),
+            (f"anthropic-crlf/{deltas}", _record_anthropic(deltas).replace(b"\n", b"\r\n")),
+        ):
+            row = await _measure(name, raw, args.rounds)
+            ratio = row["legacy_ms"] / max(row["byte_ms"], 1e-6)
+            print(
+                f"{row['name']:>22} {row['kib']:>8.1f} {row['frames']:>7} "
+                f"{row['legacy_ms']:>9.2f} {row['byte_ms']:>9.2f} {ratio:>7.1f}x"
+            )
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Upstream SSE frame parser benchmark")
+    parser.add_argument("--deltas", type=int, nargs="+", default=[200, 2_000, 20_000])
+    parser.add_argument("--rounds", type=int, default=5)
+    return asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
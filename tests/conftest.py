@@ -3,9 +3,11 @@ from __future__ import annotations
 import asyncio
 import os
 import shutil
-from typing import Generator
+from types import SimpleNamespace
+from typing import Any, Callable, Generator
 from unittest.mock import AsyncMock, MagicMock
 
+import httpx
 import pytest
 import pytest_asyncio
 from fastapi.testclient import TestClient
@@ -116,3 +118,76 @@ def _mock_ai_service_httpx(monkeypatch: pytest.MonkeyPatch) -> None:
     mock_ctx.__aexit__.return_value = False
 
     monkeypatch.setattr(ai_service_module.httpx, "AsyncClient", MagicMock(return_value=mock_ctx))
+
+
+@pytest.fixture
+def mock_upstream(monkeypatch: pytest.MonkeyPatch) -> Callable[..., None]:
+    """把 provider adapter 的上游请求挂到本地 handler（httpx.MockTransport），不出网。
+
+    用法：`mock_upstream(handler)`；Anthropic 等其它 dialect 传 `adapter="anthropic_messages"`。
+    """
+
+    def install(handler: Callable[[httpx.Request], Any], *, adapter: str = "openai_chat_completions") -> None:
+        def client_factory(*args, **kwargs) -> httpx.AsyncClient:
+            kwargs.pop("transport", None)
+            # AsyncClient 即 conftest 导入时的真实类（_mock_ai_service_httpx 会把 httpx.AsyncClient 换成 MagicMock）
+            return AsyncClient(*args, transport=httpx.MockTransport(handler), **kwargs)
+
+        monkeypatch.setattr(f"app.services.providers.{adapter}.httpx.AsyncClient", client_factory)
+
+    return install
+
+
+@pytest_asyncio.fixture
+async def mock_upstream_service(tmp_path, mock_upstream):
+    """本地 mock upstream + 临时 SQLite 上的 AIService 全套依赖；用例结束自动关闭数据库。
+
+    用法：`upstream = await mock_upstream_service(handler, name=..., base_url=..., model_list=[...])`
+    - 传入端点字段时创建该端点（api_key 默认 "k"），结果在 upstream.endpoint；更多端点经 upstream.config_service 创建
+    - settings 覆盖 AIConfigService/LlmModelRegistry 使用的配置；其余关键字参数见 AIService（如 entitlement_service）
+    """
+
+    from app.db.sqlite_manager import SQLiteManager
+    from app.services.ai_config_service import AIConfigService
+    from app.services.ai_service import AIService
+    from app.services.llm_model_registry import LlmModelRegistry
+    from app.services.model_mapping_service import ModelMappingService
+
+    managers: list[SQLiteManager] = []
+
+    async def create(
+        handler: Callable[[httpx.Request], Any],
+        *,
+        settings: Any = None,
+        entitlement_service: Any = None,
+        **endpoint: Any,
+    ) -> SimpleNamespace:
+        mock_upstream(handler)
+        settings = settings if settings is not None else get_settings()
+        db = SQLiteManager(tmp_path / "db.sqlite")
+        await db.init()
+        managers.append(db)
+        config_service = AIConfigService(db, settings, storage_dir=tmp_path / "runtime")
+        mapping_service = ModelMappingService(config_service, db, tmp_path / "runtime")
+        registry = LlmModelRegistry(config_service, mapping_service, settings)
+        service = AIService(
+            provider=MagicMock(),
+            db_manager=db,
+            ai_config_service=config_service,
+            model_mapping_service=mapping_service,
+            llm_model_registry=registry,
+            entitlement_service=entitlement_service,
+        )
+        created = await config_service.create_endpoint({"api_key": "k", **endpoint}) if endpoint else None
+        return SimpleNamespace(
+            service=service,
+            db=db,
+            config_service=config_service,
+            mapping_service=mapping_service,
+            registry=registry,
+            endpoint=created,
+        )
+
+    yield create
+    for db in managers:
+        await db.close()
@@ -14,10 +14,11 @@ from app.services.providers.openai_chat_completions import OpenAIChatCompletions
 from app.services.providers.openai_responses import OpenAIResponsesAdapter
 
 
-def _make_async_lines(lines: list[str]) -> AsyncIterator[str]:
-    async def gen() -> AsyncIterator[str]:
+def _make_async_lines(lines: list[str]) -> AsyncIterator[bytes]:
+    # adapter 以字节流分帧：每行作为一个 chunk 下发（含行尾）
+    async def gen() -> AsyncIterator[bytes]:
         for line in lines:
-            yield line
+            yield f"{line}\n".encode("utf-8")
 
     return gen()
 
@@ -35,7 +36,7 @@ def _mock_httpx_streaming_sse(
     if headers:
         response.headers.update(headers)
     response.raise_for_status = MagicMock()
-    response.aiter_lines = MagicMock(side_effect=lambda: _make_async_lines(lines))
+    response.aiter_bytes = MagicMock(side_effect=lambda: _make_async_lines(lines))
     response.aread = AsyncMock(return_value=b"")
 
     stream_ctx = MagicMock()
@@ -180,7 +181,7 @@ async def test_anthropic_messages_adapter_parses_text_delta_and_stop():
 
     assert reply_text == "Hi"
     assert upstream_request_id == "rid"
-    assert metadata is None
+    assert metadata == {"usage": {"prompt_tokens": 3, "completion_tokens": 4, "cached_tokens": 0, "total_tokens": 7}}
     assert [e for e, _ in published] == ["content_delta"]
     usage = (json.loads(response_payload) or {}).get("usage") or {}
     assert usage.get("input_tokens") == 3
@@ -245,3 +246,34 @@ async def test_gemini_generate_content_adapter_parses_candidate_text():
     assert metadata is None
     assert [e for e, _ in published] == ["content_delta"]
     assert published[0][1]["delta"] == "Hi"
+
+
+@pytest.mark.asyncio
+async def test_gemini_generate_content_adapter_captures_usage_metadata():
+    adapter = GeminiGenerateContentAdapter()
+
+    async def publish(_: str, __: dict[str, Any]) -> None:
+        return None
+
+    lines = [
+        'data: {"candidates":[{"content":{"parts":[{"text":"Hi"}]}}],"usageMetadata":{"promptTokenCount":9}}',
+        "",
+        'data: {"candidates":[{"content":{"parts":[{"text":"!"}]}}],'
+        '"usageMetadata":{"promptTokenCount":9,"candidatesTokenCount":2,"cachedContentTokenCount":4,"totalTokenCount":11}}',
+        "",
+    ]
+
+    with patch("app.services.providers.gemini_generate_content.httpx.AsyncClient") as mock_httpx:
+        _mock_httpx_streaming_sse(mock_httpx, lines=lines)
+
+        _, response_payload, _, metadata = await adapter.stream(
+            endpoint={"base_url": "https://generativelanguage.googleapis.com", "timeout": 1},
+            api_key="test-api-key",
+            model="gemini-1.5-flash",
+            payload={"contents": [{"role": "user", "parts": [{"text": "hi"}]}]},
+            timeout=1.0,
+            publish=publish,
+        )
+
+    assert metadata == {"usage": {"prompt_tokens": 9, "completion_tokens": 2, "cached_tokens": 4, "total_tokens": 11}}
+    assert json.loads(response_payload)["usageMetadata"]["totalTokenCount"] == 11
@@ -13,6 +13,7 @@ from httpx import AsyncClient
 from app import app as fastapi_app
 from app.auth import AuthenticatedUser
 from app.db.sqlite_manager import get_sqlite_manager
+from app.services.llm_app_settings import get_llm_app_settings_store
 
 
 def _mock_httpx_stream_json(mock_httpx: MagicMock, payload: dict[str, Any], *, headers: dict[str, str] | None = None) -> None:
@@ -211,6 +212,8 @@ class TestAgentRunsMicroE2E:
             """,
             ("web_search_exa_api_key", json.dumps("exa_test_key_1234567890")),
         )
+        # 直接改表绕过了写入路径：丢弃 llm_app_settings 内存快照
+        get_llm_app_settings_store(fastapi_app).invalidate()
 
         with patch("app.auth.dependencies.get_jwt_verifier") as mock_get_verifier:
             mock_verifier = MagicMock()
@@ -324,6 +327,7 @@ class TestAgentRunsMicroE2E:
                             "DELETE FROM llm_app_settings WHERE key IN (?, ?)",
                             ("web_search_enabled", "web_search_exa_api_key"),
                         )
+                        get_llm_app_settings_store(fastapi_app).invalidate()
                     except Exception:
                         pass
                     try:
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import asyncio
+import time
 from types import SimpleNamespace
 
 import pytest
@@ -127,3 +129,94 @@ async def test_refresh_endpoint_status_voyageai_uses_embeddings_probe(tmp_path,
         assert refreshed["status"] == "online"
     finally:
         await service._db.close()
+
+
+class SlowDummyAsyncClient(DummyAsyncClient):
+    instances = 0
+    inflight = 0
+    max_inflight = 0
+
+    def __init__(self, *args, **kwargs):
+        type(self).instances += 1
+
+    async def options(self, url: str, *args, **kwargs) -> DummyResponse:
+        cls = type(self)
+        cls.inflight += 1
+        cls.max_inflight = max(cls.max_inflight, cls.inflight)
+        try:
+            # stuck 端点永远不返回，由单端点截止时间兜底
+            await asyncio.sleep(10 if "stuck" in str(url) else 0.05)
+        finally:
+            cls.inflight -= 1
+        return await super().options(url, *args, **kwargs)
+
+
+@pytest.mark.anyio("asyncio")
+async def test_refresh_all_status_probes_concurrently_with_shared_client_and_deadline(tmp_path, monkeypatch):
+    manager = SQLiteManager(tmp_path / "db.sqlite")
+    await manager.init()
+    settings = SimpleNamespace(
+        http_timeout_seconds=5,
+        ai_endpoint_probe_concurrency=4,
+        ai_endpoint_probe_deadline_seconds=0.3,
+    )
+    service = AIConfigService(manager, settings, storage_dir=tmp_path / "runtime")
+    try:
+        for index in range(8):
+            await service.create_endpoint(
+                {"name": f"proxy-{index}", "base_url": f"http://proxy-{index}.local:8317", "api_key": "k"}
+            )
+        stuck = await service.create_endpoint(
+            {"name": "stuck-proxy", "base_url": "http://stuck.local:8317", "api_key": "k"}
+        )
+        monkeypatch.setattr("app.services.ai_config_service.httpx.AsyncClient", SlowDummyAsyncClient)
+
+        started = time.perf_counter()
+        first, second = await asyncio.gather(service.refresh_all_status(), service.refresh_all_status())
+        elapsed = time.perf_counter() - started
+
+        # 8 × 50ms 串行需 ≥0.4s + stuck 10s；并发 4 + 截止 0.3s 后整体远小于 1s
+        assert elapsed < 1.0
+        assert SlowDummyAsyncClient.instances == 1
+        assert SlowDummyAsyncClient.max_inflight == 4
+        # 重叠的第二轮直接跳过
+        assert len(first) == 9 and second == []
+
+        by_id = {item["id"]: item for item in first}
+        assert by_id[stuck["id"]]["status"] == "offline"
+        assert by_id[stuck["id"]]["last_error"].startswith("probe_deadline_exceeded")
+        assert all(item["status"] == "online" for item in first if item["id"] != stuck["id"])
+    finally:
+        await service._db.close()
+
+
+class TimeoutRecordingAsyncClient(DummyAsyncClient):
+    timeouts: dict[str, set] = {}
+
+    async def get(self, url: str, *args, **kwargs) -> DummyResponse:
+        type(self).timeouts.setdefault(str(url).split("/")[2], set()).add(kwargs.get("timeout"))
+        return await super().get(url, *args, **kwargs)
+
+    async def options(self, url: str, *args, **kwargs) -> DummyResponse:
+        type(self).timeouts.setdefault(str(url).split("/")[2], set()).add(kwargs.get("timeout"))
+        return await super().options(url, *args, **kwargs)
+
+
+@pytest.mark.anyio("asyncio")
+async def test_refresh_all_status_honours_per_endpoint_timeout_on_shared_client(tmp_path, monkeypatch):
+    manager = SQLiteManager(tmp_path / "db.sqlite")
+    await manager.init()
+    settings = SimpleNamespace(http_timeout_seconds=5, ai_endpoint_probe_concurrency=2)
+    service = AIConfigService(manager, settings, storage_dir=tmp_path / "runtime")
+    try:
+        await service.create_endpoint(
+            {"name": "fast-proxy", "base_url": "http://fast.local:8317", "api_key": "k", "timeout": 2}
+        )
+        await service.create_endpoint({"name": "default-proxy", "base_url": "http://default.local:8317", "api_key": "k"})
+        monkeypatch.setattr("app.services.ai_config_service.httpx.AsyncClient", TimeoutRecordingAsyncClient)
+
+        await service.refresh_all_status()
+
+        assert TimeoutRecordingAsyncClient.timeouts == {"fast.local:8317": {2}, "default.local:8317": {5}}
+    finally:
+        await service._db.close()
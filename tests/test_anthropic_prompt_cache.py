@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import json
+
+import httpx
+import pytest
+from prometheus_client import REGISTRY
+
+from app.services.providers import get_provider_adapter
+from app.services.providers.anthropic_messages import apply_prompt_cache_breakpoints
+from app.settings.config import get_settings
+
+_SYSTEM = "You are a fitness coach. " * 20
+_TOOLS = [
+    {"name": "lookup", "input_schema": {"type": "object"}},
+    {"name": "log_workout", "input_schema": {"type": "object"}},
+]
+
+
+def test_breakpoints_mark_last_tool_and_system_without_mutating_input() -> None:
+    body = {"system": _SYSTEM, "tools": _TOOLS, "messages": [{"role": "user", "content": "hi"}]}
+
+    out = apply_prompt_cache_breakpoints(body, min_chars=100)
+
+    assert out["system"] == [{"type": "text", "text": _SYSTEM, "cache_control": {"type": "ephemeral"}}]
+    assert "cache_control" not in out["tools"][0]
+    assert out["tools"][-1]["cache_control"] == {"type": "ephemeral"}
+    assert body["system"] == _SYSTEM and "cache_control" not in body["tools"][-1]
+
+    # 过短前缀不标记；客户端自带 cache_control 时保持原样
+    assert apply_prompt_cache_breakpoints({"system": "short"}, min_chars=100) == {"system": "short"}
+    managed = {"system": [{"type": "text", "text": _SYSTEM, "cache_control": {"type": "ephemeral"}}], "tools": _TOOLS}
+    assert apply_prompt_cache_breakpoints(managed, min_chars=0) is managed
+
+
+def _sse_body() -> bytes:
+    events = [
+        (
+            "message_start",
+            {
+                "type": "message_start",
+                "message": {
+                    "usage": {
+                        "input_tokens": 12,
+                        "cache_creation_input_tokens": 0,
+                        "cache_read_input_tokens": 900,
+                        "output_tokens": 1,
+                    }
+                },
+            },
+        ),
+        ("content_block_delta", {"type": "content_block_delta", "delta": {"type": "text_delta", "text": "ok"}}),
+        ("message_delta", {"type": "message_delta", "usage": {"output_tokens": 7}}),
+        ("message_stop", {"type": "message_stop"}),
+    ]
+    return "".join(f"event: {name}\ndata: {json.dumps(data)}\n\n" for name, data in events).encode("utf-8")
+
+
+@pytest.mark.asyncio
+async def test_stream_sends_breakpoints_and_records_cache_usage(monkeypatch, mock_upstream) -> None:
+    captured: list[dict] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        captured.append(json.loads(request.content))
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=_sse_body())
+
+    mock_upstream(handler, adapter="anthropic_messages")
+    monkeypatch.setattr(get_settings(), "ai_anthropic_prompt_cache_min_chars", 100)
+
+    adapter = get_provider_adapter("anthropic.messages")
+
+    async def publish(event: str, data: dict) -> None:
+        return None
+
+    payload = {"model": "claude-test", "system": _SYSTEM, "tools": _TOOLS, "messages": [], "stream": True}
+    labels = {"endpoint_id": "341", "kind": "read"}
+    before = REGISTRY.get_sample_value("ai_prompt_cache_tokens_total", labels) or 0.0
+
+    reply, response_payload, *_ = await adapter.stream(
+        endpoint={"id": 341, "base_url": "http://anthropic.local"},
+        api_key="k",
+        payload=payload,
+        timeout=5,
+        publish=publish,
+    )
+
+    assert reply == "ok"
+    assert captured[0]["system"][0]["cache_control"] == {"type": "ephemeral"}
+    assert captured[0]["tools"][-1]["cache_control"] == {"type": "ephemeral"}
+    usage = json.loads(response_payload)["usage"]
+    assert usage["cache_read_input_tokens"] == 900 and usage["input_tokens"] == 12 and usage["output_tokens"] == 7
+    assert REGISTRY.get_sample_value("ai_prompt_cache_tokens_total", labels) - before == 900
+
+    # 端点级关闭后不再插入断点
+    await adapter.stream(
+        endpoint={"id": 342, "base_url": "http://anthropic.local", "prompt_cache_enabled": False},
+        api_key="k",
+        payload=payload,
+        timeout=5,
+        publish=publish,
+    )
+    assert captured[1]["system"] == _SYSTEM
+    assert "cache_control" not in captured[1]["tools"][-1]
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import pytest
+
+from app.db.sqlite_manager import SQLiteManager
+from app.services.ai_config_service import AIConfigService
+from app.services.config_events import (
+    TOPIC_BLOCKED_MODELS,
+    TOPIC_DASHBOARD_CONFIG,
+    TOPIC_ENDPOINTS,
+    ConfigEventBus,
+)
+from app.services.model_mapping_service import ModelMappingService
+from app.settings.config import get_settings
+
+
+@pytest.mark.asyncio
+async def test_config_versions_propagate_between_workers_via_sqlite(tmp_path) -> None:
+    settings = get_settings()
+    # 两个 SQLiteManager 连接同一文件，模拟两个 worker
+    db_a = SQLiteManager(tmp_path / "db.sqlite")
+    db_b = SQLiteManager(tmp_path / "db.sqlite")
+    await db_a.init()
+    await db_b.init()
+    bus_a = ConfigEventBus(db_a)
+    bus_b = ConfigEventBus(db_b)
+    config_a = AIConfigService(db_a, settings, storage_dir=tmp_path / "a", event_bus=bus_a)
+    config_b = AIConfigService(db_b, settings, storage_dir=tmp_path / "b", event_bus=bus_b)
+    mapping_b = ModelMappingService(config_b, db_b, tmp_path / "b")
+    changes = []
+    bus_b.subscribe(None, changes.append)
+    try:
+        await config_a.create_endpoint({"name": "bus-upstream", "base_url": "http://bus.local", "api_key": "k"})
+        assert config_a.revision == 1
+        assert config_b.revision == 0
+
+        assert await bus_b.refresh() == [TOPIC_ENDPOINTS]
+        assert config_b.revision == 1
+        assert [(c.topic, c.version, c.remote) for c in changes] == [(TOPIC_ENDPOINTS, 1, True)]
+        assert await bus_b.refresh() == []
+
+        # B 的写入基于共享计数器继续递增，A 轮询后可见；全局版本号单调
+        before = bus_a.version
+        await mapping_b.upsert_mapping({"scope_type": "mapping", "scope_key": "fast", "default_model": "m"})
+        assert mapping_b.revision == 1
+        await bus_a.refresh()
+        assert bus_a.snapshot() == bus_b.snapshot()
+        assert bus_a.version > before
+
+        # 追踪开关：A 写入后 B 的缓存在收到事件前保持旧值，事件到达后失效重读
+        bus_b.subscribe(TOPIC_DASHBOARD_CONFIG, lambda _change: db_b.invalidate_tracing_cache())
+        assert await db_b.get_tracing_enabled() is False
+        await db_a.set_tracing_enabled(True)
+        await bus_a.publish(TOPIC_DASHBOARD_CONFIG)
+        assert await db_b.get_tracing_enabled() is False
+        await bus_b.refresh()
+        assert await db_b.get_tracing_enabled() is True
+    finally:
+        await db_a.close()
+        await db_b.close()
+
+
+@pytest.mark.asyncio
+async def test_local_bumps_do_not_swallow_remote_versions(tmp_path) -> None:
+    db_a = SQLiteManager(tmp_path / "db.sqlite")
+    db_b = SQLiteManager(tmp_path / "db.sqlite")
+    await db_a.init()
+    await db_b.init()
+    bus_a = ConfigEventBus(db_a)
+    bus_b = ConfigEventBus(db_b)
+    changes = []
+    bus_b.subscribe(TOPIC_BLOCKED_MODELS, changes.append)
+    try:
+        # B 本地检测到屏蔽列表文件变化；随后 A 经共享计数器发布同一主题（共享版本号同为 1）
+        assert bus_b.publish_local(TOPIC_BLOCKED_MODELS) == 1
+        assert await bus_a.publish(TOPIC_BLOCKED_MODELS) == 1
+
+        assert await bus_b.refresh() == [TOPIC_BLOCKED_MODELS]
+        assert [(c.version, c.remote) for c in changes] == [(1, False), (2, True)]
+        assert bus_b.topic_version(TOPIC_BLOCKED_MODELS) == 2
+    finally:
+        await db_a.close()
+        await db_b.close()
+
+
+@pytest.mark.asyncio
+async def test_config_event_bus_without_sqlite_is_process_local() -> None:
+    bus = ConfigEventBus()
+    seen = []
+    unsubscribe = bus.subscribe(TOPIC_ENDPOINTS, seen.append)
+    assert await bus.publish(TOPIC_ENDPOINTS) == 1
+    assert bus.publish_local(TOPIC_ENDPOINTS) == 2
+    unsubscribe()
+    await bus.publish(TOPIC_ENDPOINTS)
+    assert [c.version for c in seen] == [1, 2]
+    assert bus.version == 3
+    assert await bus.refresh() == []
+
+
+@pytest.mark.asyncio
+async def test_endpoint_probe_writes_do_not_publish_endpoint_changes(tmp_path) -> None:
+    settings = get_settings()
+    db = SQLiteManager(tmp_path / "db.sqlite")
+    await db.init()
+    bus = ConfigEventBus()
+    config = AIConfigService(db, settings, storage_dir=tmp_path / "runtime", event_bus=bus)
+    try:
+        endpoint = await config.create_endpoint(
+            {"name": "probe-upstream", "base_url": "http://probe.local", "api_key": "k", "model_list": ["m"]}
+        )
+        endpoint_id = endpoint["id"]
+        await config.update_endpoint(endpoint_id, {"status": "online"})
+        version = bus.topic_version(TOPIC_ENDPOINTS)
+
+        # 巡检写回：延迟/时间戳/错误与未变化的模型列表、密钥、启用状态均不发布
+        await config.update_endpoint(
+            endpoint_id,
+            {"latency_ms": 12.5, "last_checked_at": "2026-01-01T00:00:00+00:00", "last_error": None},
+        )
+        await config.update_endpoint(endpoint_id, {"model_list": ["m"], "api_key": "k", "is_active": True})
+        await config.update_endpoint(endpoint_id, {"status": "checking"})
+        assert bus.topic_version(TOPIC_ENDPOINTS) == version
+
+        # 进出 offline、模型列表变化、管理端编辑仍需发布
+        await config.update_endpoint(endpoint_id, {"status": "offline"})
+        assert bus.topic_version(TOPIC_ENDPOINTS) == version + 1
+        await config.update_endpoint(endpoint_id, {"status": "online"})
+        await config.update_endpoint(endpoint_id, {"model_list": ["m", "n"]})
+        await config.update_endpoint(endpoint_id, {"weight": 3})
+        assert bus.topic_version(TOPIC_ENDPOINTS) == version + 4
+    finally:
+        await db.close()
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from app.db.sqlite_manager import SQLiteManager
+from app.services.daily_quota import DailyQuotaCounter
+
+_KEY = ("quota-user", "xai", "2026-01-01")
+
+
+async def _durable_count(db: SQLiteManager) -> int:
+    row = await db.fetchone(
+        "SELECT count FROM ai_model_daily_usage WHERE user_id = ? AND model_key = ? AND usage_date = ?",
+        _KEY,
+    )
+    return int((row or {}).get("count") or 0)
+
+
+@pytest.mark.asyncio
+async def test_daily_quota_exact_under_concurrent_creates_across_workers(tmp_path, monkeypatch) -> None:
+    # 两个 SQLiteManager 连接同一文件，模拟两个 worker 并发扣减同一 (user, model, date)
+    db_a = SQLiteManager(tmp_path / "db.sqlite")
+    db_b = SQLiteManager(tmp_path / "db.sqlite")
+    await db_a.init()
+    await db_b.init()
+    counter_a = DailyQuotaCounter(db_a, chunk_size=4)
+    counter_b = DailyQuotaCounter(db_b, chunk_size=4)
+
+    reserves = 0
+    original = db_a.reserve_daily_model_usage
+
+    async def counting(*args, **kwargs):
+        nonlocal reserves
+        reserves += 1
+        return await original(*args, **kwargs)
+
+    monkeypatch.setattr(db_a, "reserve_daily_model_usage", counting)
+    try:
+        results = await asyncio.gather(
+            *[(counter_a if i % 2 else counter_b).try_consume(*_KEY, limit=37) for i in range(120)]
+        )
+        allowed = [count for ok, count in results if ok]
+        assert len(allowed) == 37
+        assert all(not ok and count <= 37 for ok, count in results if not ok)
+        # 写前预占：各 worker 预占之和封顶于上限；SQLite 往返远少于请求数
+        assert await _durable_count(db_a) == 37
+        assert reserves <= 37 // 4 + 2
+
+        await counter_a.stop()
+        await counter_b.stop()
+        assert await _durable_count(db_a) == 37
+    finally:
+        await db_a.close()
+        await db_b.close()
+
+
+@pytest.mark.asyncio
+async def test_daily_quota_crash_overcounts_by_less_than_one_chunk_and_flush_releases(tmp_path) -> None:
+    db = SQLiteManager(tmp_path / "db.sqlite")
+    await db.init()
+    try:
+        crashed = DailyQuotaCounter(db, chunk_size=5)
+        for _ in range(3):
+            assert (await crashed.try_consume(*_KEY, limit=10))[0]
+        # “崩溃”：不归还预占，持久化计数保守地多出 chunk 内未用部分
+        assert await _durable_count(db) == 5
+
+        restarted = DailyQuotaCounter(db, chunk_size=5, flush_interval_seconds=0.05)
+        results = [await restarted.try_consume(*_KEY, limit=10) for _ in range(8)]
+        assert [ok for ok, _ in results] == [True] * 5 + [False] * 3
+        assert results[-1][1] == 10
+        assert await _durable_count(db) == 10
+
+        # 空闲键的未用预占由周期 flush 批量归还
+        healthy = DailyQuotaCounter(db, chunk_size=5, flush_interval_seconds=0.05)
+        await db.execute("UPDATE ai_model_daily_usage SET count = 2")
+        assert (await healthy.try_consume(*_KEY, limit=10)) == (True, 3)
+        assert await _durable_count(db) == 7
+        await asyncio.sleep(0.06)
+        assert await healthy.flush() == 4
+        assert await _durable_count(db) == 3
+        assert healthy.describe(*_KEY) is None
+    finally:
+        await db.close()
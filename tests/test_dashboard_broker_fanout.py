@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+import pytest
+
+from app.services.dashboard_broker import DashboardBroker
+
+
+class _CountingCollector:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def aggregate_stats(self, time_window: str = "24h") -> dict:
+        self.calls += 1
+        await asyncio.sleep(0)
+        return {"daily_active_users": self.calls, "time_window": time_window}
+
+
+class _FakeSocket:
+    def __init__(self) -> None:
+        self.frames: list[str] = []
+
+    async def send_text(self, payload: str) -> None:
+        self.frames.append(payload)
+
+
+async def _run_sockets(count: int, *, ticks: int) -> tuple[int, list[_FakeSocket]]:
+    collector = _CountingCollector()
+    broker = DashboardBroker(collector, push_interval_seconds=0.02)
+    sockets = [_FakeSocket() for _ in range(count)]
+    servers = [asyncio.create_task(broker.serve(socket)) for socket in sockets]
+    while collector.calls < ticks:
+        await asyncio.sleep(0.005)
+    await asyncio.sleep(0.005)
+    for server in servers:
+        server.cancel()
+    await asyncio.gather(*servers, return_exceptions=True)
+    calls = collector.calls
+    # 最后一个订阅者离开后生产者停止
+    await asyncio.sleep(0.05)
+    assert collector.calls == calls
+    return calls, sockets
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("sockets", [1, 10, 50])
+async def test_dashboard_snapshot_queries_independent_of_socket_count(sockets: int) -> None:
+    calls, fake_sockets = await _run_sockets(sockets, ticks=3)
+    assert calls == 3
+    expected = fake_sockets[0].frames
+    assert [json.loads(frame)["data"]["daily_active_users"] for frame in expected] == [1, 2, 3]
+    # 所有连接收到同一份序列化快照
+    assert all(socket.frames == expected for socket in fake_sockets)
@@ -90,14 +90,15 @@ async def test_mapped_models_stats_returns_availability_and_usage(async_client,
     )
 
     registry = fastapi_app.state.llm_model_registry
-    original_resolve = registry.resolve_model_key
+    original_resolve = registry.resolve_model_keys
 
-    async def _fake_resolve(model_key: str, **kwargs):
-        if model_key == "broken":
-            raise ProviderError("no_active_ai_endpoint")
-        return await original_resolve(model_key, **kwargs)
+    async def _fake_resolve(model_keys, **kwargs):
+        results = await original_resolve(model_keys, **kwargs)
+        if "broken" in results:
+            results["broken"] = ProviderError("no_active_ai_endpoint")
+        return results
 
-    monkeypatch.setattr(registry, "resolve_model_key", _fake_resolve)
+    monkeypatch.setattr(registry, "resolve_model_keys", _fake_resolve)
 
     with patch("app.auth.dependencies.get_jwt_verifier") as mock_get_verifier:
         mock_verifier = mock_get_verifier.return_value
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+from collections import Counter
+
+import httpx
+import pytest
+
+from app.auth import AuthenticatedUser, UserDetails
+from app.services import endpoint_balancer as balancer_module
+from app.services.ai_service import AIMessageInput, MessageEventBroker
+from app.services.endpoint_balancer import EndpointBalancer
+from app.settings.config import get_settings
+
+_MODEL = "balance-test-model"
+_UPSTREAM_DELAYS = {"fast.upstream.local": 0.005, "slow.upstream.local": 0.08}
+
+
+def _endpoint(endpoint_id: int, *, weight: int | None = None) -> dict:
+    item = {"id": endpoint_id, "model_list": [_MODEL]}
+    if weight is not None:
+        item["weight"] = weight
+    return item
+
+
+def test_balancer_splits_by_weight_when_latency_is_equal() -> None:
+    balancer = EndpointBalancer(rng=random.Random(1))
+    heavy, light = _endpoint(1, weight=300), _endpoint(2, weight=100)
+    for endpoint_id in (1, 2):
+        balancer.begin(endpoint_id, _MODEL)
+        balancer.finish(endpoint_id, _MODEL, success=True, ttft_ms=50.0)
+
+    picks = Counter(balancer.choose([heavy, light], _MODEL)["id"] for _ in range(4000))
+
+    assert 0.7 < picks[1] / 4000 < 0.8
+
+
+def test_balancer_prefers_low_latency_and_penalizes_errors() -> None:
+    balancer = EndpointBalancer(rng=random.Random(2))
+    fast, slow = _endpoint(1), _endpoint(2)
+    for _ in range(5):
+        balancer.begin(1, _MODEL)
+        balancer.finish(1, _MODEL, success=True, ttft_ms=40.0)
+        balancer.begin(2, _MODEL)
+        balancer.finish(2, _MODEL, success=True, ttft_ms=400.0)
+
+    picks = Counter(balancer.choose([fast, slow], _MODEL)["id"] for _ in range(2000))
+    assert picks[1] > picks[2] * 2
+    assert picks[2] > 0  # 慢端点仍持续获得少量样本
+
+    healthy_score = balancer.score(fast, _MODEL)
+    for _ in range(10):
+        balancer.begin(1, _MODEL)
+        balancer.finish(1, _MODEL, success=False)
+    stats = balancer.get_stats(1, _MODEL)
+    assert stats is not None and stats.ewma_error_rate > 0.9 and stats.inflight == 0
+    assert balancer.score(fast, _MODEL) > healthy_score * 4
+
+
+def test_balancer_skips_zero_weight_unless_only_option() -> None:
+    balancer = EndpointBalancer(rng=random.Random(3))
+    drained, active = _endpoint(1, weight=0), _endpoint(2)
+
+    assert {balancer.choose([drained, active], _MODEL)["id"] for _ in range(50)} == {2}
+    assert balancer.choose([drained], _MODEL)["id"] == 1
+    assert balancer.choose([], _MODEL) is None
+
+
+def _sse_body(text: str) -> bytes:
+    chunk = {"choices": [{"index": 0, "delta": {"content": text}}]}
+    return f"data: {json.dumps(chunk)}\n\ndata: [DONE]\n\n".encode("utf-8")
+
+
+@pytest.mark.asyncio
+async def test_two_mock_upstreams_traffic_shifts_to_faster_endpoint(monkeypatch, mock_upstream_service) -> None:
+    hits: Counter[str] = Counter()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        hits[host] += 1
+        await asyncio.sleep(_UPSTREAM_DELAYS[host])
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=_sse_body(host))
+
+    monkeypatch.setattr(balancer_module, "_endpoint_balancer", EndpointBalancer(rng=random.Random(4)))
+    monkeypatch.setattr(get_settings(), "ai_endpoint_balancing_enabled", True)
+    upstream = await mock_upstream_service(handler)
+    service = upstream.service
+    for host in _UPSTREAM_DELAYS:
+        await upstream.config_service.create_endpoint(
+            {"name": host, "base_url": f"http://{host}", "api_key": "k", "model_list": [_MODEL]}
+        )
+
+    user = AuthenticatedUser(uid="balance-user", claims={})
+    broker = MessageEventBroker()
+    chosen: Counter[int] = Counter()
+    for index in range(30):
+        message_id = f"balance-{index}"
+        await broker.create_channel(message_id, owner_user_id=user.uid, conversation_id="conv-balance")
+        message = AIMessageInput(
+            model=_MODEL,
+            dialect="openai.chat_completions",
+            payload={"messages": [{"role": "user", "content": "hi"}]},
+        )
+        result = await service._generate_reply(
+            message_id=message_id,
+            message=message,
+            user=user,
+            user_details=UserDetails(uid=user.uid),
+            broker=broker,
+        )
+        chosen[result[5]] += 1
+        await broker.close(message_id)
+
+    assert hits["fast.upstream.local"] + hits["slow.upstream.local"] == 30
+    assert hits["fast.upstream.local"] >= 20
+    assert hits["slow.upstream.local"] >= 1
+    assert len(chosen) == 2
+
+    snapshot = {item["endpoint_id"]: item for item in balancer_module.get_endpoint_balancer().snapshot()}
+    fast_id, slow_id = sorted(snapshot)
+    assert snapshot[fast_id]["ewma_ttft_ms"] < snapshot[slow_id]["ewma_ttft_ms"]
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+from unittest.mock import Mock, patch
+
+import httpx
+import pytest
+from prometheus_client import REGISTRY
+
+from app.auth import AuthenticatedUser, ProviderError, UserDetails
+from app.services import endpoint_circuit_breaker as breaker_module
+from app.services.ai_service import AIMessageInput, MessageEventBroker
+from app.services.endpoint_circuit_breaker import (
+    CIRCUIT_CLOSED,
+    CIRCUIT_HALF_OPEN,
+    CIRCUIT_OPEN,
+    EndpointCircuitBreaker,
+    classify_upstream_failure,
+)
+from app.settings.config import get_settings
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_circuit_opens_after_consecutive_failures_and_recovers_via_half_open() -> None:
+    clock = _Clock()
+    breaker = EndpointCircuitBreaker(failure_threshold=3, open_seconds=10, half_open_max_trials=1, clock=clock)
+
+    for _ in range(2):
+        assert breaker.acquire(7)
+        breaker.record_failure(7, "timeout")
+    # 成功会清零连续失败计数
+    assert breaker.acquire(7)
+    breaker.record_success(7)
+    for _ in range(3):
+        assert breaker.acquire(7)
+        breaker.record_failure(7, "http_5xx")
+
+    assert breaker.state_of(7) == CIRCUIT_OPEN
+    assert not breaker.is_available(7)
+    assert not breaker.acquire(7)
+
+    clock.now += 10
+    assert breaker.is_available(7)
+    assert breaker.acquire(7)  # 唯一试探名额
+    assert breaker.state_of(7) == CIRCUIT_HALF_OPEN
+    assert not breaker.acquire(7)
+
+    breaker.record_failure(7, "timeout")
+    assert breaker.state_of(7) == CIRCUIT_OPEN
+    assert breaker.describe(7)["total_opens"] == 2
+
+    clock.now += 10
+    assert breaker.acquire(7)
+    breaker.record_success(7)
+    assert breaker.state_of(7) == CIRCUIT_CLOSED
+    assert breaker.describe(7)["consecutive_failures"] == 0
+
+
+def test_classify_upstream_failure_only_counts_timeouts_connect_errors_and_5xx() -> None:
+    request = httpx.Request("POST", "http://upstream.local/v1/chat/completions")
+
+    assert classify_upstream_failure(httpx.ReadTimeout("slow", request=request)) == "timeout"
+    assert classify_upstream_failure(httpx.ConnectError("refused", request=request)) == "connect_error"
+    assert (
+        classify_upstream_failure(
+            httpx.HTTPStatusError("boom", request=request, response=httpx.Response(502, request=request))
+        )
+        == "http_5xx"
+    )
+    assert (
+        classify_upstream_failure(
+            httpx.HTTPStatusError("bad", request=request, response=httpx.Response(400, request=request))
+        )
+        is None
+    )
+    assert classify_upstream_failure(ProviderError("upstream_http_503:overloaded")) == "http_5xx"
+    assert classify_upstream_failure(ProviderError("upstream_http_429:rate limited")) is None
+    assert classify_upstream_failure(ProviderError("upstream_empty_content")) is None
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_fails_fast_without_calling_upstream(monkeypatch, mock_upstream_service) -> None:
+    calls = {"count": 0}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls["count"] += 1
+        return httpx.Response(503, json={"error": "overloaded"})
+
+    monkeypatch.setattr(get_settings(), "ai_circuit_breaker_enabled", True)
+    monkeypatch.setattr(
+        breaker_module,
+        "_endpoint_circuit_breaker",
+        EndpointCircuitBreaker(failure_threshold=2, open_seconds=60),
+    )
+    upstream = await mock_upstream_service(
+        handler, name="flaky-upstream", base_url="http://flaky.upstream.local", model_list=["m1"]
+    )
+    service = upstream.service
+    endpoint_label = {"endpoint_id": str(upstream.endpoint["id"])}
+    user = AuthenticatedUser(uid="breaker-user", claims={})
+    broker = MessageEventBroker()
+
+    async def send(index: int) -> None:
+        message_id = f"breaker-{index}"
+        await broker.create_channel(message_id, owner_user_id=user.uid, conversation_id="conv-breaker")
+        message = AIMessageInput(
+            model="m1",
+            dialect="openai.chat_completions",
+            payload={"messages": [{"role": "user", "content": "hi"}]},
+        )
+        try:
+            await service._generate_reply(
+                message_id=message_id,
+                message=message,
+                user=user,
+                user_details=UserDetails(uid=user.uid),
+                broker=broker,
+            )
+        finally:
+            await broker.close(message_id)
+
+    for index in range(2):
+        with pytest.raises(httpx.HTTPStatusError):
+            await send(index)
+    assert calls["count"] == 2
+    assert REGISTRY.get_sample_value("ai_endpoint_circuit_state", endpoint_label) == 2
+
+    with pytest.raises(ProviderError, match="endpoint_circuit_open"):
+        await send(2)
+    assert calls["count"] == 2
+
+
+@patch("app.auth.dependencies.get_jwt_verifier")
+def test_llm_models_endpoints_view_exposes_circuit_state(mock_get_verifier, client, monkeypatch) -> None:
+    mock_verifier = Mock()
+    mock_verifier.verify_token.return_value = AuthenticatedUser(
+        uid="test-user-123",
+        claims={"sub": "test-user-123", "user_metadata": {"username": "admin", "is_admin": True}},
+    )
+    mock_get_verifier.return_value = mock_verifier
+    breaker = EndpointCircuitBreaker(failure_threshold=1, open_seconds=60)
+    monkeypatch.setattr(breaker_module, "_endpoint_circuit_breaker", breaker)
+
+    headers = {"Authorization": "Bearer mock-jwt-token"}
+    response = client.get("/api/v1/llm/models?view=endpoints&page_size=100", headers=headers)
+    assert response.status_code == 200
+    items = response.json()["data"]
+    assert items and all(item["circuit"]["state"] == CIRCUIT_CLOSED for item in items)
+
+    endpoint_id = int(items[0]["id"])
+    breaker.record_failure(endpoint_id, "timeout")
+    detail = client.get(f"/api/v1/llm/models/{endpoint_id}", headers=headers)
+    assert detail.status_code == 200
+    circuit = detail.json()["data"]["circuit"]
+    assert circuit["state"] == CIRCUIT_OPEN
+    assert circuit["last_failure_reason"] == "timeout"
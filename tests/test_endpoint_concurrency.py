@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+import httpx
+import pytest
+from prometheus_client import REGISTRY
+
+from app.auth import AuthenticatedUser, ProviderError, UserDetails
+from app.services import endpoint_concurrency as concurrency_module
+from app.services.ai_service import AIMessageInput, MessageEventBroker
+from app.services.endpoint_concurrency import PRIORITY_FREE, PRIORITY_PRO, EndpointConcurrencyLimiter
+from app.services.entitlement_service import ResolvedEntitlement
+
+_MODEL = "queue-test-model"
+
+
+@pytest.mark.asyncio
+async def test_queue_releases_pro_before_free_and_times_out() -> None:
+    limiter = EndpointConcurrencyLimiter(max_concurrency=1, max_queue_wait_seconds=1.0)
+    order: list[str] = []
+    release_holder = asyncio.Event()
+
+    async def holder() -> None:
+        async with limiter.slot(7, limit=1):
+            await release_holder.wait()
+
+    async def waiter(name: str, priority: int) -> None:
+        async with limiter.slot(7, limit=1, priority=priority):
+            order.append(name)
+
+    holder_task = asyncio.create_task(holder())
+    await asyncio.sleep(0)
+    tasks = [asyncio.create_task(waiter("free", PRIORITY_FREE))]
+    await asyncio.sleep(0)
+    tasks.append(asyncio.create_task(waiter("pro", PRIORITY_PRO)))
+    await asyncio.sleep(0)
+    assert limiter.describe(7) == {"active": 1, "queued": 2}
+
+    release_holder.set()
+    await asyncio.gather(holder_task, *tasks)
+    assert order == ["pro", "free"]
+    assert limiter.describe(7) == {"active": 0, "queued": 0}
+
+    impatient = EndpointConcurrencyLimiter(max_concurrency=1, max_queue_wait_seconds=0.02)
+    labels = {"endpoint_id": "8"}
+    before = REGISTRY.get_sample_value("ai_endpoint_queue_timeouts_total", labels) or 0.0
+    async with impatient.slot(8, limit=1):
+        with pytest.raises(ProviderError, match="endpoint_queue_timeout"):
+            async with impatient.slot(8, limit=1):
+                pass
+    assert REGISTRY.get_sample_value("ai_endpoint_queue_timeouts_total", labels) - before == 1
+    assert impatient.describe(8) == {"active": 0, "queued": 0}
+
+
+class _Entitlements:
+    async def resolve(self, user_id: str) -> ResolvedEntitlement:
+        tier = "pro" if user_id.startswith("pro") else "free"
+        return ResolvedEntitlement(tier=tier, expires_at_ms=None, flags={}, resolved_at_ms=0)
+
+
+@pytest.mark.asyncio
+async def test_generate_reply_respects_endpoint_max_concurrency(monkeypatch, mock_upstream_service) -> None:
+    state = {"active": 0, "peak": 0, "order": []}
+    first_started = asyncio.Event()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        body = json.loads(request.content)
+        state["order"].append(body["messages"][0]["content"])
+        first_started.set()
+        await asyncio.sleep(0.2)
+        state["active"] -= 1
+        chunk = {"choices": [{"index": 0, "delta": {"content": "ok"}}]}
+        content = f"data: {json.dumps(chunk)}\n\ndata: [DONE]\n\n".encode("utf-8")
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=content)
+
+    monkeypatch.setattr(
+        concurrency_module,
+        "_endpoint_concurrency_limiter",
+        EndpointConcurrencyLimiter(max_concurrency=0, max_queue_wait_seconds=5.0),
+    )
+    upstream = await mock_upstream_service(
+        handler,
+        entitlement_service=_Entitlements(),
+        name="queue-upstream",
+        base_url="http://queue.upstream.local",
+        model_list=[_MODEL],
+        max_concurrency=1,
+    )
+    service = upstream.service
+    broker = MessageEventBroker()
+
+    async def send(uid: str) -> str:
+        user = AuthenticatedUser(uid=uid, claims={})
+        message_id = f"msg-{uid}"
+        await broker.create_channel(message_id, owner_user_id=uid, conversation_id=f"conv-{uid}")
+        result = await service._generate_reply(
+            message_id=message_id,
+            message=AIMessageInput(
+                model=_MODEL,
+                dialect="openai.chat_completions",
+                payload={"messages": [{"role": "user", "content": uid}]},
+            ),
+            user=user,
+            user_details=UserDetails(uid=uid),
+            broker=broker,
+        )
+        return result[0]
+
+    first = asyncio.create_task(send("free-1"))
+    await first_started.wait()
+    rest = [asyncio.create_task(send("free-2")), asyncio.create_task(send("pro-1"))]
+    replies = await asyncio.gather(first, *rest)
+
+    assert replies == ["ok", "ok", "ok"]
+    assert state["peak"] == 1
+    assert state["order"] == ["free-1", "pro-1", "free-2"]
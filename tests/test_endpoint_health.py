@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import json
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.auth import ProviderError
+from app.services import endpoint_health as health_module
+from app.services.endpoint_health import EndpointHealthTracker, classify_passive_error
+from app.services.providers import get_provider_adapter
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_tracker_requires_probe_only_for_idle_or_suspect_endpoints() -> None:
+    clock = _Clock()
+    tracker = EndpointHealthTracker(clock=clock)
+
+    assert tracker.needs_active_probe(1, idle_seconds=60)  # 从未观测
+
+    tracker.record_success(1, latency_ms=120.0)
+    assert not tracker.needs_active_probe(1, idle_seconds=60)
+    clock.now += 61
+    assert tracker.needs_active_probe(1, idle_seconds=60)  # 空闲
+
+    tracker.record_success(1, latency_ms=80.0)
+    tracker.record_failure(1, "http_4xx")  # 请求侧问题，不代表端点异常
+    assert not tracker.needs_active_probe(1, idle_seconds=60)
+    tracker.record_failure(1, "timeout")
+    assert tracker.is_suspect(1)
+    assert tracker.needs_active_probe(1, idle_seconds=60)
+    assert tracker.describe(1)["consecutive_failures"] == 2
+
+    tracker.record_success(1, latency_ms=100.0)
+    assert not tracker.is_suspect(1)
+    assert tracker.describe(1)["ewma_latency_ms"] is not None
+
+
+def test_classify_passive_error() -> None:
+    request = httpx.Request("POST", "http://upstream.local/v1/chat/completions")
+    assert classify_passive_error(httpx.ReadTimeout("slow", request=request)) == "timeout"
+    assert (
+        classify_passive_error(
+            httpx.HTTPStatusError("bad", request=request, response=httpx.Response(401, request=request))
+        )
+        == "http_4xx"
+    )
+    assert classify_passive_error(ProviderError("upstream_http_503:overloaded")) == "http_5xx"
+    assert classify_passive_error(ProviderError("upstream_http_429:rate limited")) == "http_4xx"
+    assert classify_passive_error(ProviderError("upstream_empty_content")) == "provider_error"
+
+
+class _ProbeClient:
+    probed_urls: list[str] = []
+
+    def __init__(self, *args, **kwargs):
+        return None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+    async def options(self, url: str, *args, **kwargs):
+        type(self).probed_urls.append(str(url))
+        return SimpleNamespace(status_code=204, json=lambda: None)
+
+    async def get(self, url: str, *args, **kwargs):
+        return SimpleNamespace(status_code=200, json=lambda: {"data": [{"id": "m1"}]})
+
+
+@pytest.mark.asyncio
+async def test_adapter_traffic_feeds_passive_health_and_skips_active_probe(monkeypatch, mock_upstream_service) -> None:
+    tracker = EndpointHealthTracker()
+    monkeypatch.setattr(health_module, "_endpoint_health_tracker", tracker)
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "broken.local":
+            return httpx.Response(503, json={"error": "overloaded"})
+        chunk = {"choices": [{"index": 0, "delta": {"content": "ok"}}]}
+        body = f"data: {json.dumps(chunk)}\n\ndata: [DONE]\n\n".encode("utf-8")
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=body)
+
+    settings = SimpleNamespace(
+        http_timeout_seconds=5,
+        ai_passive_health_enabled=True,
+        ai_passive_health_idle_seconds=120.0,
+        ai_passive_health_max_probe_age_seconds=600.0,
+    )
+    upstream = await mock_upstream_service(handler, settings=settings)
+    manager, service = upstream.db, upstream.config_service
+    healthy = await service.create_endpoint({"name": "healthy", "base_url": "http://healthy.local", "api_key": "k"})
+    broken = await service.create_endpoint({"name": "broken", "base_url": "http://broken.local", "api_key": "k"})
+    idle = await service.create_endpoint({"name": "idle", "base_url": "http://idle.local", "api_key": "k"})
+
+    adapter = get_provider_adapter("openai.chat_completions")
+
+    async def publish(event: str, data: dict) -> None:
+        return None
+
+    reply, *_ = await adapter.stream(
+        endpoint=healthy,
+        api_key="k",
+        openai_req={"model": "m1", "messages": []},
+        timeout=5,
+        publish=publish,
+    )
+    assert reply == "ok"
+    with pytest.raises(httpx.HTTPStatusError):
+        await adapter.stream(
+            endpoint=broken,
+            api_key="k",
+            openai_req={"model": "m1", "messages": []},
+            timeout=5,
+            publish=publish,
+        )
+
+    assert tracker.describe(healthy["id"])["successes"] == 1
+    assert tracker.describe(broken["id"])["last_error_class"] == "http_5xx"
+
+    _ProbeClient.probed_urls = []
+    monkeypatch.setattr("app.services.ai_config_service.httpx.AsyncClient", _ProbeClient)
+    # 从未主动探测（last_checked_at 为空）：即使有成功流量也要先探测一次拉取 model_list
+    await service.refresh_all_status(passive_first=True)
+    assert {httpx.URL(url).host for url in _ProbeClient.probed_urls} == {"healthy.local", "broken.local", "idle.local"}
+    probed = await service.get_endpoint(healthy["id"])
+    assert probed["model_list"] == ["m1"]
+
+    _ProbeClient.probed_urls = []
+    results = {item["id"]: item for item in await service.refresh_all_status(passive_first=True)}
+
+    probed_hosts = {httpx.URL(url).host for url in _ProbeClient.probed_urls}
+    assert probed_hosts == {"broken.local", "idle.local"}
+    assert results[healthy["id"]]["status"] == "online"
+    # 被动路径只维护在线状态：探针延迟/检测时间保持主动探针的值
+    assert results[healthy["id"]]["latency_ms"] == probed["latency_ms"]
+    assert results[healthy["id"]]["last_checked_at"] == probed["last_checked_at"]
+    assert results[idle["id"]]["status"] == "online"
+
+    # 上次主动探针超过最大年龄：即使流量持续成功也重新探测（刷新 model_list）
+    await manager.execute(
+        "UPDATE ai_endpoints SET last_checked_at = ? WHERE id = ?",
+        ["2000-01-01T00:00:00+00:00", healthy["id"]],
+    )
+    _ProbeClient.probed_urls = []
+    await service.refresh_all_status(passive_first=True)
+    assert "healthy.local" in {httpx.URL(url).host for url in _ProbeClient.probed_urls}
+
+    # 手动“全部检测”仍然主动探测所有端点
+    _ProbeClient.probed_urls = []
+    await service.refresh_all_status()
+    assert {httpx.URL(url).host for url in _ProbeClient.probed_urls} == {"healthy.local", "broken.local", "idle.local"}
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from prometheus_client import REGISTRY
+
+from app.services.entitlement_service import EntitlementService
+
+
+def _expire(service: EntitlementService, user_id: str, *, seconds_ago: float) -> None:
+    _, value = service._cache[user_id]
+    service._cache[user_id] = (time.monotonic() - seconds_ago, value)
+
+
+def _lookups(result: str) -> float:
+    return REGISTRY.get_sample_value("entitlement_cache_requests_total", {"result": result}) or 0.0
+
+
+@pytest.mark.asyncio
+async def test_entitlement_cache_single_flight_and_stale_while_revalidate() -> None:
+    gate = asyncio.Event()
+    repo = MagicMock()
+
+    async def slow_get(user_id: str):
+        await gate.wait()
+        return {"tier": "pro", "expires_at": None, "flags": {}}
+
+    repo.get_entitlements = AsyncMock(side_effect=slow_get)
+    service = EntitlementService(repo, ttl_seconds=60, stale_ttl_seconds=600)
+    misses_before = _lookups("miss")
+
+    waiters = [asyncio.create_task(service.resolve("hot-user")) for _ in range(50)]
+    await asyncio.sleep(0)
+    gate.set()
+    results = await asyncio.gather(*waiters)
+    assert all(item.is_pro for item in results)
+    assert repo.get_entitlements.await_count == 1
+    assert _lookups("miss") - misses_before == 50
+
+    # 过期但在 stale 窗口内：立即返回旧值，后台只刷新一次；刷新失败不降级
+    _expire(service, "hot-user", seconds_ago=1)
+    gate.clear()
+    repo.get_entitlements = AsyncMock(side_effect=RuntimeError("supabase down"))
+    stale = await asyncio.gather(*[service.resolve("hot-user") for _ in range(10)])
+    assert all(item.is_pro for item in stale)
+    await asyncio.sleep(0)
+    assert repo.get_entitlements.await_count == 1
+    assert (await service.resolve("hot-user")).tier == "pro"
+
+    # 超出 stale 窗口：按未命中同步加载
+    _expire(service, "hot-user", seconds_ago=700)
+    repo.get_entitlements = AsyncMock(return_value={"tier": "free"})
+    assert (await service.resolve("hot-user")).tier == "free"
+
+
+@pytest.mark.asyncio
+async def test_entitlement_cache_is_bounded_lru_and_invalidates() -> None:
+    repo = MagicMock()
+    repo.get_entitlements = AsyncMock(side_effect=lambda user_id: {"tier": "pro" if user_id == "a" else "free"})
+    service = EntitlementService(repo, ttl_seconds=60, max_entries=2)
+
+    await service.resolve("a")
+    await service.resolve("b")
+    await service.resolve("a")  # a 最近使用 → 淘汰 b
+    await service.resolve("c")
+    assert list(service._cache) == ["a", "c"]
+    assert REGISTRY.get_sample_value("entitlement_cache_entries") == 2
+    assert repo.get_entitlements.await_count == 3
+
+    service.invalidate("a")
+    await service.resolve("a")
+    assert repo.get_entitlements.await_count == 4
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import httpx
+import pytest
+
+from app.auth.jwt_verifier import JWKSCache
+from app.services.metrics_collector import MetricsCollector
+from app.settings.config import get_settings
+
+_REAL_CLIENT = httpx.Client
+
+_JWKS_URL = "https://jwks.example.local/.well-known/jwks.json"
+
+
+@pytest.mark.asyncio
+async def test_jwt_availability_reads_cache_state_and_probes_at_most_once_per_interval(monkeypatch) -> None:
+    calls = 0
+    healthy = True
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        if not healthy:
+            return httpx.Response(503)
+        return httpx.Response(200, json={"keys": [{"kid": "k1", "kty": "RSA"}]})
+
+    def client_factory(*args, **kwargs) -> httpx.Client:
+        kwargs.pop("transport", None)
+        return _REAL_CLIENT(*args, transport=httpx.MockTransport(handler), **kwargs)
+
+    monkeypatch.setattr("app.auth.jwt_verifier.httpx.Client", client_factory)
+    monkeypatch.setattr(get_settings(), "jwks_probe_interval_seconds", 300.0)
+    cache = JWKSCache(jwks_url=_JWKS_URL, static_jwk=None, ttl_seconds=900, timeout_seconds=1.0)
+    monkeypatch.setattr(
+        "app.services.metrics_collector.get_jwt_verifier", lambda: SimpleNamespace(jwks_cache=cache)
+    )
+    collector = MetricsCollector(MagicMock(), MagicMock())
+
+    # 首次查询不等待网络：返回 pending，探针在后台执行
+    first = await collector._get_jwt_availability()
+    assert first["jwks_probe"]["ok"] is False and first["jwks_probe"]["error"] == "jwks_probe_pending"
+    await collector._jwks_probe_task
+
+    for _ in range(20):
+        result = await collector._get_jwt_availability()
+    assert calls == 1
+    assert result["success_rate"] == 100.0
+    assert result["jwks_probe"]["ok"] is True and result["jwks_probe"]["key_count"] == 1
+    assert result["jwks_probe"]["last_success_at"]
+
+    # 超过探针间隔后再刷新一次；失败时保留已缓存密钥并上报错误
+    healthy = False
+    cache._last_attempt_at -= 301
+    await collector._get_jwt_availability()
+    await collector._jwks_probe_task
+    result = await collector._get_jwt_availability()
+    assert calls == 2
+    assert result["success_rate"] == 0.0
+    assert result["jwks_probe"]["ok"] is False and "503" in result["jwks_probe"]["error"]
+    assert result["jwks_probe"]["key_count"] == 1
+    assert cache.get_key("k1")["kid"] == "k1"
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import pytest
+from prometheus_client import REGISTRY
+
+from app.auth import AuthenticatedUser
+from app.core.rate_limiter import RateLimiter
+from app.core.sse_guard import SSEConcurrencyGuard
+
+
+def _sample(name: str, labels: dict) -> float:
+    value = REGISTRY.get_sample_value(name, labels)
+    return float(value or 0.0)
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_exports_allow_and_deny_decisions() -> None:
+    limiter = RateLimiter()
+    try:
+        allow_labels = {"result": "allow", "reason": "ok", "user_type": "anonymous"}
+        deny_labels = {"result": "deny", "reason": "ip_qps", "user_type": "anonymous"}
+        allow_before = _sample("rate_limit_decisions_total", allow_labels)
+        deny_before = _sample("rate_limit_decisions_total", deny_labels)
+        blocks_before = _sample("rate_limit_blocks_total", {"reason": "ip_qps", "user_type": "anonymous"})
+
+        qps = limiter.settings.rate_limit_anonymous_qps
+        results = [
+            limiter.check_rate_limit(None, "172.16.0.9", "Mozilla/5.0", user_type="anonymous")[0]
+            for _ in range(qps + 1)
+        ]
+
+        assert results.count(False) == 1
+        assert _sample("rate_limit_decisions_total", allow_labels) - allow_before == qps
+        assert _sample("rate_limit_decisions_total", deny_labels) - deny_before == 1
+        assert _sample("rate_limit_blocks_total", {"reason": "ip_qps", "user_type": "anonymous"}) - blocks_before == 1
+    finally:
+        limiter._cleanup_task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_sse_guard_exports_active_connections_and_rejections() -> None:
+    guard = SSEConcurrencyGuard()
+    user = AuthenticatedUser(uid="metrics-user", claims={}, user_type="anonymous")
+
+    active_before = _sample("sse_active_connections", {"user_type": "anonymous"})
+    rejected_labels = {"reason": "conversation_limit_exceeded", "user_type": "anonymous"}
+    rejected_before = _sample("sse_guard_rejections_total", rejected_labels)
+
+    allowed, _, _ = await guard.check_and_register_connection("m-c1", user, "conv-m", "m1", "127.0.0.1", "pytest")
+    assert allowed
+    allowed, _, _ = await guard.check_and_register_connection("m-c2", user, "conv-m", "m2", "127.0.0.1", "pytest")
+    assert not allowed
+
+    assert _sample("sse_active_connections", {"user_type": "anonymous"}) - active_before == 1
+    assert _sample("sse_guard_rejections_total", rejected_labels) - rejected_before == 1
+
+    await guard.unregister_connection("m-c1")
+    assert _sample("sse_active_connections", {"user_type": "anonymous"}) == active_before
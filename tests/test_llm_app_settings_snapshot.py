@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import pytest
+
+from app.db.sqlite_manager import SQLiteManager
+from app.services.config_events import TOPIC_LLM_APP_SETTINGS, ConfigEventBus
+from app.services.llm_app_settings import LlmAppSettingsStore
+
+
+@pytest.mark.asyncio
+async def test_llm_app_settings_snapshot_loads_once_and_refreshes_on_write(tmp_path, monkeypatch) -> None:
+    db = SQLiteManager(tmp_path / "db.sqlite")
+    await db.init()
+    bus = ConfigEventBus()
+    store = LlmAppSettingsStore(db, event_bus=bus)
+
+    queries = 0
+    original = db.fetchall
+
+    async def counting(query, params=()):
+        nonlocal queries
+        if "llm_app_settings" in query:
+            queries += 1
+        return await original(query, params)
+
+    monkeypatch.setattr(db, "fetchall", counting)
+    try:
+        first = await store.get()
+        assert (first.default_result_mode, first.prompt_mode, first.app_output_protocol) == (
+            "raw_passthrough",
+            "server",
+            "thinkingml_v45",
+        )
+        for _ in range(20):
+            assert await store.get() is first
+        assert queries == 1
+
+        updated = await store.update({"prompt_mode": "PASSTHROUGH", "app_output_protocol": "jsonseq_v1", "bogus": 1})
+        assert updated.prompt_mode == "passthrough"
+        assert updated.app_output_protocol == "jsonseq_v1"
+        assert "bogus" not in updated.values
+        assert bus.topic_version(TOPIC_LLM_APP_SETTINGS) == 1
+        assert queries == 2
+
+        # 非法值回退默认；其他 worker 的写入表现为总线版本号推进
+        await db.execute(
+            "INSERT INTO llm_app_settings(key, value_json) VALUES ('default_result_mode', '\"weird\"')"
+            " ON CONFLICT(key) DO UPDATE SET value_json = excluded.value_json"
+        )
+        assert (await store.get()).default_result_mode == "raw_passthrough"
+        assert queries == 2
+        bus.publish_local(TOPIC_LLM_APP_SETTINGS)
+        assert (await store.get()).values["default_result_mode"] == "weird"
+        assert queries == 3
+    finally:
+        await db.close()
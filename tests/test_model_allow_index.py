@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+from unittest.mock import MagicMock
+
+import pytest
+from prometheus_client import REGISTRY
+
+from app.db.sqlite_manager import SQLiteManager
+from app.services.ai_config_service import AIConfigService
+from app.services.ai_service import AIService
+from app.services.model_mapping_service import ModelMappingService
+from app.settings.config import get_settings
+
+
+@pytest.mark.asyncio
+async def test_model_allow_index_rebuilds_only_on_config_change(tmp_path, monkeypatch) -> None:
+    settings = get_settings()
+    # 关闭测试环境的 auto-seed/auto-repair，避免重建过程中额外写入映射
+    monkeypatch.setattr(settings, "allow_test_ai_endpoints", False)
+    db = SQLiteManager(tmp_path / "db.sqlite")
+    await db.init()
+    config_service = AIConfigService(db, settings, storage_dir=tmp_path / "runtime")
+    mapping_service = ModelMappingService(config_service, db, tmp_path / "runtime")
+    service = AIService(provider=MagicMock(), ai_config_service=config_service, model_mapping_service=mapping_service)
+    try:
+        await config_service.create_endpoint(
+            {"name": "allow-upstream", "base_url": "http://allow.local", "api_key": "k", "model_list": ["m-a", "m-b"]}
+        )
+        await mapping_service.upsert_mapping(
+            {"scope_type": "mapping", "scope_key": "fast", "default_model": "m-a", "candidates": ["m-a"]}
+        )
+        await mapping_service.upsert_mapping(
+            {"scope_type": "user", "scope_key": "alice", "default_model": "m-b", "candidates": ["m-b"]}
+        )
+
+        builds = 0
+        original = service.list_app_model_scopes
+
+        async def counting(**kwargs):
+            nonlocal builds
+            builds += 1
+            return await original(**kwargs)
+
+        monkeypatch.setattr(service, "list_app_model_scopes", counting)
+
+        for _ in range(5):
+            assert await service.is_model_allowed("fast", user_id="bob")
+            assert not await service.is_model_allowed("missing")
+        assert builds == 1
+        first = service.describe_model_allow_index()
+        assert first["built"] and first["version"] >= 1
+        assert REGISTRY.get_sample_value("ai_model_allowlist_version") == first["version"]
+
+        # user 映射只对本人开放
+        assert await service.is_model_allowed("user:alice", user_id="alice")
+        assert not await service.is_model_allowed("user:alice", user_id="bob")
+
+        # 屏蔽唯一候选 → 修订号变化 → 重建后不再放行
+        await mapping_service.upsert_blocked_models([{"model": "m-a", "blocked": True}])
+        assert not await service.is_model_allowed("fast")
+        assert builds == 2
+        assert service.describe_model_allow_index()["version"] == first["version"] + 1
+        assert await service.is_model_allowed("fast") is False
+        assert builds == 2
+    finally:
+        await db.close()
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 import pytest
@@ -295,6 +296,27 @@ async def test_resolve_model_key_skips_blocked(tmp_path: Path) -> None:
         await db.close()
 
 
+@pytest.mark.anyio("asyncio")
+async def test_resolve_model_key_matches_legacy_tenant_rows(tmp_path: Path) -> None:
+    service, _ai_service, db = await _new_service(tmp_path)
+    try:
+        # 旧版本以 tenant:* 为主键落库的映射，按业务 key 与 mapping:* 均可解析
+        await db.execute(
+            """
+            INSERT INTO llm_model_mappings
+            (id, scope_type, scope_key, name, default_model, candidates_json, is_active, updated_at, metadata_json)
+            VALUES ('tenant:legacy', 'tenant', 'legacy', NULL, 'gpt-4o-mini', '["gpt-4o-mini"]', 1, NULL, '{}')
+            """
+        )
+
+        for key in ("legacy", "mapping:legacy", "tenant:legacy"):
+            resolved = await service.resolve_model_key(key)
+            assert resolved["hit"] is True
+            assert resolved["resolved_model"] == "gpt-4o-mini"
+    finally:
+        await db.close()
+
+
 @pytest.mark.anyio("asyncio")
 async def test_import_local_mappings(tmp_path: Path) -> None:
     service, ai_service, db = await _new_service(tmp_path)
@@ -330,3 +352,91 @@ async def test_import_local_mappings(tmp_path: Path) -> None:
         assert 1 in ai_service.updated_payload
     finally:
         await db.close()
+
+
+@pytest.mark.anyio("asyncio")
+async def test_blocked_models_cached_and_reloaded_on_mtime_change(tmp_path: Path, monkeypatch) -> None:
+    ai_service = FakeAIConfigService()
+    db = SQLiteManager(tmp_path / "db.sqlite3")
+    await db.init()
+    service = ModelMappingService(ai_service, db, tmp_path, blocked_check_interval_seconds=60)
+    try:
+        assert await service.list_blocked_models() == []
+        assert await service.upsert_blocked_models([{"model": "m-1", "blocked": True}]) == ["m-1"]
+
+        reads = 0
+        original = service._read_blocked
+
+        async def counting_read():
+            nonlocal reads
+            reads += 1
+            return await original()
+
+        monkeypatch.setattr(service, "_read_blocked", counting_read)
+        for _ in range(10):
+            assert await service.list_blocked_models() == ["m-1"]
+        assert reads == 0
+
+        # 外部改文件：检查间隔内仍用缓存；间隔过后按 mtime 变化重新加载，并推进修订号
+        blocked_file = tmp_path / "blocked_models.json"
+        blocked_file.write_text('{"blocked": ["m-2"]}', encoding="utf-8")
+        stat = blocked_file.stat()
+        os.utime(blocked_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        assert await service.list_blocked_models() == ["m-1"]
+
+        revision = service.revision
+        service._blocked_checked_at -= 61
+        assert await service.list_blocked_models() == ["m-2"]
+        assert reads == 1
+        assert service.revision == revision + 1
+
+        # mtime 未变：只做 stat，不再读文件
+        service._blocked_checked_at -= 61
+        assert await service.list_blocked_models() == ["m-2"]
+        assert reads == 1
+    finally:
+        await db.close()
+
+
+class RevisionedAIConfigService(FakeAIConfigService):
+    def __init__(self) -> None:
+        super().__init__()
+        self.prompt_revision = 0
+        self.list_calls = 0
+
+    async def list_prompts(self, *, page: int, page_size: int, **kwargs: object):
+        self.list_calls += 1
+        return await super().list_prompts(page=page, page_size=page_size, **kwargs)
+
+    async def update_prompt(self, prompt_id: int, payload: dict[str, object]) -> None:
+        await super().update_prompt(prompt_id, payload)
+        self.prompt_revision += 1
+
+
+@pytest.mark.anyio("asyncio")
+async def test_prompt_mappings_indexed_until_prompt_write(tmp_path: Path) -> None:
+    ai_service = RevisionedAIConfigService()
+    db = SQLiteManager(tmp_path / "db.sqlite3")
+    await db.init()
+    service = ModelMappingService(ai_service, db, tmp_path)
+    try:
+        await service.upsert_mapping(
+            {"scope_type": "prompt", "scope_key": "1", "default_model": "gpt-4o", "candidates": ["gpt-4o"]}
+        )
+        ai_service.list_calls = 0
+        for _ in range(5):
+            resolved = await service.resolve_model_key("prompt:1")
+            assert resolved["resolved_model"] == "gpt-4o"
+            picked = await service.resolve_for_message(user_id="u1", prompt_id=1)
+            assert picked["model"] == "gpt-4o"
+        # 索引已在 upsert 回读时建立：后续解析不再扫描 prompts
+        assert ai_service.list_calls == 0
+
+        # prompt 写入后索引失效并重建
+        await service.upsert_mapping(
+            {"scope_type": "prompt", "scope_key": "1", "default_model": "gpt-4o-mini", "candidates": ["gpt-4o-mini"]}
+        )
+        assert (await service.resolve_model_key("prompt:1"))["resolved_model"] == "gpt-4o-mini"
+        assert ai_service.list_calls == 1
+    finally:
+        await db.close()
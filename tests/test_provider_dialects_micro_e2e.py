@@ -15,10 +15,11 @@ from app.auth import AuthenticatedUser
 from app.services.entitlement_service import EntitlementService
 
 
-def _make_async_lines(lines: list[str]) -> AsyncIterator[str]:
-    async def gen() -> AsyncIterator[str]:
+def _make_async_lines(lines: list[str]) -> AsyncIterator[bytes]:
+    # adapter 以字节流分帧：每行作为一个 chunk 下发（含行尾）
+    async def gen() -> AsyncIterator[bytes]:
         for line in lines:
-            yield line
+            yield f"{line}\n".encode("utf-8")
 
     return gen()
 
@@ -30,7 +31,7 @@ def _mock_httpx_streaming_sse(mock_httpx: MagicMock, *, lines: list[str], header
     if headers:
         response.headers.update(headers)
     response.raise_for_status = MagicMock()
-    response.aiter_lines = MagicMock(side_effect=lambda: _make_async_lines(lines))
+    response.aiter_bytes = MagicMock(side_effect=lambda: _make_async_lines(lines))
     response.aread = AsyncMock(return_value=b"")
 
     stream_ctx = MagicMock()
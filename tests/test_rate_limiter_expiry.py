@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from app.auth import AuthenticatedUser
+from app.core.expiry_queue import ExpiryQueue
+from app.core.rate_limiter import _ENTRY_IDLE_TTL_SECONDS, RateLimiter
+from app.core.sse_guard import SSEConcurrencyGuard
+
+
+def test_expiry_queue_pops_only_due_keys_and_skips_rescheduled() -> None:
+    queue: ExpiryQueue[str] = ExpiryQueue()
+    queue.schedule("a", 10.0)
+    queue.schedule("b", 20.0)
+    queue.schedule("c", 30.0)
+
+    # 改期/注销后，旧堆条目应被惰性丢弃
+    queue.schedule("a", 25.0)
+    queue.discard("b")
+
+    assert queue.pop_due(15.0) == []
+    assert queue.pop_due(26.0) == ["a"]
+    assert len(queue) == 1
+    assert queue.pop_due(100.0, limit=5) == ["c"]
+    assert len(queue) == 0
+
+
+def test_expiry_queue_respects_limit() -> None:
+    queue: ExpiryQueue[int] = ExpiryQueue()
+    for i in range(10):
+        queue.schedule(i, float(i))
+
+    assert queue.pop_due(100.0, limit=3) == [0, 1, 2]
+    assert len(queue) == 7
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_incremental_cleanup_keeps_active_entries() -> None:
+    limiter = RateLimiter()
+    try:
+        limiter.check_rate_limit("idle-user", "10.0.0.1", "Mozilla/5.0")
+        limiter.check_rate_limit("busy-user", "10.0.0.2", "Mozilla/5.0")
+        limiter.record_failure("10.0.0.3")
+
+        # busy-user 在首次登记后仍有活动：到期时应改期而不是回收
+        later = time.time() + _ENTRY_IDLE_TTL_SECONDS + 1
+        limiter.user_qps_buckets["busy-user"].last_refill = later - 10
+        limiter.ip_qps_buckets["10.0.0.2"].last_refill = later - 10
+
+        removed = limiter._cleanup_old_entries(now=later)
+
+        assert removed == 3
+        assert "idle-user" not in limiter.user_qps_buckets
+        assert "idle-user" not in limiter.user_daily_windows
+        assert "10.0.0.1" not in limiter.ip_qps_buckets
+        assert "10.0.0.3" not in limiter.cooldown_trackers
+        assert "busy-user" in limiter.user_qps_buckets
+        assert "10.0.0.2" in limiter.ip_qps_buckets
+        assert limiter.tracked_entry_counts() == {"user": 1, "ip": 1, "cooldown": 0}
+    finally:
+        limiter._cleanup_task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_check_does_not_create_cooldown_trackers() -> None:
+    limiter = RateLimiter()
+    try:
+        for i in range(5):
+            limiter.check_rate_limit(None, f"192.168.0.{i}", "Mozilla/5.0")
+        assert len(limiter.cooldown_trackers) == 0
+    finally:
+        limiter._cleanup_task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_sse_guard_cleanup_only_unregisters_stale_connections() -> None:
+    guard = SSEConcurrencyGuard()
+    user = AuthenticatedUser(uid="user-expiry", claims={}, user_type="permanent")
+
+    allowed, _, _ = await guard.check_and_register_connection("old", user, None, "m1", "127.0.0.1", "pytest")
+    assert allowed
+    allowed, _, _ = await guard.check_and_register_connection("new", user, None, "m2", "127.0.0.1", "pytest")
+    assert allowed
+
+    guard.active_connections["old"].start_time -= 7200
+    guard._age_queue.schedule("old", guard.active_connections["old"].start_time)
+
+    assert await guard.cleanup_stale_connections(max_age_seconds=3600) == 1
+    assert set(guard.active_connections) == {"new"}
+
+    await guard.unregister_connection("new")
+    assert len(guard._age_queue) == 0
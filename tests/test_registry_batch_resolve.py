@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.auth import ProviderError
+from app.db.sqlite_manager import SQLiteManager
+from app.services.ai_config_service import AIConfigService
+from app.services.llm_model_registry import LlmModelRegistry, ResolvedProviderRoute
+from app.services.metrics_collector import MetricsCollector
+from app.services.model_mapping_service import ModelMappingService
+from app.settings.config import get_settings
+
+
+@pytest.mark.asyncio
+async def test_batch_resolve_matches_single_resolve_with_one_snapshot(tmp_path, monkeypatch) -> None:
+    settings = get_settings()
+    db = SQLiteManager(tmp_path / "db.sqlite")
+    await db.init()
+    config_service = AIConfigService(db, settings, storage_dir=tmp_path / "runtime")
+    mapping_service = ModelMappingService(config_service, db, tmp_path / "runtime")
+    registry = LlmModelRegistry(config_service, mapping_service, settings)
+    try:
+        await config_service.create_endpoint(
+            {"name": "batch-upstream", "base_url": "http://batch.upstream.local", "api_key": "k", "model_list": ["m-a"]}
+        )
+        for key, model in (("ok-1", "m-a"), ("ok-2", "m-a"), ("unroutable", "m-missing")):
+            await mapping_service.upsert_mapping(
+                {"scope_type": "mapping", "scope_key": key, "default_model": model, "candidates": [model], "is_active": True}
+            )
+        keys = ["ok-1", "ok-2", "unroutable"]
+        single: dict[str, str] = {}
+        for key in keys:
+            try:
+                single[key] = (await registry.resolve_model_key(key)).resolved_model
+            except ProviderError as exc:
+                single[key] = f"error:{exc}"
+
+        list_calls = 0
+        original_list_mappings = mapping_service.list_mappings
+
+        async def _counting_list_mappings(*args, **kwargs):
+            nonlocal list_calls
+            if not kwargs.get("mapping_ids"):  # 只统计全量加载（主键查找不计）
+                list_calls += 1
+            return await original_list_mappings(*args, **kwargs)
+
+        monkeypatch.setattr(mapping_service, "list_mappings", _counting_list_mappings)
+
+        batch = await registry.resolve_model_keys(keys)
+        assert list_calls == 1
+        assert {
+            key: route.resolved_model if isinstance(route, ResolvedProviderRoute) else f"error:{route}"
+            for key, route in batch.items()
+        } == single
+        assert isinstance(batch["ok-1"], ResolvedProviderRoute)
+
+        collector = MetricsCollector(db, MagicMock(), mapping_service, registry)
+        summary = await collector._get_mapped_models_summary()
+        assert summary["total"] == 3
+        assert summary["available"] == sum(1 for value in single.values() if not value.startswith("error:"))
+    finally:
+        await db.close()
+
+
+@pytest.mark.asyncio
+async def test_batch_resolve_isolates_unexpected_errors_per_key(tmp_path, monkeypatch) -> None:
+    settings = get_settings()
+    db = SQLiteManager(tmp_path / "db.sqlite")
+    await db.init()
+    config_service = AIConfigService(db, settings, storage_dir=tmp_path / "runtime")
+    mapping_service = ModelMappingService(config_service, db, tmp_path / "runtime")
+    registry = LlmModelRegistry(config_service, mapping_service, settings)
+    try:
+        await config_service.create_endpoint(
+            {"name": "batch-upstream", "base_url": "http://batch.upstream.local", "api_key": "k", "model_list": ["m-a"]}
+        )
+        for key in ("ok", "bad"):
+            await mapping_service.upsert_mapping(
+                {"scope_type": "mapping", "scope_key": key, "default_model": "m-a", "candidates": ["m-a"], "is_active": True}
+            )
+        original = registry._resolve_request
+
+        async def _flaky(openai_req, **kwargs):
+            if openai_req.get("model") == "bad":
+                raise KeyError("corrupt_mapping")
+            return await original(openai_req, **kwargs)
+
+        monkeypatch.setattr(registry, "_resolve_request", _flaky)
+
+        batch = await registry.resolve_model_keys(["ok", "bad"])
+        assert isinstance(batch["ok"], ResolvedProviderRoute)
+        assert isinstance(batch["bad"], KeyError)
+
+        collector = MetricsCollector(db, MagicMock(), mapping_service, registry)
+        summary = await collector._get_mapped_models_summary()
+        assert summary["total"] == 2 and summary["available"] == 1
+    finally:
+        await db.close()
@@ -184,15 +184,16 @@ class TestRequestIdSSOT:
                 assert "content_delta" in event_names
                 assert "completed" in event_names
 
-                # 验证上游转发：仅 OpenAI 语义字段 + 透传 request_id header
+                # 验证上游转发：仅 OpenAI 语义字段（含 stream_options.include_usage）+ 透传 request_id header
                 call_args = mock_httpx.return_value.__aenter__.return_value.stream.call_args
                 assert call_args is not None
                 upstream_headers = call_args[1]["headers"]
                 assert upstream_headers.get("X-Request-Id") == request_id
                 upstream_payload = call_args[1]["json"]
                 assert set(upstream_payload.keys()).issubset(
-                    {"model", "messages", "tools", "tool_choice", "temperature", "top_p", "max_tokens", "stream"}
+                    {"model", "messages", "tools", "tool_choice", "temperature", "top_p", "max_tokens", "stream", "stream_options"}
                 )
+                assert upstream_payload["stream_options"] == {"include_usage": True}
 
     @pytest.mark.asyncio
     async def test_openai_tool_calls_without_executor_returns_clear_error(self, async_client: AsyncClient, mock_jwt_token: str):
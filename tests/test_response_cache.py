@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+import httpx
+import pytest
+from prometheus_client import REGISTRY
+
+from app.auth import AuthenticatedUser, UserDetails
+from app.services import response_cache as cache_module
+from app.services.ai_service import AIMessageInput, MessageEventBroker
+from app.services.response_cache import ResponseCache, is_deterministic_payload
+from app.settings.config import get_settings
+
+_MODEL = "cache-test-model"
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.mark.asyncio
+async def test_response_cache_ttl_and_size_bounds() -> None:
+    clock = _Clock()
+    cache = ResponseCache(ttl_seconds=10, max_entries=2, clock=clock)
+
+    for key in ("a", "b", "c"):
+        inflight, is_leader = cache.join(key)
+        assert is_leader
+        await cache.complete(key, inflight, (key,), saved_tokens=1)
+
+    assert len(cache) == 2
+    assert cache.get("a") is None  # LRU 淘汰
+    assert cache.get("b").result == ("b",)
+    clock.now += 10
+    assert cache.get("b") is None  # TTL 过期
+
+
+def test_deterministic_payload_detection() -> None:
+    assert is_deterministic_payload({"temperature": 0})
+    assert is_deterministic_payload({"generationConfig": {"temperature": 0.0}})
+    assert not is_deterministic_payload({"temperature": 0.7})
+    assert not is_deterministic_payload({})
+
+
+def _sse_body(text: str) -> bytes:
+    chunks = [
+        {"choices": [{"index": 0, "delta": {"content": text}}]},
+        {"choices": [], "usage": {"prompt_tokens": 30, "completion_tokens": 12, "total_tokens": 42}},
+    ]
+    frames = "".join(f"data: {json.dumps(chunk)}\n\n" for chunk in chunks)
+    return f"{frames}data: [DONE]\n\n".encode("utf-8")
+
+
+@pytest.mark.asyncio
+async def test_identical_deterministic_requests_are_coalesced_and_cached(monkeypatch, mock_upstream_service) -> None:
+    upstream_calls = {"count": 0}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        upstream_calls["count"] += 1
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=_sse_body("cached reply"))
+
+    monkeypatch.setattr(cache_module, "_response_cache", ResponseCache(ttl_seconds=60, max_entries=16))
+    monkeypatch.setattr(get_settings(), "ai_response_cache_enabled", True)
+    upstream = await mock_upstream_service(
+        handler, name="cache-upstream", base_url="http://cache.upstream.local", model_list=[_MODEL]
+    )
+    service = upstream.service
+    saved_before = REGISTRY.get_sample_value("ai_response_cache_saved_tokens_total") or 0.0
+    user = AuthenticatedUser(uid="cache-user", claims={})
+    broker = MessageEventBroker()
+
+    async def send(message_id: str, temperature: float):
+        queue = await broker.create_channel(message_id, owner_user_id=user.uid, conversation_id="conv-cache")
+        message = AIMessageInput(
+            model=_MODEL,
+            dialect="openai.chat_completions",
+            payload={"messages": [{"role": "user", "content": "same question"}], "temperature": temperature},
+        )
+        result = await service._generate_reply(
+            message_id=message_id,
+            message=message,
+            user=user,
+            user_details=UserDetails(uid=user.uid),
+            broker=broker,
+        )
+        events = []
+        while not queue.empty():
+            events.append(queue.get_nowait())
+        return result, events, broker.get_meta(message_id).upstream_routing["mode"]
+
+    (first, first_events, first_mode), (second, second_events, second_mode) = await asyncio.gather(
+        send("cache-1", 0), send("cache-2", 0)
+    )
+    assert upstream_calls["count"] == 1
+    assert first[0] == second[0] == "cached reply"
+    assert {first_mode, second_mode} == {"single", "coalesced"}
+    for events in (first_events, second_events):
+        deltas = [event.data["delta"] for event in events if event.event == "content_delta"]
+        assert deltas == ["cached reply"]
+
+    third, third_events, third_mode = await send("cache-3", 0)
+    assert upstream_calls["count"] == 1
+    assert third[0] == "cached reply" and third_mode == "cache_hit"
+    routed = [event.data for event in third_events if event.data.get("state") == "routed"]
+    assert routed and routed[0]["response_cache"] == "cache_hit"
+
+    # 非确定性请求不参与缓存
+    await send("cache-4", 0.7)
+    assert upstream_calls["count"] == 2
+
+    saved_after = REGISTRY.get_sample_value("ai_response_cache_saved_tokens_total")
+    assert saved_after - saved_before == 84
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import pytest
+
+from app.services.providers.sse import iter_sse_byte_frames
+
+_STREAM = (
+    ": keep-alive comment\n\n"
+    "event: message_start\n"
+    'data: {"type":"message_start"}\n\n'
+    "event: ping\n"
+    "data: {}\n\n"
+    'data: {"delta":"健身🏋️"}\n\n'
+    "data: line-1\n"
+    "data: line-2\n\n"
+    "event: empty\n\n"
+    "data: [DONE]"
+).encode("utf-8")
+
+_EXPECTED = [
+    ("message_start", '{"type":"message_start"}'),
+    ("ping", "{}"),
+    (None, '{"delta":"健身🏋️"}'),
+    (None, "line-1\nline-2"),
+    (None, "[DONE]"),
+]
+
+
+async def _collect(chunks: list[bytes]) -> list[tuple[str | None, str]]:
+    async def gen():
+        for chunk in chunks:
+            yield chunk
+
+    return [item async for item in iter_sse_byte_frames(gen())]
+
+
+@pytest.mark.asyncio
+async def test_byte_parser_handles_any_chunk_boundary() -> None:
+    assert await _collect([_STREAM]) == _EXPECTED
+    # 任意切分位置（含多字节字符中间、分隔符中间）结果一致
+    for size in (1, 2, 3, 7, 64):
+        chunks = [_STREAM[i : i + size] for i in range(0, len(_STREAM), size)]
+        assert await _collect(chunks) == _EXPECTED
+
+
+@pytest.mark.asyncio
+async def test_byte_parser_normalizes_crlf_split_across_chunks() -> None:
+    crlf = _STREAM.replace(b"\n", b"\r\n")
+    for size in (1, 5, len(crlf)):
+        chunks = [crlf[i : i + size] for i in range(0, len(crlf), size)]
+        assert await _collect(chunks) == _EXPECTED
@@ -13,6 +13,7 @@ from httpx import AsyncClient
 from app import app as fastapi_app
 from app.auth import AuthenticatedUser
 from app.services.ai_service import MessageEvent
+from app.services.llm_app_settings import get_llm_app_settings_store
 from scripts.monitoring.local_mock_ai_conversation_e2e import _validate_thinkingml
 
 
@@ -53,9 +54,10 @@ def _assert_completed_required_fields(events: list[dict[str, Any]]) -> dict[str,
 
 
 def _make_async_lines(lines: list[str]):
+    # adapter 以字节流分帧：每行作为一个 chunk 下发（含行尾）
     async def gen():
         for line in lines:
-            yield line
+            yield f"{line}\n".encode("utf-8")
 
     return gen()
 
@@ -75,7 +77,7 @@ def _mock_httpx_streaming_sse(mock_httpx: MagicMock, *, lines: list[str], header
     if headers:
         response.headers.update(headers)
     response.raise_for_status = MagicMock()
-    response.aiter_lines = MagicMock(side_effect=lambda: _make_async_lines(lines))
+    response.aiter_bytes = MagicMock(side_effect=lambda: _make_async_lines(lines))
     response.aread = AsyncMock(return_value=b"")
 
     stream_ctx = MagicMock()
@@ -755,6 +757,7 @@ async def test_messages_default_result_mode_without_dashboard_config_defaults_to
                 "DELETE FROM llm_app_settings WHERE key = ?",
                 ("default_result_mode",),
             )
+            get_llm_app_settings_store(fastapi_app).invalidate()
 
             reply = _build_valid_thinkingml_reply(normalize_title_variants=True)
             # 触发 broker 的超长拆分（>256 chars -> 多条 content_delta），避免依赖 provider 侧分块实现。
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import json
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+import httpx
+import pytest
+
+from app.auth import AuthenticatedUser
+from app.db.sqlite_manager import SQLiteManager
+from app.services.ai_service import AIMessageInput, MessageEventBroker
+from app.services.metrics_collector import MetricsCollector
+from app.services.providers.openai_chat_completions import OpenAIChatCompletionsAdapter
+from app.services.providers.usage import normalize_usage
+from app.settings.config import get_settings
+
+_MODEL = "usage-test-model"
+
+
+def test_normalize_usage_across_dialects() -> None:
+    assert normalize_usage(
+        {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15, "prompt_tokens_details": {"cached_tokens": 4}}
+    ) == {"prompt_tokens": 10, "completion_tokens": 5, "cached_tokens": 4, "total_tokens": 15}
+    # Anthropic：input_tokens 不含缓存读写部分
+    assert normalize_usage(
+        {"input_tokens": 2, "cache_read_input_tokens": 100, "cache_creation_input_tokens": 8, "output_tokens": 7}
+    ) == {"prompt_tokens": 110, "completion_tokens": 7, "cached_tokens": 100, "total_tokens": 117}
+    assert normalize_usage({"input_tokens": 3, "output_tokens": 4, "input_tokens_details": {"cached_tokens": 1}}) == {
+        "prompt_tokens": 3,
+        "completion_tokens": 4,
+        "cached_tokens": 1,
+        "total_tokens": 7,
+    }
+    assert normalize_usage({"unknown": 1}) is None
+    assert normalize_usage(None) is None
+
+
+def test_stream_options_only_for_native_openai_by_default() -> None:
+    adapter = OpenAIChatCompletionsAdapter()
+    request = {"model": _MODEL, "messages": [{"role": "user", "content": "hi"}]}
+
+    _, _, payload = adapter.build_request({"base_url": "https://api.openai.com"}, request)
+    assert payload["stream_options"] == {"include_usage": True}
+
+    _, _, payload = adapter.build_request({"base_url": "https://compat.vendor.example"}, request)
+    assert "stream_options" not in payload
+
+
+@pytest.mark.asyncio
+async def test_stream_usage_is_persisted_and_summed(mock_upstream_service, monkeypatch) -> None:
+    seen_bodies: list[dict] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        seen_bodies.append(json.loads(request.content))
+        chunks = [
+            {"choices": [{"index": 0, "delta": {"content": "hello"}}]},
+            {
+                "choices": [],
+                "usage": {
+                    "prompt_tokens": 30,
+                    "completion_tokens": 12,
+                    "total_tokens": 42,
+                    "prompt_tokens_details": {"cached_tokens": 16},
+                },
+            },
+        ]
+        body = "".join(f"data: {json.dumps(chunk)}\n\n" for chunk in chunks) + "data: [DONE]\n\n"
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=body.encode("utf-8"))
+
+    upstream = await mock_upstream_service(
+        handler, name="usage-upstream", base_url="http://usage.upstream.local", model_list=[_MODEL]
+    )
+    service, db = upstream.service, upstream.db
+    user = AuthenticatedUser(uid="usage-user", claims={})
+    broker = MessageEventBroker()
+    for index in range(2):
+        if index == 1:
+            # 非 api.openai.com 的兼容端点默认不带 stream_options，需显式开启
+            monkeypatch.setattr(get_settings(), "ai_openai_stream_include_usage", True)
+        message_id = f"usage-{index}"
+        queue = await broker.create_channel(message_id, owner_user_id=user.uid, conversation_id="conv-usage")
+        message = AIMessageInput(
+            model=_MODEL,
+            dialect="openai.chat_completions",
+            payload={"messages": [{"role": "user", "content": "hi"}]},
+            metadata={"save_history": False},
+        )
+        await service.run_conversation(message_id, user, message, broker)
+        events = []
+        while not queue.empty():
+            item = queue.get_nowait()
+            if item is not None:
+                events.append(item)
+        completed = [event.data for event in events if event.event == "completed"]
+        assert completed and completed[0]["metadata"] is None  # usage 只落库，不随 completed 下发
+
+    assert "stream_options" not in seen_bodies[0]
+    assert seen_bodies[1]["stream_options"] == {"include_usage": True}
+
+    stats = await db.fetchone(
+        "SELECT prompt_tokens, completion_tokens, cached_tokens, total_tokens FROM ai_request_stats WHERE user_id = ?",
+        [user.uid],
+    )
+    assert dict(stats) == {"prompt_tokens": 60, "completion_tokens": 24, "cached_tokens": 32, "total_tokens": 84}
+
+    log = await db.fetchone(
+        "SELECT prompt_tokens, cached_tokens, total_tokens FROM conversation_logs WHERE message_id = ?",
+        ["usage-1"],
+    )
+    assert dict(log) == {"prompt_tokens": 30, "cached_tokens": 16, "total_tokens": 42}
+
+    rollup = await db.fetchall("SELECT model, total_tokens FROM ai_token_usage_hourly", ())
+    assert [dict(row) for row in rollup] == [{"model": _MODEL, "total_tokens": 84}]
+
+    collector = MetricsCollector(db, MagicMock())
+    assert await collector._get_token_usage("24h") == 84
+
+
+@pytest.mark.asyncio
+async def test_token_usage_reads_hourly_rollup_window(tmp_path) -> None:
+    db = SQLiteManager(tmp_path / "db.sqlite")
+    await db.init()
+    collector = MetricsCollector(db, MagicMock())
+    try:
+        # 升级前只有按天累计：汇总表为空时启动回填到当天 00 时
+        await db.execute(
+            """
+            INSERT INTO ai_request_stats (user_id, endpoint_id, model, request_date, total_tokens)
+            VALUES ('u1', NULL, 'm', '2000-01-01', 7), ('u2', NULL, 'm', '2000-01-01', 3)
+            """,
+            (),
+        )
+        await collector.backfill_token_usage_hourly()
+        backfilled = await db.fetchone("SELECT usage_hour, endpoint_id, total_tokens FROM ai_token_usage_hourly", ())
+        assert dict(backfilled) == {"usage_hour": "2000-01-01T00", "endpoint_id": 0, "total_tokens": 10}
+
+        now = datetime.now()
+        for hours_ago, tokens in ((0, 5), (3, 20), (30, 400)):
+            hour = (now - timedelta(hours=hours_ago)).strftime("%Y-%m-%dT%H")
+            await db.execute(
+                "INSERT INTO ai_token_usage_hourly (usage_hour, model, endpoint_id, total_tokens) VALUES (?, 'm', 1, ?)",
+                [hour, tokens],
+            )
+
+        assert await collector._get_token_usage("1h") == 5
+        assert await collector._get_token_usage("24h") == 25
+        assert await collector._get_token_usage("7d") == 425
+    finally:
+        await db.close()
+
+
+@pytest.mark.asyncio
+async def test_token_usage_backfills_legacy_conversation_logs_once(tmp_path) -> None:
+    db = SQLiteManager(tmp_path / "db.sqlite")
+    await db.init()
+    collector = MetricsCollector(db, MagicMock())
+    try:
+        # token 列上线前的日志：列为 0，usage 只在 response_payload 中；已有 token 列的日志由 ai_request_stats 回填
+        for payload, total_tokens in (
+            ({"usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}}, 0),
+            ({"usage": {"input_tokens": 4, "output_tokens": 6}}, 0),
+            ({"usage": {"total_tokens": 99}}, 99),
+            ({"reply": "no usage"}, 0),
+        ):
+            await db.execute(
+                """
+                INSERT INTO conversation_logs (user_id, message_id, response_payload, model_used, status, total_tokens)
+                VALUES ('u1', 'm1', ?, 'legacy-model', 'success', ?)
+                """,
+                [json.dumps(payload), total_tokens],
+            )
+        await collector.backfill_token_usage_hourly()
+        assert await collector._get_token_usage("24h") == 25
+        rows = await db.fetchall("SELECT model, endpoint_id FROM ai_token_usage_hourly", ())
+        assert [dict(row) for row in rows] == [{"model": "legacy-model", "endpoint_id": 0}]
+
+        # 汇总表非空后不再回填
+        await collector.backfill_token_usage_hourly()
+        assert await collector._get_token_usage("24h") == 25
+    finally:
+        await db.close()
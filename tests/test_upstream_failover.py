@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from collections import Counter
+
+import httpx
+import pytest
+
+from app.auth import AuthenticatedUser, UserDetails
+from app.services import endpoint_balancer as balancer_module
+from app.services import endpoint_circuit_breaker as breaker_module
+from app.services.ai_service import AIMessageInput, AIService, MessageEventBroker
+from app.services.endpoint_balancer import EndpointBalancer
+from app.services.endpoint_circuit_breaker import EndpointCircuitBreaker
+from app.settings.config import get_settings
+
+_MODEL = "failover-test-model"
+
+
+def _sse_body(text: str) -> bytes:
+    chunk = {"choices": [{"index": 0, "delta": {"content": text}}]}
+    return f"data: {json.dumps(chunk)}\n\ndata: [DONE]\n\n".encode("utf-8")
+
+
+async def _setup(mock_upstream_service, monkeypatch, behaviours: dict[str, tuple[float, int]]):
+    """behaviours: host -> (首包前延迟秒数, HTTP 状态码)；首个 host 为主路由（is_default）。"""
+
+    hits: Counter[str] = Counter()
+    cancelled: Counter[str] = Counter()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        hits[host] += 1
+        delay, status = behaviours[host]
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled[host] += 1
+            raise
+        if status != 200:
+            return httpx.Response(status, json={"error": "overloaded"})
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=_sse_body(host))
+
+    monkeypatch.setattr(balancer_module, "_endpoint_balancer", EndpointBalancer())
+    monkeypatch.setattr(breaker_module, "_endpoint_circuit_breaker", EndpointCircuitBreaker())
+    upstream = await mock_upstream_service(handler)
+    endpoint_ids: dict[str, int] = {}
+    for index, host in enumerate(behaviours):
+        endpoint = await upstream.config_service.create_endpoint(
+            {
+                "name": host,
+                "base_url": f"http://{host}",
+                "api_key": "k",
+                "model_list": [_MODEL],
+                "is_default": index == 0,
+            }
+        )
+        endpoint_ids[host] = int(endpoint["id"])
+    return upstream.service, endpoint_ids, hits, cancelled
+
+
+async def _send(service: AIService, message_id: str):
+    user = AuthenticatedUser(uid="failover-user", claims={})
+    broker = MessageEventBroker()
+    queue = await broker.create_channel(message_id, owner_user_id=user.uid, conversation_id="conv-failover")
+    message = AIMessageInput(
+        model=_MODEL,
+        dialect="openai.chat_completions",
+        payload={"messages": [{"role": "user", "content": "hi"}]},
+    )
+    result = await service._generate_reply(
+        message_id=message_id,
+        message=message,
+        user=user,
+        user_details=UserDetails(uid=user.uid),
+        broker=broker,
+    )
+    events = []
+    while not queue.empty():
+        events.append(queue.get_nowait())
+    return result, events, broker.get_meta(message_id).upstream_routing
+
+
+@pytest.mark.asyncio
+async def test_failover_switches_endpoint_when_ttft_exceeds_threshold(monkeypatch, mock_upstream_service) -> None:
+    settings = get_settings()
+    monkeypatch.setattr(settings, "ai_upstream_failover_enabled", True)
+    monkeypatch.setattr(settings, "ai_upstream_failover_ttft_seconds", 0.05)
+    service, endpoint_ids, hits, cancelled = await _setup(
+        mock_upstream_service,
+        monkeypatch,
+        {"stuck.upstream.local": (5.0, 200), "backup.upstream.local": (0.0, 200)},
+    )
+    result, events, routing = await _send(service, "failover-ttft")
+
+    assert result[0] == "backup.upstream.local"
+    assert result[5] == endpoint_ids["backup.upstream.local"]
+    assert cancelled["stuck.upstream.local"] == 1
+    routed = [event.data["endpoint_id"] for event in events if event.data.get("state") == "routed"]
+    assert routed == [endpoint_ids["backup.upstream.local"]]
+    assert routing["mode"] == "failover"
+    assert [item["outcome"] for item in routing["attempts"]] == ["ttft_timeout", "won"]
+
+
+@pytest.mark.asyncio
+async def test_failover_on_upstream_error_before_first_delta(monkeypatch, mock_upstream_service) -> None:
+    settings = get_settings()
+    monkeypatch.setattr(settings, "ai_upstream_failover_enabled", True)
+    service, endpoint_ids, hits, _ = await _setup(
+        mock_upstream_service,
+        monkeypatch,
+        {"broken.upstream.local": (0.0, 503), "backup.upstream.local": (0.0, 200)},
+    )
+    result, _, routing = await _send(service, "failover-error")
+
+    assert result[0] == "backup.upstream.local"
+    assert hits == Counter({"broken.upstream.local": 1, "backup.upstream.local": 1})
+    assert [item["outcome"] for item in routing["attempts"]] == ["error", "won"]
+    assert routing["attempts"][0]["endpoint_id"] == endpoint_ids["broken.upstream.local"]
+    assert routing["attempts"][0]["error"]
+
+
+@pytest.mark.asyncio
+async def test_hedged_race_keeps_only_fastest_stream_and_cancels_loser(monkeypatch, mock_upstream_service) -> None:
+    settings = get_settings()
+    monkeypatch.setattr(settings, "ai_upstream_hedge_enabled", True)
+    service, endpoint_ids, hits, cancelled = await _setup(
+        mock_upstream_service,
+        monkeypatch,
+        {"slow.upstream.local": (0.5, 200), "fast.upstream.local": (0.01, 200)},
+    )
+    result, events, routing = await _send(service, "hedged")
+
+    assert result[0] == "fast.upstream.local"
+    assert result[5] == endpoint_ids["fast.upstream.local"]
+    assert hits == Counter({"slow.upstream.local": 1, "fast.upstream.local": 1})
+    assert cancelled["slow.upstream.local"] == 1
+    # 落败者的 routed/增量事件不会泄露给客户端
+    deltas = [event.data.get("delta") for event in events if event.event == "content_delta"]
+    assert "".join(deltas) == "fast.upstream.local"
+    routed = [event.data["endpoint_id"] for event in events if event.data.get("state") == "routed"]
+    assert routed == [endpoint_ids["fast.upstream.local"]]
+    assert routing["mode"] == "hedged"
+    assert [item["outcome"] for item in routing["attempts"]] == ["cancelled", "won"]
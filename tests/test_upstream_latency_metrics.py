@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from time import perf_counter
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from prometheus_client import REGISTRY
+
+from app.api.v1.messages import _observe_sse_first_event
+from app.auth import AuthenticatedUser
+from app.services.ai_service import AIMessageInput, MessageEventBroker
+
+_MODEL = "latency-test-model"
+_DIALECT = "openai.chat_completions"
+
+
+def _count(name: str, labels: dict[str, str]) -> float:
+    return REGISTRY.get_sample_value(f"{name}_count", labels) or 0.0
+
+
+class _SlowStream(httpx.AsyncByteStream):
+    def __init__(self, chunks: list[bytes]) -> None:
+        self._chunks = chunks
+
+    async def __aiter__(self):
+        for chunk in self._chunks:
+            await asyncio.sleep(0.01)
+            yield chunk
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("result_mode", ["xml_plaintext", "auto"])  # auto → emit_raw：每帧 upstream_raw + content_delta
+async def test_upstream_latency_histograms_are_observed(mock_upstream_service, result_mode) -> None:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        chunks = [
+            {"choices": [{"index": 0, "delta": {"content": "a"}}]},
+            {"choices": [{"index": 0, "delta": {"content": "b"}}]},
+            {"choices": [{"index": 0, "delta": {"content": "c"}}]},
+            {"choices": [], "usage": {"prompt_tokens": 5, "completion_tokens": 3, "total_tokens": 8}},
+        ]
+        parts = [f"data: {json.dumps(chunk)}\n\n".encode("utf-8") for chunk in chunks] + [b"data: [DONE]\n\n"]
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, stream=_SlowStream(parts))
+
+    upstream = await mock_upstream_service(
+        handler, name="latency-upstream", base_url="http://latency.upstream.local", model_list=[_MODEL]
+    )
+    service = upstream.service
+    labels = {"endpoint_id": str(upstream.endpoint["id"]), "model": _MODEL, "dialect": _DIALECT}
+    names = (
+        "ai_upstream_connect_seconds",
+        "ai_upstream_ttft_seconds",
+        "ai_upstream_chunk_gap_seconds",
+        "ai_upstream_output_tokens_per_second",
+    )
+    before = {name: _count(name, labels) for name in names}
+
+    user = AuthenticatedUser(uid="latency-user", claims={})
+    broker = MessageEventBroker()
+    message_id = "latency-1"
+    await broker.create_channel(
+        message_id, owner_user_id=user.uid, conversation_id="conv-latency", result_mode=result_mode
+    )
+    message = AIMessageInput(
+        model=_MODEL,
+        dialect=_DIALECT,
+        payload={"messages": [{"role": "user", "content": "hi"}]},
+        metadata={"save_history": False},
+    )
+    await service.run_conversation(message_id, user, message, broker)
+
+    assert _count("ai_upstream_connect_seconds", labels) - before["ai_upstream_connect_seconds"] == 1
+    assert _count("ai_upstream_ttft_seconds", labels) - before["ai_upstream_ttft_seconds"] == 1
+    # 3 个增量 → 2 个间隔（emit_raw 时 upstream_raw 不重复计入）
+    assert _count("ai_upstream_chunk_gap_seconds", labels) - before["ai_upstream_chunk_gap_seconds"] == 2
+    tps = "ai_upstream_output_tokens_per_second"
+    assert _count(tps, labels) - before[tps] == 1
+    assert broker.get_meta(message_id).upstream_labels == labels
+
+
+def test_sse_first_event_uses_channel_labels() -> None:
+    labels = {"endpoint_id": "42", "model": "m", "dialect": _DIALECT}
+    meta = SimpleNamespace(created_perf=perf_counter() - 0.5, upstream_labels=labels)
+    before = _count("ai_sse_first_event_seconds", labels)
+    before_sum = REGISTRY.get_sample_value("ai_sse_first_event_seconds_sum", labels) or 0.0
+
+    _observe_sse_first_event(meta, perf_counter())
+    _observe_sse_first_event(meta, None)  # 未写出任何内容帧：不记录
+
+    assert _count("ai_sse_first_event_seconds", labels) - before == 1
+    assert REGISTRY.get_sample_value("ai_sse_first_event_seconds_sum", labels) - before_sum >= 0.5
+    unknown = {"endpoint_id": "unknown", "model": "unknown", "dialect": "unknown"}
+    before_unknown = _count("ai_sse_first_event_seconds", unknown)
+    _observe_sse_first_event(SimpleNamespace(created_perf=perf_counter(), upstream_labels=None), perf_counter())
+    assert _count("ai_sse_first_event_seconds", unknown) - before_unknown == 1
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.repositories.user_repo import UserRepository
+from app.services.config_events import TOPIC_ENTITLEMENTS, ConfigEventBus
+from app.services.supabase_admin import SupabaseAdminClient
+from app.settings.config import Settings
+
+_REAL_ASYNC_CLIENT = httpx.AsyncClient
+_ROUND_TRIP_SECONDS = 0.05
+
+
+@pytest.mark.asyncio
+async def test_user_bundle_cold_load_is_one_round_trip_over_pooled_client(monkeypatch) -> None:
+    requests: list[str] = []
+    clients = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request.url.path.rsplit("/", 1)[-1])
+        await asyncio.sleep(_ROUND_TRIP_SECONDS)
+        return httpx.Response(200, json=[{"user_id": "u-1", "tier": "pro"}])
+
+    def client_factory(*args, **kwargs):
+        nonlocal clients
+        clients += 1
+        return _REAL_ASYNC_CLIENT(*args, transport=httpx.MockTransport(handler), **kwargs)
+
+    monkeypatch.setattr("app.services.supabase_admin.httpx.AsyncClient", client_factory)
+    supabase = SupabaseAdminClient(
+        Settings(SUPABASE_SERVICE_ROLE_KEY="test-key", SUPABASE_URL="https://test.supabase.co")
+    )
+    repo = UserRepository(supabase, max_cached_bundles=2)
+    try:
+        started = time.perf_counter()
+        bundles = await asyncio.gather(*[repo.get_user_bundle("u-1") for _ in range(20)])
+        elapsed = time.perf_counter() - started
+
+        assert all(bundle is bundles[0] for bundle in bundles)
+        assert bundles[0]["entitlements"]["tier"] == "pro"
+        # 20 个并发请求只触发一次加载：3 张表并发读取，复用同一连接池
+        assert sorted(requests) == ["user_entitlements", "user_profiles", "user_settings"]
+        assert clients == 1
+        assert elapsed < _ROUND_TRIP_SECONDS * 2.5
+
+        # 有界 LRU：u-1 最近使用，u-2 被淘汰
+        await repo.get_user_bundle("u-2")
+        await repo.get_user_bundle("u-1")
+        await repo.get_user_bundle("u-3")
+        assert list(repo._bundle_cache) == ["u-1", "u-3"]
+        assert len(requests) == 9
+
+        # 管理端修改权益（TOPIC_ENTITLEMENTS）后 bundle 缓存失效，下一次读取重新加载
+        bus = ConfigEventBus()
+        bus.subscribe(TOPIC_ENTITLEMENTS, repo.on_config_change)
+        bus.publish_local(TOPIC_ENTITLEMENTS)
+        await repo.get_user_bundle("u-1")
+        assert len(requests) == 12
+    finally:
+        await supabase.aclose()